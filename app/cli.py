@@ -0,0 +1,195 @@
+"""
+Comandos de mantenimiento de la aplicación.
+
+Uso:
+    python -m app.cli migrate [--revision head] [--sql]
+    python -m app.cli repair-chat-counters [--chat-id ID] [--batch-size N]
+    python -m app.cli jobs-worker [--workers N]
+    python -m app.cli export-chats [--output FILE[.gz]] [--gzip] [--chat-id ID ...] [--batch-size N]
+    python -m app.cli import-chats FILE[.gz] [--batch-size N]
+    python -m app.cli index-messages [--rebuild]
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+from app.conf.db import SessionLocal
+from app.conf.logging import configure_logging
+from app.entities import chats, embeddings, jobs, messages, search, summaries  # noqa: F401 (registra los modelos)
+from app.repositories.chats import ChatRepository
+
+
+# alembic.ini en la raíz del proyecto, sin depender del directorio actual
+ALEMBIC_INI = Path(__file__).resolve().parent.parent / "alembic.ini"
+
+
+def migrate(args: argparse.Namespace):
+    """Aplicar las migraciones de Alembic (reemplaza al create_all del arranque)"""
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("script_location", str(ALEMBIC_INI.parent / "migrations"))
+    started = time.perf_counter()
+    command.upgrade(config, args.revision, sql=args.sql)
+    if not args.sql:
+        print(f"Esquema actualizado a {args.revision} en {time.perf_counter() - started:.2f}s")
+
+
+def repair_chat_counters(args: argparse.Namespace):
+    """Recalcular message_count y last_message_at de los chats"""
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        processed = ChatRepository(db).repair_counters(args.chat_id, args.batch_size)
+    print(f"Contadores recalculados para {processed} chats en {time.perf_counter() - started:.2f}s")
+
+
+def jobs_worker(args: argparse.Namespace):
+    """Consumir la cola de jobs en un proceso aparte (con JOBS_WORKERS=0 en la API)"""
+    from app.providers.llm_studio_api import lm_studio_provider
+    from app.services.job_worker import JobWorker
+
+    worker = JobWorker.from_settings()
+    if args.workers is not None:
+        worker.workers = args.workers
+
+    async def run():
+        await lm_studio_provider.startup()
+        await worker.start()
+        print(f"Procesando jobs con {worker.workers} workers (Ctrl+C para salir)")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await worker.stop()
+            await lm_studio_provider.shutdown()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+def export_chats(args: argparse.Namespace):
+    """Exportar chats y mensajes como NDJSON (gzip con --gzip o si el archivo termina en .gz)"""
+    from app.services.transfer import ChatExporter
+
+    compress = args.gzip or (args.output or "").endswith(".gz")
+    exporter = ChatExporter(args.chat_id, compress, args.batch_size)
+    started = time.perf_counter()
+    written = 0
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for chunk in exporter.chunks():
+            output.write(chunk)
+            written += len(chunk)
+    finally:
+        if args.output:
+            output.close()
+    print(f"Exportados {written} bytes en {time.perf_counter() - started:.2f}s", file=sys.stderr)
+
+
+def import_chats(args: argparse.Namespace):
+    """Importar un NDJSON exportado (gzip detectado automáticamente; - lee de stdin)"""
+    from app.services.transfer import ChatImporter, NdjsonDecoder
+
+    decoder = NdjsonDecoder()
+    source = sys.stdin.buffer if args.file == "-" else open(args.file, "rb")
+    with SessionLocal() as db, source:
+        importer = ChatImporter(db, args.batch_size)
+        while chunk := source.read(1 << 20):
+            importer.add_lines(decoder.feed(chunk))
+        importer.add_lines(decoder.finish())
+        stats = importer.finish()
+    print(
+        f"Importados {stats['chats']} chats y {stats['messages']} mensajes en "
+        f"{stats['elapsed_seconds']:.2f}s ({stats['rows_per_second']} filas/s)"
+    )
+
+
+def index_messages(args: argparse.Namespace):
+    """
+    Embeber los mensajes que no tienen embedding del modelo actual (anteriores a
+    CONTEXT_RETRIEVAL_ENABLED, importados o tras cambiar de modelo) y poner al día
+    el índice global; --rebuild lo reconstruye desde la tabla (descarta las filas borradas)
+    """
+    from app.conf.settings import get_settings
+    from app.providers.llm_studio_api import lm_studio_provider
+    from app.repositories.embeddings import EmbeddingRepository
+    from app.services.retrieval import ConversationRetriever
+
+    settings = get_settings().model_copy(update={"context_retrieval_enabled": True})
+    retriever = ConversationRetriever.from_settings(settings)
+
+    async def run() -> int:
+        await lm_studio_provider.startup()
+        try:
+            total, after_id = 0, 0
+            while True:
+                indexed, after_id = await retriever.index_pending(after_id=after_id)
+                total += indexed
+                if indexed < retriever.batch_size:
+                    return total
+                print(f"{total} mensajes embebidos (hasta el id {after_id})", file=sys.stderr)
+        finally:
+            await lm_studio_provider.shutdown()
+
+    started = time.perf_counter()
+    embedded = asyncio.run(run())
+    embedded_seconds = time.perf_counter() - started
+    if args.rebuild:
+        retriever.index.reset()
+    with SessionLocal() as db:
+        added = retriever.sync_index(EmbeddingRepository(db))
+    print(
+        f"Embebidos {embedded} mensajes con {retriever.model} en {embedded_seconds:.2f}s; "
+        f"índice global: {retriever.index.count} vectores ({added} nuevos) en {time.perf_counter() - started:.2f}s"
+    )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Comandos de mantenimiento")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    upgrade = subparsers.add_parser("migrate", help="aplicar las migraciones del esquema (alembic upgrade)")
+    upgrade.add_argument("--revision", default="head", help="revisión destino")
+    upgrade.add_argument("--sql", action="store_true", help="imprimir el SQL sin conectarse")
+    upgrade.set_defaults(handler=migrate)
+
+    repair = subparsers.add_parser("repair-chat-counters", help="recalcular message_count/last_message_at de los chats")
+    repair.add_argument("--chat-id", type=int, default=None, help="solo este chat")
+    repair.add_argument("--batch-size", type=int, default=1000, help="chats por transacción")
+    repair.set_defaults(handler=repair_chat_counters)
+
+    worker = subparsers.add_parser("jobs-worker", help="procesar la cola de jobs de completions")
+    worker.add_argument("--workers", type=int, default=None, help="workers concurrentes (por defecto JOBS_WORKERS)")
+    worker.set_defaults(handler=jobs_worker)
+
+    export = subparsers.add_parser("export-chats", help="exportar chats y mensajes como NDJSON")
+    export.add_argument("--output", default=None, help="archivo destino (por defecto stdout; .gz comprime)")
+    export.add_argument("--gzip", action="store_true", help="comprimir con gzip")
+    export.add_argument("--chat-id", type=int, action="append", default=None, help="solo este chat (repetible)")
+    export.add_argument("--batch-size", type=int, default=1000, help="filas leídas por lote")
+    export.set_defaults(handler=export_chats)
+
+    load = subparsers.add_parser("import-chats", help="importar un NDJSON exportado (los chats reciben ids nuevos)")
+    load.add_argument("file", help="archivo NDJSON o NDJSON gzip (- para stdin)")
+    load.add_argument("--batch-size", type=int, default=1000, help="registros por transacción")
+    load.set_defaults(handler=import_chats)
+
+    index = subparsers.add_parser("index-messages", help="embeber los mensajes pendientes y actualizar el índice de vectores")
+    index.add_argument("--rebuild", action="store_true", help="reconstruir el índice global desde cero")
+    index.set_defaults(handler=index_messages)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    configure_logging()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,99 @@
-import os
-from sqlalchemy import create_engine
+import asyncio
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from sqlalchemy import create_engine, event, exc, text
 from sqlalchemy.orm import sessionmaker, declarative_base
-from dotenv import load_dotenv
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql import functions
+from app.conf.logging import current_repository_method
+from app.conf.pool import InstrumentedQueuePool
+from app.conf.settings import Settings, get_settings
 
-# cargar variables de entorno
-load_dotenv()
+settings = get_settings()
 
 # obtener URL de conexión
-DATABASE_URL = os.getenv("DATABASE_URL")
+DATABASE_URL = settings.database_url
 
-# crear engine SQLAlchemy
-engine = create_engine(DATABASE_URL, echo=True, future=True)
+def connect_args_for(url: str) -> dict:
+    """Argumentos del driver: SQLite (pruebas/benchmarks locales) necesita compartir conexiones entre hilos"""
+    return {"check_same_thread": False} if url.startswith("sqlite") else {}
+
+def engine_options(settings: Settings) -> dict:
+    """
+    Pool de conexiones configurable. pre-ping descarta conexiones muertas (p. ej.
+    tras un failover de SQL Server) y recycle las renueva antes de que el servidor
+    o un firewall las corte. SQLite en memoria usa su pool propio (una sola BD por conexión).
+    """
+    url = settings.database_url
+    options = {}
+    if not (url.startswith("sqlite") and (":memory:" in url or url.rstrip("/") == "sqlite:")):
+        options.update(
+            poolclass=InstrumentedQueuePool,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+            pool_pre_ping=settings.db_pool_pre_ping
+        )
+    # p. ej. READ COMMITTED, SNAPSHOT (SQL Server) o AUTOCOMMIT
+    if settings.db_isolation_level:
+        options["isolation_level"] = settings.db_isolation_level
+    return options
+
+def create_db_engine(settings: Settings):
+    """Crear el engine (DB_ECHO solo para depurar: escribe cada sentencia y sus parámetros)"""
+    return create_engine(
+        settings.database_url,
+        echo=settings.db_echo,
+        future=True,
+        connect_args=connect_args_for(settings.database_url),
+        **engine_options(settings)
+    )
+
+engine = create_db_engine(settings)
+
+# log de consultas lentas (WARNING) y de cada consulta muestreada (DEBUG, desactivado por defecto)
+query_logger = logging.getLogger("app.db.query")
+slow_query_logger = logging.getLogger("app.db.slow_query")
+SLOW_QUERY_THRESHOLD_MS = settings.db_slow_query_ms
+# las sentencias muy largas (p. ej. INSERT multi-VALUES) se recortan
+MAX_LOGGED_STATEMENT_CHARS = 2000
+
+def install_query_logging(target_engine, threshold_ms: float = SLOW_QUERY_THRESHOLD_MS):
+    """
+    Medir cada consulta con eventos del cursor. Los parámetros nunca se registran
+    (incluyen el contenido de los mensajes); solo la sentencia, la duración y el
+    método del repositorio que la lanzó.
+    """
+    @event.listens_for(target_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._query_started_at = time.perf_counter()
+
+    @event.listens_for(target_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started_at = getattr(context, "_query_started_at", None)
+        if started_at is None:
+            return
+        duration_ms = (time.perf_counter() - started_at) * 1000
+        if duration_ms >= threshold_ms:
+            slow_query_logger.warning("slow query", extra=_query_fields(statement, duration_ms, executemany))
+        elif query_logger.isEnabledFor(logging.DEBUG):
+            query_logger.debug("query", extra=_query_fields(statement, duration_ms, executemany))
+
+def _query_fields(statement: str, duration_ms: float, executemany: bool) -> dict:
+    return {
+        "statement": statement[:MAX_LOGGED_STATEMENT_CHARS],
+        "duration_ms": round(duration_ms, 3),
+        "repository_method": current_repository_method.get(),
+        "executemany": executemany
+    }
+
+if SLOW_QUERY_THRESHOLD_MS > 0:
+    install_query_logging(engine)
 
 # session local
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -18,6 +101,19 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # clase base para modelos
 Base = declarative_base()
 
+# En SQLite, func.now() compila a CURRENT_TIMESTAMP (sin fracciones de segundo y con
+# otro formato de texto que el de SQLAlchemy), lo que rompe el orden y los cursores
+# por (created_at, id). Se genera el mismo formato que usa SQLAlchemy, con milisegundos.
+@compiles(functions.now, "sqlite")
+def _sqlite_now(element, compiler, **kw):
+    return "STRFTIME('%Y-%m-%d %H:%M:%f000', 'now')"
+
+# executor dedicado para las operaciones bloqueantes de BD
+db_executor = ThreadPoolExecutor(
+    max_workers=settings.db_executor_workers,
+    thread_name_prefix="db"
+)
+
 # función auxiliar para obtener sesión
 def get_db():
     db = SessionLocal()
@@ -25,3 +121,47 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def get_pool_stats() -> dict:
+    """Estado del pool de conexiones y estadísticas de espera en el checkout"""
+    pool = engine.pool
+    if isinstance(pool, InstrumentedQueuePool):
+        stats = pool.to_dict()
+    else:
+        stats = {"status": pool.status()}
+    stats["pool_class"] = type(pool).__name__
+    stats["pre_ping"] = pool._pre_ping
+    stats["recycle_seconds"] = pool._recycle
+    return stats
+
+# migraciones de Alembic (migrations/ en la raíz del proyecto)
+MIGRATIONS_PATH = Path(__file__).resolve().parent.parent.parent / "migrations"
+
+@functools.lru_cache(maxsize=1)
+def expected_schema_revision() -> str:
+    """Última revisión de las migraciones que trae este código (head de Alembic)"""
+    from alembic.script import ScriptDirectory
+
+    return ScriptDirectory(str(MIGRATIONS_PATH)).get_current_head()
+
+def check_database() -> dict:
+    """
+    Comprobar la conexión y que el esquema esté migrado (lo usa /readyz).
+    Devuelve la revisión de Alembic aplicada (None si no hay migraciones) y la
+    que espera este código: si no coinciden faltan columnas o tablas.
+    """
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        try:
+            revision = conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+        except exc.DBAPIError:
+            revision = None
+    return {"schema_revision": revision, "expected_schema_revision": expected_schema_revision()}
+
+async def run_db(func, *args, **kwargs):
+    """
+    Ejecutar una operación síncrona de BD (repositorio) en el executor de BD
+    para no bloquear el event loop. La sesión se usa desde un solo hilo a la vez.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, functools.partial(func, *args, **kwargs))
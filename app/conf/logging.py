@@ -0,0 +1,92 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional
+from app.conf.settings import get_settings
+
+# Método del repositorio que está ejecutando consultas (lo fija instrument_repository),
+# para que el log de consultas lentas indique quién las lanzó
+current_repository_method: ContextVar[Optional[str]] = ContextVar("current_repository_method", default=None)
+
+# Atributos propios de LogRecord: el resto son los campos pasados en `extra`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por registro, con los campos de `extra` al primer nivel"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class SamplingFilter(logging.Filter):
+    """Dejar pasar solo una fracción de los registros por debajo de WARNING"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or self.rate >= 1 or random.random() < self.rate
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def configure_logging(
+    level: Optional[str] = None,
+    log_format: Optional[str] = None,
+    query_sample_rate: Optional[float] = None
+):
+    """
+    Configurar el logger `app`: JSON (o texto) a stdout. La escritura se hace en
+    un hilo aparte (QueueHandler/QueueListener) para que registrar un evento no
+    bloquee la petición. Se puede llamar varias veces; la última configuración gana.
+    """
+    global _listener
+
+    settings = get_settings()
+    level = (level or settings.log_level).upper()
+    log_format = (log_format or settings.log_format).lower()
+    if query_sample_rate is None:
+        query_sample_rate = settings.db_query_log_sample_rate
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if log_format == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    if _listener is not None:
+        _listener.stop()
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+    app_logger = logging.getLogger("app")
+    app_logger.handlers = [logging.handlers.QueueHandler(log_queue)]
+    app_logger.setLevel(level)
+    app_logger.propagate = False
+
+    # el log de cada consulta (DEBUG) es de alto volumen: se muestrea
+    query_logger = logging.getLogger("app.db.query")
+    query_logger.filters = [SamplingFilter(query_sample_rate)]
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+atexit.register(_stop_listener)
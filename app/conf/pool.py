@@ -0,0 +1,104 @@
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+from app.utils.metrics import db_pool_checkout_wait, db_pool_checkout_timeouts
+
+class PoolStats:
+    """Estadísticas de checkout del pool de conexiones a la BD"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._recent_waits: Deque[float] = deque(maxlen=1024)
+
+    def record_checkout(self, wait: float):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+            self._recent_waits.append(wait)
+
+    def record_timeout(self, wait: float):
+        with self._lock:
+            self.timeouts += 1
+            self.wait_max = max(self.wait_max, wait)
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            recent = sorted(self._recent_waits)
+
+        def percentile(pct: float) -> float:
+            if not recent:
+                return 0.0
+            index = max(0, min(len(recent) - 1, round(pct / 100 * len(recent)) - 1))
+            return round(recent[index] * 1000, 3)
+
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "checkout_wait_ms": {
+                "avg": round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "max": round(self.wait_max * 1000, 3),
+                "p50": percentile(50),
+                "p95": percentile(95),
+                "p99": percentile(99)
+            }
+        }
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool que mide cuánto espera cada checkout (cola del pool + conexión nueva
+    si hay overflow disponible) y cuántos terminan en timeout por saturación.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+        # _do_get de QueuePool es recursivo: solo se mide la llamada externa
+        self._measuring = threading.local()
+
+    def _do_get(self):
+        if getattr(self._measuring, "active", False):
+            return super()._do_get()
+
+        self._measuring.active = True
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            wait = time.perf_counter() - started
+            self.stats.record_timeout(wait)
+            db_pool_checkout_timeouts.inc()
+            raise
+        finally:
+            self._measuring.active = False
+        wait = time.perf_counter() - started
+        self.stats.record_checkout(wait)
+        db_pool_checkout_wait.observe(wait)
+        return connection
+
+    def recreate(self):
+        # dispose()/recreate() crean un pool nuevo: se conservan las estadísticas
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def to_dict(self) -> Dict:
+        stats = self.stats.to_dict()
+        stats.update({
+            "pool_size": self.size(),
+            "max_overflow": self._max_overflow,
+            "timeout_seconds": self.timeout(),
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            # QueuePool cuenta el overflow desde -pool_size
+            "open": self.size() + self.overflow(),
+            "overflow": max(0, self.overflow())
+        })
+        return stats
@@ -0,0 +1,160 @@
+import os
+from functools import lru_cache
+from typing import List, Literal, Optional
+from dotenv import load_dotenv
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+
+DEFAULT_SYSTEM_PROMPT = "Eres un asistente inteligente y útil. Responde de manera clara y concisa."
+
+class Settings(BaseModel):
+    """
+    Configuración de la app. Cada campo se lee de la variable de entorno con el
+    mismo nombre en mayúsculas (p. ej. db_pool_size <- DB_POOL_SIZE) y se valida
+    al arrancar, así un valor mal escrito falla al inicio y no en una petición.
+    """
+
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
+    # Base de datos
+    database_url: str
+    db_echo: bool = False
+    db_pool_size: int = Field(10, ge=1)
+    db_max_overflow: int = Field(20, ge=0)
+    db_pool_timeout: float = Field(30, gt=0)
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    db_isolation_level: Optional[str] = None
+    db_executor_workers: int = Field(10, ge=1)
+    db_slow_query_ms: float = 200
+    db_query_log_sample_rate: float = Field(0.01, ge=0, le=1)
+    # /readyz: cuánto se reutiliza el último resultado y cuánto se espera a la BD
+    readiness_cache_seconds: float = Field(5, ge=0)
+    readiness_timeout: float = Field(2, gt=0)
+
+    # Logging
+    log_level: str = "INFO"
+    log_format: Literal["json", "text"] = "json"
+
+    # LM Studio: instancias y cliente HTTP
+    lm_studio_url: str = "http://127.0.0.1:1234"
+    lm_studio_urls: Optional[str] = None
+    lm_studio_model: str = "qwen/qwen3-8b"
+    lm_studio_timeout: float = Field(60, gt=0)
+    lm_studio_connect_timeout: float = Field(5, gt=0)
+    lm_studio_max_connections: int = Field(20, ge=1)
+    lm_studio_max_keepalive_connections: int = Field(10, ge=0)
+    lm_studio_keepalive_expiry: float = Field(30, ge=0)
+    lm_studio_http2: bool = False
+
+    # LM Studio: reparto de carga, resiliencia y admisión
+    lm_studio_routing_policy: Literal["least_outstanding", "latency"] = "least_outstanding"
+    lm_studio_affinity_slack: int = Field(2, ge=0)
+    lm_studio_breaker_failure_threshold: int = Field(3, ge=1)
+    lm_studio_breaker_recovery_seconds: float = Field(30, gt=0)
+    lm_studio_health_interval: float = Field(10, ge=0)
+    lm_studio_health_timeout: float = Field(2, gt=0)
+    lm_studio_retry_attempts: int = Field(3, ge=1)
+    lm_studio_retry_base_delay: float = Field(0.2, ge=0)
+    lm_studio_retry_max_delay: float = Field(2, ge=0)
+    # hedging (0 = desactivado): solo /v1/models y /v1/embeddings; las generaciones no se
+    # duplican porque el segundo intento no tendría cupo de admisión
+    lm_studio_hedge_delay: float = Field(0, ge=0)
+    lm_studio_max_concurrency: int = Field(2, ge=1)
+    lm_studio_max_queue_depth: int = Field(32, ge=0)
+    lm_studio_queue_timeout: float = Field(30, gt=0)
+    # cupos que puede ocupar el trabajo en lote (por defecto todos menos uno)
+    lm_studio_batch_max_concurrency: Optional[int] = Field(None, ge=1)
+    lm_studio_coalesce: bool = True
+
+    # Parámetros de generación
+    llm_system_prompt: str = DEFAULT_SYSTEM_PROMPT
+    llm_temperature: float = Field(0.7, ge=0, le=2)
+    # -1: sin límite (hasta el fin de la generación)
+    llm_max_tokens: int = Field(-1, ge=-1)
+
+    # Cache de respuestas del LLM
+    response_cache_backend: Literal["none", "memory", "sqlite"] = "none"
+    response_cache_max_entries: int = Field(1000, ge=1)
+    response_cache_ttl_seconds: float = Field(86400, gt=0)
+    response_cache_path: str = "response_cache.db"
+
+    # Ventana de contexto
+    context_max_tokens: int = Field(4096, ge=1)
+    context_response_reserve_tokens: int = Field(1024, ge=0)
+    context_max_messages: int = Field(50, ge=1)
+    context_fetch_batch_size: int = Field(20, ge=1)
+    # ajustar la estimación de tokens con el usage real de LM Studio
+    context_token_calibration: bool = True
+    # Resumen incremental de los mensajes antiguos (opt-in): al pasar el umbral se
+    # pliegan en un resumen versionado y el contexto envía resumen + ventana reciente
+    context_summary_enabled: bool = False
+    context_summary_trigger_messages: int = Field(40, ge=2)  # mensajes sin resumir que disparan un plegado
+    context_summary_keep_messages: int = Field(10, ge=0)  # los más recientes no se resumen
+    context_summary_max_tokens: int = Field(512, ge=16)
+    context_summary_chunk_tokens: int = Field(2048, ge=128)  # mensajes plegados por llamada al LLM
+    # Recuperación de turnos antiguos por similitud (opt-in, requiere numpy): los mensajes se
+    # embeben al guardarse y los más parecidos al mensaje nuevo se agregan al contexto
+    context_retrieval_enabled: bool = False
+    context_retrieval_scope: Literal["chat", "global"] = "chat"  # global: también otros chats
+    context_retrieval_top_k: int = Field(4, ge=1)
+    context_retrieval_min_score: float = Field(0.3, ge=-1, le=1)  # similitud coseno mínima
+    context_retrieval_max_tokens: int = Field(512, ge=16)  # presupuesto de los turnos recuperados
+    # provider: /v1/embeddings de LM Studio (modelo de embeddings cargado); local: hashing en CPU
+    embedding_backend: Literal["provider", "local"] = "provider"
+    embedding_model: str = "text-embedding-nomic-embed-text-v1.5"
+    embedding_dimensions: int = Field(256, ge=16)  # solo backend local
+    embedding_batch_size: int = Field(64, ge=1)  # mensajes por llamada al embedder
+    # índice global (numpy.memmap) derivado de message_embeddings, para el alcance global
+    vector_index_path: str = "vector_index"
+
+    # Jobs de completions en segundo plano
+    jobs_workers: int = Field(1, ge=0)  # por proceso; 0 desactiva el worker
+    jobs_poll_interval: float = Field(1, gt=0)
+    # un job "running" más viejo que esto se da por abandonado (worker caído) y se reencola
+    jobs_lease_seconds: float = Field(900, gt=0)
+    jobs_max_attempts: int = Field(3, ge=1)
+
+    # Búsqueda de texto completo: solo se rankean las N coincidencias más recientes (SQLite)
+    # o las N más relevantes (SQL Server); acota el costo de las palabras muy frecuentes. 0 = todas
+    search_max_ranked_matches: int = Field(10000, ge=0)
+
+    # Caches en memoria
+    conversation_cache_max_chats: int = Field(1024, ge=0)
+    conversation_cache_ttl_seconds: float = Field(300, gt=0)
+    conversation_cache_max_messages: int = Field(50, ge=1)
+    pagination_count_ttl_seconds: float = Field(30, ge=0)
+
+    @field_validator("log_format", "response_cache_backend", "context_retrieval_scope", "embedding_backend", mode="before")
+    @classmethod
+    def _lowercase(cls, value):
+        value = value.lower() if isinstance(value, str) else value
+        return "none" if value == "off" else value
+
+    @field_validator("log_level", mode="before")
+    @classmethod
+    def _uppercase(cls, value):
+        return value.upper() if isinstance(value, str) else value
+
+    @property
+    def lm_studio_base_urls(self) -> List[str]:
+        """LM_STUDIO_URLS (separadas por coma) o, si no está, LM_STUDIO_URL"""
+        urls = [url.strip() for url in (self.lm_studio_urls or "").split(",") if url.strip()]
+        return urls or [self.lm_studio_url]
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """Leer .env (sin pisar el entorno) y construir la configuración"""
+        load_dotenv()
+        fields = cls.model_fields
+        values = {
+            name.lower(): value
+            for name, value in os.environ.items()
+            # las variables vacías (p. ej. DB_ISOLATION_LEVEL=) usan el valor por defecto
+            if name.lower() in fields and value != ""
+        }
+        return cls(**values)
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """Configuración cargada una sola vez por proceso"""
+    return Settings.from_env()
@@ -5,7 +5,8 @@ from app.services.chats import ChatService
 from app.dtos.chats.chat_request import ChatCreateRequest, ChatUpdateRequest
 from app.dtos.chats.chat_response import ChatResponse, ChatListResponse
 from app.utils.response_mapper import ResponseMapper, ErrorResponseMapper
-from typing import List, Dict
+from app.utils.pagination import InvalidCursorError
+from typing import List, Dict, Optional, Literal
 
 class ChatController:
     
@@ -83,12 +84,23 @@ class ChatController:
             )
     
     @staticmethod
-    def get_all_chats(page: int = Query(1, ge=1), db: Session = Depends(get_db)) -> Dict:
-        """Obtener todos los chats con paginación"""
+    def get_all_chats(
+        cursor: Optional[str] = Query(None),
+        direction: Literal["next", "prev"] = Query("next"),
+        limit: int = Query(16, ge=1, le=100),
+        include_total: bool = Query(False),
+        db: Session = Depends(get_db)
+    ) -> Dict:
+        """Obtener los chats con paginación por cursor"""
         try:
             chat_service = ChatService(db)
-            chats, pagination = chat_service.get_all_chats_paginated(page)
+            chats, pagination = chat_service.get_all_chats_paginated(cursor, direction, limit, include_total)
             return ResponseMapper.success("Chats retrieved successfully", chats, pagination)
+        except InvalidCursorError as ice:
+            raise HTTPException(
+                status_code=400,
+                detail=ErrorResponseMapper.error(400, str(ice))
+            )
         except Exception as e:
             raise HTTPException(
                 status_code=500,
@@ -0,0 +1,36 @@
+from fastapi import HTTPException
+from app.conf.db import check_database, run_db
+from app.conf.settings import get_settings
+from app.providers.llm_studio_api import lm_studio_provider
+from app.utils.readiness import ReadinessProbe
+from app.utils.response_mapper import ResponseMapper, ErrorResponseMapper
+from typing import Dict
+
+# Comprobación de BD fuera del event loop (executor de BD), cacheada unos segundos
+readiness_probe = ReadinessProbe(
+    lambda: run_db(check_database),
+    cache_seconds=get_settings().readiness_cache_seconds,
+    timeout=get_settings().readiness_timeout
+)
+
+class HealthController:
+
+    @staticmethod
+    def liveness() -> Dict:
+        """El proceso responde; no toca la BD ni LM Studio"""
+        return ResponseMapper.success("Service is alive", {"status": "ok"})
+
+    @staticmethod
+    async def readiness() -> Dict:
+        """Lista para recibir tráfico: BD accesible y esquema migrado"""
+        status = dict(await readiness_probe.status())
+        # informativo: sin LM Studio se siguen sirviendo los chats y el historial
+        status["llm_backends_available"] = sum(
+            1 for backend in lm_studio_provider.router.backends if backend.available
+        )
+        if not status["ready"]:
+            raise HTTPException(
+                status_code=503,
+                detail=ErrorResponseMapper.error(503, f"Service not ready: {status['error']}")
+            )
+        return ResponseMapper.success("Service is ready", status)
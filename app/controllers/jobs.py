@@ -0,0 +1,104 @@
+from fastapi import HTTPException, Depends
+from sqlalchemy.orm import Session
+from app.conf.db import get_db
+from app.dtos.messenger.completion_request import CompletionRequest
+from app.services.jobs import JobService, JobConflictError
+from app.utils.response_mapper import ResponseMapper, ErrorResponseMapper
+from typing import Dict
+
+class JobController:
+    
+    @staticmethod
+    async def submit_completion(chat_id: int, request: CompletionRequest, db: Session = Depends(get_db)) -> Dict:
+        """Encolar una completion para procesarla en segundo plano"""
+        try:
+            job_service = JobService(db)
+            job = await job_service.submit(chat_id, request)
+            return ResponseMapper.success("Job queued successfully", job)
+        except ValueError as ve:
+            raise HTTPException(
+                status_code=404,
+                detail=ErrorResponseMapper.error(404, str(ve))
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=ErrorResponseMapper.error(500, f"Error queuing job: {str(e)}")
+            )
+    
+    @staticmethod
+    async def get_job(job_id: int, db: Session = Depends(get_db)) -> Dict:
+        """Obtener el estado de un job"""
+        try:
+            job_service = JobService(db)
+            job = await job_service.get_job(job_id)
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=ErrorResponseMapper.error(500, f"Error retrieving job: {str(e)}")
+            )
+        if not job:
+            raise HTTPException(
+                status_code=404,
+                detail=ErrorResponseMapper.error(404, "Job not found")
+            )
+        return ResponseMapper.success("Job retrieved successfully", job)
+    
+    @staticmethod
+    async def get_result(job_id: int, db: Session = Depends(get_db)) -> Dict:
+        """Obtener la respuesta de un job terminado (409 si aún no terminó bien)"""
+        try:
+            job_service = JobService(db)
+            result = await job_service.get_result(job_id)
+        except JobConflictError as ce:
+            raise HTTPException(
+                status_code=409,
+                detail=ErrorResponseMapper.error(409, str(ce))
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=ErrorResponseMapper.error(500, f"Error retrieving job result: {str(e)}")
+            )
+        if not result:
+            raise HTTPException(
+                status_code=404,
+                detail=ErrorResponseMapper.error(404, "Job not found")
+            )
+        return ResponseMapper.success("Job result retrieved successfully", result)
+    
+    @staticmethod
+    async def cancel_job(job_id: int, db: Session = Depends(get_db)) -> Dict:
+        """Cancelar un job en cola o en curso (409 si ya terminó)"""
+        try:
+            job_service = JobService(db)
+            job = await job_service.cancel(job_id)
+        except JobConflictError as ce:
+            raise HTTPException(
+                status_code=409,
+                detail=ErrorResponseMapper.error(409, str(ce))
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=ErrorResponseMapper.error(500, f"Error cancelling job: {str(e)}")
+            )
+        if not job:
+            raise HTTPException(
+                status_code=404,
+                detail=ErrorResponseMapper.error(404, "Job not found")
+            )
+        return ResponseMapper.success("Job cancelled successfully", job)
+    
+    @staticmethod
+    async def get_stats(db: Session = Depends(get_db)) -> Dict:
+        """Obtener el tamaño de la cola por estado y el estado de los workers"""
+        try:
+            job_service = JobService(db)
+            stats = await job_service.get_stats()
+            return ResponseMapper.success("Job stats retrieved successfully", stats)
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=ErrorResponseMapper.error(500, f"Error retrieving job stats: {str(e)}")
+            )
@@ -1,14 +1,26 @@
 from fastapi import HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from app.conf.db import get_db
 from app.services.messenger import CompletionService
 from app.dtos.messenger.completion_request import CompletionRequest
 from app.utils.response_mapper import ResponseMapper, ErrorResponseMapper
+from app.utils.pagination import InvalidCursorError
+from app.providers.errors import ProviderError
 from typing import Dict, Optional
 import asyncio
 
 class MessengerController:
     
+    @staticmethod
+    def _provider_error(error: ProviderError) -> HTTPException:
+        """Convertir un error del proveedor en su código HTTP (con Retry-After si aplica)"""
+        return HTTPException(
+            status_code=error.status_code,
+            detail=ErrorResponseMapper.error(error.status_code, f"Error communicating with LLM: {str(error)}"),
+            headers={"Retry-After": str(error.retry_after)} if error.retry_after else None
+        )
+    
     @staticmethod
     async def process_completion(chat_id: int, request: CompletionRequest, db: Session = Depends(get_db)) -> Dict:
         """Procesar completion: enviar mensaje del usuario al LLM y obtener respuesta"""
@@ -21,19 +33,60 @@ class MessengerController:
                 status_code=404,
                 detail=ErrorResponseMapper.error(404, str(ve))
             )
+        except ProviderError as pe:
+            raise MessengerController._provider_error(pe)
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=ErrorResponseMapper.error(500, f"Error processing completion: {str(e)}")
+            )
+    
+    @staticmethod
+    async def stream_completion(chat_id: int, request: CompletionRequest, db: Session = Depends(get_db)) -> StreamingResponse:
+        """Procesar completion en streaming: reenviar los tokens del LLM como Server-Sent Events"""
+        try:
+            completion_service = CompletionService(db)
+            context = await completion_service.prepare_stream_context(chat_id, request)
+        except ValueError as ve:
+            raise HTTPException(
+                status_code=404,
+                detail=ErrorResponseMapper.error(404, str(ve))
+            )
+        except ProviderError as pe:
+            raise MessengerController._provider_error(pe)
         except Exception as e:
             raise HTTPException(
                 status_code=500,
                 detail=ErrorResponseMapper.error(500, f"Error processing completion: {str(e)}")
             )
+        
+        return StreamingResponse(
+            completion_service.stream_completion(chat_id, request, context),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
     
     @staticmethod
-    def get_chat_registers(chat_id: int, db: Session = Depends(get_db)) -> Dict:
-        """Obtener todos los mensajes de un chat (registros)"""
+    async def get_chat_registers(
+        chat_id: int,
+        cursor: Optional[str] = None,
+        direction: str = "prev",
+        limit: int = 100,
+        include_total: bool = False,
+        db: Session = Depends(get_db)
+    ) -> Dict:
+        """Obtener una página de mensajes de un chat (registros)"""
         try:
             completion_service = CompletionService(db)
-            result = completion_service.get_chat_messages(chat_id)
-            return ResponseMapper.success("Chat messages retrieved successfully", result)
+            result, pagination = await completion_service.get_chat_messages(
+                chat_id, cursor, direction, limit, include_total
+            )
+            return ResponseMapper.success("Chat messages retrieved successfully", result, pagination)
+        except InvalidCursorError as ice:
+            raise HTTPException(
+                status_code=400,
+                detail=ErrorResponseMapper.error(400, str(ice))
+            )
         except ValueError as ve:
             raise HTTPException(
                 status_code=404,
@@ -45,6 +98,24 @@ class MessengerController:
                 detail=ErrorResponseMapper.error(500, f"Error retrieving messages: {str(e)}")
             )
     
+    @staticmethod
+    async def get_chat_summaries(chat_id: int, db: Session = Depends(get_db)) -> Dict:
+        """Obtener las versiones del resumen de los mensajes antiguos de un chat"""
+        try:
+            completion_service = CompletionService(db)
+            summaries = await completion_service.get_chat_summaries(chat_id)
+            return ResponseMapper.success("Chat summaries retrieved successfully", summaries)
+        except ValueError as ve:
+            raise HTTPException(
+                status_code=404,
+                detail=ErrorResponseMapper.error(404, str(ve))
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=ErrorResponseMapper.error(500, f"Error retrieving summaries: {str(e)}")
+            )
+    
     @staticmethod
     async def update_completion(chat_id: int, new_message: Optional[str], db: Session = Depends(get_db)) -> Dict:
         """Actualizar los últimos mensajes del chat (user-llm) con nuevo mensaje o reutilizar el anterior"""
@@ -57,6 +128,8 @@ class MessengerController:
                 status_code=404,
                 detail=ErrorResponseMapper.error(404, str(ve))
             )
+        except ProviderError as pe:
+            raise MessengerController._provider_error(pe)
         except Exception as e:
             raise HTTPException(
                 status_code=500,
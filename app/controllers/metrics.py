@@ -0,0 +1,20 @@
+from fastapi import HTTPException
+from fastapi.responses import PlainTextResponse
+from app.utils.metrics import metrics_registry
+from app.utils.response_mapper import ErrorResponseMapper
+
+class MetricsController:
+    
+    # Formato de exposición de texto de Prometheus
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+    
+    @staticmethod
+    def render_metrics() -> PlainTextResponse:
+        """Exponer todas las métricas en formato Prometheus"""
+        try:
+            return PlainTextResponse(metrics_registry.render(), media_type=MetricsController.CONTENT_TYPE)
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=ErrorResponseMapper.error(500, f"Error rendering metrics: {str(e)}")
+            )
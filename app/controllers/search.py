@@ -0,0 +1,56 @@
+from fastapi import HTTPException, Depends
+from sqlalchemy.orm import Session
+from app.conf.db import get_db
+from app.services.search import SearchService, InvalidSearchQueryError
+from app.utils.response_mapper import ResponseMapper, ErrorResponseMapper
+from app.utils.pagination import InvalidCursorError
+from typing import Dict, Optional
+
+class SearchController:
+    
+    @staticmethod
+    async def search_messages(
+        q: str,
+        chat_id: Optional[int] = None,
+        cursor: Optional[str] = None,
+        limit: int = 20,
+        db: Session = Depends(get_db)
+    ) -> Dict:
+        """Buscar mensajes por contenido"""
+        try:
+            search_service = SearchService(db)
+            result, pagination = await search_service.search_messages(q, chat_id, cursor, limit)
+            return ResponseMapper.success("Messages searched successfully", result, pagination)
+        except (InvalidSearchQueryError, InvalidCursorError) as ve:
+            raise HTTPException(
+                status_code=400,
+                detail=ErrorResponseMapper.error(400, str(ve))
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=ErrorResponseMapper.error(500, f"Error searching messages: {str(e)}")
+            )
+    
+    @staticmethod
+    async def search_chats(
+        q: str,
+        cursor: Optional[str] = None,
+        limit: int = 20,
+        db: Session = Depends(get_db)
+    ) -> Dict:
+        """Buscar chats por título"""
+        try:
+            search_service = SearchService(db)
+            result, pagination = await search_service.search_chats(q, cursor, limit)
+            return ResponseMapper.success("Chats searched successfully", result, pagination)
+        except (InvalidSearchQueryError, InvalidCursorError) as ve:
+            raise HTTPException(
+                status_code=400,
+                detail=ErrorResponseMapper.error(400, str(ve))
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=ErrorResponseMapper.error(500, f"Error searching chats: {str(e)}")
+            )
@@ -0,0 +1,102 @@
+from fastapi import HTTPException
+from app.conf.db import get_pool_stats
+from app.providers.llm_studio_api import lm_studio_provider
+from app.utils.conversation_cache import conversation_cache
+from app.utils.response_mapper import ResponseMapper, ErrorResponseMapper
+from typing import Dict
+
+class SystemController:
+    
+    @staticmethod
+    def get_provider_pool_stats() -> Dict:
+        """Obtener las estadísticas del pool de conexiones con LM Studio"""
+        try:
+            stats = lm_studio_provider.get_pool_stats()
+            return ResponseMapper.success("Provider pool stats retrieved successfully", stats)
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=ErrorResponseMapper.error(500, f"Error retrieving provider pool stats: {str(e)}")
+            )
+    
+    @staticmethod
+    def get_provider_backends() -> Dict:
+        """Obtener el estado de las instancias de LM Studio (salud, carga y latencia)"""
+        try:
+            stats = lm_studio_provider.get_router_stats()
+            return ResponseMapper.success("Provider backends retrieved successfully", stats)
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=ErrorResponseMapper.error(500, f"Error retrieving provider backends: {str(e)}")
+            )
+    
+    @staticmethod
+    def get_provider_resilience_stats() -> Dict:
+        """Obtener el estado de los circuit breakers, reintentos y hedging hacia LM Studio"""
+        try:
+            stats = lm_studio_provider.get_resilience_stats()
+            return ResponseMapper.success("Provider resilience stats retrieved successfully", stats)
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=ErrorResponseMapper.error(500, f"Error retrieving provider resilience stats: {str(e)}")
+            )
+    
+    @staticmethod
+    def get_provider_admission_stats() -> Dict:
+        """Obtener las métricas de la cola de admisión hacia LM Studio"""
+        try:
+            stats = lm_studio_provider.get_admission_stats()
+            return ResponseMapper.success("Provider admission stats retrieved successfully", stats)
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=ErrorResponseMapper.error(500, f"Error retrieving provider admission stats: {str(e)}")
+            )
+    
+    @staticmethod
+    def get_response_cache_stats() -> Dict:
+        """Obtener las métricas de la cache de respuestas del LLM"""
+        try:
+            stats = lm_studio_provider.response_cache.stats()
+            return ResponseMapper.success("Response cache stats retrieved successfully", stats)
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=ErrorResponseMapper.error(500, f"Error retrieving response cache stats: {str(e)}")
+            )
+    
+    @staticmethod
+    def clear_response_cache() -> Dict:
+        """Vaciar la cache de respuestas del LLM"""
+        try:
+            lm_studio_provider.response_cache.clear()
+            return ResponseMapper.success("Response cache cleared successfully", {"cleared": True})
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=ErrorResponseMapper.error(500, f"Error clearing response cache: {str(e)}")
+            )
+    
+    @staticmethod
+    def get_db_pool_stats() -> Dict:
+        """Obtener el estado del pool de conexiones a la BD y la espera en el checkout"""
+        try:
+            return ResponseMapper.success("Database pool stats retrieved successfully", get_pool_stats())
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=ErrorResponseMapper.error(500, f"Error retrieving database pool stats: {str(e)}")
+            )
+    
+    @staticmethod
+    def get_conversation_cache_stats() -> Dict:
+        """Obtener las métricas de la cache de conversaciones (hits/misses)"""
+        try:
+            return ResponseMapper.success("Conversation cache stats retrieved successfully", conversation_cache.stats())
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=ErrorResponseMapper.error(500, f"Error retrieving conversation cache stats: {str(e)}")
+            )
@@ -0,0 +1,39 @@
+from fastapi import HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from datetime import datetime, timezone
+from app.conf.db import get_db
+from app.services.transfer import TransferService, TransferFormatError
+from app.utils.response_mapper import ResponseMapper, ErrorResponseMapper
+from typing import Dict, List, Optional
+
+class TransferController:
+    
+    @staticmethod
+    async def export_chats(chat_ids: Optional[List[int]], compress: bool, db: Session = Depends(get_db)) -> StreamingResponse:
+        """Exportar chats y mensajes como NDJSON en streaming"""
+        transfer_service = TransferService(db)
+        filename = f"chats-{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}.ndjson" + (".gz" if compress else "")
+        return StreamingResponse(
+            transfer_service.export_chats(chat_ids, compress),
+            media_type="application/gzip" if compress else "application/x-ndjson",
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+    
+    @staticmethod
+    async def import_chats(request: Request, batch_size: int, db: Session = Depends(get_db)) -> Dict:
+        """Importar un archivo NDJSON (o NDJSON gzip) exportado con /export"""
+        try:
+            transfer_service = TransferService(db)
+            stats = await transfer_service.import_chats(request.stream(), batch_size)
+            return ResponseMapper.success("Chats imported successfully", stats)
+        except TransferFormatError as fe:
+            raise HTTPException(
+                status_code=400,
+                detail=ErrorResponseMapper.error(400, str(fe))
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=ErrorResponseMapper.error(500, f"Error importing chats: {str(e)}")
+            )
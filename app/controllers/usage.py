@@ -0,0 +1,45 @@
+from fastapi import HTTPException, Depends
+from sqlalchemy.orm import Session
+from datetime import datetime
+from app.conf.db import get_db
+from app.services.usage import UsageService
+from app.utils.response_mapper import ResponseMapper, ErrorResponseMapper
+from typing import Dict, Optional
+
+class UsageController:
+    
+    @staticmethod
+    async def get_summary(
+        since: Optional[datetime],
+        until: Optional[datetime],
+        top: int,
+        db: Session = Depends(get_db)
+    ) -> Dict:
+        """Obtener el resumen de uso de tokens de una ventana de tiempo"""
+        try:
+            usage_service = UsageService(db)
+            summary = await usage_service.get_summary(since, until, top)
+            return ResponseMapper.success("Usage summary retrieved successfully", summary)
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=ErrorResponseMapper.error(500, f"Error retrieving usage summary: {str(e)}")
+            )
+    
+    @staticmethod
+    async def get_chat_usage(chat_id: int, db: Session = Depends(get_db)) -> Dict:
+        """Obtener el uso de tokens acumulado de un chat"""
+        try:
+            usage_service = UsageService(db)
+            usage = await usage_service.get_chat_usage(chat_id)
+            return ResponseMapper.success("Chat usage retrieved successfully", usage)
+        except ValueError as ve:
+            raise HTTPException(
+                status_code=404,
+                detail=ErrorResponseMapper.error(404, str(ve))
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=ErrorResponseMapper.error(500, f"Error retrieving chat usage: {str(e)}")
+            )
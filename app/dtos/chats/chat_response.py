@@ -15,6 +15,10 @@ class ChatResponse(BaseModel):
     id: int
     title: Optional[str]
     created_at: datetime
+    message_count: int = 0
+    last_message_at: Optional[datetime] = None
+    prompt_tokens_total: int = 0
+    completion_tokens_total: int = 0
     messages: List[MessageResponse] = []
 
     class Config:
@@ -25,6 +29,7 @@ class ChatListResponse(BaseModel):
     title: Optional[str]
     created_at: datetime
     message_count: int = 0
+    last_message_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
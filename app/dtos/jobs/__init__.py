@@ -0,0 +1 @@
+from .job_response import JobResponse, JobResultResponse
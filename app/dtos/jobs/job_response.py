@@ -0,0 +1,28 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+
+class JobResponse(BaseModel):
+    id: int
+    chat_id: int
+    status: str
+    attempts: int
+    error: Optional[str] = None
+    result_message_id: Optional[int] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class JobResultResponse(BaseModel):
+    job_id: int
+    llm_response: str
+    message_id: int
+    created_at: datetime
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    model: Optional[str] = None
+    latency_ms: Optional[int] = None
+    finish_reason: Optional[str] = None
@@ -1,2 +1,3 @@
 from .completion_request import CompletionRequest, UpdateCompletionRequest
 from .completion_response import CompletionResponse, MessagesListResponse
+from .summary_response import ChatSummaryResponse
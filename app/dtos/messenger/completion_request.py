@@ -3,6 +3,8 @@ from typing import Optional
 
 class CompletionRequest(BaseModel):
     message: str
+    # Permitir respuestas cacheadas aunque la generación no sea determinista
+    cache: Optional[bool] = None
 
 class UpdateCompletionRequest(BaseModel):
     new_message: Optional[str] = None
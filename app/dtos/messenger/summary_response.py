@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+
+class ChatSummaryResponse(BaseModel):
+    version: int
+    content: str
+    through_message_id: int
+    message_count: int
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    model: Optional[str] = None
+    created_at: datetime
+    invalidated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
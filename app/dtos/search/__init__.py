@@ -0,0 +1 @@
+from .search_response import MessageSearchResult, ChatSearchResult
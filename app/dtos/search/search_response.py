@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+
+class MessageSearchResult(BaseModel):
+    message_id: int
+    chat_id: int
+    chat_title: Optional[str]
+    sender: str
+    created_at: datetime
+    snippet: str
+    score: Optional[float]  # mayor es más relevante; None sin índice de texto completo
+
+class ChatSearchResult(BaseModel):
+    chat_id: int
+    title: Optional[str]
+    created_at: datetime
+    message_count: int
+    last_message_at: Optional[datetime]
+    snippet: str
+    score: Optional[float]
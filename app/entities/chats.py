@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, func
+from sqlalchemy import Column, Integer, String, DateTime, Index, func
 from sqlalchemy.orm import relationship
 from app.conf.db import Base
 
@@ -8,5 +8,16 @@ class Chat(Base):
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # contadores denormalizados: se mantienen en la misma transacción que los inserts de mensajes
+    message_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_message_at = Column(DateTime(timezone=True), nullable=True)
+    # suma del uso de tokens de los mensajes del chat (se ajusta al regenerar una respuesta)
+    prompt_tokens_total = Column(Integer, nullable=False, default=0, server_default="0")
+    completion_tokens_total = Column(Integer, nullable=False, default=0, server_default="0")
 
     messages = relationship("Message", back_populates="chat")
+
+    __table_args__ = (
+        # listado paginado por cursor (created_at, id), ver migración 0003
+        Index("ix_chats_created_at", "created_at", "id"),
+    )
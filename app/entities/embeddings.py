@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, LargeBinary, Index
+from app.conf.db import Base
+
+class MessageEmbedding(Base):
+    """
+    Embedding de un mensaje para recuperar turnos antiguos relevantes
+    (CONTEXT_RETRIEVAL_ENABLED). Reescribir el mensaje borra su embedding y el
+    nuevo se guarda con otro id: el índice global (app/utils/vector_index.py)
+    se mantiene al día leyendo solo los ids posteriores al último que tiene.
+    """
+    __tablename__ = "message_embeddings"
+
+    id = Column(Integer, primary_key=True, index=True)
+    message_id = Column(Integer, ForeignKey("messages.id"), nullable=False)
+    chat_id = Column(Integer, ForeignKey("chats.id"), nullable=False)
+    # embeddings de modelos distintos no son comparables
+    model = Column(String(128), nullable=False)
+    dimensions = Column(Integer, nullable=False)
+    # float32 little-endian con norma 1 (producto punto = similitud coseno)
+    vector = Column(LargeBinary, nullable=False)
+
+    __table_args__ = (
+        Index("ux_message_embeddings_message_id", "message_id", unique=True),
+        # recuperación dentro de un chat
+        Index("ix_message_embeddings_chat_id_model", "chat_id", "model"),
+    )
@@ -1,2 +1,5 @@
 from .chats import Chat
 from .messages import Message
+from .jobs import CompletionJob
+from .summaries import ChatSummary
+from .embeddings import MessageEmbedding
@@ -0,0 +1,32 @@
+from sqlalchemy import Boolean, Column, Integer, String, ForeignKey, DateTime, Index, func
+from app.conf.db import Base
+
+class CompletionJob(Base):
+    """Completion en segundo plano: cola durable que consumen los workers de jobs"""
+    __tablename__ = "completion_jobs"
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+    FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+    STATUSES = (QUEUED, RUNNING) + FINISHED
+
+    id = Column(Integer, primary_key=True, index=True)
+    chat_id = Column(Integer, ForeignKey("chats.id"), nullable=False)
+    message = Column(String, nullable=False)
+    cache = Column(Boolean, nullable=True)
+    status = Column(String(16), nullable=False, default=QUEUED, server_default=QUEUED)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    error = Column(String, nullable=True)
+    # mensaje "llm" guardado al terminar
+    result_message_id = Column(Integer, ForeignKey("messages.id"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # los workers toman el job en cola más antiguo: filtro por status + orden por id
+        Index("ix_completion_jobs_status_id", "status", "id"),
+    )
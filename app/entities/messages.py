@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, func
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index, func
 from sqlalchemy.orm import relationship
 from app.conf.db import Base
 
@@ -10,5 +10,21 @@ class Message(Base):
     sender = Column(String, nullable=False)  # "user" o "llm"
     content = Column(String, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # uso reportado por LM Studio (solo en los mensajes "llm"; ver migración 0005)
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
+    model = Column(String(128), nullable=True)
+    latency_ms = Column(Integer, nullable=True)
+    finish_reason = Column(String(32), nullable=True)
 
     chat = relationship("Chat", back_populates="messages")
+
+    __table_args__ = (
+        # consultas calientes: filtro por chat_id + orden/cursor por (created_at, id);
+        # también cubre la FK chat_id (ver migración 0002)
+        Index(
+            "ix_messages_chat_id_created_at",
+            "chat_id", "created_at", "id",
+            mssql_include=["sender"]
+        ),
+    )
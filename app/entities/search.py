@@ -0,0 +1,33 @@
+from sqlalchemy import DDL, Float, Integer, String, column, event, table
+from app.entities.chats import Chat
+from app.entities.messages import Message
+
+# Índices de texto completo de SQLite (FTS5, ver migración 0008). Son tablas
+# virtuales de contenido externo: guardan solo el índice y leen el texto de
+# messages/chats; los triggers las mantienen al día con cada insert/update/delete.
+# En SQL Server el índice es FULLTEXT sobre las mismas columnas y no necesita tablas aparte.
+messages_fts = table("messages_fts", column("rowid", Integer), column("rank", Float), column("content", String))
+chats_fts = table("chats_fts", column("rowid", Integer), column("rank", Float), column("title", String))
+
+# unicode61 con remove_diacritics: "cancion" encuentra "canción"
+SQLITE_FTS_TOKENIZER = "unicode61 remove_diacritics 2"
+
+def sqlite_fts_statements(source: str, fts: str, text_column: str):
+    """Tabla FTS5 de contenido externo sobre source.text_column y sus triggers de sincronización"""
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({text_column}, content='{source}', content_rowid='id', "
+        f"tokenize='{SQLITE_FTS_TOKENIZER}')",
+        f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {source} BEGIN "
+        f"INSERT INTO {fts}(rowid, {text_column}) VALUES (new.id, new.{text_column}); END",
+        f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {source} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {text_column}) VALUES ('delete', old.id, old.{text_column}); END",
+        f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {text_column} ON {source} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {text_column}) VALUES ('delete', old.id, old.{text_column}); "
+        f"INSERT INTO {fts}(rowid, {text_column}) VALUES (new.id, new.{text_column}); END",
+    ]
+
+# create_all (pruebas y benchmarks sobre SQLite) crea también los índices FTS5
+for _source, _fts, _column in ((Message.__table__, "messages_fts", "content"), (Chat.__table__, "chats_fts", "title")):
+    for _statement in sqlite_fts_statements(_source.name, _fts, _column):
+        event.listen(_source, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+    event.listen(_source, "before_drop", DDL(f"DROP TABLE IF EXISTS {_fts}").execute_if(dialect="sqlite"))
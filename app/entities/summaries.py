@@ -0,0 +1,31 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index, func
+from app.conf.db import Base
+
+class ChatSummary(Base):
+    """
+    Resumen acumulado de los mensajes más antiguos de un chat. Cada plegado crea
+    una versión nueva (la anterior + los mensajes siguientes); reescribir un turno
+    ya resumido invalida las versiones que lo cubren y vuelve a valer la anterior.
+    """
+    __tablename__ = "chat_summaries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    chat_id = Column(Integer, ForeignKey("chats.id"), nullable=False)
+    version = Column(Integer, nullable=False)
+    content = Column(String, nullable=False)
+    # último mensaje resumido: el contexto sigue con los mensajes posteriores a (created_at, id)
+    through_message_id = Column(Integer, ForeignKey("messages.id"), nullable=False)
+    through_created_at = Column(DateTime(timezone=True), nullable=False)
+    # mensajes del chat cubiertos por esta versión (acumulado)
+    message_count = Column(Integer, nullable=False)
+    # uso de la generación del resumen
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
+    model = Column(String(128), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    invalidated_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # versión vigente de un chat: filtro por chat_id + orden por versión descendente
+        Index("ux_chat_summaries_chat_id_version", "chat_id", "version", unique=True),
+    )
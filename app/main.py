@@ -1,31 +1,56 @@
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.conf.db import engine
+from app.conf.logging import configure_logging
+from app.providers.llm_studio_api import lm_studio_provider
 from app.routes.chats import router as chats_router
 from app.routes.messenger import router as messenger_router
-from sqlalchemy import text
+from app.routes.system import router as system_router
+from app.routes.usage import router as usage_router
+from app.routes.metrics import router as metrics_router
+from app.routes.health import router as health_router
+from app.routes.jobs import router as jobs_router
+from app.routes.transfer import router as transfer_router
+from app.routes.search import router as search_router
+from app.services.job_worker import job_worker
+from app.services.retrieval import conversation_retriever
+from app.services.summarizer import conversation_summarizer
+from app.utils.metrics import MetricsMiddleware
 
-app = FastAPI(title="Chat with Qwen")
+configure_logging()
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # El arranque no toca la BD: el esquema se aplica con `python -m app.cli migrate`
+    # y la conexión se comprueba en /readyz
+    # cliente HTTP compartido con LM Studio (pool de conexiones keep-alive)
+    await lm_studio_provider.startup()
+    # workers de la cola de jobs (JOBS_WORKERS=0 y `python -m app.cli jobs-worker` para consumirla en otro proceso)
+    await job_worker.start()
+    logger.info("Aplicación iniciada")
+    yield
+    await job_worker.stop()
+    await conversation_summarizer.stop()
+    await conversation_retriever.stop()
+    await lm_studio_provider.shutdown()
+
+app = FastAPI(title="Chat with Qwen", lifespan=lifespan)
+
+# Latencia por ruta y peticiones en curso para /metrics
+app.add_middleware(MetricsMiddleware)
 
 # Incluir rutas
 app.include_router(chats_router)
 app.include_router(messenger_router)
-\
+app.include_router(system_router)
+app.include_router(usage_router)
+app.include_router(jobs_router)
+app.include_router(transfer_router)
+app.include_router(search_router)
+app.include_router(metrics_router)
+app.include_router(health_router)
+
 @app.get("/")
 def root():
     return {"message": "Hola, FastAPI está vivo 🚀"}
-
-@app.on_event("startup")
-def startup_event():
-    # probar conexión a DB
-    try:
-        with engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
-            print("Conexión a DB exitosa y segura")
-    except Exception as e:
-        print("Error de conexión a DB:", e)
-    
-    # crear tablas automáticamente
-    from app.entities import chats, messages 
-    from app.conf.db import Base
-    Base.metadata.create_all(bind=engine)
-    print("Tablas creadas en la DB si no existían")
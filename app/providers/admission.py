@@ -0,0 +1,189 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional
+from app.providers.errors import ProviderOverloadedError, ProviderQueueTimeoutError
+
+class AdmissionController:
+    """
+    Control de admisión delante de LM Studio: como máximo `max_concurrency`
+    generaciones a la vez, el resto espera en una cola FIFO de profundidad
+    acotada. Si la cola está llena se rechaza al instante (429) y si la espera
+    supera `queue_timeout` se rechaza con 503, en lugar de acumular peticiones
+    que terminarían en timeout.
+    
+    El trabajo en lote (jobs) usa un carril de baja prioridad: solo entra con un
+    cupo libre y sin peticiones interactivas esperando, y nunca ocupa más de
+    `batch_max_concurrency` cupos, así una generación larga en lote no deja sin
+    cupo al tráfico interactivo.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        max_queue_depth: int,
+        queue_timeout: float,
+        batch_max_concurrency: Optional[int] = None
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue_depth = max_queue_depth
+        self.queue_timeout = queue_timeout
+        # por defecto se reserva un cupo para el tráfico interactivo
+        self.batch_max_concurrency = batch_max_concurrency or max(1, max_concurrency - 1)
+        self._active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._batch_active = 0
+        self._batch_waiters: Deque[asyncio.Future] = deque()
+        # métricas
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self._recent_waits: Deque[float] = deque(maxlen=1024)
+
+    @property
+    def in_flight(self) -> int:
+        return self._active
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def check_capacity(self):
+        """Rechazar de inmediato si una nueva petición no cabría ni en la cola"""
+        if self._active >= self.max_concurrency and len(self._waiters) >= self.max_queue_depth:
+            self.rejected_queue_full += 1
+            raise ProviderOverloadedError("LM Studio is overloaded, try again later", self._retry_after())
+
+    def _retry_after(self) -> int:
+        return max(1, math.ceil(self.queue_timeout / 2))
+
+    def _record_wait(self, wait: float):
+        self.admitted += 1
+        self.queue_wait_total += wait
+        self.queue_wait_max = max(self.queue_wait_max, wait)
+        self._recent_waits.append(wait)
+
+    async def acquire(self):
+        """Obtener un cupo de generación (esperando en la cola FIFO si hace falta)"""
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+            self._record_wait(0.0)
+            return
+
+        self.check_capacity()
+
+        started = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout=self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # el cupo se traspasó justo al expirar: devolverlo
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self.rejected_timeout += 1
+                raise ProviderQueueTimeoutError(
+                    "Timed out waiting for an LM Studio slot", self._retry_after()
+                ) from e
+            raise
+        # el cupo llega traspasado desde release(): _active ya lo cuenta
+        self._record_wait(time.perf_counter() - started)
+
+    def _can_admit_batch(self) -> bool:
+        return (
+            self._active < self.max_concurrency
+            and not self._waiters
+            and self._batch_active < self.batch_max_concurrency
+        )
+
+    async def acquire_batch(self):
+        """
+        Obtener un cupo de baja prioridad. Sin límite de cola ni timeout: cuántos
+        esperan lo acota el número de workers de jobs.
+        """
+        if self._can_admit_batch() and not self._batch_waiters:
+            self._active += 1
+            self._batch_active += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._batch_waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release(batch=True)
+            elif waiter in self._batch_waiters:
+                self._batch_waiters.remove(waiter)
+            raise
+
+    def _wake_batch(self):
+        while self._batch_waiters and self._can_admit_batch():
+            waiter = self._batch_waiters.popleft()
+            if not waiter.done():
+                self._active += 1
+                self._batch_active += 1
+                waiter.set_result(True)
+
+    def release(self, batch: bool = False):
+        """
+        Liberar un cupo, traspasándolo al primer waiter interactivo vivo; si no
+        hay, el cupo queda libre y puede pasar al carril de lote
+        """
+        if batch:
+            self._batch_active -= 1
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                return
+        self._active -= 1
+        self._wake_batch()
+
+    @asynccontextmanager
+    async def slot(self, batch: bool = False):
+        if batch:
+            await self.acquire_batch()
+        else:
+            await self.acquire()
+        try:
+            yield
+        finally:
+            self.release(batch)
+
+    def stats(self) -> Dict:
+        recent = sorted(self._recent_waits)
+
+        def percentile(pct: float) -> float:
+            if not recent:
+                return 0.0
+            index = max(0, min(len(recent) - 1, round(pct / 100 * len(recent)) - 1))
+            return round(recent[index] * 1000, 3)
+
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue_depth": self.max_queue_depth,
+            "queue_timeout_seconds": self.queue_timeout,
+            "in_flight": self._active,
+            "queued": len(self._waiters),
+            "batch_max_concurrency": self.batch_max_concurrency,
+            "batch_in_flight": self._batch_active,
+            "batch_queued": len(self._batch_waiters),
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "queue_wait_ms": {
+                "avg": round(self.queue_wait_total / self.admitted * 1000, 3) if self.admitted else 0.0,
+                "max": round(self.queue_wait_max * 1000, 3),
+                "p50": percentile(50),
+                "p95": percentile(95),
+                "p99": percentile(99)
+            }
+        }
@@ -0,0 +1,88 @@
+import logging
+import time
+from typing import Any, Dict, Optional
+import httpx
+
+logger = logging.getLogger(__name__)
+
+class ConnectionPoolStats:
+    """Estadísticas del pool de conexiones HTTP compartido con LM Studio"""
+
+    # Eventos de httpcore que indican que la petición ya obtuvo una conexión del pool
+    _ACQUIRED_EVENTS = (
+        "connection.connect_tcp.started",
+        "http11.send_request_headers.started",
+        "http2.send_request_headers.started",
+    )
+
+    def __init__(self):
+        self.requests_total = 0
+        self.in_flight = 0
+        self.new_connections = 0
+        self.reused_connections = 0
+        self.pool_wait_total = 0.0
+        self.pool_wait_max = 0.0
+        self.pool_wait_last = 0.0
+        self._pool_unavailable_logged = False
+
+    def request_started(self) -> float:
+        """Contar una petición en curso y devolver su inicio (para medir la espera por conexión)"""
+        self.requests_total += 1
+        self.in_flight += 1
+        return time.perf_counter()
+
+    def request_finished(self):
+        """Descontar una petición en curso (con o sin error)"""
+        self.in_flight -= 1
+
+    def make_trace(self, started_at: float):
+        """Crear un callback de trace de httpx que mide la espera por una conexión"""
+        state = {"acquired": False}
+
+        async def trace(event_name: str, info: Dict[str, Any]):
+            if state["acquired"] or event_name not in self._ACQUIRED_EVENTS:
+                return
+            state["acquired"] = True
+            wait = time.perf_counter() - started_at
+            self.pool_wait_last = wait
+            self.pool_wait_total += wait
+            self.pool_wait_max = max(self.pool_wait_max, wait)
+            if event_name == "connection.connect_tcp.started":
+                self.new_connections += 1
+            else:
+                self.reused_connections += 1
+
+        return trace
+
+    def _pool_connections(self, client: Optional[httpx.AsyncClient]) -> Dict[str, Optional[int]]:
+        """
+        Conexiones abiertas, en uso y libres del pool de httpcore. httpx no las
+        expone: se leen del transporte (ruta probada con el rango de httpx fijado
+        en requirements.txt); si cambia se informan como desconocidas (None).
+        """
+        if client is None or client.is_closed:
+            return {"open": 0, "in_use": 0, "idle": 0}
+        try:
+            connections = client._transport._pool.connections
+        except AttributeError:
+            if not self._pool_unavailable_logged:
+                self._pool_unavailable_logged = True
+                logger.warning("No se puede leer el pool de conexiones de httpx %s", httpx.__version__)
+            return {"open": None, "in_use": None, "idle": None}
+        idle = sum(1 for conn in connections if conn.is_idle())
+        return {"open": len(connections), "in_use": len(connections) - idle, "idle": idle}
+
+    def to_dict(self, client: Optional[httpx.AsyncClient] = None) -> Dict:
+        acquired = self.new_connections + self.reused_connections
+        return {
+            "requests_total": self.requests_total,
+            "in_flight": self.in_flight,
+            "connections": self._pool_connections(client),
+            "new_connections": self.new_connections,
+            "reused_connections": self.reused_connections,
+            "pool_wait_ms": {
+                "last": round(self.pool_wait_last * 1000, 3),
+                "avg": round(self.pool_wait_total / acquired * 1000, 3) if acquired else 0.0,
+                "max": round(self.pool_wait_max * 1000, 3),
+            },
+        }
@@ -0,0 +1,76 @@
+import asyncio
+import re
+import unicodedata
+import zlib
+from typing import List
+from app.conf.settings import Settings
+from app.providers.llm_studio_api import LMStudioAPIProvider, lm_studio_provider
+from app.utils.vector_index import normalize, np, require_numpy
+
+_WORD = re.compile(r"\w+")
+# palabras demasiado frecuentes para distinguir un turno de otro (español e inglés)
+STOPWORDS = frozenset(
+    "a al algo como con de del el ella en era es esa ese esta este fue ha hay la las le lo los me mi "
+    "muy más no nos o para pero por que qué se si sin su sus te tu un una uno y ya yo "
+    "an and are as at be but by for from i in is it of on or that the this to was with you".split()
+)
+
+class LocalEmbedder:
+    """
+    Embeddings léxicos en CPU, sin modelo: palabras y bigramas (en minúsculas, sin
+    tildes ni palabras vacías) repartidos por hashing en `dimensions` posiciones con
+    signo, en escala logarítmica y con norma 1. Encuentra turnos que comparten
+    vocabulario, no sinónimos; para similitud semántica usar el backend provider.
+    """
+
+    def __init__(self, dimensions: int):
+        require_numpy()
+        self.dimensions = dimensions
+        self.model = f"local-hashing-{dimensions}"
+
+    @staticmethod
+    def features(text: str) -> List[str]:
+        decomposed = unicodedata.normalize("NFKD", text.lower())
+        plain = "".join(char for char in decomposed if not unicodedata.combining(char))
+        words = [word for word in _WORD.findall(plain) if word not in STOPWORDS]
+        return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+    def embed_sync(self, texts: List[str]) -> "np.ndarray":
+        rows, columns, signs = [], [], []
+        for row, text in enumerate(texts):
+            for feature in self.features(text):
+                # crc32 y no hash(): debe dar lo mismo en todos los procesos
+                digest = zlib.crc32(feature.encode("utf-8"))
+                rows.append(row)
+                columns.append(digest % self.dimensions)
+                signs.append(1.0 if digest & 0x80000000 else -1.0)
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        np.add.at(vectors, (rows, columns), signs)
+        # escala logarítmica: una palabra repetida no domina el vector
+        vectors = np.copysign(np.log1p(np.abs(vectors)), vectors)
+        return normalize(vectors)
+
+    async def embed(self, texts: List[str]) -> "np.ndarray":
+        if len(texts) == 1:
+            return self.embed_sync(texts)
+        # los lotes de la indexación (decenas de mensajes) no bloquean el event loop
+        return await asyncio.get_running_loop().run_in_executor(None, self.embed_sync, texts)
+
+class ProviderEmbedder:
+    """Embeddings del modelo de embeddings cargado en LM Studio (/v1/embeddings)"""
+
+    def __init__(self, provider: LMStudioAPIProvider, model: str):
+        require_numpy()
+        self.provider = provider
+        self.model = model
+
+    async def embed(self, texts: List[str]) -> "np.ndarray":
+        response = await self.provider.embeddings(texts, self.model)
+        data = sorted(response["data"], key=lambda item: item["index"])
+        return normalize(np.asarray([item["embedding"] for item in data], dtype=np.float32))
+
+def build_embedder(settings: Settings):
+    """Crear el embedder según EMBEDDING_BACKEND (provider o local)"""
+    if settings.embedding_backend == "local":
+        return LocalEmbedder(settings.embedding_dimensions)
+    return ProviderEmbedder(lm_studio_provider, settings.embedding_model)
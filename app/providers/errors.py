@@ -0,0 +1,52 @@
+from typing import Optional
+
+class ProviderError(Exception):
+    """Error al comunicarse con LM Studio; `status_code` es el que se devuelve al cliente"""
+
+    status_code = 502
+
+    def __init__(self, message: str, retry_after: Optional[int] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class ProviderConnectionError(ProviderError):
+    """No se pudo conectar con LM Studio o la conexión se cortó"""
+
+    status_code = 502
+
+class ProviderTimeoutError(ProviderConnectionError):
+    """LM Studio no respondió dentro del timeout"""
+
+    status_code = 504
+
+class ProviderHTTPError(ProviderError):
+    """LM Studio respondió con un código de error"""
+
+    status_code = 502
+
+    def __init__(self, message: str, upstream_status: int, retry_after: Optional[int] = None):
+        super().__init__(message, retry_after)
+        self.upstream_status = upstream_status
+
+class ProviderUnavailableError(ProviderError):
+    """Todas las instancias de LM Studio tienen el circuit breaker abierto"""
+
+    status_code = 503
+
+class ProviderAdmissionError(ProviderError):
+    """El proveedor rechazó la petición por sobrecarga antes de enviarla a LM Studio"""
+
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message, retry_after)
+
+class ProviderOverloadedError(ProviderAdmissionError):
+    """La cola de espera hacia LM Studio está llena"""
+
+    status_code = 429
+
+class ProviderQueueTimeoutError(ProviderAdmissionError):
+    """Se agotó el tiempo de espera en la cola hacia LM Studio"""
+
+    status_code = 503
@@ -1,31 +1,291 @@
+import asyncio
+import copy
+import hashlib
 import httpx
 import json
-from typing import List, Dict, Optional, AsyncGenerator
-import os
-from dotenv import load_dotenv
-
-# Cargar variables de entorno
-load_dotenv()
+import time
+from contextlib import aclosing
+from typing import List, Dict, Optional, AsyncGenerator, Callable, Set
+from app.conf.settings import Settings, get_settings
+from app.providers.admission import AdmissionController
+from app.providers.errors import (
+    ProviderError,
+    ProviderConnectionError,
+    ProviderTimeoutError,
+    ProviderHTTPError
+)
+from app.providers.resilience import Hedger, RetryPolicy
+from app.providers.response_cache import ResponseCache, response_cache
+from app.providers.router import Backend, BackendRouter
+from app.utils.metrics import (
+    metrics_registry,
+    llm_generation_duration,
+    llm_requests_in_flight,
+    llm_time_to_first_token,
+    record_usage
+)
 
 class LMStudioAPIProvider:
     """Proveedor para comunicarse con la API de LM Studio"""
     
-    def __init__(self):
-        self.base_url = os.getenv("LM_STUDIO_URL", "http://127.0.0.1:1234")
-        self.model = os.getenv("LM_STUDIO_MODEL", "qwen/qwen3-8b")
-        self.timeout = httpx.Timeout(60.0)  # 60 segundos de timeout
+    def __init__(self, settings: Optional[Settings] = None):
+        settings = settings or get_settings()
+        # LM_STUDIO_URLS (separadas por coma) reparte la carga entre varias instancias
+        self.base_urls = settings.lm_studio_base_urls
+        self.base_url = self.base_urls[0]
+        self.model = settings.lm_studio_model
+        # El timeout de lectura acota la espera entre bytes de la respuesta, no la
+        # espera en la cola de admisión (que tiene su propio límite)
+        self.timeout = httpx.Timeout(settings.lm_studio_timeout, connect=settings.lm_studio_connect_timeout)
+        # Pool de conexiones compartido (keep-alive entre peticiones)
+        self.limits = httpx.Limits(
+            max_connections=settings.lm_studio_max_connections,
+            max_keepalive_connections=settings.lm_studio_max_keepalive_connections,
+            keepalive_expiry=settings.lm_studio_keepalive_expiry
+        )
+        # HTTP/2 requiere el extra httpx[http2]
+        self.http2 = settings.lm_studio_http2
+        # Reparto de carga, afinidad por chat y circuit breaker por instancia
+        self.router = BackendRouter(
+            self.base_urls,
+            client_factory=self._create_client,
+            policy=settings.lm_studio_routing_policy,
+            affinity_slack=settings.lm_studio_affinity_slack,
+            failure_threshold=settings.lm_studio_breaker_failure_threshold,
+            recovery_seconds=settings.lm_studio_breaker_recovery_seconds,
+            health_interval=settings.lm_studio_health_interval,
+            health_timeout=settings.lm_studio_health_timeout
+        )
+        # Reintentos acotados y hedging opcional (LM_STUDIO_HEDGE_DELAY > 0)
+        self.retry_policy = RetryPolicy(
+            max_attempts=settings.lm_studio_retry_attempts,
+            base_delay=settings.lm_studio_retry_base_delay,
+            max_delay=settings.lm_studio_retry_max_delay
+        )
+        self.hedger = Hedger(delay=settings.lm_studio_hedge_delay)
+        # Control de admisión: cada instancia de LM Studio solo atiende unas pocas
+        # generaciones a la vez, el límite global escala con el número de instancias
+        self.admission = AdmissionController(
+            max_concurrency=settings.lm_studio_max_concurrency * len(self.base_urls),
+            max_queue_depth=settings.lm_studio_max_queue_depth,
+            queue_timeout=settings.lm_studio_queue_timeout,
+            batch_max_concurrency=settings.lm_studio_batch_max_concurrency
+        )
+        # Peticiones idénticas en curso comparten una sola generación (solo las
+        # deterministas o con cache=True, como la cache de respuestas)
+        self.coalesce = settings.lm_studio_coalesce
+        self.coalesced_requests = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Cache opt-in de respuestas completas (RESPONSE_CACHE_BACKEND)
+        self.response_cache = response_cache
+        # Contexto TLS compartido: cargar los certificados cuesta decenas de ms por cliente
+        self._ssl_context = None
     
-    async def get_available_models(self) -> List[Dict]:
-        """Obtener los modelos disponibles en LM Studio"""
+    def _create_client(self, base_url: str) -> httpx.AsyncClient:
+        """Cliente HTTP con pool de conexiones keep-alive para una instancia"""
+        if self._ssl_context is None:
+            self._ssl_context = httpx.create_ssl_context()
+        return httpx.AsyncClient(
+            base_url=base_url,
+            verify=self._ssl_context,
+            timeout=self.timeout,
+            limits=self.limits,
+            http2=self.http2,
+            headers={"Content-Type": "application/json"}
+        )
+    
+    async def startup(self):
+        """Crear los clientes HTTP compartidos y arrancar los health checks (lifespan de la app)"""
+        await self.router.start()
+    
+    async def shutdown(self):
+        """Cerrar los clientes HTTP compartidos y sus conexiones keep-alive"""
+        await self.router.stop()
+        self.response_cache.close()
+    
+    @staticmethod
+    def _track_request(backend: Backend) -> Dict:
+        """Registrar una petición en las estadísticas y devolver sus extensiones de trace"""
+        started_at = backend.pool_stats.request_started()
+        return {"trace": backend.pool_stats.make_trace(started_at)}
+    
+    @staticmethod
+    def _affinity_key(chat_id: Optional[int]) -> Optional[str]:
+        return f"chat:{chat_id}" if chat_id is not None else None
+    
+    def get_pool_stats(self) -> Dict:
+        """Obtener las estadísticas del pool de conexiones de cada instancia"""
+        stats = {
+            "backends": [
+                dict(backend.pool_stats.to_dict(backend.client), url=backend.url)
+                for backend in self.router.backends
+            ]
+        }
+        stats["limits"] = {
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "keepalive_expiry": self.limits.keepalive_expiry
+        }
+        stats["http2"] = self.http2
+        return stats
+    
+    def get_router_stats(self) -> Dict:
+        """Obtener el estado de las instancias (salud, carga y latencia)"""
+        return self.router.stats()
+    
+    def get_resilience_stats(self) -> Dict:
+        """Obtener el estado de los circuit breakers, reintentos y hedging"""
+        return {
+            "breakers": [
+                dict(backend.breaker.to_dict(), url=backend.url)
+                for backend in self.router.backends
+            ],
+            "retry": self.retry_policy.to_dict(),
+            "hedging": self.hedger.to_dict()
+        }
+    
+    def get_admission_stats(self) -> Dict:
+        """Obtener las métricas del control de admisión (cola y espera)"""
+        stats = self.admission.stats()
+        stats["coalescing"] = {
+            "enabled": self.coalesce,
+            "in_flight": len(self._inflight),
+            "coalesced_requests": self.coalesced_requests
+        }
+        return stats
+    
+    @staticmethod
+    def _payload_key(payload: Dict) -> str:
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+    
+    async def _coalesced(self, payload: Dict, request) -> Dict:
+        """
+        Ejecutar `request()` una sola vez por payload en curso: las peticiones
+        idénticas que llegan mientras tanto esperan y reciben una copia del mismo
+        resultado (marcada con "cached"). Si el líder se cancela (p. ej. su cliente se desconectó), sus
+        seguidores no se cancelan: el primero en despertar repite la petición y
+        los demás pasan a esperarlo a él.
+        """
+        key = self._payload_key(payload)
+        while True:
+            pending = self._inflight.get(key)
+            if pending is None:
+                break
+            try:
+                result = await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled() or asyncio.current_task().cancelling():
+                    # cancelaron a este seguidor, no al líder
+                    raise
+                continue
+            self.coalesced_requests += 1
+            result = copy.deepcopy(result)
+            result["cached"] = True
+            return result
+        
+        future = asyncio.get_running_loop().create_future()
+        # evitar el aviso de excepción no recuperada cuando no hay seguidores
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.get(f"{self.base_url}/v1/models")
+            result = await request()
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            del self._inflight[key]
+    
+    @staticmethod
+    def _error_detail(response: httpx.Response):
+        """Cuerpo de una respuesta de error (vacío si era un stream sin leer)"""
+        try:
+            return response.json()
+        except Exception:
+            try:
+                return response.text
+            except httpx.ResponseNotRead:
+                return ""
+    
+    def _provider_error(self, error: Exception) -> Exception:
+        """Convertir los errores de httpx en errores del proveedor con su código HTTP"""
+        if isinstance(error, ProviderError):
+            return error
+        if isinstance(error, httpx.TimeoutException):
+            return ProviderTimeoutError(f"Timeout waiting for LM Studio: {str(error)}")
+        if isinstance(error, httpx.RequestError):
+            return ProviderConnectionError(f"Error connecting to LM Studio: {str(error)}")
+        if isinstance(error, httpx.HTTPStatusError):
+            status = error.response.status_code
+            detail = self._error_detail(error.response)
+            message = f"HTTP error from LM Studio: {status} - {detail}" if detail else f"HTTP error from LM Studio: {status}"
+            return ProviderHTTPError(message, status)
+        return error
+    
+    def _is_idempotent_retryable(self, error: Exception) -> bool:
+        """Llamadas sin efectos (listar modelos): se reintenta cualquier fallo de la instancia"""
+        return self.router.is_backend_failure(error)
+    
+    def _is_pre_generation_failure(self, error: Exception) -> bool:
+        """
+        Completions: solo se reintenta si la petición no llegó a generar nada
+        (no se pudo conectar o la instancia respondió 5xx); un timeout de lectura
+        puede ser una generación larga y repetirla duplicaría el trabajo de la GPU
+        """
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code >= 500
+        return isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+    
+    async def _send(self, method: str, path: str, affinity_key: Optional[str], tried: Set[str], **kwargs) -> Dict:
+        """Un intento de petición contra la instancia que elija el router"""
+        async with self.router.lease(affinity_key, exclude=tried) as backend:
+            tried.add(backend.url)
+            extensions = self._track_request(backend)
+            try:
+                response = await backend.client.request(method, path, extensions=extensions, **kwargs)
                 response.raise_for_status()
                 return response.json()
-        except httpx.RequestError as e:
-            raise Exception(f"Error connecting to LM Studio: {str(e)}")
-        except httpx.HTTPStatusError as e:
-            raise Exception(f"HTTP error from LM Studio: {e.response.status_code}")
+            finally:
+                backend.pool_stats.request_finished()
+    
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        retryable: Callable[[Exception], bool],
+        affinity_key: Optional[str] = None,
+        hedge: bool = False,
+        **kwargs
+    ) -> Dict:
+        """
+        Petición con reintentos (backoff con jitter, cada intento en una instancia
+        distinta si hay otra disponible) y hedging opcional.
+        
+        hedge solo para llamadas cortas e idempotentes: una generación duplicada
+        ocuparía otra GPU sin cupo de admisión justo cuando la latencia ya es alta.
+        """
+        tried: Set[str] = set()
+        
+        async def attempt() -> Dict:
+            return await self._send(method, path, affinity_key, tried, **kwargs)
+        
+        async def hedged_attempt() -> Dict:
+            if hedge and len(self.router.backends) > 1:
+                return await self.hedger.run(attempt)
+            return await attempt()
+        
+        try:
+            return await self.retry_policy.run(hedged_attempt, retryable)
+        except Exception as e:
+            raise self._provider_error(e) from e
+    
+    async def get_available_models(self) -> List[Dict]:
+        """Obtener los modelos disponibles en LM Studio"""
+        return await self._request("GET", "/v1/models", self._is_idempotent_retryable, hedge=True)
     
     async def chat_completion(
         self,
@@ -33,7 +293,10 @@ class LMStudioAPIProvider:
         temperature: float = 0.7,
         max_tokens: int = -1,
         stream: bool = False,
-        system_message: Optional[str] = None
+        system_message: Optional[str] = None,
+        cache: Optional[bool] = None,
+        chat_id: Optional[int] = None,
+        batch: bool = False
     ) -> Dict:
         """
         Realizar una consulta de chat completion a LM Studio
@@ -44,113 +307,201 @@ class LMStudioAPIProvider:
             max_tokens: Número máximo de tokens (-1 para ilimitado)
             stream: Si debe hacer streaming o devolver respuesta completa
             system_message: Mensaje del sistema opcional
+            cache: True para permitir la cache de respuestas aunque temperature > 0,
+                False para no usarla nunca (p. ej. al regenerar); None solo si temperature == 0
+            chat_id: Chat de la petición, para preferir la instancia que ya tiene su KV cache
+            batch: Trabajo en lote (jobs): usa el carril de admisión de baja prioridad
+        
+        Returns:
+            Respuesta de LM Studio; con "cached": True si se reutilizó la de otra
+            petición (cache de respuestas o coalescencia), cuyo uso ya se contó
         """
-        try:
-            # Preparar mensajes
-            formatted_messages = []
-            
-            # Agregar mensaje del sistema si se proporciona
-            if system_message:
-                formatted_messages.append({
-                    "role": "system", 
-                    "content": system_message
-                })
-            
-            # Agregar mensajes del contexto
-            formatted_messages.extend(messages)
-            
-            payload = {
-                "model": self.model,
-                "messages": formatted_messages,
-                "temperature": temperature,
-                "max_tokens": max_tokens,
-                "stream": stream
-            }
-            
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    f"{self.base_url}/v1/chat/completions",
-                    json=payload,
-                    headers={"Content-Type": "application/json"}
-                )
-                response.raise_for_status()
-                return response.json()
-                
-        except httpx.RequestError as e:
-            raise Exception(f"Error connecting to LM Studio: {str(e)}")
-        except httpx.HTTPStatusError as e:
-            error_detail = ""
-            try:
-                error_detail = e.response.json()
-            except:
-                error_detail = e.response.text
-            raise Exception(f"HTTP error from LM Studio: {e.response.status_code} - {error_detail}")
+        cache_key = None
+        if self.response_cache.allows(temperature, cache):
+            cache_key = self.response_cache.make_key(
+                self.model,
+                system_message,
+                {"temperature": temperature, "max_tokens": max_tokens},
+                messages
+            )
+            cached = await self.response_cache.get(cache_key)
+            if cached is not None:
+                # copia marcada: el backend en memoria guarda el mismo dict
+                return dict(cached, cached=True)
+        
+        # Preparar mensajes
+        formatted_messages = []
+        
+        # Agregar mensaje del sistema si se proporciona
+        if system_message:
+            formatted_messages.append({
+                "role": "system", 
+                "content": system_message
+            })
+        
+        # Agregar mensajes del contexto
+        formatted_messages.extend(messages)
+        
+        payload = {
+            "model": self.model,
+            "messages": formatted_messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": stream
+        }
+        
+        async def request() -> Dict:
+            async with self.admission.slot(batch=batch):
+                started = time.perf_counter()
+                llm_requests_in_flight.inc()
+                try:
+                    result = await self._request(
+                        "POST",
+                        "/v1/chat/completions",
+                        self._is_pre_generation_failure,
+                        self._affinity_key(chat_id),
+                        json=payload
+                    )
+                finally:
+                    llm_requests_in_flight.dec()
+                elapsed = time.perf_counter() - started
+                llm_generation_duration.observe(elapsed, mode="complete")
+                record_usage(result.get("usage"), elapsed, "complete")
+                return result
+        
+        # una petición interactiva no debe quedar esperando a un líder en el carril de lote;
+        # una generación con muestreo es propia de cada petición (mismo criterio que la cache)
+        coalesce = self.coalesce and not batch and ResponseCache.shareable(temperature, cache)
+        result = await (self._coalesced(payload, request) if coalesce else request())
+        if cache_key is not None:
+            await self.response_cache.set(cache_key, result)
+        return result
     
     async def chat_completion_stream(
         self,
         messages: List[Dict[str, str]],
         temperature: float = 0.7,
         max_tokens: int = -1,
-        system_message: Optional[str] = None
+        system_message: Optional[str] = None,
+        chat_id: Optional[int] = None
     ) -> AsyncGenerator[Dict, None]:
         """
-        Realizar una consulta de chat completion con streaming
+        Realizar una consulta de chat completion con streaming.
+        Los fallos de la instancia se reintentan solo mientras no se haya
+        emitido ningún chunk.
         
         Args:
             messages: Lista de mensajes en formato [{"role": "user|assistant", "content": "..."}]
             temperature: Temperatura para la generación
             max_tokens: Número máximo de tokens
             system_message: Mensaje del sistema opcional
+            chat_id: Chat de la petición, para preferir la instancia que ya tiene su KV cache
             
         Yields:
             Chunks de respuesta del streaming
         """
-        try:
-            # Preparar mensajes
-            formatted_messages = []
-            
-            if system_message:
-                formatted_messages.append({
-                    "role": "system", 
-                    "content": system_message
-                })
-            
-            formatted_messages.extend(messages)
-            
-            payload = {
-                "model": self.model,
-                "messages": formatted_messages,
-                "temperature": temperature,
-                "max_tokens": max_tokens,
-                "stream": True
-            }
-            
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                async with client.stream(
-                    "POST",
-                    f"{self.base_url}/v1/chat/completions",
-                    json=payload,
-                    headers={"Content-Type": "application/json"}
-                ) as response:
-                    response.raise_for_status()
-                    
-                    async for line in response.aiter_lines():
-                        if line.strip():
-                            # Las líneas de streaming vienen como "data: {...}"
-                            if line.startswith("data: "):
-                                data_str = line[6:]  # Remover "data: "
-                                if data_str.strip() == "[DONE]":
-                                    break
-                                try:
-                                    chunk = json.loads(data_str)
-                                    yield chunk
-                                except json.JSONDecodeError:
-                                    continue
-                                    
-        except httpx.RequestError as e:
-            raise Exception(f"Error connecting to LM Studio: {str(e)}")
-        except httpx.HTTPStatusError as e:
-            raise Exception(f"HTTP error from LM Studio: {e.response.status_code}")
+        # Preparar mensajes
+        formatted_messages = []
+        
+        if system_message:
+            formatted_messages.append({
+                "role": "system", 
+                "content": system_message
+            })
+        
+        formatted_messages.extend(messages)
+        
+        payload = {
+            "model": self.model,
+            "messages": formatted_messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": True,
+            # el último chunk trae usage (prompt/completion tokens)
+            "stream_options": {"include_usage": True}
+        }
+        
+        usage = None
+        # el cupo se mantiene durante todo el streaming (incluidos los reintentos)
+        async with self.admission.slot():
+            started = time.perf_counter()
+            llm_requests_in_flight.inc()
+            try:
+                # aclosing: si el cliente se desconecta se cierra la petición a LM Studio de inmediato
+                async with aclosing(self._stream_with_retries(payload, chat_id)) as chunks:
+                    async for chunk in chunks:
+                        if chunk.get("usage"):
+                            usage = chunk["usage"]
+                        yield chunk
+            finally:
+                llm_requests_in_flight.dec()
+            elapsed = time.perf_counter() - started
+            llm_generation_duration.observe(elapsed, mode="stream")
+            record_usage(usage, elapsed, "stream")
+    
+    async def _stream_with_retries(self, payload: Dict, chat_id: Optional[int]) -> AsyncGenerator[Dict, None]:
+        """Stream de chunks reintentando los fallos de la instancia previos al primer chunk"""
+        started = time.perf_counter()
+        tried: Set[str] = set()
+        attempt = 1
+        while True:
+            first_token_sent = False
+            try:
+                async with self.router.lease(self._affinity_key(chat_id), exclude=tried) as backend:
+                    tried.add(backend.url)
+                    extensions = self._track_request(backend)
+                    try:
+                        async with backend.client.stream(
+                            "POST",
+                            "/v1/chat/completions",
+                            json=payload,
+                            extensions=extensions
+                        ) as response:
+                            response.raise_for_status()
+                            
+                            async for line in response.aiter_lines():
+                                if line.strip():
+                                    # Las líneas de streaming vienen como "data: {...}"
+                                    if line.startswith("data: "):
+                                        data_str = line[6:]  # Remover "data: "
+                                        if data_str.strip() == "[DONE]":
+                                            break
+                                        try:
+                                            chunk = json.loads(data_str)
+                                        except json.JSONDecodeError:
+                                            continue
+                                        if not first_token_sent:
+                                            first_token_sent = True
+                                            llm_time_to_first_token.observe(time.perf_counter() - started)
+                                        yield chunk
+                    finally:
+                        backend.pool_stats.request_finished()
+                return
+            except Exception as e:
+                if (
+                    first_token_sent
+                    or attempt >= self.retry_policy.max_attempts
+                    or not self.router.is_backend_failure(e)
+                ):
+                    raise self._provider_error(e) from e
+            self.retry_policy.retries += 1
+            await asyncio.sleep(self.retry_policy.backoff(attempt))
+            attempt += 1
+    
+    async def embeddings(self, inputs: List[str], model: str) -> Dict:
+        """
+        Calcular embeddings con /v1/embeddings (requiere un modelo de embeddings cargado).
+        No pasa por la admisión: es una llamada corta a otro modelo y no ocupa un cupo
+        de generación; sin efectos, se reintenta ante cualquier fallo de la instancia.
+        
+        Args:
+            inputs: Textos a embeber (un vector por texto, en el mismo orden en "data")
+            model: Modelo de embeddings
+        """
+        payload = {"model": model, "input": inputs}
+        return await self._request(
+            "POST", "/v1/embeddings", self._is_idempotent_retryable, hedge=True, json=payload
+        )
     
     async def simple_completion(
         self,
@@ -166,28 +517,21 @@ class LMStudioAPIProvider:
             temperature: Temperatura para la generación
             max_tokens: Número máximo de tokens
         """
-        try:
-            payload = {
-                "model": self.model,
-                "prompt": prompt,
-                "temperature": temperature,
-                "max_tokens": max_tokens,
-                "stream": False
-            }
-            
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    f"{self.base_url}/v1/completions",
-                    json=payload,
-                    headers={"Content-Type": "application/json"}
-                )
-                response.raise_for_status()
-                return response.json()
-                
-        except httpx.RequestError as e:
-            raise Exception(f"Error connecting to LM Studio: {str(e)}")
-        except httpx.HTTPStatusError as e:
-            raise Exception(f"HTTP error from LM Studio: {e.response.status_code}")
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": False
+        }
+        
+        async with self.admission.slot():
+            return await self._request("POST", "/v1/completions", self._is_pre_generation_failure, json=payload)
 
 # Instancia global del proveedor
 lm_studio_provider = LMStudioAPIProvider()
+
+metrics_registry.gauge(
+    "llm_admission_queue_depth", "Peticiones esperando cupo hacia LM Studio",
+    function=lambda: lm_studio_provider.admission.queued
+)
@@ -0,0 +1,170 @@
+import asyncio
+import math
+import random
+import time
+from typing import Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+class CircuitBreaker:
+    """
+    Circuit breaker por instancia de LM Studio.
+
+    closed: pasa todo el tráfico; tras `failure_threshold` fallos seguidos se abre.
+    open: no recibe tráfico durante `recovery_seconds`.
+    half_open: deja pasar `half_open_max_calls` peticiones de prueba; si una
+    funciona se cierra, si falla vuelve a abrirse.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, recovery_seconds: float, half_open_max_calls: int = 1):
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._trials = 0
+        self.consecutive_failures = 0
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_seconds:
+            self._to_half_open()
+        return self._state
+
+    def _to_half_open(self):
+        self._state = self.HALF_OPEN
+        self._trials = 0
+
+    def allows(self) -> bool:
+        """Saber si la instancia puede recibir una petición ahora"""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        return state == self.HALF_OPEN and self._trials < self.half_open_max_calls
+
+    def on_attempt(self):
+        if self.state == self.HALF_OPEN:
+            self._trials += 1
+
+    def release_trial(self):
+        """Devolver una prueba que terminó sin resultado (p. ej. cancelada)"""
+        if self._state == self.HALF_OPEN and self._trials > 0:
+            self._trials -= 1
+
+    def record_success(self):
+        self._state = self.CLOSED
+        self._trials = 0
+        self.consecutive_failures = 0
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self._state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self._state != self.OPEN:
+                self.trips += 1
+            self._state = self.OPEN
+            self._opened_at = time.monotonic()
+
+    def probe_succeeded(self):
+        """Un health check correcto adelanta el paso de open a half_open"""
+        if self._state == self.OPEN:
+            self._to_half_open()
+
+    def retry_after(self) -> int:
+        if self.state != self.OPEN:
+            return 0
+        return max(1, math.ceil(self._opened_at + self.recovery_seconds - time.monotonic()))
+
+    def to_dict(self) -> Dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "recovery_seconds": self.recovery_seconds,
+            "retry_after_seconds": self.retry_after(),
+            "trips": self.trips
+        }
+
+class RetryPolicy:
+    """Reintentos acotados con backoff exponencial y jitter completo"""
+
+    def __init__(self, max_attempts: int, base_delay: float, max_delay: float):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+
+    def backoff(self, attempt: int) -> float:
+        """Espera antes del reintento número `attempt` (desde 1)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    async def run(self, operation: Callable[[], Awaitable[T]], retryable: Callable[[Exception], bool]) -> T:
+        attempt = 1
+        while True:
+            try:
+                return await operation()
+            except Exception as e:
+                if attempt >= self.max_attempts or not retryable(e):
+                    raise
+            self.retries += 1
+            await asyncio.sleep(self.backoff(attempt))
+            attempt += 1
+
+    def to_dict(self) -> Dict:
+        return {
+            "max_attempts": self.max_attempts,
+            "base_delay_seconds": self.base_delay,
+            "max_delay_seconds": self.max_delay,
+            "retries": self.retries
+        }
+
+class Hedger:
+    """
+    Peticiones hedged: si la primera no terminó tras `delay` segundos se lanza
+    una segunda (en otra instancia) y se usa la que responda primero.
+    Con `delay` <= 0 está desactivado.
+    """
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.started = 0
+        self.won = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.delay > 0
+
+    async def run(self, attempt: Callable[[], Awaitable[T]]) -> T:
+        if not self.enabled:
+            return await attempt()
+
+        primary = asyncio.ensure_future(attempt())
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.delay)
+            if not done:
+                self.started += 1
+                tasks.add(asyncio.ensure_future(attempt()))
+
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.won += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    def to_dict(self) -> Dict:
+        return {"enabled": self.enabled, "delay_seconds": self.delay, "started": self.started, "won": self.won}
@@ -0,0 +1,270 @@
+import asyncio
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from app.conf.settings import Settings, get_settings
+
+_WHITESPACE = re.compile(r"\s+")
+
+class MemoryResponseBackend:
+    """Backend en memoria: LRU con TTL, local al proceso"""
+
+    name = "memory"
+    # las operaciones son baratas, no hace falta sacarlas del event loop
+    blocking = False
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            stored_at, value = item
+            if time.time() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.evictions += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Dict):
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def size(self) -> int:
+        return len(self._entries)
+
+    def close(self):
+        pass
+
+class SQLiteResponseBackend:
+    """
+    Backend en disco (SQLite): sobrevive a reinicios y se comparte entre los
+    workers de uvicorn de la misma máquina. Expira por TTL y, al superar
+    `max_entries`, elimina las entradas usadas hace más tiempo.
+    """
+
+    name = "sqlite"
+    blocking = True
+
+    def __init__(self, path: str, max_entries: int, ttl_seconds: float):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._last_access = 0.0
+        self._conn: Optional[sqlite3.Connection] = None
+        with self._lock:
+            self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Conexión abierta (con el lock tomado). close() la cierra al terminar el
+        lifespan, pero la instancia es global: otro lifespan en el mismo proceso
+        (tests, comandos del CLI) la vuelve a abrir aquí.
+        """
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_response_cache_accessed_at ON response_cache (accessed_at)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _clock(self) -> float:
+        # estrictamente creciente para que el orden LRU no dependa de la resolución del reloj
+        self._last_access = max(time.time(), self._last_access + 1e-6)
+        return self._last_access
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            conn = self._connect()
+            now = self._clock()
+            row = conn.execute(
+                "SELECT value, stored_at FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                self.evictions += 1
+                return None
+            conn.execute("UPDATE response_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Dict):
+        with self._lock:
+            conn = self._connect()
+            now = self._clock()
+            conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now, now)
+            )
+            self._evict(now)
+
+    def _evict(self, now: float):
+        expired = self._conn.execute(
+            "DELETE FROM response_cache WHERE stored_at < ?", (now - self.ttl_seconds,)
+        ).rowcount
+        overflow = self._conn.execute(
+            "DELETE FROM response_cache WHERE key IN ("
+            "SELECT key FROM response_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        ).rowcount
+        self.evictions += expired + overflow
+
+    def clear(self):
+        with self._lock:
+            self._connect().execute("DELETE FROM response_cache")
+
+    def size(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+class ResponseCache:
+    """
+    Cache opt-in de respuestas completas del LLM.
+
+    La clave es un hash de modelo, mensaje del sistema, parámetros de muestreo y
+    lista de mensajes normalizada. Solo se usa cuando la generación es
+    determinista (temperature == 0) o cuando quien llama lo permite de forma
+    explícita; una regeneración nunca debe leer de aquí.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    @staticmethod
+    def shareable(temperature: float, cache: Optional[bool]) -> bool:
+        """
+        Una respuesta se puede compartir entre peticiones solo si la generación es
+        determinista (temperature == 0) o quien llama lo permite (cache=True).
+        La misma regla decide la coalescencia de peticiones idénticas en curso.
+        """
+        if cache is False:
+            return False
+        return cache is True or temperature == 0
+
+    def allows(self, temperature: float, cache: Optional[bool]) -> bool:
+        """Decidir si una petición puede usar la cache"""
+        return self.enabled and self.shareable(temperature, cache)
+
+    @staticmethod
+    def _normalize(content: str) -> str:
+        return _WHITESPACE.sub(" ", content).strip()
+
+    @classmethod
+    def make_key(
+        cls,
+        model: str,
+        system_message: Optional[str],
+        params: Dict,
+        messages: List[Dict[str, str]]
+    ) -> str:
+        material = {
+            "model": model,
+            "system": cls._normalize(system_message) if system_message else None,
+            "params": params,
+            "messages": [
+                [message["role"], cls._normalize(message["content"])] for message in messages
+            ]
+        }
+        encoded = json.dumps(material, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    async def _call(self, method, *args):
+        if self.backend.blocking:
+            return await asyncio.get_running_loop().run_in_executor(None, method, *args)
+        return method(*args)
+
+    async def get(self, key: str) -> Optional[Dict]:
+        value = await self._call(self.backend.get, key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Dict):
+        await self._call(self.backend.set, key, value)
+        self.stores += 1
+
+    def clear(self):
+        if self.enabled:
+            self.backend.clear()
+
+    def close(self):
+        if self.enabled:
+            self.backend.close()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        stats = {
+            "enabled": self.enabled,
+            "backend": self.backend.name if self.enabled else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stores": self.stores
+        }
+        if self.enabled:
+            stats.update({
+                "entries": self.backend.size(),
+                "max_entries": self.backend.max_entries,
+                "ttl_seconds": self.backend.ttl_seconds,
+                "evictions": self.backend.evictions
+            })
+        return stats
+
+def build_response_cache(settings: Settings) -> ResponseCache:
+    """Crear la cache según RESPONSE_CACHE_BACKEND (none, memory o sqlite)"""
+    max_entries = settings.response_cache_max_entries
+    ttl_seconds = settings.response_cache_ttl_seconds
+
+    if settings.response_cache_backend == "memory":
+        return ResponseCache(MemoryResponseBackend(max_entries, ttl_seconds))
+    if settings.response_cache_backend == "sqlite":
+        return ResponseCache(SQLiteResponseBackend(settings.response_cache_path, max_entries, ttl_seconds))
+    return ResponseCache()
+
+# Instancia global de la cache de respuestas
+response_cache = build_response_cache(get_settings())
@@ -0,0 +1,239 @@
+import asyncio
+import hashlib
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Callable, Collection, Dict, List, Optional
+
+import httpx
+
+from app.providers.client_stats import ConnectionPoolStats
+from app.providers.errors import ProviderUnavailableError
+from app.providers.resilience import CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+class Backend:
+    """Una instancia de LM Studio (u otro servidor compatible con OpenAI)"""
+
+    def __init__(self, url: str, breaker: CircuitBreaker):
+        self.url = url.rstrip("/")
+        self.breaker = breaker
+        self.client: Optional[httpx.AsyncClient] = None
+        self.pool_stats = ConnectionPoolStats()
+        self.outstanding = 0
+        # media móvil exponencial de la duración de las peticiones (segundos)
+        self.latency_ewma: Optional[float] = None
+        self.healthy = True
+        self.requests = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def available(self) -> bool:
+        return self.healthy and self.breaker.allows()
+
+    def to_dict(self) -> Dict:
+        return {
+            "url": self.url,
+            "available": self.available,
+            "healthy": self.healthy,
+            "breaker": self.breaker.state,
+            "outstanding": self.outstanding,
+            "latency_ewma_ms": round(self.latency_ewma * 1000, 3) if self.latency_ewma is not None else None,
+            "requests": self.requests,
+            "failures": self.failures,
+            "last_error": self.last_error
+        }
+
+class BackendRouter:
+    """
+    Reparte las peticiones entre varias instancias de LM Studio.
+
+    - `least_outstanding`: la instancia con menos peticiones en curso.
+    - `latency`: la de menor (peticiones en curso + 1) * latencia EWMA.
+
+    Con afinidad (chat_id) se prefiere siempre la misma instancia para
+    aprovechar su KV cache (rendezvous hashing, así solo se reasignan los chats
+    de una instancia expulsada), salvo que esté `affinity_slack` peticiones por
+    encima de la menos cargada. Cada instancia tiene un circuit breaker que la
+    saca de la rotación tras `failure_threshold` fallos seguidos; el health
+    check contra /v1/models la marca como caída o adelanta su readmisión.
+    """
+
+    POLICIES = ("least_outstanding", "latency")
+
+    def __init__(
+        self,
+        urls: List[str],
+        client_factory: Callable[[str], httpx.AsyncClient],
+        policy: str = "least_outstanding",
+        affinity_slack: int = 2,
+        failure_threshold: int = 3,
+        recovery_seconds: float = 30.0,
+        health_interval: float = 10.0,
+        health_timeout: float = 2.0,
+        ewma_alpha: float = 0.3
+    ):
+        if not urls:
+            raise ValueError("At least one LM Studio URL is required")
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown routing policy: {policy}")
+        self.backends = [Backend(url, CircuitBreaker(failure_threshold, recovery_seconds)) for url in urls]
+        self.client_factory = client_factory
+        self.policy = policy
+        self.affinity_slack = affinity_slack
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.ewma_alpha = ewma_alpha
+        self.affinity_hits = 0
+        self.affinity_overflows = 0
+        self._health_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Crear los clientes HTTP y arrancar el health check periódico"""
+        for backend in self.backends:
+            self._ensure_client(backend)
+        if self.health_interval > 0 and (self._health_task is None or self._health_task.done()):
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def stop(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+        for backend in self.backends:
+            if backend.client is not None:
+                await backend.client.aclose()
+                backend.client = None
+
+    def _ensure_client(self, backend: Backend) -> httpx.AsyncClient:
+        if backend.client is None or backend.client.is_closed:
+            backend.client = self.client_factory(backend.url)
+        return backend.client
+
+    def _cost(self, backend: Backend) -> float:
+        if self.policy == "latency":
+            # sin mediciones todavía se asume la mejor latencia conocida
+            known = [b.latency_ewma for b in self.backends if b.latency_ewma is not None]
+            latency = backend.latency_ewma if backend.latency_ewma is not None else min(known, default=1.0)
+            return (backend.outstanding + 1) * latency
+        return backend.outstanding
+
+    @staticmethod
+    def _affinity_score(key: str, backend: Backend) -> int:
+        digest = hashlib.blake2b(f"{key}|{backend.url}".encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "big")
+
+    def select(self, affinity_key: Optional[str] = None, exclude: Collection[str] = ()) -> Backend:
+        """
+        Elegir la instancia para una petición, evitando las de `exclude` (ya
+        intentadas) mientras haya otras. Sin ninguna con el breaker cerrado o en
+        prueba se rechaza con 503.
+        """
+        allowed = [backend for backend in self.backends if backend.breaker.allows()]
+        if not allowed:
+            retry_after = min(backend.breaker.retry_after() for backend in self.backends)
+            raise ProviderUnavailableError("No LM Studio backend is available", max(1, retry_after))
+        # si el health check las marca a todas como caídas se intenta igual
+        candidates = [backend for backend in allowed if backend.healthy] or allowed
+        candidates = [backend for backend in candidates if backend.url not in exclude] or candidates
+
+        best = min(candidates, key=lambda backend: (self._cost(backend), backend.outstanding))
+        if affinity_key is None:
+            return best
+
+        preferred = max(candidates, key=lambda backend: self._affinity_score(affinity_key, backend))
+        if preferred.outstanding - best.outstanding > self.affinity_slack:
+            self.affinity_overflows += 1
+            return best
+        self.affinity_hits += 1
+        return preferred
+
+    @staticmethod
+    def is_backend_failure(error: BaseException) -> bool:
+        """Errores que indican un problema de la instancia (no de la petición)"""
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code >= 500
+        return isinstance(error, httpx.RequestError)
+
+    def record_success(self, backend: Backend, elapsed: float):
+        backend.breaker.record_success()
+        if backend.latency_ewma is None:
+            backend.latency_ewma = elapsed
+        else:
+            backend.latency_ewma += self.ewma_alpha * (elapsed - backend.latency_ewma)
+
+    def record_failure(self, backend: Backend, error: BaseException):
+        backend.failures += 1
+        backend.last_error = f"{type(error).__name__}: {error}"
+        backend.breaker.record_failure()
+
+    @asynccontextmanager
+    async def lease(self, affinity_key: Optional[str] = None, exclude: Collection[str] = ()):
+        """Reservar una instancia durante una petición y registrar su resultado"""
+        backend = self.select(affinity_key, exclude)
+        self._ensure_client(backend)
+        backend.breaker.on_attempt()
+        backend.outstanding += 1
+        backend.requests += 1
+        started = time.perf_counter()
+        recorded = False
+        try:
+            yield backend
+        except Exception as e:
+            recorded = True
+            if self.is_backend_failure(e):
+                self.record_failure(backend, e)
+            else:
+                # la instancia respondió (p. ej. 4xx): el fallo es de la petición
+                backend.breaker.record_success()
+            raise
+        else:
+            recorded = True
+            self.record_success(backend, time.perf_counter() - started)
+        finally:
+            backend.outstanding -= 1
+            if not recorded:
+                backend.breaker.release_trial()
+
+    async def check_health(self, backend: Backend) -> bool:
+        """Consultar /v1/models; un fallo saca la instancia de la rotación"""
+        client = self._ensure_client(backend)
+        try:
+            response = await client.get("/v1/models", timeout=self.health_timeout)
+            response.raise_for_status()
+        except (httpx.HTTPError, OSError) as e:
+            backend.healthy = False
+            backend.last_error = f"health check: {type(e).__name__}: {e}"
+            return False
+        backend.healthy = True
+        backend.breaker.probe_succeeded()
+        return True
+
+    async def check_all(self) -> List[bool]:
+        return await asyncio.gather(*(self.check_health(backend) for backend in self.backends))
+
+    async def _health_loop(self):
+        while True:
+            try:
+                await self.check_all()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # un error inesperado no debe dejar al proceso sin health checks
+                logger.exception("Error en el health check de LM Studio")
+            await asyncio.sleep(self.health_interval)
+
+    def stats(self) -> Dict:
+        return {
+            "policy": self.policy,
+            "affinity_slack": self.affinity_slack,
+            "affinity_hits": self.affinity_hits,
+            "affinity_overflows": self.affinity_overflows,
+            "health_interval_seconds": self.health_interval,
+            "backends": [backend.to_dict() for backend in self.backends]
+        }
@@ -1,9 +1,16 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select, update
 from app.entities.chats import Chat
 from app.entities.messages import Message
+from app.entities.embeddings import MessageEmbedding
+from app.entities.jobs import CompletionJob
+from app.entities.summaries import ChatSummary
+from app.utils.conversation_cache import conversation_cache
+from app.utils.pagination import CursorKey, keyset_condition, count_cache
+from app.utils.metrics import instrument_repository
 from typing import List, Optional, Tuple
 
+@instrument_repository("chats")
 class ChatRepository:
     
     def __init__(self, db: Session):
@@ -15,6 +22,7 @@ class ChatRepository:
         self.db.add(chat)
         self.db.commit()
         self.db.refresh(chat)
+        count_cache.invalidate("chats")
         return chat
     
     def get_chat_by_id(self, chat_id: int) -> Optional[Chat]:
@@ -34,35 +42,99 @@ class ChatRepository:
         """Eliminar un chat y sus mensajes asociados"""
         chat = self.db.query(Chat).filter(Chat.id == chat_id).first()
         if chat:
-            # Eliminar mensajes asociados primero
+            # Eliminar jobs, resúmenes, embeddings y mensajes asociados primero (FKs hacia chats/messages)
+            self.db.query(CompletionJob).filter(CompletionJob.chat_id == chat_id).delete()
+            self.db.query(ChatSummary).filter(ChatSummary.chat_id == chat_id).delete()
+            self.db.query(MessageEmbedding).filter(MessageEmbedding.chat_id == chat_id).delete()
             self.db.query(Message).filter(Message.chat_id == chat_id).delete()
             # Eliminar el chat
             self.db.delete(chat)
             self.db.commit()
+            conversation_cache.invalidate(chat_id)
+            count_cache.invalidate("chats")
             return True
         return False
     
-    def get_all_chats_paginated(self, page: int = 1, items_per_page: int = 16) -> Tuple[List[tuple], int]:
-        """Obtener todos los chats con conteo de mensajes y paginación"""
-        offset = (page - 1) * items_per_page
+    def get_chats_page(
+        self,
+        limit: int = 16,
+        cursor: Optional[CursorKey] = None,
+        direction: str = "next"
+    ) -> Tuple[List[tuple], bool]:
+        """
+        Obtener una página de chats (más recientes primero) con paginación keyset
+        sobre (created_at, id). Solo lee la tabla chats: el conteo de mensajes y la
+        última actividad están denormalizados.
         
-        # Obtener el total de chats
-        total_chats = self.db.query(Chat).count()
+        Args:
+            limit: Número de chats por página
+            cursor: Clave (created_at, id) desde la que continuar (exclusiva)
+            direction: "next" (chats más antiguos) o "prev" (chats más recientes)
+            
+        Returns:
+            (filas (id, title, created_at, message_count, last_message_at), hay_más_en_esa_dirección)
+        """
+        query = self.db.query(
+            Chat.id,
+            Chat.title,
+            Chat.created_at,
+            Chat.message_count,
+            Chat.last_message_at
+        )
         
-        # Obtener los chats paginados
-        chats = (
-            self.db.query(
-                Chat.id,
-                Chat.title,
-                Chat.created_at,
-                func.count(Message.id).label('message_count')
-            )
-            .outerjoin(Message)
-            .group_by(Chat.id, Chat.title, Chat.created_at)
-            .order_by(Chat.created_at.desc())
-            .offset(offset)
-            .limit(items_per_page)
-            .all()
+        if cursor is not None:
+            query = query.filter(keyset_condition(Chat.created_at, Chat.id, cursor, newer=direction == "prev"))
+        
+        if direction == "prev":
+            query = query.order_by(Chat.created_at.asc(), Chat.id.asc())
+        else:
+            query = query.order_by(Chat.created_at.desc(), Chat.id.desc())
+        
+        rows = query.limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if direction == "prev":
+            rows.reverse()
+        return rows, has_more
+    
+    def count_chats(self) -> int:
+        """Total de chats (cacheado unos segundos: solo se pide de forma opcional)"""
+        return count_cache.get_or_compute("chats", lambda: self.db.query(func.count(Chat.id)).scalar())
+    
+    def repair_counters(self, chat_id: Optional[int] = None, batch_size: int = 1000) -> int:
+        """
+        Recalcular message_count y last_message_at desde la tabla messages
+        (backfill inicial o reparación). Procesa los chats por rangos de id,
+        con un commit por lote para no bloquear la tabla en bases grandes.
+        
+        Returns:
+            Número de chats procesados
+        """
+        message_count = (
+            select(func.count(Message.id))
+            .where(Message.chat_id == Chat.id)
+            .scalar_subquery()
+        )
+        last_message_at = (
+            select(func.max(Message.created_at))
+            .where(Message.chat_id == Chat.id)
+            .scalar_subquery()
         )
         
-        return chats, total_chats
\ No newline at end of file
+        if chat_id is not None:
+            ranges = [(chat_id, chat_id)]
+        else:
+            max_id = self.db.query(func.max(Chat.id)).scalar() or 0
+            ranges = [(start, start + batch_size - 1) for start in range(1, max_id + 1, batch_size)]
+        
+        processed = 0
+        for start, end in ranges:
+            result = self.db.execute(
+                update(Chat)
+                .where(Chat.id.between(start, end))
+                .values(message_count=message_count, last_message_at=last_message_at)
+                .execution_options(synchronize_session=False)
+            )
+            self.db.commit()
+            processed += result.rowcount
+        return processed
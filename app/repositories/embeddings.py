@@ -0,0 +1,125 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import Integer, LargeBinary, String, and_, bindparam, delete, insert, select
+from sqlalchemy.engine import Row
+from app.entities.embeddings import MessageEmbedding
+from app.entities.messages import Message
+from app.utils.metrics import instrument_repository
+from app.utils.pagination import CursorKey, keyset_condition
+from typing import Dict, List, Optional
+
+@instrument_repository("embeddings")
+class EmbeddingRepository:
+    """
+    Embeddings de los mensajes (message_embeddings). Los vectores viajan como bytes
+    (float32); pasarlos a numpy y compararlos lo hace el servicio de recuperación.
+    Usa Core (filas) en lugar de entidades ORM: se leen miles de vectores por consulta.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_unindexed_messages(
+        self,
+        model: str,
+        limit: int,
+        chat_id: Optional[int] = None,
+        after_id: int = 0
+    ) -> List[Row]:
+        """
+        Mensajes sin embedding del modelo (id, chat_id, content) en orden de id,
+        posteriores a after_id. Cambiar de modelo los deja a todos pendientes.
+        """
+        messages = Message.__table__
+        embeddings = MessageEmbedding.__table__
+        query = (
+            select(messages.c.id, messages.c.chat_id, messages.c.content)
+            .outerjoin(embeddings, and_(embeddings.c.message_id == messages.c.id, embeddings.c.model == model))
+            .where(embeddings.c.id.is_(None), messages.c.id > after_id)
+            .order_by(messages.c.id)
+            .limit(limit)
+        )
+        if chat_id is not None:
+            query = query.where(messages.c.chat_id == chat_id)
+        return self.db.execute(query).all()
+
+    def save_embeddings(self, rows: List[Dict]):
+        """
+        Guardar embeddings {message_id, content, model, dimensions, vector} en una
+        transacción, reemplazando los anteriores de esos mensajes. Solo se insertan
+        si el mensaje sigue existiendo con el mismo texto: si se borró o se reescribió
+        mientras se calculaba el embedding, la fila se descarta (INSERT ... SELECT).
+        """
+        messages = Message.__table__
+        embeddings = MessageEmbedding.__table__
+        self.db.execute(delete(embeddings).where(embeddings.c.message_id.in_([row["message_id"] for row in rows])))
+        source = (
+            select(
+                messages.c.id,
+                messages.c.chat_id,
+                bindparam("model", type_=String),
+                bindparam("dimensions", type_=Integer),
+                bindparam("vector", type_=LargeBinary)
+            )
+            .where(messages.c.id == bindparam("message_id"), messages.c.content == bindparam("content"))
+        )
+        self.db.execute(
+            insert(embeddings).from_select(["message_id", "chat_id", "model", "dimensions", "vector"], source),
+            rows
+        )
+        self.db.commit()
+
+    def get_chat_embeddings(self, chat_id: int, model: str, before_id: Optional[int] = None) -> List[Row]:
+        """Embeddings (id, vector) de un chat, opcionalmente solo de los mensajes anteriores a before_id"""
+        embeddings = MessageEmbedding.__table__
+        query = select(embeddings.c.id, embeddings.c.vector).where(
+            embeddings.c.chat_id == chat_id, embeddings.c.model == model
+        )
+        if before_id is not None:
+            query = query.where(embeddings.c.message_id < before_id)
+        return self.db.execute(query).all()
+
+    def get_embeddings_after(self, model: str, after_id: int, limit: int) -> List[Row]:
+        """Embeddings (id, vector) con id posterior a after_id, en orden: sincronización del índice global"""
+        embeddings = MessageEmbedding.__table__
+        return self.db.execute(
+            select(embeddings.c.id, embeddings.c.vector)
+            .where(embeddings.c.id > after_id, embeddings.c.model == model)
+            .order_by(embeddings.c.id)
+            .limit(limit)
+        ).all()
+
+    def get_embedded_messages(self, embedding_ids: List[int]) -> List[Row]:
+        """
+        Mensajes de los embeddings dados (embedding_id, id, chat_id, sender, content,
+        created_at). Los embeddings ya borrados no aparecen.
+        """
+        messages = Message.__table__
+        embeddings = MessageEmbedding.__table__
+        return self.db.execute(
+            select(
+                embeddings.c.id.label("embedding_id"),
+                messages.c.id,
+                messages.c.chat_id,
+                messages.c.sender,
+                messages.c.content,
+                messages.c.created_at
+            )
+            .join(messages, messages.c.id == embeddings.c.message_id)
+            .where(embeddings.c.id.in_(embedding_ids))
+        ).all()
+
+    def get_turn_partner(self, chat_id: int, key: CursorKey, sender: str) -> Optional[Row]:
+        """
+        El otro mensaje del turno de key (created_at, id): la respuesta siguiente a
+        una pregunta o la pregunta anterior a una respuesta; None si no la hay.
+        """
+        messages = Message.__table__
+        newer = sender == "user"
+        order = (messages.c.created_at, messages.c.id)
+        row = self.db.execute(
+            select(messages.c.id, messages.c.chat_id, messages.c.sender, messages.c.content, messages.c.created_at)
+            .where(messages.c.chat_id == chat_id, keyset_condition(*order, key, newer=newer))
+            .order_by(*(order if newer else (column.desc() for column in order)))
+            .limit(1)
+        ).first()
+        return row if row is not None and row.sender != sender else None
@@ -0,0 +1,147 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, update
+from datetime import datetime, timedelta, timezone
+from app.entities.jobs import CompletionJob
+from app.entities.messages import Message
+from app.repositories.messages import MessageRepository
+from app.utils.metrics import instrument_repository
+from typing import Dict, Optional
+
+# Errores recortados al guardarlos en el job
+MAX_ERROR_CHARS = 2000
+
+def _utcnow() -> datetime:
+    # started_at/finished_at se fijan desde la app (UTC) para comparar con el lease sin depender del reloj del servidor
+    return datetime.now(timezone.utc)
+
+@instrument_repository("jobs")
+class JobRepository:
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def create_job(self, chat_id: int, message: str, cache: Optional[bool] = None) -> CompletionJob:
+        """Encolar una completion"""
+        job = CompletionJob(chat_id=chat_id, message=message, cache=cache, status=CompletionJob.QUEUED)
+        self.db.add(job)
+        self.db.commit()
+        self.db.refresh(job)
+        return job
+    
+    def get_job(self, job_id: int) -> Optional[CompletionJob]:
+        return self.db.get(CompletionJob, job_id)
+    
+    def get_result_message(self, job: CompletionJob) -> Optional[Message]:
+        if job.result_message_id is None:
+            return None
+        return self.db.get(Message, job.result_message_id)
+    
+    def claim_next_job(self, max_tries: int = 5) -> Optional[CompletionJob]:
+        """
+        Tomar el job en cola más antiguo. El UPDATE es condicional (status = queued):
+        si otro worker (u otro proceso) lo tomó antes, se prueba con el siguiente.
+        """
+        for _ in range(max_tries):
+            job_id = (
+                self.db.query(CompletionJob.id)
+                .filter(CompletionJob.status == CompletionJob.QUEUED)
+                .order_by(CompletionJob.id)
+                .limit(1)
+                .scalar()
+            )
+            if job_id is None:
+                return None
+            result = self.db.execute(
+                update(CompletionJob)
+                .where(CompletionJob.id == job_id, CompletionJob.status == CompletionJob.QUEUED)
+                .values(
+                    status=CompletionJob.RUNNING,
+                    started_at=_utcnow(),
+                    attempts=CompletionJob.attempts + 1
+                )
+                .execution_options(synchronize_session=False)
+            )
+            self.db.commit()
+            if result.rowcount == 1:
+                return self.db.get(CompletionJob, job_id)
+        return None
+    
+    def _transition(self, job_id: int, from_statuses: tuple, **values) -> bool:
+        result = self.db.execute(
+            update(CompletionJob)
+            .where(CompletionJob.id == job_id, CompletionJob.status.in_(from_statuses))
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+    
+    def complete_job(self, job: CompletionJob, llm_content: str, usage: Dict) -> Optional[Message]:
+        """
+        Marcar el job como terminado y guardar el par user-llm en la misma
+        transacción. Si el job ya no está en curso (cancelado o borrado con su
+        chat) no se guarda nada.
+        """
+        finished = self._transition(
+            job.id, (CompletionJob.RUNNING,), status=CompletionJob.SUCCEEDED, error=None, finished_at=_utcnow()
+        )
+        if not finished:
+            self.db.rollback()
+            return None
+        # create_message_pair hace commit del cambio de estado junto con los mensajes
+        _, llm_message = MessageRepository(self.db).create_message_pair(job.chat_id, job.message, llm_content, usage)
+        self._transition(job.id, (CompletionJob.SUCCEEDED,), result_message_id=llm_message.id)
+        self.db.commit()
+        return llm_message
+    
+    def fail_job(self, job_id: int, error: str, retry: bool) -> bool:
+        """Devolver el job a la cola (retry) o marcarlo como fallido"""
+        if retry:
+            values = {"status": CompletionJob.QUEUED, "error": error[:MAX_ERROR_CHARS]}
+        else:
+            values = {"status": CompletionJob.FAILED, "error": error[:MAX_ERROR_CHARS], "finished_at": _utcnow()}
+        changed = self._transition(job_id, (CompletionJob.RUNNING,), **values)
+        self.db.commit()
+        return changed
+    
+    def cancel_job(self, job_id: int) -> bool:
+        """Cancelar un job en cola o en curso; False si ya había terminado"""
+        changed = self._transition(
+            job_id,
+            (CompletionJob.QUEUED, CompletionJob.RUNNING),
+            status=CompletionJob.CANCELLED,
+            finished_at=_utcnow()
+        )
+        self.db.commit()
+        return changed
+    
+    def requeue_stale_jobs(self, lease_seconds: float, max_attempts: int) -> int:
+        """
+        Recuperar jobs "running" cuyo worker murió (más viejos que el lease):
+        vuelven a la cola, o fallan si ya agotaron los intentos
+        """
+        stale = (
+            CompletionJob.status == CompletionJob.RUNNING,
+            CompletionJob.started_at < _utcnow() - timedelta(seconds=lease_seconds)
+        )
+        requeued = self.db.execute(
+            update(CompletionJob)
+            .where(*stale, CompletionJob.attempts < max_attempts)
+            .values(status=CompletionJob.QUEUED, error="worker lease expired")
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        self.db.execute(
+            update(CompletionJob)
+            .where(*stale, CompletionJob.attempts >= max_attempts)
+            .values(status=CompletionJob.FAILED, error="worker lease expired", finished_at=_utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        return requeued
+    
+    def count_by_status(self) -> Dict[str, int]:
+        rows = (
+            self.db.query(CompletionJob.status, func.count(CompletionJob.id))
+            .group_by(CompletionJob.status)
+            .all()
+        )
+        return {status: count for status, count in rows}
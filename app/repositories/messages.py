@@ -1,7 +1,15 @@
 from sqlalchemy.orm import Session
+from sqlalchemy import or_, and_, insert, update, delete, case, func
+from datetime import datetime
 from app.entities.messages import Message
-from typing import List, Optional, Dict
+from app.entities.chats import Chat
+from app.entities.embeddings import MessageEmbedding
+from app.utils.conversation_cache import conversation_cache, CachedMessage
+from app.utils.pagination import CursorKey, keyset_condition
+from app.utils.metrics import instrument_repository
+from typing import List, Optional, Dict, Tuple
 
+@instrument_repository("messages")
 class MessageRepository:
     
     def __init__(self, db: Session):
@@ -9,43 +17,176 @@ class MessageRepository:
     
     def create_message(self, chat_id: int, sender: str, content: str) -> Message:
         """Crear un nuevo mensaje"""
+        self._increment_chat_counters(chat_id, 1)
         message = Message(chat_id=chat_id, sender=sender, content=content)
-        self.db.add(message)
-        self.db.commit()
-        self.db.refresh(message)
+        try:
+            self.db.add(message)
+            self.db.commit()
+            self.db.refresh(message)
+        except Exception:
+            # sin el mensaje tampoco quedan los contadores del chat
+            self.db.rollback()
+            raise
+        conversation_cache.append(chat_id, [CachedMessage.from_entity(message)])
         return message
     
-    def get_chat_context_for_llm(self, chat_id: int, limit: int = 20) -> List[Dict[str, str]]:
-        """Obtener el contexto del chat en formato para LLM"""
-        messages = (
-            self.db.query(Message)
-            .filter(Message.chat_id == chat_id)
-            .order_by(Message.created_at.asc())
+    def _increment_chat_counters(self, chat_id: int, count: int, usage: Optional[Dict] = None):
+        """
+        Actualizar message_count, last_message_at y el uso de tokens acumulado
+        del chat dentro de la transacción en curso. Va antes de los INSERT: si el
+        chat ya no existe (lo borró otro worker mientras la cache de conversaciones
+        lo daba por existente) se descarta la transacción con ValueError (404) en
+        lugar de fallar por la FK; además bloquea la fila del chat hasta el commit.
+        """
+        values = {"message_count": Chat.message_count + count, "last_message_at": func.now()}
+        values.update(self._usage_increments(usage))
+        result = self.db.execute(
+            update(Chat)
+            .where(Chat.id == chat_id)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            self.db.rollback()
+            conversation_cache.invalidate(chat_id)
+            raise ValueError("Chat not found")
+    
+    @staticmethod
+    def _usage_increments(usage: Optional[Dict], previous: Optional[Message] = None) -> Dict:
+        """Sumas a aplicar a los acumulados del chat (descontando el uso previo al regenerar)"""
+        if not usage:
+            return {}
+        increments = {}
+        totals = {"prompt_tokens": Chat.prompt_tokens_total, "completion_tokens": Chat.completion_tokens_total}
+        for column, total in totals.items():
+            delta = (usage.get(column) or 0) - (getattr(previous, column, None) or 0)
+            if delta:
+                increments[total.key] = total + delta
+        return increments
+    
+    def create_message_pair(
+        self,
+        chat_id: int,
+        user_content: str,
+        llm_content: str,
+        usage: Optional[Dict] = None
+    ) -> Tuple[Message, Message]:
+        """
+        Guardar el par user-llm en una sola transacción: un único INSERT de dos filas
+        que devuelve los ids y fechas generados por el servidor (RETURNING/OUTPUT),
+        más la actualización de los contadores del chat
+        
+        Args:
+            usage: Uso de la respuesta del LLM (prompt_tokens, completion_tokens,
+                model, latency_ms, finish_reason) que se guarda en el mensaje "llm"
+        """
+        values = {
+            "user": {"chat_id": chat_id, "sender": "user", "content": user_content},
+            "llm": {"chat_id": chat_id, "sender": "llm", "content": llm_content, **(usage or {})}
+        }
+        # el INSERT multi-VALUES necesita las mismas columnas en todas las filas
+        for column in (usage or {}):
+            values["user"].setdefault(column, None)
+        self._increment_chat_counters(chat_id, len(values), usage)
+        try:
+            # INSERT multi-VALUES: el orden de OUTPUT no está garantizado, se asocia por sender
+            rows = self.db.execute(
+                insert(Message)
+                .values(list(values.values()))
+                .returning(Message.id, Message.created_at, Message.sender)
+            ).all()
+            self.db.commit()
+        except Exception:
+            # sin el par tampoco quedan los contadores del chat (ni nada más de la transacción)
+            self.db.rollback()
+            raise
+        
+        # objetos desligados de la sesión: leerlos no dispara consultas tras el commit
+        created = {
+            row.sender: Message(id=row.id, created_at=row.created_at, **values[row.sender])
+            for row in rows
+        }
+        user_message, llm_message = created["user"], created["llm"]
+        conversation_cache.append(chat_id, [CachedMessage.from_entity(user_message), CachedMessage.from_entity(llm_message)])
+        return user_message, llm_message
+    
+    def get_recent_messages(
+        self,
+        chat_id: int,
+        limit: int,
+        before: Optional[CursorKey] = None
+    ) -> List[Message]:
+        """
+        Obtener los mensajes más recientes de un chat, del más nuevo al más antiguo.
+        
+        Args:
+            chat_id: ID del chat
+            limit: Número máximo de filas a leer
+            before: Cursor (created_at, id) exclusivo para seguir leyendo hacia atrás
+        """
+        query = self.db.query(Message).filter(Message.chat_id == chat_id)
+        
+        if before is not None:
+            query = query.filter(keyset_condition(Message.created_at, Message.id, before, newer=False))
+        
+        return (
+            query
+            .order_by(Message.created_at.desc(), Message.id.desc())
             .limit(limit)
             .all()
         )
-        
-        # Convertir a formato OpenAI compatible
-        context = []
-        for message in messages:
-            # Mapear 'user' y 'llm' a 'user' y 'assistant' respectivamente
-            role = "assistant" if message.sender == "llm" else "user"
-            context.append({
-                "role": role,
-                "content": message.content
-            })
-        
-        return context
     
     def get_all_messages_by_chat_id(self, chat_id: int) -> List[Message]:
         """Obtener todos los mensajes de un chat ordenados por fecha"""
         return (
             self.db.query(Message)
             .filter(Message.chat_id == chat_id)
-            .order_by(Message.created_at.asc())
+            .order_by(Message.created_at.asc(), Message.id.asc())
             .all()
         )
     
+    def get_messages_page(
+        self,
+        chat_id: int,
+        limit: int = 100,
+        cursor: Optional[CursorKey] = None,
+        direction: str = "prev"
+    ) -> Tuple[List[Message], bool]:
+        """
+        Obtener una página de mensajes de un chat en orden cronológico con
+        paginación keyset sobre (created_at, id).
+        
+        Args:
+            chat_id: ID del chat
+            limit: Número de mensajes por página
+            cursor: Clave (created_at, id) desde la que continuar (exclusiva);
+                sin cursor se devuelven los mensajes más recientes
+            direction: "prev" (mensajes más antiguos) o "next" (más nuevos)
+            
+        Returns:
+            (mensajes de la página, hay_más_en_esa_dirección)
+        """
+        query = self.db.query(Message).filter(Message.chat_id == chat_id)
+        
+        if cursor is not None:
+            query = query.filter(keyset_condition(Message.created_at, Message.id, cursor, newer=direction == "next"))
+        
+        if direction == "next":
+            query = query.order_by(Message.created_at.asc(), Message.id.asc())
+        else:
+            query = query.order_by(Message.created_at.desc(), Message.id.desc())
+        
+        messages = query.limit(limit + 1).all()
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+        if direction != "next":
+            messages.reverse()
+        return messages, has_more
+    
+    def count_messages(self, chat_id: int) -> int:
+        """Total de mensajes de un chat (contador denormalizado en chats)"""
+        return self.db.query(Chat.message_count).filter(Chat.id == chat_id).scalar() or 0
+    
     def get_last_two_messages(self, chat_id: int) -> tuple[Optional[Message], Optional[Message]]:
         """
         Obtener los dos últimos mensajes de un chat.
@@ -55,7 +196,7 @@ class MessageRepository:
         last_messages = (
             self.db.query(Message)
             .filter(Message.chat_id == chat_id)
-            .order_by(Message.created_at.desc())
+            .order_by(Message.created_at.desc(), Message.id.desc())
             .limit(2)
             .all()
         )
@@ -74,7 +215,7 @@ class MessageRepository:
             llm_message = (
                 self.db.query(Message)
                 .filter(Message.chat_id == chat_id, Message.sender == "llm")
-                .order_by(Message.created_at.desc())
+                .order_by(Message.created_at.desc(), Message.id.desc())
                 .first()
             )
             
@@ -85,9 +226,13 @@ class MessageRepository:
                     .filter(
                         Message.chat_id == chat_id,
                         Message.sender == "user",
-                        Message.created_at < llm_message.created_at
+                        # el par se inserta en un solo statement y puede compartir created_at
+                        or_(
+                            Message.created_at < llm_message.created_at,
+                            and_(Message.created_at == llm_message.created_at, Message.id < llm_message.id)
+                        )
                     )
-                    .order_by(Message.created_at.desc())
+                    .order_by(Message.created_at.desc(), Message.id.desc())
                     .first()
                 )
         
@@ -103,19 +248,65 @@ class MessageRepository:
         if not user_message or not llm_message:
             return None, None
         
-        # Actualizar mensaje del usuario si se proporciona nuevo contenido
+        return self.update_message_pair(user_message, llm_message, user_content, llm_content)
+    
+    def update_message_pair(
+        self,
+        user_message: Message,
+        llm_message: Message,
+        user_content: Optional[str] = None,
+        llm_content: Optional[str] = None,
+        usage: Optional[Dict] = None
+    ) -> tuple[Message, Message]:
+        """
+        Actualizar un par user-llm ya leído con un único UPDATE (CASE por id)
+        en una sola transacción, sin refresh posterior.
+        Si user_content es None, solo actualiza el mensaje del LLM.
+        Con usage se reemplaza el uso del mensaje del LLM y se ajustan los acumulados del chat.
+        """
+        contents = {}
         if user_content is not None:
-            user_message.content = user_content
-        
-        # Actualizar mensaje del LLM
+            contents[user_message.id] = user_content
         if llm_content is not None:
-            llm_message.content = llm_content
+            contents[llm_message.id] = llm_content
         
-        self.db.commit()
+        # desligar los objetos para que el commit no los expire (se devuelven ya actualizados)
+        for message in (user_message, llm_message):
+            if message in self.db:
+                self.db.expunge(message)
         
-        if user_content is not None:
-            self.db.refresh(user_message)
-        if llm_content is not None:
-            self.db.refresh(llm_message)
+        if contents:
+            messages_table = Message.__table__
+            values = {"content": case(contents, value=messages_table.c.id)}
+            if usage:
+                # el uso solo cambia en el mensaje del LLM
+                values.update({
+                    column: case({llm_message.id: value}, value=messages_table.c.id, else_=messages_table.c[column])
+                    for column, value in usage.items()
+                })
+            self.db.execute(
+                update(messages_table)
+                .where(messages_table.c.id.in_(list(contents)))
+                .values(**values)
+            )
+            increments = self._usage_increments(usage, previous=llm_message)
+            if increments:
+                self.db.execute(
+                    update(Chat)
+                    .where(Chat.id == llm_message.chat_id)
+                    .values(**increments)
+                    .execution_options(synchronize_session=False)
+                )
+            # el embedding del texto anterior ya no sirve (se recalcula en segundo plano)
+            self.db.execute(delete(MessageEmbedding).where(MessageEmbedding.message_id.in_(list(contents))))
+            self.db.commit()
         
-        return user_message, llm_message
\ No newline at end of file
+        for message in (user_message, llm_message):
+            if message.id in contents:
+                message.content = contents[message.id]
+                conversation_cache.update_content(message.chat_id, message.id, message.content)
+        if contents and usage:
+            for column, value in usage.items():
+                setattr(llm_message, column, value)
+        
+        return user_message, llm_message
@@ -0,0 +1,179 @@
+import time
+from sqlalchemy.orm import Session
+from sqlalchemy import Integer, and_, column, func, literal_column, null, or_, select, text
+from app.entities.chats import Chat
+from app.entities.messages import Message
+from app.entities.search import chats_fts, messages_fts
+from app.utils.metrics import instrument_repository
+from app.utils.pagination import InvalidCursorError, RankCursorKey
+from typing import Dict, List, Optional, Tuple
+
+# Marcas del resaltado en los fragmentos (el texto no se escapa: no es HTML seguro)
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_END = "</mark>"
+ELLIPSIS = "…"
+# tokens por fragmento de FTS5 (máximo 64)
+SNIPPET_TOKENS = 16
+
+# backend de búsqueda por URL de BD: (backend, vence). Con índice se detecta una vez por
+# proceso; "like" se vuelve a detectar pasado este tiempo, por si después se aplicó la
+# migración 0008 o se creó el índice Full-Text de SQL Server
+LIKE_BACKEND_TTL_SECONDS = 60
+_backends: Dict[str, Tuple[str, float]] = {}
+
+def fts5_query(terms: List[str]) -> str:
+    """Términos como frases de FTS5 (AND implícito); "term*" busca por prefijo"""
+    return " ".join(f'"{term[:-1]}"*' if term.endswith("*") else f'"{term}"' for term in terms)
+
+def fulltext_query(terms: List[str]) -> str:
+    """Condición de CONTAINSTABLE de SQL Server con todos los términos"""
+    return " AND ".join(f'"{term}"' for term in terms)
+
+@instrument_repository("search")
+class SearchRepository:
+    """
+    Búsqueda de texto completo con el índice de cada motor: FTS5 en SQLite
+    (bm25, fragmentos con snippet()) y CONTAINSTABLE en SQL Server. Sin índice
+    (SQL Server sin Full-Text o base sin la migración 0008) recurre a LIKE, sin
+    ranking y recorriendo la tabla.
+    
+    Los términos ya vienen normalizados por el servicio (palabras, "*" final = prefijo).
+    """
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def get_backend(self) -> str:
+        """"fts5", "fulltext" o "like" según el motor y los índices instalados"""
+        bind = self.db.get_bind()
+        url = str(bind.url)
+        cached = _backends.get(url)
+        if cached is not None and time.monotonic() < cached[1]:
+            return cached[0]
+        backend = self._detect_backend(bind.dialect.name)
+        expires = time.monotonic() + LIKE_BACKEND_TTL_SECONDS if backend == "like" else float("inf")
+        _backends[url] = (backend, expires)
+        return backend
+    
+    def _detect_backend(self, dialect: str) -> str:
+        if dialect == "sqlite":
+            found = self.db.execute(
+                text("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN ('messages_fts', 'chats_fts')")
+            ).scalar()
+            return "fts5" if found == 2 else "like"
+        if dialect == "mssql":
+            found = self.db.execute(
+                text("SELECT COUNT(*) FROM sys.fulltext_indexes WHERE object_id IN (OBJECT_ID('messages'), OBJECT_ID('chats'))")
+            ).scalar()
+            return "fulltext" if found == 2 else "like"
+        return "like"
+    
+    def search_messages(
+        self,
+        terms: List[str],
+        chat_id: Optional[int] = None,
+        after: Optional[RankCursorKey] = None,
+        limit: int = 20,
+        max_ranked: int = 0
+    ) -> Tuple[str, List[Dict]]:
+        """
+        Mensajes que contienen todos los términos, del más al menos relevante.
+        Devuelve el backend usado y filas con id, chat_id, chat_title, sender,
+        created_at, rank y snippet (FTS5) o text (el contenido, para resaltar aparte).
+        Con max_ranked solo se rankean esas coincidencias (ver _search).
+        """
+        columns = (
+            Message.id, Message.chat_id, Message.sender, Message.created_at,
+            Chat.title.label("chat_title")
+        )
+        scope = None
+        if chat_id is not None:
+            # los mensajes de un chat ocupan un tramo de ids: acota el recorrido del índice
+            scope = select(Message.id).where(Message.chat_id == chat_id).correlate(None)
+        return self._search(
+            Message, Message.content, messages_fts, columns, terms, after, limit, max_ranked,
+            joins=[(Chat, Chat.id == Message.chat_id)],
+            filters=[Message.chat_id == chat_id] if chat_id is not None else [],
+            scope=scope
+        )
+    
+    def search_chats(
+        self,
+        terms: List[str],
+        after: Optional[RankCursorKey] = None,
+        limit: int = 20,
+        max_ranked: int = 0
+    ) -> Tuple[str, List[Dict]]:
+        """Chats cuyo título contiene todos los términos, del más al menos relevante"""
+        columns = (Chat.id, Chat.title, Chat.created_at, Chat.message_count, Chat.last_message_at)
+        return self._search(Chat, Chat.title, chats_fts, columns, terms, after, limit, max_ranked)
+    
+    def _search(self, model, text_column, fts, columns, terms, after, limit, max_ranked, joins=(), filters=(), scope=None):
+        """
+        Consulta común a mensajes y chats. max_ranked acota el ranking: bm25 se
+        calcula para cada coincidencia, así que en SQLite solo se rankean las
+        max_ranked más recientes (rango de rowid, sin recorrer el resto del índice)
+        y en SQL Server CONTAINSTABLE devuelve solo las max_ranked más relevantes.
+        """
+        backend = self.get_backend()
+        if after is not None:
+            cursor_backend, after_rank, after_id = after
+            if cursor_backend != backend:
+                # el backend cambió entre páginas (p. ej. se aplicó la migración 0008): los
+                # rank no son comparables y la página siguiente saldría vacía sin error
+                raise InvalidCursorError("Cursor from a different search backend, start the search again")
+        if backend == "fts5":
+            # rank = bm25: negativo, menor es más relevante
+            match = literal_column(fts.name).op("MATCH")(fts5_query(terms))
+            rank = fts.c.rank
+            snippet = func.snippet(literal_column(fts.name), 0, HIGHLIGHT_START, HIGHLIGHT_END, ELLIPSIS, SNIPPET_TOKENS)
+            query = (
+                select(*columns, snippet.label("snippet"), rank.label("rank"))
+                .select_from(fts)
+                .join(model, model.id == fts.c.rowid)
+                .where(match)
+            )
+            if scope is not None:
+                ids = scope.subquery()
+                query = query.where(fts.c.rowid.between(
+                    select(func.min(ids.c.id)).scalar_subquery(),
+                    select(func.max(ids.c.id)).scalar_subquery()
+                ))
+            elif max_ranked:
+                newest = select(fts.c.rowid).where(match).order_by(fts.c.rowid.desc()).limit(max_ranked).correlate(None).subquery()
+                query = query.where(fts.c.rowid >= select(func.min(newest.c.rowid)).scalar_subquery())
+            order = (rank, model.id)
+            if after is not None:
+                query = query.where(or_(rank > after_rank, and_(rank == after_rank, model.id > after_id)))
+        elif backend == "fulltext":
+            # RANK de CONTAINSTABLE: 0-1000, mayor es más relevante
+            arguments = [literal_column(model.__tablename__), literal_column(text_column.key), fulltext_query(terms)]
+            if max_ranked and scope is None:
+                arguments.append(max_ranked)  # top_n_by_rank
+            matches = func.CONTAINSTABLE(*arguments).table_valued(column("KEY", Integer), column("RANK", Integer)).alias("ft")
+            rank = matches.c.RANK
+            query = (
+                select(*columns, text_column.label("text"), rank.label("rank"))
+                .select_from(matches)
+                .join(model, model.id == matches.c.KEY)
+            )
+            order = (rank.desc(), model.id)
+            if after is not None:
+                query = query.where(or_(rank < after_rank, and_(rank == after_rank, model.id > after_id)))
+        else:
+            # sin índice: los más nuevos primero
+            query = (
+                select(*columns, text_column.label("text"), null().label("rank"))
+                .select_from(model)
+                .where(*(text_column.contains(term.rstrip("*"), autoescape=True) for term in terms))
+            )
+            order = (model.id.desc(),)
+            if after is not None:
+                query = query.where(model.id < after_id)
+    
+        for target, onclause in joins:
+            query = query.join(target, onclause)
+        if filters:
+            query = query.where(*filters)
+        rows = self.db.execute(query.order_by(*order).limit(limit)).mappings().all()
+        return backend, [dict(row) for row in rows]
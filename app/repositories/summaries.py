@@ -0,0 +1,111 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, update
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timezone
+from app.entities.chats import Chat
+from app.entities.messages import Message
+from app.entities.summaries import ChatSummary
+from app.utils.metrics import instrument_repository
+from app.utils.pagination import CursorKey, keyset_condition
+from typing import Dict, List, Optional
+
+@instrument_repository("summaries")
+class SummaryRepository:
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_active_summary(self, chat_id: int, before: Optional[CursorKey] = None) -> Optional[ChatSummary]:
+        """
+        Versión vigente (la más nueva sin invalidar) del resumen de un chat.
+        Con before solo cuentan las versiones que terminan antes de ese cursor
+        (regenerar un par usa el contexto anterior a ese par).
+        """
+        query = self.db.query(ChatSummary).filter(
+            ChatSummary.chat_id == chat_id,
+            ChatSummary.invalidated_at.is_(None)
+        )
+        if before is not None:
+            query = query.filter(
+                keyset_condition(ChatSummary.through_created_at, ChatSummary.through_message_id, before, newer=False)
+            )
+        return query.order_by(ChatSummary.version.desc()).first()
+
+    def list_summaries(self, chat_id: int) -> List[ChatSummary]:
+        """Todas las versiones de un chat, de la más nueva a la más antigua"""
+        return (
+            self.db.query(ChatSummary)
+            .filter(ChatSummary.chat_id == chat_id)
+            .order_by(ChatSummary.version.desc())
+            .all()
+        )
+
+    def count_messages(self, chat_id: int) -> Optional[int]:
+        """Mensajes del chat según el contador denormalizado (None si el chat no existe)"""
+        return self.db.query(Chat.message_count).filter(Chat.id == chat_id).scalar()
+
+    def get_messages_after(self, chat_id: int, after: Optional[CursorKey], limit: int) -> List[Message]:
+        """Mensajes posteriores al cursor (los aún no resumidos), del más antiguo al más nuevo"""
+        query = self.db.query(Message).filter(Message.chat_id == chat_id)
+        if after is not None:
+            query = query.filter(keyset_condition(Message.created_at, Message.id, after, newer=True))
+        return (
+            query
+            .order_by(Message.created_at.asc(), Message.id.asc())
+            .limit(limit)
+            .all()
+        )
+
+    def create_summary(
+        self,
+        chat_id: int,
+        content: str,
+        through_message: Message,
+        message_count: int,
+        usage: Optional[Dict] = None
+    ) -> Optional[ChatSummary]:
+        """
+        Guardar una versión nueva. Si otro proceso guardó la misma versión a la
+        vez, el índice único la rechaza y se devuelve None.
+        """
+        latest = (
+            self.db.query(func.max(ChatSummary.version))
+            .filter(ChatSummary.chat_id == chat_id)
+            .scalar()
+        )
+        usage = usage or {}
+        summary = ChatSummary(
+            chat_id=chat_id,
+            version=(latest or 0) + 1,
+            content=content,
+            through_message_id=through_message.id,
+            through_created_at=through_message.created_at,
+            message_count=message_count,
+            prompt_tokens=usage.get("prompt_tokens"),
+            completion_tokens=usage.get("completion_tokens"),
+            model=usage.get("model")
+        )
+        self.db.add(summary)
+        try:
+            self.db.commit()
+        except IntegrityError:
+            self.db.rollback()
+            return None
+        self.db.refresh(summary)
+        return summary
+
+    def invalidate_from(self, chat_id: int, key: CursorKey) -> int:
+        """Invalidar las versiones que cubren el mensaje del cursor (created_at, id) o alguno posterior"""
+        result = self.db.execute(
+            update(ChatSummary)
+            .where(
+                ChatSummary.chat_id == chat_id,
+                ChatSummary.invalidated_at.is_(None),
+                # hasta el cursor o después = no anterior al cursor
+                ~keyset_condition(ChatSummary.through_created_at, ChatSummary.through_message_id, key, newer=False)
+            )
+            .values(invalidated_at=datetime.now(timezone.utc))
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        return result.rowcount
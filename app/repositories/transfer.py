@@ -0,0 +1,84 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import Result, bindparam, case, insert, select, update
+from app.entities.chats import Chat
+from app.entities.messages import Message
+from app.utils.metrics import instrument_repository
+from typing import Dict, List, Optional
+
+# Columnas que viajan en la exportación (los ids de los mensajes se regeneran al importar)
+CHAT_COLUMNS = ("id", "title", "created_at")
+MESSAGE_COLUMNS = (
+    "chat_id", "sender", "content", "created_at",
+    "prompt_tokens", "completion_tokens", "model", "latency_ms", "finish_reason"
+)
+
+@instrument_repository("transfer")
+class TransferRepository:
+    """
+    Lectura en streaming y escritura masiva para exportar/importar chats. Usa Core
+    (filas y diccionarios) en lugar de entidades ORM para no crear un objeto por mensaje.
+    """
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def stream_chats(self, chat_ids: Optional[List[int]] = None, yield_per: int = 1000) -> Result:
+        """Chats ordenados por id; el resultado se consume por lotes de yield_per filas"""
+        chats = Chat.__table__
+        query = select(*(chats.c[name] for name in CHAT_COLUMNS)).order_by(chats.c.id)
+        if chat_ids:
+            query = query.where(chats.c.id.in_(chat_ids))
+        return self.db.execute(query.execution_options(yield_per=yield_per))
+    
+    def stream_messages(self, chat_ids: Optional[List[int]] = None, yield_per: int = 1000) -> Result:
+        """Mensajes ordenados por (chat_id, created_at, id): recorre el índice compuesto sin ordenar"""
+        messages = Message.__table__
+        query = (
+            select(*(messages.c[name] for name in MESSAGE_COLUMNS))
+            .order_by(messages.c.chat_id, messages.c.created_at, messages.c.id)
+        )
+        if chat_ids:
+            query = query.where(messages.c.chat_id.in_(chat_ids))
+        return self.db.execute(query.execution_options(yield_per=yield_per))
+    
+    def insert_chats(self, rows: List[Dict]) -> List[int]:
+        """Insertar un lote de chats (un executemany) y devolver sus ids nuevos en el mismo orden"""
+        chats = Chat.__table__
+        result = self.db.execute(
+            insert(chats).returning(chats.c.id, sort_by_parameter_order=True),
+            rows
+        )
+        return [row.id for row in result]
+    
+    def insert_messages(self, rows: List[Dict]):
+        """Insertar un lote de mensajes con un executemany"""
+        self.db.execute(insert(Message.__table__), rows)
+    
+    def add_chat_counters(self, rows: List[Dict]):
+        """
+        Sumar a los contadores denormalizados de cada chat los mensajes de un lote.
+        Cada fila trae chat_id, messages, last_message_at, prompt_tokens y completion_tokens.
+        """
+        chats = Chat.__table__
+        last_message_at = bindparam("last_message_at")
+        self.db.execute(
+            update(chats)
+            .where(chats.c.id == bindparam("chat_id"))
+            .values(
+                message_count=chats.c.message_count + bindparam("messages"),
+                last_message_at=case(
+                    (chats.c.last_message_at.is_(None), last_message_at),
+                    (chats.c.last_message_at < last_message_at, last_message_at),
+                    else_=chats.c.last_message_at
+                ),
+                prompt_tokens_total=chats.c.prompt_tokens_total + bindparam("prompt_tokens"),
+                completion_tokens_total=chats.c.completion_tokens_total + bindparam("completion_tokens")
+            ),
+            rows
+        )
+    
+    def commit(self):
+        self.db.commit()
+    
+    def rollback(self):
+        self.db.rollback()
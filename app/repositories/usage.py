@@ -0,0 +1,154 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import Date, cast, func
+from datetime import datetime
+from app.entities.chats import Chat
+from app.entities.messages import Message
+from app.utils.metrics import instrument_repository
+from typing import List, Optional, Dict
+
+@instrument_repository("usage")
+class UsageRepository:
+    """Consultas agregadas sobre el uso de tokens guardado en los mensajes del LLM"""
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def _responses(self, *columns, since: datetime, until: Optional[datetime] = None):
+        """Respuestas del LLM con uso conocido dentro de la ventana [since, until)"""
+        query = (
+            self.db.query(*columns)
+            .filter(Message.sender == "llm", Message.prompt_tokens.isnot(None), Message.created_at >= since)
+        )
+        if until is not None:
+            query = query.filter(Message.created_at < until)
+        return query
+    
+    def _day(self):
+        # SQLite guarda las fechas como texto: CAST AS DATE no sirve, date() sí
+        if self.db.get_bind().dialect.name == "sqlite":
+            return func.date(Message.created_at)
+        return cast(Message.created_at, Date)
+    
+    def get_totals(self, since: datetime, until: Optional[datetime] = None) -> Dict:
+        """Totales de la ventana: respuestas, tokens y latencia"""
+        row = self._responses(
+            func.count(Message.id).label("responses"),
+            func.coalesce(func.sum(Message.prompt_tokens), 0).label("prompt_tokens"),
+            func.coalesce(func.sum(Message.completion_tokens), 0).label("completion_tokens"),
+            func.max(Message.prompt_tokens).label("max_prompt_tokens"),
+            func.avg(Message.latency_ms).label("avg_latency_ms"),
+            func.max(Message.latency_ms).label("max_latency_ms"),
+            since=since,
+            until=until
+        ).one()
+        return dict(row._mapping)
+    
+    def get_usage_by_model(self, since: datetime, until: Optional[datetime] = None) -> List[Dict]:
+        """Uso agrupado por modelo"""
+        rows = (
+            self._responses(
+                Message.model,
+                func.count(Message.id).label("responses"),
+                func.sum(Message.prompt_tokens).label("prompt_tokens"),
+                func.sum(Message.completion_tokens).label("completion_tokens"),
+                func.avg(Message.latency_ms).label("avg_latency_ms"),
+                since=since,
+                until=until
+            )
+            .group_by(Message.model)
+            .order_by(func.sum(Message.prompt_tokens).desc())
+            .all()
+        )
+        return [dict(row._mapping) for row in rows]
+    
+    def get_usage_by_day(self, since: datetime, until: Optional[datetime] = None) -> List[Dict]:
+        """Uso por día (UTC en SQLite, hora del servidor en SQL Server)"""
+        day = self._day()
+        rows = (
+            self._responses(
+                day.label("day"),
+                func.count(Message.id).label("responses"),
+                func.sum(Message.prompt_tokens).label("prompt_tokens"),
+                func.sum(Message.completion_tokens).label("completion_tokens"),
+                since=since,
+                until=until
+            )
+            .group_by(day)
+            .order_by(day)
+            .all()
+        )
+        return [{**row._mapping, "day": str(row.day)} for row in rows]
+    
+    def get_finish_reasons(self, since: datetime, until: Optional[datetime] = None) -> Dict[str, int]:
+        """Respuestas por finish_reason ("length" = cortadas por max_tokens o por la ventana del modelo)"""
+        rows = (
+            self._responses(Message.finish_reason, func.count(Message.id), since=since, until=until)
+            .group_by(Message.finish_reason)
+            .all()
+        )
+        return {reason or "unknown": count for reason, count in rows}
+    
+    def get_largest_prompts(self, since: datetime, until: Optional[datetime] = None, limit: int = 10) -> List[Dict]:
+        """Respuestas con más prompt_tokens (sin el contenido de los mensajes)"""
+        rows = (
+            self._responses(
+                Message.id.label("message_id"),
+                Message.chat_id,
+                Message.created_at,
+                Message.prompt_tokens,
+                Message.completion_tokens,
+                Message.latency_ms,
+                Message.finish_reason,
+                since=since,
+                until=until
+            )
+            .order_by(Message.prompt_tokens.desc())
+            .limit(limit)
+            .all()
+        )
+        return [dict(row._mapping) for row in rows]
+    
+    def get_top_chats(self, limit: int = 10) -> List[Dict]:
+        """Chats con más tokens acumulados (contadores denormalizados en chats)"""
+        total = Chat.prompt_tokens_total + Chat.completion_tokens_total
+        rows = (
+            self.db.query(
+                Chat.id.label("chat_id"),
+                Chat.title,
+                Chat.message_count,
+                Chat.prompt_tokens_total,
+                Chat.completion_tokens_total
+            )
+            .filter(total > 0)
+            .order_by(total.desc())
+            .limit(limit)
+            .all()
+        )
+        return [dict(row._mapping) for row in rows]
+    
+    def get_chat_usage(self, chat_id: int) -> Optional[Dict]:
+        """Acumulados de un chat y estadísticas de sus respuestas"""
+        chat = (
+            self.db.query(Chat.id, Chat.message_count, Chat.prompt_tokens_total, Chat.completion_tokens_total)
+            .filter(Chat.id == chat_id)
+            .first()
+        )
+        if chat is None:
+            return None
+        stats = (
+            self.db.query(
+                func.count(Message.id).label("responses"),
+                func.max(Message.prompt_tokens).label("max_prompt_tokens"),
+                func.avg(Message.latency_ms).label("avg_latency_ms")
+            )
+            # usa el índice (chat_id, created_at, id)
+            .filter(Message.chat_id == chat_id, Message.sender == "llm", Message.prompt_tokens.isnot(None))
+            .one()
+        )
+        return {
+            "chat_id": chat.id,
+            "message_count": chat.message_count,
+            "prompt_tokens_total": chat.prompt_tokens_total,
+            "completion_tokens_total": chat.completion_tokens_total,
+            **stats._mapping
+        }
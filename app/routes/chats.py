@@ -3,7 +3,7 @@ from sqlalchemy.orm import Session
 from app.controllers.chats import ChatController
 from app.dtos.chats.chat_request import ChatCreateRequest, ChatUpdateRequest
 from app.conf.db import get_db
-from typing import Dict
+from typing import Dict, Optional, Literal
 
 router = APIRouter(prefix="/api/v1/chats", tags=["chats"])
 
@@ -13,9 +13,15 @@ def create_chat(request: ChatCreateRequest, db: Session = Depends(get_db)) -> Di
     return ChatController.create_chat(request, db)
 
 @router.get("/list")
-def get_all_chats(page: int = Query(1, ge=1), db: Session = Depends(get_db)) -> Dict:
-    """Obtener todos los chats con paginación"""
-    return ChatController.get_all_chats(page, db)
+def get_all_chats(
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en pagination.next_cursor/prev_cursor"),
+    direction: Literal["next", "prev"] = Query("next"),
+    limit: int = Query(16, ge=1, le=100),
+    include_total: bool = Query(False, description="Incluir el total de chats (conteo cacheado)"),
+    db: Session = Depends(get_db)
+) -> Dict:
+    """Obtener los chats (más recientes primero) con paginación por cursor"""
+    return ChatController.get_all_chats(cursor, direction, limit, include_total, db)
 
 @router.get("/get/{chat_id}")
 def get_chat_by_id(chat_id: int, db: Session = Depends(get_db)) -> Dict:
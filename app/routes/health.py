@@ -0,0 +1,15 @@
+from fastapi import APIRouter
+from app.controllers.health import HealthController
+from typing import Dict
+
+router = APIRouter(tags=["health"])
+
+@router.get("/healthz")
+def healthz() -> Dict:
+    """Liveness: el proceso está vivo"""
+    return HealthController.liveness()
+
+@router.get("/readyz")
+async def readyz() -> Dict:
+    """Readiness: BD accesible y esquema migrado (503 si no)"""
+    return await HealthController.readiness()
@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from app.controllers.jobs import JobController
+from app.dtos.messenger.completion_request import CompletionRequest
+from app.conf.db import get_db
+from typing import Dict
+
+router = APIRouter(prefix="/api/v1/jobs", tags=["jobs"])
+
+@router.post("/completion/{chat_id}", status_code=202)
+async def submit_completion_job(chat_id: int, request: CompletionRequest, db: Session = Depends(get_db)) -> Dict:
+    """Encolar una completion; la respuesta se consulta en /result/{job_id}"""
+    return await JobController.submit_completion(chat_id, request, db)
+
+@router.get("/stats")
+async def get_job_stats(db: Session = Depends(get_db)) -> Dict:
+    """Jobs por estado y workers de este proceso"""
+    return await JobController.get_stats(db)
+
+@router.get("/get/{job_id}")
+async def get_job(job_id: int, db: Session = Depends(get_db)) -> Dict:
+    """Estado de un job (queued, running, succeeded, failed, cancelled)"""
+    return await JobController.get_job(job_id, db)
+
+@router.get("/result/{job_id}")
+async def get_job_result(job_id: int, db: Session = Depends(get_db)) -> Dict:
+    """Respuesta del LLM de un job terminado"""
+    return await JobController.get_result(job_id, db)
+
+@router.post("/cancel/{job_id}")
+async def cancel_job(job_id: int, db: Session = Depends(get_db)) -> Dict:
+    """Cancelar un job en cola o en curso"""
+    return await JobController.cancel_job(job_id, db)
@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, Body
+from fastapi import APIRouter, Depends, Body, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from app.controllers.messenger import MessengerController
 from app.dtos.messenger.completion_request import CompletionRequest
 from app.conf.db import get_db
-from typing import Dict, Optional
+from typing import Dict, Optional, Literal
 
 router = APIRouter(prefix="/api/v1/messenger", tags=["messenger"])
 
@@ -16,13 +17,31 @@ async def process_completion(
     """Enviar mensaje del usuario al LLM y obtener respuesta"""
     return await MessengerController.process_completion(chat_id, request, db)
 
+@router.post("/completion/{chat_id}/stream")
+async def stream_completion(
+    chat_id: int, 
+    request: CompletionRequest, 
+    db: Session = Depends(get_db)
+) -> StreamingResponse:
+    """Enviar mensaje del usuario al LLM y recibir la respuesta en streaming (SSE)"""
+    return await MessengerController.stream_completion(chat_id, request, db)
+
 @router.get("/registers/{chat_id}")
-def get_chat_registers(
+async def get_chat_registers(
     chat_id: int, 
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en pagination.next_cursor/prev_cursor"),
+    direction: Literal["next", "prev"] = Query("prev", description="prev: mensajes anteriores, next: posteriores"),
+    limit: int = Query(100, ge=1, le=500),
+    include_total: bool = Query(False, description="Incluir el total de mensajes (conteo cacheado)"),
     db: Session = Depends(get_db)
 ) -> Dict:
-    """Obtener todos los mensajes de un chat"""
-    return MessengerController.get_chat_registers(chat_id, db)
+    """Obtener los mensajes de un chat en orden cronológico, paginados por cursor (por defecto los más recientes)"""
+    return await MessengerController.get_chat_registers(chat_id, cursor, direction, limit, include_total, db)
+
+@router.get("/summaries/{chat_id}")
+async def get_chat_summaries(chat_id: int, db: Session = Depends(get_db)) -> Dict:
+    """Versiones del resumen de los mensajes antiguos del chat (CONTEXT_SUMMARY_ENABLED)"""
+    return await MessengerController.get_chat_summaries(chat_id, db)
 
 @router.put("/update/{chat_id}")
 async def update_completion(
@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from app.controllers.search import SearchController
+from app.conf.db import get_db
+from typing import Dict, Optional
+
+router = APIRouter(prefix="/api/v1/search", tags=["search"])
+
+@router.get("/messages")
+async def search_messages(
+    q: str = Query(..., min_length=1, max_length=200, description="Palabras a buscar (todas); palabra* busca por prefijo"),
+    chat_id: Optional[int] = Query(None, description="Buscar solo en este chat"),
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en pagination.next_cursor"),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+) -> Dict:
+    """Buscar mensajes por contenido, del más al menos relevante, con fragmentos resaltados"""
+    return await SearchController.search_messages(q, chat_id, cursor, limit, db)
+
+@router.get("/chats")
+async def search_chats(
+    q: str = Query(..., min_length=1, max_length=200, description="Palabras a buscar (todas); palabra* busca por prefijo"),
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en pagination.next_cursor"),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+) -> Dict:
+    """Buscar chats por título, del más al menos relevante"""
+    return await SearchController.search_chats(q, cursor, limit, db)
@@ -0,0 +1,45 @@
+from fastapi import APIRouter
+from app.controllers.system import SystemController
+from typing import Dict
+
+router = APIRouter(prefix="/api/v1/system", tags=["system"])
+
+@router.get("/provider/pool")
+def get_provider_pool_stats() -> Dict:
+    """Obtener las estadísticas del pool de conexiones con LM Studio"""
+    return SystemController.get_provider_pool_stats()
+
+@router.get("/provider/backends")
+def get_provider_backends() -> Dict:
+    """Obtener el estado de las instancias de LM Studio"""
+    return SystemController.get_provider_backends()
+
+@router.get("/provider/breakers")
+def get_provider_resilience_stats() -> Dict:
+    """Obtener el estado de los circuit breakers, reintentos y hedging"""
+    return SystemController.get_provider_resilience_stats()
+
+@router.get("/provider/admission")
+def get_provider_admission_stats() -> Dict:
+    """Obtener las métricas de la cola de admisión hacia LM Studio"""
+    return SystemController.get_provider_admission_stats()
+
+@router.get("/db/pool")
+def get_db_pool_stats() -> Dict:
+    """Obtener el estado del pool de conexiones a la BD"""
+    return SystemController.get_db_pool_stats()
+
+@router.get("/cache/conversations")
+def get_conversation_cache_stats() -> Dict:
+    """Obtener las métricas de la cache de conversaciones"""
+    return SystemController.get_conversation_cache_stats()
+
+@router.get("/cache/responses")
+def get_response_cache_stats() -> Dict:
+    """Obtener las métricas de la cache de respuestas del LLM"""
+    return SystemController.get_response_cache_stats()
+
+@router.delete("/cache/responses")
+def clear_response_cache() -> Dict:
+    """Vaciar la cache de respuestas del LLM"""
+    return SystemController.clear_response_cache()
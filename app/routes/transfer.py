@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from app.controllers.transfer import TransferController
+from app.conf.db import get_db
+from typing import Dict, List, Optional
+
+router = APIRouter(prefix="/api/v1/transfer", tags=["transfer"])
+
+@router.get("/export")
+async def export_chats(
+    chat_id: Optional[List[int]] = Query(None, description="Exportar solo estos chats (repetible); por defecto todos"),
+    gzip: bool = Query(False, description="Comprimir la salida con gzip"),
+    db: Session = Depends(get_db)
+) -> StreamingResponse:
+    """Exportar chats y mensajes como NDJSON en streaming (cabecera, chats y después mensajes)"""
+    return await TransferController.export_chats(chat_id, gzip, db)
+
+@router.post("/import")
+async def import_chats(
+    request: Request,
+    batch_size: int = Query(1000, ge=1, le=10000, description="Registros por transacción"),
+    db: Session = Depends(get_db)
+) -> Dict:
+    """Importar un NDJSON de /export (cuerpo crudo, gzip detectado automáticamente); los chats reciben ids nuevos"""
+    return await TransferController.import_chats(request, batch_size, db)
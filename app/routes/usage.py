@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from datetime import datetime
+from app.controllers.usage import UsageController
+from app.conf.db import get_db
+from typing import Dict, Optional
+
+router = APIRouter(prefix="/api/v1/usage", tags=["usage"])
+
+@router.get("/summary")
+async def get_usage_summary(
+    since: Optional[datetime] = Query(None, description="Inicio de la ventana (por defecto hace 7 días)"),
+    until: Optional[datetime] = Query(None, description="Fin de la ventana (exclusivo)"),
+    top: int = Query(10, ge=1, le=100, description="Tamaño de los rankings de prompts y chats"),
+    db: Session = Depends(get_db)
+) -> Dict:
+    """Resumen del uso de tokens: totales, por modelo y por día, finish_reason y rankings"""
+    return await UsageController.get_summary(since, until, top, db)
+
+@router.get("/chats/{chat_id}")
+async def get_chat_usage(chat_id: int, db: Session = Depends(get_db)) -> Dict:
+    """Uso de tokens acumulado de un chat"""
+    return await UsageController.get_chat_usage(chat_id, db)
@@ -3,6 +3,7 @@ from app.repositories.chats import ChatRepository
 from app.dtos.chats.chat_request import ChatCreateRequest, ChatUpdateRequest
 from app.dtos.chats.chat_response import ChatResponse, ChatListResponse
 from app.utils.response_mapper import PaginationMeta
+from app.utils.pagination import decode_cursor, page_cursors
 from typing import List, Optional, Tuple
 
 class ChatService:
@@ -33,19 +34,29 @@ class ChatService:
         """Eliminar un chat"""
         return self.chat_repository.delete_chat(chat_id)
     
-    def get_all_chats_paginated(self, page: int = 1, items_per_page: int = 16) -> Tuple[List[ChatListResponse], PaginationMeta]:
-        """Obtener todos los chats con paginación"""
-        chats_data, total_items = self.chat_repository.get_all_chats_paginated(page, items_per_page)
+    def get_all_chats_paginated(
+        self,
+        cursor: Optional[str] = None,
+        direction: str = "next",
+        items_per_page: int = 16,
+        include_total: bool = False
+    ) -> Tuple[List[ChatListResponse], PaginationMeta]:
+        """Obtener los chats con paginación por cursor (keyset sobre created_at, id)"""
+        key = decode_cursor(cursor) if cursor else None
+        chats_data, has_more = self.chat_repository.get_chats_page(items_per_page, key, direction)
         
         chats = [
             ChatListResponse(
                 id=chat.id,
                 title=chat.title,
                 created_at=chat.created_at,
-                message_count=chat.message_count
+                message_count=chat.message_count,
+                last_message_at=chat.last_message_at
             )
             for chat in chats_data
         ]
         
-        pagination = PaginationMeta(page, total_items, items_per_page)
-        return chats, pagination
\ No newline at end of file
+        next_cursor, prev_cursor = page_cursors(chats_data, has_more, cursor, direction)
+        total_items = self.chat_repository.count_chats() if include_total else None
+        pagination = PaginationMeta.from_cursors(items_per_page, next_cursor, prev_cursor, total_items)
+        return chats, pagination
@@ -0,0 +1,194 @@
+from datetime import datetime
+from typing import List, Dict, Optional, Tuple, Iterator
+from app.conf.settings import Settings, get_settings
+from app.repositories.embeddings import EmbeddingRepository
+from app.repositories.messages import MessageRepository
+from app.repositories.summaries import SummaryRepository
+from app.utils.tokens import estimate_tokens, estimate_message_tokens, token_calibration, MESSAGE_OVERHEAD_TOKENS
+from app.utils.conversation_cache import conversation_cache, CachedMessage
+
+# Encabezado del resumen de los mensajes antiguos dentro del contexto
+SUMMARY_HEADER = "Resumen de la conversación anterior:\n"
+# Encabezado de los mensajes anteriores recuperados por similitud
+RECALL_HEADER = "Mensajes anteriores relacionados con la pregunta:\n"
+
+class ContextBuilder:
+    """
+    Construye el contexto para el LLM con una ventana deslizante limitada por tokens:
+    toma los turnos más recientes que caben en el presupuesto, manteniendo siempre
+    el mensaje del sistema y el mensaje nuevo del usuario.
+    
+    Los mensajes se leen primero de la cache de conversaciones y solo se va a la
+    BD (por lotes, con consulta descendente) si la cache no alcanza.
+    
+    Con CONTEXT_SUMMARY_ENABLED, si el chat tiene un resumen vigente la ventana se
+    detiene en el último mensaje resumido y el resumen va al inicio del contexto.
+    
+    Con CONTEXT_RETRIEVAL_ENABLED y el embedding del mensaje nuevo, los mensajes
+    anteriores más parecidos (hasta CONTEXT_RETRIEVAL_MAX_TOKENS) van después del
+    resumen; los que terminan dentro de la ventana no se repiten y devuelven su costo.
+    """
+
+    def __init__(
+        self,
+        message_repository: MessageRepository,
+        max_tokens: Optional[int] = None,
+        response_reserve_tokens: Optional[int] = None,
+        max_messages: Optional[int] = None,
+        fetch_batch_size: Optional[int] = None,
+        summary_repository: Optional[SummaryRepository] = None,
+        embedding_repository: Optional[EmbeddingRepository] = None,
+        retriever=None,
+        settings: Optional[Settings] = None
+    ):
+        settings = settings or get_settings()
+        self.message_repository = message_repository
+        self.max_tokens = max_tokens or settings.context_max_tokens
+        self.response_reserve_tokens = (
+            response_reserve_tokens if response_reserve_tokens is not None
+            else settings.context_response_reserve_tokens
+        )
+        self.max_messages = max_messages or settings.context_max_messages
+        self.fetch_batch_size = fetch_batch_size or settings.context_fetch_batch_size
+        self.calibrate = settings.context_token_calibration
+        self.summary_repository = summary_repository if settings.context_summary_enabled else None
+        self.embedding_repository = embedding_repository
+        self.retriever = retriever if settings.context_retrieval_enabled else None
+        self.recall_max_tokens = settings.context_retrieval_max_tokens
+
+    def build(
+        self,
+        chat_id: int,
+        user_content: str,
+        system_message: Optional[str] = None,
+        before: Optional[Tuple[datetime, int]] = None,
+        query_vector=None
+    ) -> List[Dict[str, str]]:
+        """
+        Construir el contexto en formato OpenAI (sin el mensaje del sistema, que
+        agrega el proveedor) terminando con el mensaje nuevo del usuario.
+
+        Args:
+            chat_id: ID del chat
+            user_content: Mensaje nuevo del usuario (siempre se incluye)
+            system_message: Mensaje del sistema, solo para descontarlo del presupuesto
+            before: Cursor (created_at, id) para ignorar los mensajes desde ese punto
+            query_vector: Embedding de user_content para recuperar mensajes anteriores
+        """
+        user_turn = {"role": "user", "content": user_content}
+        budget = self.max_tokens - self.response_reserve_tokens
+        if self.calibrate:
+            # tokens reales ≈ estimados × ratio: el presupuesto se expresa en tokens estimados
+            budget = int(budget / token_calibration.ratio)
+        budget -= estimate_message_tokens(user_turn)
+        if system_message:
+            budget -= estimate_tokens(system_message) + MESSAGE_OVERHEAD_TOKENS
+
+        summary_turn, boundary = None, None
+        summary = self.summary_repository.get_active_summary(chat_id, before) if self.summary_repository else None
+        if summary is not None:
+            summary_turn = {"role": "system", "content": SUMMARY_HEADER + summary.content}
+            budget -= estimate_message_tokens(summary_turn)
+            boundary = (summary.through_created_at, summary.through_message_id)
+
+        recalled, recall_overhead = {}, 0
+        if self.retriever is not None and query_vector is not None:
+            recalled = self._recall(chat_id, query_vector, before, min(budget, self.recall_max_tokens))
+            if recalled:
+                recall_overhead = estimate_tokens(RECALL_HEADER) + MESSAGE_OVERHEAD_TOKENS
+                budget -= recall_overhead + sum(cost for _, _, cost in recalled.values())
+
+        history = []
+        rows = self._iter_history(chat_id, before)
+        try:
+            for row in rows:
+                if len(history) >= self.max_messages:
+                    break
+                if boundary is not None and (row.created_at, row.id) <= boundary:
+                    # lo anterior ya está en el resumen
+                    break
+                turn = {
+                    # Mapear 'user' y 'llm' a 'user' y 'assistant' respectivamente
+                    "role": "assistant" if row.sender == "llm" else "user",
+                    "content": row.content
+                }
+                cost = estimate_message_tokens(turn)
+                # un mensaje recuperado que entra en la ventana no se repite: devuelve su costo
+                refund = recalled[row.id][2] if row.id in recalled else 0
+                if cost > budget + refund:
+                    # la ventana debe ser contigua: se corta en el primer turno que no cabe
+                    break
+                if refund:
+                    del recalled[row.id]
+                    budget += refund + (recall_overhead if not recalled else 0)
+                budget -= cost
+                history.append(turn)
+        finally:
+            rows.close()
+
+        history.reverse()
+        if recalled:
+            # en orden cronológico, como el resto del contexto
+            ordered = sorted(recalled.values(), key=lambda item: (item[0].created_at, item[0].id))
+            history.insert(0, {"role": "system", "content": RECALL_HEADER + "\n".join(text for _, text, _ in ordered)})
+        if summary_turn is not None:
+            history.insert(0, summary_turn)
+        history.append(user_turn)
+        return history
+
+    def _recall(self, chat_id: int, query_vector, before: Optional[Tuple[datetime, int]], limit: int) -> Dict:
+        """
+        Turnos anteriores parecidos al mensaje nuevo que caben enteros en limit
+        tokens, de mayor a menor similitud: {id: (mensaje, línea, costo)}
+        """
+        recalled = {}
+        turns = self.retriever.retrieve(
+            self.embedding_repository, chat_id, query_vector, before_id=before[1] if before is not None else None
+        )
+        for turn in turns:
+            lines = [
+                (message, f"{'Asistente' if message.sender == 'llm' else 'Usuario'}: {message.content}")
+                for message in turn if message.id not in recalled
+            ]
+            cost = sum(estimate_tokens(text) for _, text in lines)
+            if cost > limit:
+                # un turno largo no entra entero; el siguiente puede caber
+                continue
+            limit -= cost
+            for message, text in lines:
+                recalled[message.id] = (message, text, estimate_tokens(text))
+        return recalled
+
+    def _iter_history(self, chat_id: int, before: Optional[Tuple[datetime, int]]) -> Iterator[CachedMessage]:
+        """Recorrer el historial del más nuevo al más antiguo: cache primero, luego BD por lotes"""
+        cursor = before
+        entry = conversation_cache.get(chat_id)
+
+        if entry is not None:
+            for message in entry.messages:
+                if before is not None and (message.created_at, message.id) >= before:
+                    continue
+                cursor = (message.created_at, message.id)
+                yield message
+            if entry.complete:
+                return
+
+        # en un miss se carga en la cache lo que se lea desde el mensaje más reciente
+        token = conversation_cache.begin_load(chat_id) if entry is None and before is None else None
+        loaded = []
+        exhausted = False
+        try:
+            while not exhausted:
+                rows = [
+                    CachedMessage.from_entity(row)
+                    for row in self.message_repository.get_recent_messages(chat_id, self.fetch_batch_size, before=cursor)
+                ]
+                exhausted = len(rows) < self.fetch_batch_size
+                loaded.extend(rows)
+                for row in rows:
+                    yield row
+                if rows:
+                    cursor = (rows[-1].created_at, rows[-1].id)
+        finally:
+            if token is not None:
+                conversation_cache.put(token, loaded, complete=exhausted)
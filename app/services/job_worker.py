@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import time
+from app.conf.db import SessionLocal, run_db
+from app.conf.settings import Settings, get_settings
+from app.entities.jobs import CompletionJob
+from app.providers.errors import ProviderError
+from app.repositories.jobs import JobRepository
+from app.services.messenger import CompletionService
+from app.services.retrieval import conversation_retriever
+from app.services.summarizer import conversation_summarizer
+from app.utils.metrics import completion_jobs_total
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+def _call_repository(method: str, *args):
+    """Ejecutar un método de JobRepository con una sesión propia (los workers no tienen petición)"""
+    db = SessionLocal()
+    try:
+        return getattr(JobRepository(db), method)(*args)
+    finally:
+        db.close()
+
+class JobWorker:
+    """
+    Workers que procesan la cola de jobs de completions dentro del proceso de la API.
+    La cola es la tabla completion_jobs: los jobs sobreviven a un reinicio y varios
+    procesos pueden compartirla (el claim es un UPDATE condicional). Las peticiones al
+    LLM usan el carril batch de la admisión, así el tráfico interactivo pasa primero.
+    """
+
+    def __init__(self, workers: int, poll_interval: float, lease_seconds: float, max_attempts: int):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._tasks: List[asyncio.Task] = []
+        # job en curso -> tarea de generación (para cancelarla desde la API)
+        self._running: Dict[int, asyncio.Task] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._last_reap = 0.0
+
+    @classmethod
+    def from_settings(cls, settings: Optional[Settings] = None) -> "JobWorker":
+        settings = settings or get_settings()
+        return cls(
+            workers=settings.jobs_workers,
+            poll_interval=settings.jobs_poll_interval,
+            lease_seconds=settings.jobs_lease_seconds,
+            max_attempts=settings.jobs_max_attempts
+        )
+
+    async def start(self):
+        """Arrancar los workers (no toca la BD: la recuperación de jobs abandonados la hace el primer ciclo)"""
+        if self.workers == 0 or self._tasks:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._last_reap = 0.0
+        self._tasks = [asyncio.create_task(self._loop(), name=f"job-worker-{i}") for i in range(self.workers)]
+        logger.info("Workers de jobs iniciados", extra={"workers": self.workers})
+
+    async def stop(self):
+        """Parar los workers; los jobs en curso vuelven a la cola"""
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        """Avisar de un job nuevo sin esperar al siguiente sondeo"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def cancel(self, job_id: int) -> bool:
+        """Cortar la generación de un job si la está haciendo este proceso"""
+        task = self._running.get(job_id)
+        if task is None:
+            return False
+        task.cancel()
+        return True
+
+    def stats(self) -> Dict:
+        return {
+            "workers": len(self._tasks),
+            "running_jobs": sorted(self._running),
+            "poll_interval": self.poll_interval,
+            "lease_seconds": self.lease_seconds,
+            "max_attempts": self.max_attempts
+        }
+
+    async def _requeue_stale(self):
+        self._last_reap = time.monotonic()
+        requeued = await run_db(_call_repository, "requeue_stale_jobs", self.lease_seconds, self.max_attempts)
+        if requeued:
+            logger.warning("Jobs abandonados devueltos a la cola", extra={"jobs": requeued})
+
+    async def _loop(self):
+        while True:
+            try:
+                # los jobs de un worker caído (en cualquier proceso) se recuperan periódicamente
+                if time.monotonic() - self._last_reap >= min(self.lease_seconds, 60):
+                    await self._requeue_stale()
+                self._wakeup.clear()
+                job = await run_db(_call_repository, "claim_next_job")
+                if job is None:
+                    await self._wait(self.poll_interval)
+                    continue
+                backoff = await self._process(job)
+                if backoff:
+                    await asyncio.sleep(backoff)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # un fallo de BD no debe matar al worker
+                logger.exception("Error en el worker de jobs")
+                await asyncio.sleep(self.poll_interval)
+
+    async def _wait(self, timeout: float):
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _generate(self, job: CompletionJob) -> Tuple[str, Dict]:
+        db = SessionLocal()
+        try:
+            service = CompletionService(db)
+            return await service.generate_reply(job.chat_id, job.message, job.cache, operation="job", batch=True)
+        finally:
+            db.close()
+
+    async def _process(self, job: CompletionJob) -> float:
+        """Procesar un job ya reclamado. Devuelve cuánto esperar antes del siguiente (backoff)"""
+        task = asyncio.create_task(self._generate(job))
+        self._running[job.id] = task
+        try:
+            content, usage = await task
+        except asyncio.CancelledError:
+            if self._stopping or not task.cancelled():
+                # apagado: la generación se corta y el job vuelve a la cola
+                task.cancel()
+                await run_db(_call_repository, "fail_job", job.id, "worker stopped", True)
+                raise
+            # cancelado desde la API: el job ya está marcado como cancelled
+            completion_jobs_total.inc(outcome="cancelled")
+            return 0
+        except ProviderError as e:
+            retry = job.attempts < self.max_attempts
+            await run_db(_call_repository, "fail_job", job.id, str(e), retry)
+            completion_jobs_total.inc(outcome="retried" if retry else "failed")
+            logger.warning(
+                "Job fallido por el proveedor",
+                extra={"job_id": job.id, "attempt": job.attempts, "retry": retry, "error": str(e)}
+            )
+            return (e.retry_after or self.poll_interval) if retry else 0
+        except Exception as e:
+            # errores no transitorios (chat borrado, respuesta inválida): sin reintento
+            await run_db(_call_repository, "fail_job", job.id, str(e), False)
+            completion_jobs_total.inc(outcome="failed")
+            logger.exception("Job fallido", extra={"job_id": job.id})
+            return 0
+        finally:
+            self._running.pop(job.id, None)
+
+        try:
+            message = await run_db(_call_repository, "complete_job", job, content, usage)
+        except asyncio.CancelledError:
+            await run_db(_call_repository, "fail_job", job.id, "worker stopped", True)
+            raise
+        except Exception as e:
+            # el guardado falló y complete_job descartó su transacción: el job no puede quedar
+            # "running" hasta que venza el lease (chat borrado: sin reintento)
+            retry = not isinstance(e, ValueError) and job.attempts < self.max_attempts
+            await run_db(_call_repository, "fail_job", job.id, str(e), retry)
+            completion_jobs_total.inc(outcome="retried" if retry else "failed")
+            logger.exception("Error guardando el resultado del job", extra={"job_id": job.id, "retry": retry})
+            return self.poll_interval if retry else 0
+        completion_jobs_total.inc(outcome="succeeded" if message is not None else "cancelled")
+        if message is not None:
+            conversation_summarizer.notify(job.chat_id)
+            conversation_retriever.notify(job.chat_id)
+        return 0
+
+# Workers globales (se arrancan en el lifespan de la app)
+job_worker = JobWorker.from_settings()
@@ -0,0 +1,77 @@
+from sqlalchemy.orm import Session
+from app.conf.db import run_db
+from app.repositories.chats import ChatRepository
+from app.repositories.jobs import JobRepository
+from app.entities.jobs import CompletionJob
+from app.dtos.jobs.job_response import JobResponse, JobResultResponse
+from app.dtos.messenger.completion_request import CompletionRequest
+from typing import Dict, Optional
+
+class JobConflictError(Exception):
+    """La operación no aplica al estado actual del job (p. ej. resultado de un job sin terminar)"""
+
+class JobService:
+    
+    def __init__(self, db: Session):
+        self.job_repository = JobRepository(db)
+        self.chat_repository = ChatRepository(db)
+    
+    async def submit(self, chat_id: int, request: CompletionRequest) -> JobResponse:
+        """Encolar una completion para procesarla en segundo plano"""
+        chat = await run_db(self.chat_repository.get_chat_by_id, chat_id)
+        if not chat:
+            raise ValueError("Chat not found")
+        job = await run_db(self.job_repository.create_job, chat_id, request.message, request.cache)
+        # despertar a los workers de este proceso sin esperar al siguiente sondeo
+        from app.services.job_worker import job_worker
+        job_worker.notify()
+        return JobResponse.model_validate(job)
+    
+    async def get_job(self, job_id: int) -> Optional[JobResponse]:
+        """Obtener el estado de un job"""
+        job = await run_db(self.job_repository.get_job, job_id)
+        return JobResponse.model_validate(job) if job else None
+    
+    async def get_result(self, job_id: int) -> Optional[JobResultResponse]:
+        """Obtener la respuesta de un job terminado"""
+        job = await run_db(self.job_repository.get_job, job_id)
+        if not job:
+            return None
+        if job.status != CompletionJob.SUCCEEDED:
+            raise JobConflictError(f"Job is {job.status}")
+        message = await run_db(self.job_repository.get_result_message, job)
+        if message is None:
+            raise JobConflictError("Job result is no longer available")
+        return JobResultResponse(
+            job_id=job.id,
+            llm_response=message.content,
+            message_id=message.id,
+            created_at=message.created_at,
+            prompt_tokens=message.prompt_tokens,
+            completion_tokens=message.completion_tokens,
+            model=message.model,
+            latency_ms=message.latency_ms,
+            finish_reason=message.finish_reason
+        )
+    
+    async def cancel(self, job_id: int) -> Optional[JobResponse]:
+        """Cancelar un job en cola o en curso"""
+        job = await run_db(self.job_repository.get_job, job_id)
+        if not job:
+            return None
+        if not await run_db(self.job_repository.cancel_job, job_id):
+            raise JobConflictError(f"Job is already {job.status}")
+        # si lo está generando este proceso, se corta la petición al LLM
+        from app.services.job_worker import job_worker
+        job_worker.cancel(job_id)
+        job = await run_db(self.job_repository.get_job, job_id)
+        return JobResponse.model_validate(job)
+    
+    async def get_stats(self) -> Dict:
+        """Jobs por estado (todos los procesos) y estado de los workers de este proceso"""
+        from app.services.job_worker import job_worker
+        by_status = await run_db(self.job_repository.count_by_status)
+        return {
+            "by_status": {status: by_status.get(status, 0) for status in CompletionJob.STATUSES},
+            "worker": job_worker.stats()
+        }
@@ -1,80 +1,298 @@
 from sqlalchemy.orm import Session
+from app.conf.db import run_db, SessionLocal
+from app.conf.settings import Settings, get_settings
 from app.repositories.messages import MessageRepository
 from app.repositories.chats import ChatRepository
+from app.repositories.embeddings import EmbeddingRepository
+from app.repositories.summaries import SummaryRepository
+from app.services.context_builder import ContextBuilder
+from app.services.retrieval import conversation_retriever
+from app.services.summarizer import conversation_summarizer
+from app.utils.conversation_cache import conversation_cache
+from app.utils.metrics import timed, completion_stage_duration
+from app.utils.pagination import decode_cursor, page_cursors
+from app.utils.tokens import estimate_prompt_tokens, token_calibration
+from app.utils.response_mapper import PaginationMeta
 from app.providers.llm_studio_api import lm_studio_provider
+from app.providers.errors import ProviderError
 from app.dtos.messenger.completion_request import CompletionRequest, UpdateCompletionRequest
 from app.dtos.messenger.completion_response import CompletionResponse, MessagesListResponse, MessageContext
-from typing import Optional
+from app.dtos.messenger.summary_response import ChatSummaryResponse
+from typing import Optional, List, Dict, AsyncGenerator, Tuple
 import asyncio
+import json
+import time
 
 class CompletionService:
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, settings: Optional[Settings] = None):
+        settings = settings or get_settings()
         self.message_repository = MessageRepository(db)
         self.chat_repository = ChatRepository(db)
+        self.summary_repository = SummaryRepository(db)
+        self.context_builder = ContextBuilder(
+            self.message_repository,
+            summary_repository=self.summary_repository,
+            embedding_repository=EmbeddingRepository(db),
+            retriever=conversation_retriever,
+            settings=settings
+        )
+        # Prompt y parámetros de muestreo (LLM_SYSTEM_PROMPT, LLM_TEMPERATURE, LLM_MAX_TOKENS)
+        self.system_message = settings.llm_system_prompt
+        self.temperature = settings.llm_temperature
+        self.max_tokens = settings.llm_max_tokens
     
-    async def process_completion(self, chat_id: int, request: CompletionRequest) -> CompletionResponse:
+    async def _ensure_chat_exists(self, chat_id: int):
         """
-        Procesar una completion: obtener contexto, enviar a LLM, guardar mensajes
+        Verificar que el chat existe; si su historial está en cache no se consulta la BD.
+        La cache es por proceso: un chat borrado por otro worker pasa esta verificación
+        hasta que vence el TTL, pero al guardar el par create_message_pair lo detecta y
+        responde igual 404 (a cambio se pierde la llamada al LLM ya hecha).
         """
-        # Verificar que el chat existe
-        chat = self.chat_repository.get_chat_by_id(chat_id)
+        if conversation_cache.contains(chat_id):
+            return
+        chat = await run_db(self.chat_repository.get_chat_by_id, chat_id)
         if not chat:
             raise ValueError("Chat not found")
+    
+    async def _build_context(
+        self,
+        chat_id: int,
+        user_content: str,
+        operation: str,
+        before: Optional[Tuple] = None
+    ) -> List[Dict[str, str]]:
+        """
+        Contexto para el LLM (etapa "context" de las métricas). Con la recuperación
+        activa incluye el embedding del mensaje nuevo, que se calcula antes de
+        pasar al executor de BD porque puede ser una llamada a LM Studio.
+        """
+        with timed(completion_stage_duration, operation=operation, stage="context"):
+            query_vector = None
+            if self.context_builder.retriever is not None:
+                query_vector = await self.context_builder.retriever.embed_query(user_content)
+            return await run_db(
+                self.context_builder.build, chat_id, user_content, self.system_message, before, query_vector
+            )
+    
+    async def generate_reply(
+        self,
+        chat_id: int,
+        message: str,
+        cache: Optional[bool] = None,
+        operation: str = "process",
+        batch: bool = False
+    ) -> Tuple[str, Dict]:
+        """
+        Obtener el contexto y la respuesta del LLM para un mensaje nuevo, sin guardar nada.
+        Devuelve (contenido de la respuesta, uso para el mensaje "llm").
         
-        # 1. Obtener contexto anterior del chat
-        context = self.message_repository.get_chat_context_for_llm(chat_id)
+        Args:
+            operation: Etiqueta de las métricas por etapa (process, job)
+            batch: Usar el carril de admisión de baja prioridad (jobs en segundo plano)
+        """
+        # Verificar que el chat existe
+        await self._ensure_chat_exists(chat_id)
         
-        # 2. Agregar el nuevo mensaje del usuario al contexto
-        context.append({
-            "role": "user",
-            "content": request.message
-        })
+        # 1-2. Obtener los turnos recientes que caben en el presupuesto + el nuevo mensaje del usuario
+        context = await self._build_context(chat_id, message, operation)
         
         # 3. Enviar al LLM
         try:
-            llm_response = await lm_studio_provider.chat_completion(
-                messages=context,
-                system_message="Eres un asistente inteligente y útil. Responde de manera clara y concisa.",
-                temperature=0.7,
-                max_tokens=-1,
-                stream=False
-            )
+            started = time.perf_counter()
+            with timed(completion_stage_duration, operation=operation, stage="llm"):
+                llm_response = await lm_studio_provider.chat_completion(
+                    messages=context,
+                    system_message=self.system_message,
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens,
+                    stream=False,
+                    cache=cache,
+                    chat_id=chat_id,
+                    batch=batch
+                )
             
-            # Extraer la respuesta del LLM
+            # Extraer la respuesta del LLM y su uso de tokens
             llm_content = llm_response['choices'][0]['message']['content']
+            return llm_content, self._record_usage(llm_response, time.perf_counter() - started, context)
             
+        except ProviderError:
+            # los errores del proveedor se propagan con su código HTTP (429/502/503/504)
+            raise
         except Exception as e:
             raise Exception(f"Error communicating with LLM: {str(e)}")
+    
+    async def process_completion(self, chat_id: int, request: CompletionRequest) -> CompletionResponse:
+        """
+        Procesar una completion: obtener contexto, enviar a LLM, guardar mensajes
+        """
+        llm_content, usage = await self.generate_reply(chat_id, request.message, request.cache)
         
         # 4. Guardar los mensajes en la base de datos
         try:
-            # Guardar mensaje del usuario
-            self.message_repository.create_message(chat_id, "user", request.message)
-            
-            # Guardar respuesta del LLM
-            llm_message = self.message_repository.create_message(chat_id, "llm", llm_content)
+            # Guardar mensaje del usuario y respuesta del LLM en una sola transacción
+            with timed(completion_stage_duration, operation="process", stage="persist"):
+                _, llm_message = await run_db(
+                    self.message_repository.create_message_pair, chat_id, request.message, llm_content, usage
+                )
+            # plegar los mensajes antiguos en el resumen si el chat pasó el umbral y
+            # embeber los mensajes nuevos (en segundo plano)
+            conversation_summarizer.notify(chat_id)
+            conversation_retriever.notify(chat_id)
             
             return CompletionResponse(
                 llm_response=llm_content,
                 message_id=llm_message.id,
                 created_at=llm_message.created_at
             )
-            
+
+        except ValueError:
+            # el chat se borró mientras se generaba la respuesta (404)
+            raise
         except Exception as e:
             raise Exception(f"Error saving messages: {str(e)}")
     
-    def get_chat_messages(self, chat_id: int) -> MessagesListResponse:
+    async def prepare_stream_context(self, chat_id: int, request: CompletionRequest) -> List[Dict[str, str]]:
+        """
+        Validar el chat y construir el contexto antes de abrir el stream,
+        para poder responder 404 antes de enviar cabeceras SSE
+        """
+        await self._ensure_chat_exists(chat_id)
+        # rechazar con 429 antes de abrir el stream si la cola ya está llena
+        lm_studio_provider.admission.check_capacity()
+        
+        return await self._build_context(chat_id, request.message, "stream")
+    
+    async def stream_completion(
+        self,
+        chat_id: int,
+        request: CompletionRequest,
+        context: List[Dict[str, str]]
+    ) -> AsyncGenerator[str, None]:
+        """
+        Reenviar los tokens del LLM como eventos SSE a medida que llegan y,
+        al terminar el stream, guardar el par de mensajes user-llm.
+        
+        Si el cliente se desconecta, Starlette cancela este generador; al cerrar
+        el stream del proveedor se cierra la petición a LM Studio y no se guarda nada.
+        """
+        stream = lm_studio_provider.chat_completion_stream(
+            messages=context,
+            system_message=self.system_message,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            chat_id=chat_id
+        )
+        parts = []
+        # modelo, finish_reason y usage llegan en chunks distintos (usage en el último)
+        summary = {"choices": [{}]}
+        started = time.perf_counter()
+        try:
+            async for chunk in stream:
+                choices = chunk.get("choices") or [{}]
+                delta = (choices[0].get("delta") or {}).get("content")
+                if delta:
+                    parts.append(delta)
+                    yield self._sse_event({"delta": delta})
+                if choices[0].get("finish_reason"):
+                    summary["choices"][0]["finish_reason"] = choices[0]["finish_reason"]
+                for key in ("model", "usage"):
+                    if chunk.get(key):
+                        summary[key] = chunk[key]
+        except ProviderError as pe:
+            yield self._sse_event(
+                {
+                    "message": f"Error communicating with LLM: {str(pe)}",
+                    "status_code": pe.status_code,
+                    "retry_after": pe.retry_after
+                },
+                event="error"
+            )
+            return
+        except Exception as e:
+            yield self._sse_event({"message": f"Error communicating with LLM: {str(e)}"}, event="error")
+            return
+        finally:
+            await stream.aclose()
+        
+        llm_content = "".join(parts)
+        usage = self._record_usage(summary, time.perf_counter() - started, context)
+        try:
+            with timed(completion_stage_duration, operation="stream", stage="persist"):
+                llm_message = await run_db(self._save_message_pair, chat_id, request.message, llm_content, usage)
+        except Exception as e:
+            yield self._sse_event({"message": f"Error saving messages: {str(e)}"}, event="error")
+            return
+        conversation_summarizer.notify(chat_id)
+        conversation_retriever.notify(chat_id)
+        
+        response = CompletionResponse(
+            llm_response=llm_content,
+            message_id=llm_message.id,
+            created_at=llm_message.created_at
+        )
+        yield self._sse_event(response.model_dump(mode="json"), event="done")
+    
+    @staticmethod
+    def _save_message_pair(chat_id: int, user_content: str, llm_content: str, usage: Dict):
+        """
+        Guardar el par user-llm con una sesión propia: la sesión de la petición
+        puede cerrarse antes de que termine el streaming
+        """
+        with SessionLocal() as db:
+            _, llm_message = MessageRepository(db).create_message_pair(chat_id, user_content, llm_content, usage)
+            return llm_message
+    
+    def _record_usage(self, llm_response: Dict, elapsed: float, context: List[Dict[str, str]]) -> Dict:
+        """
+        Extraer el uso de una respuesta de LM Studio (columnas del mensaje "llm")
+        y calibrar la estimación local de tokens con los prompt_tokens reales.
+        Una respuesta reutilizada ("cached": cache de respuestas o coalescencia) trae
+        el uso de la petición original: no se vuelve a sumar ni a calibrar, y su
+        latencia (casi cero) no se guarda para no bajar los promedios.
+        """
+        finish_reason = (llm_response.get("choices") or [{}])[0].get("finish_reason")
+        cached = bool(llm_response.get("cached"))
+        usage = {} if cached else llm_response.get("usage") or {}
+        if not cached:
+            token_calibration.observe(
+                estimate_prompt_tokens(context, self.system_message), usage.get("prompt_tokens")
+            )
+        return {
+            "prompt_tokens": usage.get("prompt_tokens"),
+            "completion_tokens": usage.get("completion_tokens"),
+            "model": (llm_response.get("model") or "")[:128] or None,
+            "latency_ms": None if cached else round(elapsed * 1000),
+            "finish_reason": (finish_reason or "")[:32] or None
+        }
+    
+    @staticmethod
+    def _sse_event(data: Dict, event: Optional[str] = None) -> str:
+        """Serializar un evento Server-Sent Events"""
+        payload = f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+        return f"event: {event}\n{payload}" if event else payload
+    
+    async def get_chat_messages(
+        self,
+        chat_id: int,
+        cursor: Optional[str] = None,
+        direction: str = "prev",
+        limit: int = 100,
+        include_total: bool = False
+    ) -> Tuple[MessagesListResponse, PaginationMeta]:
         """
-        Obtener todos los mensajes de un chat en formato de contexto
+        Obtener una página de mensajes de un chat en formato de contexto.
+        Sin cursor devuelve los mensajes más recientes; prev_cursor lleva a los anteriores.
         """
+        key = decode_cursor(cursor) if cursor else None
+        
         # Verificar que el chat existe
-        chat = self.chat_repository.get_chat_by_id(chat_id)
-        if not chat:
-            raise ValueError("Chat not found")
+        await self._ensure_chat_exists(chat_id)
         
-        # Obtener todos los mensajes
-        messages = self.message_repository.get_all_messages_by_chat_id(chat_id)
+        # Obtener la página de mensajes
+        messages, has_more = await run_db(
+            self.message_repository.get_messages_page, chat_id, limit, key, direction
+        )
         
         # Convertir a formato de respuesta
         message_contexts = []
@@ -86,11 +304,21 @@ class CompletionService:
                 created_at=message.created_at
             ))
         
+        next_cursor, prev_cursor = page_cursors(messages, has_more, cursor, direction)
+        total_items = await run_db(self.message_repository.count_messages, chat_id) if include_total else None
+        pagination = PaginationMeta.from_cursors(limit, next_cursor, prev_cursor, total_items)
+        
         return MessagesListResponse(
             chat_id=chat_id,
             messages=message_contexts,
             total_messages=len(message_contexts)
-        )
+        ), pagination
+    
+    async def get_chat_summaries(self, chat_id: int) -> List[ChatSummaryResponse]:
+        """Versiones del resumen de un chat, de la más nueva a la más antigua (incluye las invalidadas)"""
+        await self._ensure_chat_exists(chat_id)
+        summaries = await run_db(self.summary_repository.list_summaries, chat_id)
+        return [ChatSummaryResponse.model_validate(summary) for summary in summaries]
     
     async def update_completion(self, chat_id: int, new_message: Optional[str] = None) -> CompletionResponse:
         """
@@ -98,12 +326,10 @@ class CompletionService:
         Si new_message es proporcionado, actualiza también el mensaje del usuario.
         """
         # 1. Verificar que el chat existe
-        chat = self.chat_repository.get_chat_by_id(chat_id)
-        if not chat:
-            raise ValueError("Chat not found")
+        await self._ensure_chat_exists(chat_id)
         
         # 2. Obtener el último par de mensajes (user, llm)
-        user_message, llm_message = self.message_repository.get_last_two_messages(chat_id)
+        user_message, llm_message = await run_db(self.message_repository.get_last_two_messages, chat_id)
         
         if not llm_message or not user_message:
             raise ValueError("No message pair found in chat")
@@ -111,44 +337,58 @@ class CompletionService:
         # 3. Determinar qué mensaje del usuario usar
         user_content = new_message if new_message is not None else user_message.content
         
-        # 4. Obtener contexto previo (sin incluir el par actual user-llm)
-        # Para simplificar, obtenemos el contexto completo y removemos los últimos 2 mensajes
-        full_context = self.message_repository.get_chat_context_for_llm(chat_id)
-        
-        # Remover los últimos 2 mensajes (user y assistant del par actual) si existen
-        context = full_context[:-2] if len(full_context) >= 2 else []
-        
-        # 5. Agregar el mensaje del usuario (nuevo o reutilizado)
-        context.append({
-            "role": "user",
-            "content": user_content
-        })
+        # 4-5. Obtener el contexto previo (anterior al par actual user-llm)
+        # y agregar el mensaje del usuario (nuevo o reutilizado)
+        context = await self._build_context(
+            chat_id, user_content, "update", before=(user_message.created_at, user_message.id)
+        )
         
         # 6. Enviar al LLM
         try:
-            llm_response = await lm_studio_provider.chat_completion(
-                messages=context,
-                system_message="Eres un asistente inteligente y útil. Responde de manera clara y concisa.",
-                temperature=0.7,
-                max_tokens=-1,
-                stream=False
-            )
+            started = time.perf_counter()
+            with timed(completion_stage_duration, operation="update", stage="llm"):
+                llm_response = await lm_studio_provider.chat_completion(
+                    messages=context,
+                    system_message=self.system_message,
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens,
+                    stream=False,
+                    # regenerar debe producir una respuesta nueva
+                    cache=False,
+                    chat_id=chat_id
+                )
             
             llm_content = llm_response['choices'][0]['message']['content']
+            usage = self._record_usage(llm_response, time.perf_counter() - started, context)
             
+        except ProviderError:
+            # los errores del proveedor se propagan con su código HTTP (429/502/503/504)
+            raise
         except Exception as e:
             raise Exception(f"Error communicating with LLM: {str(e)}")
         
         # 7. Actualizar los mensajes en la base de datos
         try:
-            updated_user, updated_llm = self.message_repository.update_last_message_pair(
-                chat_id,
-                user_content if new_message is not None else None,  # Solo actualizar user si hay new_message
-                llm_content
-            )
+            with timed(completion_stage_duration, operation="update", stage="persist"):
+                # los resúmenes que cubren el par reescrito dejan de valer (antes de reescribirlo:
+                # si la actualización falla, como mucho se vuelve a resumir)
+                conversation_summarizer.cancel(chat_id)
+                await run_db(
+                    self.summary_repository.invalidate_from, chat_id, (user_message.created_at, user_message.id)
+                )
+                updated_user, updated_llm = await run_db(
+                    self.message_repository.update_message_pair,
+                    user_message,
+                    llm_message,
+                    user_content if new_message is not None else None,  # Solo actualizar user si hay new_message
+                    llm_content,
+                    usage
+                )
             
             if not updated_llm:
                 raise Exception("Failed to update messages")
+            # los embeddings del par reescrito se borraron: volver a calcularlos
+            conversation_retriever.notify(chat_id)
             
             return CompletionResponse(
                 llm_response=llm_content,
@@ -0,0 +1,245 @@
+import asyncio
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from app.conf.db import SessionLocal, run_db
+from app.conf.settings import Settings, get_settings
+from app.providers.embeddings import build_embedder
+from app.providers.errors import ProviderError
+from app.repositories.embeddings import EmbeddingRepository
+from app.utils.metrics import message_embeddings_total
+from app.utils.vector_index import VectorIndex, np
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# texto embebido por mensaje: los modelos de embeddings truncan a unos cientos de tokens
+EMBEDDING_MAX_CHARS = 2000
+# candidatos extra del índice global: algunos pueden ser de embeddings ya borrados
+GLOBAL_OVERSAMPLE = 2
+
+def _call_repository(method: str, *args):
+    """Ejecutar un método de EmbeddingRepository con una sesión propia (la indexación no tiene petición)"""
+    db = SessionLocal()
+    try:
+        return getattr(EmbeddingRepository(db), method)(*args)
+    finally:
+        db.close()
+
+@dataclass
+class RecalledMessage:
+    """Mensaje anterior parecido al mensaje nuevo"""
+    id: int
+    chat_id: int
+    sender: str
+    content: str
+    created_at: datetime
+    score: float
+
+class ConversationRetriever:
+    """
+    Memoria de largo plazo de los chats. Cada mensaje guardado se embebe en segundo
+    plano (message_embeddings) y, al construir el contexto, los mensajes anteriores
+    más parecidos al mensaje nuevo se agregan aunque hayan quedado fuera de la
+    ventana reciente.
+
+    Con alcance "chat" se comparan los embeddings del chat leídos de la BD (cientos
+    o miles de vectores: un producto matriz-vector); con "global" se recorre el
+    índice numpy.memmap de todos los chats, que se pone al día con la tabla antes
+    de cada búsqueda.
+
+    Las tareas de indexación son locales al proceso y no se persisten: lo que quede
+    sin embeber se retoma con el siguiente mensaje del chat o con
+    `python -m app.cli index-messages`.
+    """
+
+    def __init__(
+        self,
+        enabled: bool,
+        embedder,
+        scope: str,
+        top_k: int,
+        min_score: float,
+        index_path: str,
+        batch_size: int
+    ):
+        self.enabled = enabled
+        self.embedder = embedder
+        self.scope = scope
+        self.top_k = top_k
+        self.min_score = min_score
+        self.index_path = index_path
+        self.batch_size = batch_size
+        self._index: Optional[VectorIndex] = None
+        self._index_lock = threading.Lock()
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+    @classmethod
+    def from_settings(cls, settings: Optional[Settings] = None) -> "ConversationRetriever":
+        settings = settings or get_settings()
+        enabled = settings.context_retrieval_enabled
+        return cls(
+            enabled=enabled,
+            # desactivada no necesita numpy ni el modelo de embeddings
+            embedder=build_embedder(settings) if enabled else None,
+            scope=settings.context_retrieval_scope,
+            top_k=settings.context_retrieval_top_k,
+            min_score=settings.context_retrieval_min_score,
+            index_path=settings.vector_index_path,
+            batch_size=settings.embedding_batch_size
+        )
+
+    @property
+    def model(self) -> str:
+        return self.embedder.model
+
+    @property
+    def index(self) -> VectorIndex:
+        """Índice global, abierto al primer uso (solo lo necesita el alcance global y el CLI)"""
+        with self._index_lock:
+            if self._index is None:
+                self._index = VectorIndex(self.index_path, self.model)
+            return self._index
+
+    async def embed_query(self, text: str) -> Optional["np.ndarray"]:
+        """Embedding del mensaje nuevo; None si la recuperación está desactivada o el embedder falla"""
+        if not self.enabled:
+            return None
+        try:
+            return (await self.embedder.embed([text[:EMBEDDING_MAX_CHARS]]))[0]
+        except ProviderError as e:
+            # sin embedding el contexto sigue con la ventana reciente (y el resumen)
+            logger.warning("No se pudo embeber el mensaje", extra={"error": str(e)})
+            return None
+
+    def retrieve(
+        self,
+        repository: EmbeddingRepository,
+        chat_id: int,
+        vector: "np.ndarray",
+        before_id: Optional[int] = None
+    ) -> List[List[RecalledMessage]]:
+        """
+        Turnos anteriores más parecidos a vector, de mayor a menor similitud (hasta
+        top_k y desde min_score). Cada turno trae el mensaje encontrado y su pareja
+        (la pregunta o la respuesta), en orden cronológico. before_id descarta ese
+        mensaje del chat y los posteriores (al regenerar un par). Corre en el
+        executor de BD, al construir el contexto.
+        """
+        if self.scope == "global":
+            self.sync_index(repository)
+            candidates = self.index.search(vector, 2 * self.top_k * GLOBAL_OVERSAMPLE, self.min_score)
+        else:
+            candidates = self._search_chat(repository, chat_id, vector, before_id)
+        if not candidates:
+            return []
+
+        def allowed(row) -> bool:
+            return before_id is None or row.chat_id != chat_id or row.id < before_id
+
+        scores = dict(candidates)
+        hits = [row for row in repository.get_embedded_messages(list(scores)) if allowed(row)]
+        hits.sort(key=lambda row: scores[row.embedding_id], reverse=True)
+        turns, seen = [], set()
+        for hit in hits:
+            if hit.id in seen:
+                # la pareja de un turno ya elegido
+                continue
+            turn = [hit]
+            partner = repository.get_turn_partner(hit.chat_id, (hit.created_at, hit.id), hit.sender)
+            if partner is not None and allowed(partner):
+                turn.append(partner)
+            turn.sort(key=lambda row: (row.created_at, row.id))
+            seen.update(row.id for row in turn)
+            score = scores[hit.embedding_id]
+            turns.append([
+                RecalledMessage(row.id, row.chat_id, row.sender, row.content, row.created_at, score)
+                for row in turn
+            ])
+            if len(turns) == self.top_k:
+                break
+        return turns
+
+    def _search_chat(
+        self,
+        repository: EmbeddingRepository,
+        chat_id: int,
+        vector: "np.ndarray",
+        before_id: Optional[int]
+    ) -> List[Tuple[int, float]]:
+        rows = repository.get_chat_embeddings(chat_id, self.model, before_id)
+        if not rows:
+            return []
+        matrix = np.frombuffer(b"".join(row.vector for row in rows), dtype="<f4").reshape(len(rows), -1)
+        if matrix.shape[1] != vector.shape[0]:
+            return []
+        scores = matrix @ vector
+        # el doble: la pregunta y la respuesta de un mismo turno pueden salir las dos
+        top = np.argsort(-scores)[:2 * self.top_k]
+        return [(rows[i].id, float(scores[i])) for i in top if scores[i] >= self.min_score]
+
+    def sync_index(self, repository: EmbeddingRepository) -> int:
+        """Agregar al índice global los embeddings nuevos de la tabla; devuelve cuántos"""
+        return self.index.sync(lambda after_id, limit: repository.get_embeddings_after(self.model, after_id, limit))
+
+    def notify(self, chat_id: int):
+        """Avisar de mensajes nuevos o reescritos en un chat (una sola tarea por chat a la vez)"""
+        if not self.enabled or chat_id in self._tasks:
+            return
+        task = asyncio.create_task(self._run(chat_id))
+        self._tasks[chat_id] = task
+        task.add_done_callback(lambda done: self._forget(chat_id, done))
+
+    def _forget(self, chat_id: int, task: asyncio.Task):
+        if self._tasks.get(chat_id) is task:
+            del self._tasks[chat_id]
+
+    async def stop(self):
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def _run(self, chat_id: int):
+        after_id = 0
+        try:
+            while True:
+                indexed, after_id = await self.index_pending(chat_id, after_id)
+                if indexed < self.batch_size:
+                    break
+        except asyncio.CancelledError:
+            message_embeddings_total.inc(outcome="cancelled")
+            raise
+        except ProviderError as e:
+            message_embeddings_total.inc(outcome="failed")
+            logger.warning("No se pudieron embeber los mensajes del chat", extra={"chat_id": chat_id, "error": str(e)})
+        except Exception:
+            message_embeddings_total.inc(outcome="failed")
+            logger.exception("Error al embeber los mensajes del chat", extra={"chat_id": chat_id})
+
+    async def index_pending(self, chat_id: Optional[int] = None, after_id: int = 0) -> Tuple[int, int]:
+        """
+        Embeber el siguiente lote de mensajes sin embedding (de un chat o de todos)
+        con id posterior a after_id. Devuelve (mensajes leídos, último id leído).
+        """
+        rows = await run_db(_call_repository, "get_unindexed_messages", self.model, self.batch_size, chat_id, after_id)
+        if not rows:
+            return 0, after_id
+        vectors = await self.embedder.embed([row.content[:EMBEDDING_MAX_CHARS] for row in rows])
+        await run_db(_call_repository, "save_embeddings", [
+            {
+                "message_id": row.id,
+                "content": row.content,
+                "model": self.model,
+                "dimensions": vectors.shape[1],
+                "vector": vector.astype("<f4").tobytes()
+            }
+            for row, vector in zip(rows, vectors)
+        ])
+        message_embeddings_total.inc(len(rows), outcome="indexed")
+        return len(rows), rows[-1].id
+
+# Recuperador global (las tareas se cancelan en el lifespan de la app)
+conversation_retriever = ConversationRetriever.from_settings()
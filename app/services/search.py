@@ -0,0 +1,133 @@
+import re
+from sqlalchemy.orm import Session
+from app.conf.db import run_db
+from app.conf.settings import Settings, get_settings
+from app.dtos.search import ChatSearchResult, MessageSearchResult
+from app.repositories.search import SearchRepository, HIGHLIGHT_START, HIGHLIGHT_END, ELLIPSIS
+from app.utils.pagination import RankCursorKey, decode_rank_cursor, encode_rank_cursor
+from app.utils.response_mapper import PaginationMeta
+from typing import Dict, List, Optional, Tuple
+
+# palabras de la consulta; "*" al final busca por prefijo
+TERM_PATTERN = re.compile(r"\w+\*?")
+MAX_TERMS = 8
+# un prefijo más corto coincide con casi todo el índice
+MIN_PREFIX_CHARS = 3
+# largo de los fragmentos resaltados en Python (SQL Server y LIKE)
+SNIPPET_CHARS = 160
+
+class InvalidSearchQueryError(ValueError):
+    """Consulta de búsqueda sin ninguna palabra"""
+
+def parse_terms(query: str) -> List[str]:
+    """Palabras de la consulta (todas deben aparecer), sin operadores del motor"""
+    terms = []
+    for term in TERM_PATTERN.findall(query):
+        if term.endswith("*") and len(term) - 1 < MIN_PREFIX_CHARS:
+            term = term[:-1]
+        if term.lower() not in (t.lower() for t in terms):
+            terms.append(term)
+    if not terms:
+        raise InvalidSearchQueryError("Search query must contain at least one word")
+    return terms[:MAX_TERMS]
+
+def highlight(text: Optional[str], terms: List[str], width: int = SNIPPET_CHARS) -> str:
+    """Fragmento de text alrededor del primer término encontrado, con los términos resaltados"""
+    if not text:
+        return ""
+    pattern = re.compile(
+        "|".join(
+            rf"\b{re.escape(term[:-1])}\w*" if term.endswith("*") else rf"\b{re.escape(term)}\b"
+            for term in terms
+        ),
+        re.IGNORECASE
+    )
+    match = pattern.search(text)
+    start = max(0, match.start() - width // 3) if match else 0
+    end = min(len(text), start + width)
+    fragment = pattern.sub(lambda m: f"{HIGHLIGHT_START}{m.group(0)}{HIGHLIGHT_END}", text[start:end])
+    return (ELLIPSIS if start > 0 else "") + fragment + (ELLIPSIS if end < len(text) else "")
+
+class SearchService:
+    
+    def __init__(self, db: Session, settings: Optional[Settings] = None):
+        self.search_repository = SearchRepository(db)
+        self.max_ranked = (settings or get_settings()).search_max_ranked_matches
+    
+    @staticmethod
+    def _score(backend: str, rank) -> Optional[float]:
+        """Puntaje común (mayor es más relevante): bm25 de FTS5 es negativo, RANK de SQL Server no"""
+        if rank is None:
+            return None
+        return -rank if backend == "fts5" else float(rank)
+    
+    def _page(self, search, terms: List[str], cursor: Optional[str], limit: int, **kwargs) -> Tuple[str, List[Dict], Optional[str]]:
+        after: Optional[RankCursorKey] = decode_rank_cursor(cursor) if cursor else None
+        backend, rows = search(terms, after=after, limit=limit + 1, max_ranked=self.max_ranked, **kwargs)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = encode_rank_cursor((backend, rows[-1]["rank"], rows[-1]["id"])) if has_more else None
+        for row in rows:
+            if "snippet" not in row:
+                row["snippet"] = highlight(row["text"], terms)
+        return backend, rows, next_cursor
+    
+    def _search_messages(self, query: str, chat_id: Optional[int], cursor: Optional[str], limit: int):
+        terms = parse_terms(query)
+        backend, rows, next_cursor = self._page(
+            self.search_repository.search_messages, terms, cursor, limit, chat_id=chat_id
+        )
+        results = [
+            MessageSearchResult(
+                message_id=row["id"],
+                chat_id=row["chat_id"],
+                chat_title=row["chat_title"],
+                sender=row["sender"],
+                created_at=row["created_at"],
+                snippet=row["snippet"],
+                score=self._score(backend, row["rank"])
+            )
+            for row in rows
+        ]
+        return {"query": query, "terms": terms, "backend": backend, "results": results}, next_cursor
+    
+    def _search_chats(self, query: str, cursor: Optional[str], limit: int):
+        terms = parse_terms(query)
+        backend, rows, next_cursor = self._page(self.search_repository.search_chats, terms, cursor, limit)
+        results = [
+            ChatSearchResult(
+                chat_id=row["id"],
+                title=row["title"],
+                created_at=row["created_at"],
+                message_count=row["message_count"],
+                last_message_at=row["last_message_at"],
+                snippet=row["snippet"],
+                score=self._score(backend, row["rank"])
+            )
+            for row in rows
+        ]
+        return {"query": query, "terms": terms, "backend": backend, "results": results}, next_cursor
+    
+    async def search_messages(
+        self,
+        query: str,
+        chat_id: Optional[int] = None,
+        cursor: Optional[str] = None,
+        limit: int = 20
+    ) -> Tuple[Dict, PaginationMeta]:
+        """
+        Buscar mensajes que contengan todas las palabras de la consulta (en todos
+        los chats o en uno), ordenados por relevancia y paginados por cursor.
+        """
+        result, next_cursor = await run_db(self._search_messages, query, chat_id, cursor, limit)
+        return result, PaginationMeta.from_cursors(limit, next_cursor, None)
+    
+    async def search_chats(
+        self,
+        query: str,
+        cursor: Optional[str] = None,
+        limit: int = 20
+    ) -> Tuple[Dict, PaginationMeta]:
+        """Buscar chats por título, ordenados por relevancia y paginados por cursor"""
+        result, next_cursor = await run_db(self._search_chats, query, cursor, limit)
+        return result, PaginationMeta.from_cursors(limit, next_cursor, None)
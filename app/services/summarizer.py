@@ -0,0 +1,194 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from app.conf.db import SessionLocal, run_db
+from app.conf.settings import Settings, get_settings
+from app.entities.messages import Message
+from app.providers.errors import ProviderError
+from app.providers.llm_studio_api import lm_studio_provider
+from app.repositories.summaries import SummaryRepository
+from app.utils.metrics import conversation_summaries_total
+from app.utils.tokens import estimate_tokens, MESSAGE_OVERHEAD_TOKENS
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_SYSTEM_PROMPT = (
+    "Resumes conversaciones entre un usuario y un asistente. Conserva los hechos, datos, "
+    "decisiones, preferencias del usuario y preguntas pendientes; omite saludos y relleno. "
+    "Responde solo con el resumen, en el idioma de la conversación."
+)
+
+@dataclass
+class FoldPlan:
+    """Tramo de mensajes a plegar en una versión nueva del resumen"""
+    previous_summary: Optional[str]
+    messages: List[Tuple[str, str]]  # (sender, content), del más antiguo al más nuevo
+    through_message: Message
+    message_count: int
+
+class ConversationSummarizer:
+    """
+    Resumen incremental de los chats largos. Tras guardar un par de mensajes se
+    revisa en segundo plano si los mensajes sin resumir pasan el umbral; si es así
+    se pliegan los más antiguos (dejando la ventana reciente) junto con el resumen
+    vigente en una versión nueva. La llamada al LLM usa el carril batch de la
+    admisión, así no le quita cupo al tráfico interactivo.
+
+    Las tareas son locales al proceso y no se persisten: si una se pierde, el
+    siguiente mensaje del chat vuelve a disparar el plegado.
+    """
+
+    def __init__(
+        self,
+        enabled: bool,
+        trigger_messages: int,
+        keep_messages: int,
+        max_tokens: int,
+        chunk_tokens: int
+    ):
+        self.enabled = enabled
+        self.trigger_messages = trigger_messages
+        self.keep_messages = keep_messages
+        self.max_tokens = max_tokens
+        self.chunk_tokens = chunk_tokens
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+    @classmethod
+    def from_settings(cls, settings: Optional[Settings] = None) -> "ConversationSummarizer":
+        settings = settings or get_settings()
+        return cls(
+            enabled=settings.context_summary_enabled,
+            trigger_messages=settings.context_summary_trigger_messages,
+            keep_messages=settings.context_summary_keep_messages,
+            max_tokens=settings.context_summary_max_tokens,
+            chunk_tokens=settings.context_summary_chunk_tokens
+        )
+
+    def notify(self, chat_id: int):
+        """Avisar de mensajes nuevos en un chat (una sola tarea por chat a la vez)"""
+        if not self.enabled or chat_id in self._tasks:
+            return
+        task = asyncio.create_task(self._run(chat_id))
+        self._tasks[chat_id] = task
+        task.add_done_callback(lambda done: self._forget(chat_id, done))
+
+    def _forget(self, chat_id: int, task: asyncio.Task):
+        # solo si sigue siendo la tarea registrada (cancel() puede haberla reemplazado)
+        if self._tasks.get(chat_id) is task:
+            del self._tasks[chat_id]
+
+    def cancel(self, chat_id: int):
+        """Descartar el plegado en curso de un chat (sus mensajes se están reescribiendo)"""
+        task = self._tasks.pop(chat_id, None)
+        if task is not None:
+            task.cancel()
+
+    async def stop(self):
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def _run(self, chat_id: int):
+        try:
+            while await self.fold(chat_id):
+                pass
+        except asyncio.CancelledError:
+            conversation_summaries_total.inc(outcome="cancelled")
+            raise
+        except ProviderError as e:
+            conversation_summaries_total.inc(outcome="failed")
+            logger.warning("No se pudo resumir el chat", extra={"chat_id": chat_id, "error": str(e)})
+        except Exception:
+            conversation_summaries_total.inc(outcome="failed")
+            logger.exception("Error al resumir el chat", extra={"chat_id": chat_id})
+
+    async def fold(self, chat_id: int) -> bool:
+        """Plegar el siguiente tramo de mensajes; False si el chat no lo necesita"""
+        plan = await run_db(self.plan, chat_id)
+        if plan is None:
+            return False
+        content, usage = await self._summarize(plan)
+        if not content:
+            conversation_summaries_total.inc(outcome="empty")
+            return False
+        summary = await run_db(self._save, chat_id, content, plan, usage)
+        conversation_summaries_total.inc(outcome="folded" if summary is not None else "conflict")
+        return summary is not None
+
+    def plan(self, chat_id: int) -> Optional[FoldPlan]:
+        """Elegir el tramo a plegar: mensajes sin resumir, sin la ventana reciente y acotados en tokens"""
+        with SessionLocal() as db:
+            repository = SummaryRepository(db)
+            total = repository.count_messages(chat_id)
+            if total is None:
+                return None
+            current = repository.get_active_summary(chat_id)
+            covered = current.message_count if current else 0
+            pending = total - covered
+            if pending < self.trigger_messages or pending <= self.keep_messages:
+                return None
+            after = (current.through_created_at, current.through_message_id) if current else None
+            rows = repository.get_messages_after(chat_id, after, pending - self.keep_messages)
+
+        segment, cost = [], 0
+        for row in rows:
+            row_cost = estimate_tokens(row.content) + MESSAGE_OVERHEAD_TOKENS
+            if segment and cost + row_cost > self.chunk_tokens:
+                break
+            segment.append(row)
+            cost += row_cost
+        # cortar al final de un turno (respuesta del LLM) para no separar pregunta y respuesta
+        while segment and segment[-1].sender != "llm":
+            segment.pop()
+        if not segment:
+            return None
+        return FoldPlan(
+            previous_summary=current.content if current else None,
+            messages=[(row.sender, row.content) for row in segment],
+            through_message=segment[-1],
+            message_count=covered + len(segment)
+        )
+
+    @staticmethod
+    def build_prompt(plan: FoldPlan) -> str:
+        parts = []
+        if plan.previous_summary:
+            parts.append(f"Resumen hasta ahora:\n{plan.previous_summary}")
+        lines = [
+            f"{'Asistente' if sender == 'llm' else 'Usuario'}: {content}"
+            for sender, content in plan.messages
+        ]
+        parts.append("Mensajes nuevos:\n" + "\n".join(lines))
+        parts.append("Escribe el resumen actualizado de toda la conversación.")
+        return "\n\n".join(parts)
+
+    async def _summarize(self, plan: FoldPlan) -> Tuple[str, Dict]:
+        response = await lm_studio_provider.chat_completion(
+            messages=[{"role": "user", "content": self.build_prompt(plan)}],
+            system_message=SUMMARY_SYSTEM_PROMPT,
+            temperature=0.2,
+            max_tokens=self.max_tokens,
+            stream=False,
+            cache=False,
+            batch=True
+        )
+        usage = response.get("usage") or {}
+        content = (response["choices"][0]["message"]["content"] or "").strip()
+        return content, {
+            "prompt_tokens": usage.get("prompt_tokens"),
+            "completion_tokens": usage.get("completion_tokens"),
+            "model": (response.get("model") or "")[:128] or None
+        }
+
+    @staticmethod
+    def _save(chat_id: int, content: str, plan: FoldPlan, usage: Dict):
+        with SessionLocal() as db:
+            return SummaryRepository(db).create_summary(
+                chat_id, content, plan.through_message, plan.message_count, usage
+            )
+
+# Resumidor global (las tareas se cancelan en el lifespan de la app)
+conversation_summarizer = ConversationSummarizer.from_settings()
@@ -0,0 +1,302 @@
+import asyncio
+import json
+import time
+import zlib
+from collections import defaultdict
+from datetime import datetime, timezone
+from sqlalchemy.orm import Session
+from app.conf.db import SessionLocal, run_db
+from app.repositories.transfer import TransferRepository
+from app.utils.pagination import count_cache
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional
+
+# Formato de exportación: una cabecera, todos los chats y después todos los mensajes
+# (cada mensaje referencia el id original de su chat, que debe aparecer antes)
+EXPORT_FORMAT = "chat-export"
+EXPORT_VERSION = 1
+DEFAULT_BATCH_SIZE = 1000
+GZIP_MAGIC = b"\x1f\x8b"
+SENDERS = ("user", "llm")
+
+class TransferFormatError(ValueError):
+    """Registro inválido en un archivo de importación"""
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _encode(record: Dict) -> bytes:
+    return (json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=_json_default) + "\n").encode()
+
+class ChatExporter:
+    """
+    Exportación de chats y mensajes como NDJSON (opcionalmente gzip). Las filas se
+    leen por lotes de batch_size con yield_per y se escriben a medida que llegan,
+    así la memoria no depende del tamaño de la base. Usa su propia sesión porque
+    la respuesta se sigue enviando después de terminar la petición.
+    """
+
+    def __init__(self, chat_ids: Optional[List[int]] = None, compress: bool = False, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.chat_ids = chat_ids or None
+        self.compress = compress
+        self.batch_size = batch_size
+
+    def records(self) -> Iterator[Dict]:
+        with SessionLocal() as db:
+            repository = TransferRepository(db)
+            yield {
+                "type": "header",
+                "format": EXPORT_FORMAT,
+                "version": EXPORT_VERSION,
+                "exported_at": datetime.now(timezone.utc)
+            }
+            for row in repository.stream_chats(self.chat_ids, self.batch_size):
+                yield {"type": "chat", **row._asdict()}
+            for row in repository.stream_messages(self.chat_ids, self.batch_size):
+                yield {"type": "message", **row._asdict()}
+
+    def chunks(self) -> Iterator[bytes]:
+        """Bloques de bytes de batch_size registros cada uno (comprimidos si compress)"""
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if self.compress else None
+        lines = []
+        for record in self.records():
+            lines.append(_encode(record))
+            if len(lines) >= self.batch_size:
+                chunk = b"".join(lines)
+                lines.clear()
+                chunk = compressor.compress(chunk) if compressor else chunk
+                if chunk:
+                    yield chunk
+        chunk = b"".join(lines)
+        if compressor:
+            chunk = compressor.compress(chunk) + compressor.flush()
+        if chunk:
+            yield chunk
+
+    async def stream(self) -> AsyncIterator[bytes]:
+        """chunks() consumido desde el executor de BD, sin bloquear el event loop"""
+        chunks = self.chunks()
+        pending = None
+        try:
+            while True:
+                pending = asyncio.ensure_future(run_db(next, chunks, None))
+                # shield: si el cliente se desconecta, el lote en curso termina antes de cerrar el generador
+                chunk = await asyncio.shield(pending)
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            if pending is not None and not pending.done():
+                await asyncio.wait([pending])
+            await run_db(chunks.close)
+
+class NdjsonDecoder:
+    """
+    Divide un flujo de bytes NDJSON en líneas, descomprimiendo sobre la marcha si
+    empieza con la cabecera gzip. Las líneas se devuelven sin parsear para que el
+    JSON se decodifique fuera del event loop.
+    """
+
+    def __init__(self):
+        self._head = b""
+        self._detected = False
+        self._decompressor = None
+        self._buffer = b""
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        if not self._detected:
+            self._head += chunk
+            if len(self._head) < len(GZIP_MAGIC):
+                return []
+            chunk, self._head, self._detected = self._head, b"", True
+            if chunk.startswith(GZIP_MAGIC):
+                self._decompressor = zlib.decompressobj(31)
+        if self._decompressor is not None:
+            try:
+                chunk = self._decompressor.decompress(chunk)
+            except zlib.error as e:
+                raise TransferFormatError(f"Invalid gzip stream: {e}")
+        lines = (self._buffer + chunk).split(b"\n")
+        self._buffer = lines.pop()
+        return [line for line in lines if line.strip()]
+
+    def finish(self) -> List[bytes]:
+        lines = []
+        if not self._detected:
+            # flujo de menos de 2 bytes: no puede ser gzip
+            head, self._head, self._detected = self._head, b"", True
+            lines = self.feed(head)
+        if self._decompressor is not None:
+            self._buffer += self._decompressor.flush()
+            if not self._decompressor.eof:
+                raise TransferFormatError("Truncated gzip stream")
+        rest, self._buffer = self._buffer, b""
+        if rest.strip():
+            lines.append(rest)
+        return lines
+
+class ChatImporter:
+    """
+    Importación masiva: acumula registros y por cada lote de batch_size inserta
+    los chats (con sus ids nuevos), los mensajes y los contadores de los chats con
+    executemany, en una transacción por lote. Los chats reciben ids nuevos y los
+    mensajes se reasignan con el mapa id original -> id nuevo.
+
+    Si un registro es inválido la importación se detiene: los lotes anteriores
+    quedan confirmados y el error indica el número de registro.
+    """
+
+    def __init__(self, db: Session, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.transfer_repository = TransferRepository(db)
+        self.batch_size = batch_size
+        self.chat_ids: Dict[int, int] = {}
+        self._chats: List[Dict] = []
+        self._chat_sources: List[int] = []
+        self._messages: List[Dict] = []
+        self.records = 0
+        self.chats = 0
+        self.messages = 0
+        self._started = time.perf_counter()
+
+    def add_lines(self, lines: Iterable[bytes]):
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                raise TransferFormatError(f"Record {self.records + 1}: invalid JSON")
+            self.add(record)
+
+    def add(self, record: Dict):
+        self.records += 1
+        if not isinstance(record, dict):
+            raise TransferFormatError(f"Record {self.records}: expected an object")
+        kind = record.get("type")
+        if kind == "chat":
+            self._add_chat(record)
+        elif kind == "message":
+            self._messages.append(self._message_row(record))
+        elif kind == "header":
+            if record.get("format") != EXPORT_FORMAT or record.get("version", 0) > EXPORT_VERSION:
+                raise TransferFormatError(f"Record {self.records}: unsupported export format")
+        else:
+            raise TransferFormatError(f"Record {self.records}: unknown type {kind!r}")
+        if len(self._chats) + len(self._messages) >= self.batch_size:
+            self.flush()
+
+    def _add_chat(self, record: Dict):
+        source_id = record.get("id")
+        if not isinstance(source_id, int):
+            raise TransferFormatError(f"Record {self.records}: chat id must be an integer")
+        if source_id in self.chat_ids or source_id in self._chat_sources:
+            raise TransferFormatError(f"Record {self.records}: duplicated chat {source_id}")
+        self._chat_sources.append(source_id)
+        self._chats.append({
+            "title": record.get("title"),
+            "created_at": self._datetime(record.get("created_at"))
+        })
+
+    def _message_row(self, record: Dict) -> Dict:
+        if record.get("sender") not in SENDERS:
+            raise TransferFormatError(f"Record {self.records}: sender must be one of {', '.join(SENDERS)}")
+        if not isinstance(record.get("content"), str):
+            raise TransferFormatError(f"Record {self.records}: message content must be a string")
+        return {
+            "chat_id": record.get("chat_id"),
+            "sender": record["sender"],
+            "content": record["content"],
+            "created_at": self._datetime(record.get("created_at")),
+            "prompt_tokens": record.get("prompt_tokens"),
+            "completion_tokens": record.get("completion_tokens"),
+            "model": record.get("model"),
+            "latency_ms": record.get("latency_ms"),
+            "finish_reason": record.get("finish_reason"),
+            "_record": self.records
+        }
+
+    def _datetime(self, value) -> datetime:
+        """Fechas ISO 8601; sin zona horaria se toman como UTC y sin fecha, el momento actual"""
+        if value is None:
+            return datetime.now(timezone.utc)
+        try:
+            parsed = datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise TransferFormatError(f"Record {self.records}: invalid date {value!r}")
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+    def flush(self):
+        """Escribir el lote acumulado en una transacción"""
+        if not self._chats and not self._messages:
+            return
+        try:
+            if self._chats:
+                new_ids = self.transfer_repository.insert_chats(self._chats)
+                self.chat_ids.update(zip(self._chat_sources, new_ids))
+            if self._messages:
+                self._insert_messages()
+            self.transfer_repository.commit()
+        except Exception:
+            self.transfer_repository.rollback()
+            raise
+        if self._chats:
+            count_cache.invalidate("chats")
+        self.chats += len(self._chats)
+        self.messages += len(self._messages)
+        self._chats, self._chat_sources, self._messages = [], [], []
+
+    def _insert_messages(self):
+        counters = defaultdict(lambda: {"messages": 0, "last_message_at": None, "prompt_tokens": 0, "completion_tokens": 0})
+        for row in self._messages:
+            record = row.pop("_record")
+            chat_id = self.chat_ids.get(row["chat_id"])
+            if chat_id is None:
+                raise TransferFormatError(f"Record {record}: chat {row['chat_id']!r} must appear before its messages")
+            row["chat_id"] = chat_id
+            counter = counters[chat_id]
+            counter["messages"] += 1
+            if counter["last_message_at"] is None or counter["last_message_at"] < row["created_at"]:
+                counter["last_message_at"] = row["created_at"]
+            counter["prompt_tokens"] += row["prompt_tokens"] or 0
+            counter["completion_tokens"] += row["completion_tokens"] or 0
+        self.transfer_repository.insert_messages(self._messages)
+        self.transfer_repository.add_chat_counters(
+            [{"chat_id": chat_id, **counter} for chat_id, counter in counters.items()]
+        )
+
+    def finish(self) -> Dict:
+        """Escribir el último lote y devolver el resumen de la importación"""
+        self.flush()
+        elapsed = time.perf_counter() - self._started
+        rows = self.chats + self.messages
+        return {
+            "chats": self.chats,
+            "messages": self.messages,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(rows / elapsed, 1) if elapsed > 0 else None
+        }
+
+class TransferService:
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def export_chats(self, chat_ids: Optional[List[int]] = None, compress: bool = False) -> AsyncIterator[bytes]:
+        """Flujo NDJSON (gzip si compress) con los chats indicados o todos"""
+        return ChatExporter(chat_ids, compress).stream()
+
+    async def import_chats(self, chunks: AsyncIterator[bytes], batch_size: int = DEFAULT_BATCH_SIZE) -> Dict:
+        """
+        Importar un flujo NDJSON (gzip detectado por su cabecera). El cuerpo se lee
+        a medida que llega y cada lote se escribe en el executor de BD.
+        """
+        importer = ChatImporter(self.db, batch_size)
+        decoder = NdjsonDecoder()
+        lines = []
+        async for chunk in chunks:
+            lines.extend(decoder.feed(chunk))
+            if len(lines) >= batch_size:
+                await run_db(importer.add_lines, lines)
+                lines = []
+        lines.extend(decoder.finish())
+        await run_db(importer.add_lines, lines)
+        return await run_db(importer.finish)
@@ -0,0 +1,50 @@
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta, timezone
+from app.conf.db import run_db
+from app.repositories.usage import UsageRepository
+from app.utils.tokens import token_calibration
+from typing import Dict, Optional
+
+class UsageService:
+    
+    # ventana por defecto del resumen (las consultas recorren los mensajes de la ventana)
+    DEFAULT_WINDOW = timedelta(days=7)
+    
+    def __init__(self, db: Session):
+        self.usage_repository = UsageRepository(db)
+    
+    def _summary(self, since: datetime, until: Optional[datetime], top: int) -> Dict:
+        totals = self.usage_repository.get_totals(since, until)
+        return {
+            "since": since,
+            "until": until,
+            "totals": totals,
+            "by_model": self.usage_repository.get_usage_by_model(since, until),
+            "by_day": self.usage_repository.get_usage_by_day(since, until),
+            "finish_reasons": self.usage_repository.get_finish_reasons(since, until),
+            "largest_prompts": self.usage_repository.get_largest_prompts(since, until, top),
+            "top_chats": self.usage_repository.get_top_chats(top),
+            "token_estimator": token_calibration.to_dict()
+        }
+    
+    async def get_summary(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        top: int = 10
+    ) -> Dict:
+        """
+        Resumen del uso de tokens para planificar capacidad: totales, por modelo,
+        por día, respuestas cortadas (finish_reason), prompts más grandes y chats
+        que más consumen. Por defecto cubre los últimos 7 días.
+        """
+        if since is None:
+            since = datetime.now(timezone.utc) - self.DEFAULT_WINDOW
+        return await run_db(self._summary, since, until, top)
+    
+    async def get_chat_usage(self, chat_id: int) -> Dict:
+        """Uso acumulado de un chat"""
+        usage = await run_db(self.usage_repository.get_chat_usage, chat_id)
+        if usage is None:
+            raise ValueError("Chat not found")
+        return usage
@@ -0,0 +1,182 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+from app.conf.settings import Settings, get_settings
+
+class CachedMessage(NamedTuple):
+    id: int
+    created_at: datetime
+    sender: str
+    content: str
+
+    @classmethod
+    def from_entity(cls, message) -> "CachedMessage":
+        return cls(message.id, message.created_at, message.sender, message.content)
+
+class ConversationEntry:
+    """Mensajes recientes de un chat, del más nuevo al más antiguo"""
+
+    def __init__(self, messages: List[CachedMessage], complete: bool):
+        self.messages = messages
+        # True si no hay mensajes más antiguos en la BD que los cacheados
+        self.complete = complete
+        self.loaded_at = time.monotonic()
+
+class LoadToken:
+    """Marca una carga desde BD en curso; se invalida si hay escrituras mientras tanto"""
+
+    def __init__(self, chat_id: int):
+        self.chat_id = chat_id
+        self.stale = False
+
+class ConversationCache:
+    """
+    Cache LRU con TTL del historial reciente por chat_id.
+
+    Es local al proceso: cada worker de uvicorn tiene su propia copia y el TTL
+    acota cuánto puede quedar desactualizada frente a escrituras de otros workers.
+    """
+
+    def __init__(self, max_chats: int, ttl_seconds: float, max_messages: int):
+        self.max_chats = max_chats
+        self.ttl_seconds = ttl_seconds
+        self.max_messages = max_messages
+        self._entries: "OrderedDict[int, ConversationEntry]" = OrderedDict()
+        self._loading: Dict[int, List[LoadToken]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_chats > 0
+
+    def _get_entry(self, chat_id: int) -> Optional[ConversationEntry]:
+        entry = self._entries.get(chat_id)
+        if entry is None:
+            return None
+        if time.monotonic() - entry.loaded_at > self.ttl_seconds:
+            del self._entries[chat_id]
+            self.evictions += 1
+            return None
+        return entry
+
+    def get(self, chat_id: int) -> Optional[ConversationEntry]:
+        """Obtener la entrada de un chat (None si no está o expiró)"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._get_entry(chat_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(chat_id)
+            self.hits += 1
+            return entry
+
+    def contains(self, chat_id: int) -> bool:
+        """Saber si el chat está en cache (implica que el chat existe); no cuenta como hit/miss"""
+        if not self.enabled:
+            return False
+        with self._lock:
+            return self._get_entry(chat_id) is not None
+
+    def begin_load(self, chat_id: int) -> LoadToken:
+        """Registrar una lectura desde BD que luego se guardará con put()"""
+        token = LoadToken(chat_id)
+        with self._lock:
+            self._loading.setdefault(chat_id, []).append(token)
+        return token
+
+    def _finish_load(self, token: LoadToken):
+        tokens = self._loading.get(token.chat_id, [])
+        if token in tokens:
+            tokens.remove(token)
+        if not tokens:
+            self._loading.pop(token.chat_id, None)
+
+    def _mark_written(self, chat_id: int):
+        for token in self._loading.get(chat_id, ()):
+            token.stale = True
+
+    def put(self, token: LoadToken, messages: List[CachedMessage], complete: bool):
+        """
+        Guardar los mensajes recientes de un chat, del más nuevo al más antiguo.
+        Se descarta si hubo escrituras en el chat desde begin_load().
+        """
+        with self._lock:
+            self._finish_load(token)
+            if not self.enabled or token.stale:
+                return
+            self._entries[token.chat_id] = ConversationEntry(
+                messages[:self.max_messages],
+                complete and len(messages) <= self.max_messages
+            )
+            self._entries.move_to_end(token.chat_id)
+            while len(self._entries) > self.max_chats:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def append(self, chat_id: int, messages: List[CachedMessage]):
+        """Agregar mensajes recién guardados (solo si el chat ya está en cache)"""
+        with self._lock:
+            self._mark_written(chat_id)
+            entry = self._get_entry(chat_id)
+            if entry is None:
+                return
+            entry.messages = list(reversed(messages)) + entry.messages
+            if len(entry.messages) > self.max_messages:
+                entry.messages = entry.messages[:self.max_messages]
+                entry.complete = False
+
+    def update_content(self, chat_id: int, message_id: int, content: str):
+        """Reflejar la edición del contenido de un mensaje cacheado"""
+        with self._lock:
+            self._mark_written(chat_id)
+            entry = self._get_entry(chat_id)
+            if entry is None:
+                return
+            entry.messages = [
+                message._replace(content=content) if message.id == message_id else message
+                for message in entry.messages
+            ]
+
+    def invalidate(self, chat_id: int):
+        """Eliminar un chat de la cache"""
+        with self._lock:
+            self._mark_written(chat_id)
+            if self._entries.pop(chat_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "chats": len(self._entries),
+            "max_chats": self.max_chats,
+            "ttl_seconds": self.ttl_seconds,
+            "max_messages": self.max_messages,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
+
+def build_conversation_cache(settings: Settings) -> ConversationCache:
+    return ConversationCache(
+        max_chats=settings.conversation_cache_max_chats,
+        ttl_seconds=settings.conversation_cache_ttl_seconds,
+        max_messages=settings.conversation_cache_max_messages
+    )
+
+# Instancia global de la cache de conversaciones
+conversation_cache = build_conversation_cache(get_settings())
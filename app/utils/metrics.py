@@ -0,0 +1,330 @@
+import bisect
+import functools
+from abc import ABC, abstractmethod
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from app.conf.logging import current_repository_method
+
+# Buckets por defecto de Prometheus (segundos)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Generaciones del LLM: de décimas de segundo a minutos
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+RATE_BUCKETS = (1, 2, 5, 10, 15, 20, 30, 40, 60, 80, 120, 200)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class _Metric(ABC):
+    """Base de las métricas: cada tipo genera sus muestras en el formato de texto de Prometheus"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    @abstractmethod
+    def _samples(self) -> List[str]:
+        """Líneas de las series de la métrica (sin HELP/TYPE)"""
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+class Gauge(_Metric):
+    """Gauge; con `function` el valor se lee al momento del scrape"""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        function: Optional[Callable[[], float]] = None
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function = function
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        if self._function is not None:
+            return [f"{self.name} {_format_value(self._function())}"]
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # por serie: [conteo por bucket (no acumulado) + overflow, suma, total]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(series[0]), series[1], series[2]) for key, series in self._series.items()]
+        lines = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+class MetricsRegistry:
+    """Registro de métricas en memoria con exposición en formato de texto de Prometheus"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (), function=None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, function))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+# Registro global de métricas de la aplicación
+metrics_registry = MetricsRegistry()
+
+# HTTP
+http_request_duration = metrics_registry.histogram(
+    "http_request_duration_seconds", "Latencia de las peticiones HTTP por ruta", ("method", "route", "status")
+)
+http_requests_in_flight = metrics_registry.gauge(
+    "http_requests_in_flight", "Peticiones HTTP en curso"
+)
+
+# LLM
+llm_time_to_first_token = metrics_registry.histogram(
+    "llm_time_to_first_token_seconds", "Tiempo hasta el primer token del LLM (streaming)", buckets=LLM_BUCKETS
+)
+llm_generation_duration = metrics_registry.histogram(
+    "llm_generation_seconds", "Duración total de la generación del LLM", ("mode",), buckets=LLM_BUCKETS
+)
+llm_tokens_per_second = metrics_registry.histogram(
+    "llm_tokens_per_second", "Tokens generados por segundo según el campo usage", ("mode",), buckets=RATE_BUCKETS
+)
+llm_tokens_total = metrics_registry.counter(
+    "llm_tokens_total", "Tokens reportados por LM Studio en usage", ("type",)
+)
+llm_requests_in_flight = metrics_registry.gauge(
+    "llm_requests_in_flight", "Generaciones en curso contra LM Studio"
+)
+
+# Servicio de completions
+completion_stage_duration = metrics_registry.histogram(
+    "completion_stage_duration_seconds", "Duración de cada etapa de una completion", ("operation", "stage")
+)
+completion_jobs_total = metrics_registry.counter(
+    "completion_jobs_total", "Jobs de completions procesados por el worker, por resultado", ("outcome",)
+)
+conversation_summaries_total = metrics_registry.counter(
+    "conversation_summaries_total", "Plegados de mensajes antiguos en el resumen de un chat, por resultado", ("outcome",)
+)
+message_embeddings_total = metrics_registry.counter(
+    "message_embeddings_total", "Mensajes embebidos (indexed) y tareas de indexación fallidas o canceladas", ("outcome",)
+)
+
+# Base de datos
+db_query_duration = metrics_registry.histogram(
+    "db_query_duration_seconds", "Duración de los métodos de los repositorios", ("repository", "method")
+)
+
+db_pool_checkout_wait = metrics_registry.histogram(
+    "db_pool_checkout_wait_seconds", "Espera para obtener una conexión del pool de BD"
+)
+db_pool_checkout_timeouts = metrics_registry.counter(
+    "db_pool_checkout_timeouts_total", "Checkouts del pool de BD que agotaron DB_POOL_TIMEOUT"
+)
+
+def record_usage(usage: Optional[Dict], elapsed: float, mode: str):
+    """Registrar los tokens del campo usage de una respuesta y la velocidad de generación"""
+    if not usage:
+        return
+    completion_tokens = usage.get("completion_tokens") or 0
+    prompt_tokens = usage.get("prompt_tokens") or 0
+    llm_tokens_total.inc(prompt_tokens, type="prompt")
+    llm_tokens_total.inc(completion_tokens, type="completion")
+    if completion_tokens and elapsed > 0:
+        llm_tokens_per_second.observe(completion_tokens / elapsed, mode=mode)
+
+@contextmanager
+def timed(histogram: Histogram, **labels):
+    """Medir la duración de un bloque (también sirve alrededor de un await)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - started, **labels)
+
+def instrument_repository(name: str):
+    """
+    Decorador de clase: mide la duración de cada método público del repositorio
+    en db_query_duration_seconds{repository, method} y deja el método en
+    current_repository_method para el log de consultas lentas
+    """
+    def decorate(cls):
+        for attribute, method in list(vars(cls).items()):
+            if attribute.startswith("_") or not callable(method):
+                continue
+            setattr(cls, attribute, _timed_method(method, name, attribute))
+        return cls
+    return decorate
+
+def _timed_method(method, repository: str, method_name: str):
+    qualified_name = f"{repository}.{method_name}"
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        token = current_repository_method.set(qualified_name)
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            db_query_duration.observe(time.perf_counter() - started, repository=repository, method=method_name)
+            current_repository_method.reset(token)
+    return wrapper
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI (sin BaseHTTPMiddleware, para no envolver el body) que mide la
+    latencia por plantilla de ruta y las peticiones en curso. En streaming la
+    duración incluye todo el envío del body.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec()
+            route = scope.get("route")
+            http_request_duration.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                # plantilla de la ruta para no crear una serie por cada chat_id
+                route=getattr(route, "path", "unmatched"),
+                status=str(status["code"])
+            )
@@ -0,0 +1,110 @@
+import base64
+import json
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+from sqlalchemy import or_, and_
+from app.conf.settings import get_settings
+
+CursorKey = Tuple[datetime, int]
+# resultados ordenados por relevancia: (backend, rank del backend o None si no hay ranking, id).
+# El rank solo es comparable dentro del mismo backend (bm25, RANK de SQL Server o ninguno)
+RankCursorKey = Tuple[str, Optional[float], int]
+
+class InvalidCursorError(ValueError):
+    """Cursor de paginación mal formado"""
+    pass
+
+def encode_cursor(key: CursorKey) -> str:
+    """Codificar la clave (created_at, id) de una fila como cursor opaco"""
+    created_at, row_id = key
+    raw = json.dumps({"c": created_at.isoformat(), "i": row_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> CursorKey:
+    """Decodificar un cursor generado por encode_cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(data["c"]), int(data["i"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursorError("Invalid cursor") from e
+
+def encode_rank_cursor(key: RankCursorKey) -> str:
+    """Codificar la clave (backend, rank, id) de un resultado de búsqueda como cursor opaco"""
+    backend, rank, row_id = key
+    raw = json.dumps({"b": backend, "r": rank, "i": row_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_rank_cursor(cursor: str) -> RankCursorKey:
+    """Decodificar un cursor generado por encode_rank_cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        rank = data["r"]
+        return str(data["b"]), (float(rank) if rank is not None else None), int(data["i"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursorError("Invalid cursor") from e
+
+def keyset_condition(created_at_column, id_column, key: CursorKey, newer: bool):
+    """Condición de keyset sobre (created_at, id): filas posteriores (newer) o anteriores al cursor"""
+    created_at, row_id = key
+    if newer:
+        return or_(
+            created_at_column > created_at,
+            and_(created_at_column == created_at, id_column > row_id)
+        )
+    return or_(
+        created_at_column < created_at,
+        and_(created_at_column == created_at, id_column < row_id)
+    )
+
+def page_cursors(
+    rows: List[Any],
+    has_more: bool,
+    cursor: Optional[str],
+    direction: str
+) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Calcular (next_cursor, prev_cursor) de una página ya ordenada para mostrar.
+
+    Args:
+        rows: Filas de la página (con atributos created_at e id)
+        has_more: Si existían más filas en la dirección recorrida
+        cursor: Cursor con el que se pidió la página (None = extremo inicial)
+        direction: "next" (hacia adelante) o "prev" (hacia atrás)
+    """
+    if not rows:
+        return None, None
+    first = encode_cursor((rows[0].created_at, rows[0].id))
+    last = encode_cursor((rows[-1].created_at, rows[-1].id))
+    if direction == "next":
+        return (last if has_more else None), (first if cursor else None)
+    return (last if cursor else None), (first if has_more else None)
+
+class CountCache:
+    """Cache con TTL de conteos totales (evita un COUNT completo por cada página)"""
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._values: Dict[Hashable, Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], int]) -> int:
+        now = time.monotonic()
+        with self._lock:
+            cached = self._values.get(key)
+            if cached and cached[0] > now:
+                return cached[1]
+        value = compute()
+        with self._lock:
+            self._values[key] = (now + self.ttl_seconds, value)
+        return value
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._values.pop(key, None)
+
+# Instancia global para los conteos opcionales de los listados
+count_cache = CountCache(ttl_seconds=get_settings().pagination_count_ttl_seconds)
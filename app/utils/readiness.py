@@ -0,0 +1,63 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional
+
+class ReadinessProbe:
+    """
+    Comprobación de disponibilidad para /readyz. El resultado se reutiliza durante
+    unos segundos y las peticiones concurrentes comparten una sola comprobación,
+    así los probes del orquestador no generan una consulta a la BD cada uno.
+    Nada se comprueba al arrancar: la primera llamada hace la primera comprobación.
+    """
+
+    def __init__(self, check: Callable[[], Awaitable[Dict]], cache_seconds: float, timeout: float):
+        self.check = check
+        self.cache_seconds = cache_seconds
+        self.timeout = timeout
+        self._result: Optional[Dict] = None
+        self._checked_at = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _fresh(self) -> bool:
+        return self._result is not None and time.monotonic() - self._checked_at < self.cache_seconds
+
+    async def status(self) -> Dict:
+        if self._fresh():
+            return self._result
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if not self._fresh():
+                self._result = await self._run_check()
+                self._checked_at = time.monotonic()
+        return self._result
+
+    async def _run_check(self) -> Dict:
+        started = time.perf_counter()
+        try:
+            details = await asyncio.wait_for(self.check(), self.timeout)
+            error = None
+        except asyncio.TimeoutError:
+            details, error = {}, f"timed out after {self.timeout}s"
+        except Exception as e:
+            details, error = {}, str(e)
+        revision = details.get("schema_revision")
+        expected = details.get("expected_schema_revision")
+        if error is None and revision is None:
+            schema_error = "database schema not migrated (python -m app.cli migrate)"
+        elif error is None and expected is not None and revision != expected:
+            # p. ej. una BD en 0003 cuando el código ya usa columnas de 0009
+            schema_error = f"database schema at revision {revision}, expected {expected} (python -m app.cli migrate)"
+        else:
+            schema_error = None
+        result = {
+            "ready": error is None and schema_error is None,
+            "database": "ok" if error is None else "unavailable",
+            "latency_ms": round((time.perf_counter() - started) * 1000, 3),
+            "checked_at": datetime.now().isoformat()
+        }
+        result.update(details)
+        if error is not None or schema_error is not None:
+            result["error"] = error or schema_error
+        return result
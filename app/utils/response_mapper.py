@@ -2,13 +2,40 @@ from datetime import datetime
 from typing import Any, Optional, Dict
 
 class PaginationMeta:
-    def __init__(self, current_page: int, total_items: int, items_per_page: int = 16):
+    def __init__(
+        self,
+        current_page: Optional[int],
+        total_items: Optional[int],
+        items_per_page: int = 16,
+        next_cursor: Optional[str] = None,
+        prev_cursor: Optional[str] = None
+    ):
         self.current_page = current_page
         self.total_items = total_items
         self.items_per_page = items_per_page
-        self.total_pages = (total_items + items_per_page - 1) // items_per_page
-        self.has_next = current_page < self.total_pages
-        self.has_prev = current_page > 1
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total_pages = (
+            (total_items + items_per_page - 1) // items_per_page
+            if total_items is not None else None
+        )
+        if current_page is not None and self.total_pages is not None:
+            self.has_next = current_page < self.total_pages
+            self.has_prev = current_page > 1
+        else:
+            # paginación por cursor (keyset): no hay número de página
+            self.has_next = next_cursor is not None
+            self.has_prev = prev_cursor is not None
+
+    @classmethod
+    def from_cursors(
+        cls,
+        items_per_page: int,
+        next_cursor: Optional[str],
+        prev_cursor: Optional[str],
+        total_items: Optional[int] = None
+    ) -> "PaginationMeta":
+        return cls(None, total_items, items_per_page, next_cursor, prev_cursor)
 
     def to_dict(self) -> Dict:
         return {
@@ -17,7 +44,9 @@ class PaginationMeta:
             "items_per_page": self.items_per_page,
             "total_pages": self.total_pages,
             "has_next": self.has_next,
-            "has_prev": self.has_prev
+            "has_prev": self.has_prev,
+            "next_cursor": self.next_cursor,
+            "prev_cursor": self.prev_cursor
         }
 
 class ResponseMapper:
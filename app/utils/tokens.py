@@ -0,0 +1,60 @@
+import math
+import threading
+from typing import Dict, List, Optional
+
+# Estimación local (sin tokenizer del modelo): los BPE de Qwen rondan
+# ~3.5 caracteres por token en español/inglés
+CHARS_PER_TOKEN = 3.5
+
+# Tokens extra por mensaje que añade la plantilla de chat (<|im_start|>role ... <|im_end|>)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+def estimate_tokens(text: str) -> int:
+    """Estimar el número de tokens de un texto"""
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def estimate_message_tokens(message: Dict[str, str]) -> int:
+    """Estimar los tokens de un mensaje en formato OpenAI ({"role", "content"})"""
+    return estimate_tokens(message.get("content", "")) + MESSAGE_OVERHEAD_TOKENS
+
+def estimate_prompt_tokens(messages: List[Dict[str, str]], system_message: Optional[str] = None) -> int:
+    """Estimar los tokens del prompt completo que se envía al LLM"""
+    total = sum(estimate_message_tokens(message) for message in messages)
+    if system_message:
+        total += estimate_tokens(system_message) + MESSAGE_OVERHEAD_TOKENS
+    return total
+
+class TokenCalibration:
+    """
+    Corrige la estimación local con los prompt_tokens reales que devuelve LM Studio:
+    mantiene una media móvil (EWMA) de real / estimado, acotada para que una
+    respuesta anómala no deforme la ventana de contexto.
+    """
+
+    def __init__(self, alpha: float = 0.1, min_ratio: float = 0.5, max_ratio: float = 2.0):
+        self.alpha = alpha
+        self.min_ratio = min_ratio
+        self.max_ratio = max_ratio
+        self.ratio = 1.0
+        self.samples = 0
+        self._lock = threading.Lock()
+
+    def observe(self, estimated: int, actual: Optional[int]):
+        if not estimated or not actual:
+            return
+        ratio = min(self.max_ratio, max(self.min_ratio, actual / estimated))
+        with self._lock:
+            self.ratio = ratio if self.samples == 0 else self.ratio + self.alpha * (ratio - self.ratio)
+            self.samples += 1
+
+    def to_dict(self) -> Dict:
+        return {
+            "ratio": round(self.ratio, 4),
+            "samples": self.samples,
+            "chars_per_token": round(CHARS_PER_TOKEN / self.ratio, 3)
+        }
+
+# Calibración global (local al proceso), alimentada por las respuestas del LLM
+token_calibration = TokenCalibration()
@@ -0,0 +1,182 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Callable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # dependencia opcional: solo la usa CONTEXT_RETRIEVAL_ENABLED
+    np = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos (un solo proceso por índice)
+    fcntl = None
+
+# filas reservadas al crear el índice; después la capacidad se duplica
+MIN_CAPACITY = 4096
+# filas por bloque al buscar: acota la memoria temporal de los puntajes
+SEARCH_BLOCK_ROWS = 1 << 16
+# filas leídas de la BD por consulta al sincronizar
+SYNC_BATCH_SIZE = 10000
+
+def require_numpy():
+    if np is None:
+        raise RuntimeError("Embedding retrieval requires numpy (pip install numpy)")
+
+def normalize(vectors: "np.ndarray") -> "np.ndarray":
+    """Filas con norma 1 (las vacías quedan en cero): el producto punto pasa a ser la similitud coseno"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.maximum(norms, 1e-12)).astype(np.float32, copy=False)
+
+class VectorIndex:
+    """
+    Índice de embeddings en archivos mapeados en memoria (numpy.memmap) dentro
+    de un directorio: vectors.f32 (filas × dimensiones, float32 con norma 1),
+    ids.i64 (id de message_embeddings de cada fila) y meta.json (modelo,
+    dimensiones, filas válidas). El SO carga las páginas bajo demanda, así un
+    millón de vectores no ocupa memoria del proceso hasta que se recorren.
+
+    Es una copia derivada de message_embeddings: sync() agrega los ids posteriores
+    al último que tiene, así que se puede borrar y reconstruir en cualquier momento.
+    Varios procesos comparten los archivos (quien escribe toma un flock); las filas
+    de embeddings borrados quedan hasta reconstruirlo y la búsqueda las descarta
+    al leer los mensajes. La búsqueda es exacta: producto punto por bloques.
+    """
+
+    def __init__(self, path: str, model: str):
+        require_numpy()
+        self.path = path
+        self.model = model
+        self.dimensions: Optional[int] = None
+        self.count = 0
+        self.last_id = 0
+        self._capacity = 0
+        self._vectors = None
+        self._ids = None
+        self._lock = threading.RLock()
+        os.makedirs(path, exist_ok=True)
+        with self._writer():
+            pass
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _load(self):
+        """Leer meta.json (lo que otro proceso haya agregado) y mapear los archivos"""
+        try:
+            with open(self._file("meta.json"), encoding="utf-8") as file:
+                meta = json.load(file)
+        except FileNotFoundError:
+            meta = None
+        if meta is None or meta["model"] != self.model:
+            # otro modelo: sus vectores no son comparables, se empieza de cero
+            self._reset_files()
+            return
+        self.dimensions = meta["dimensions"]
+        self.count = meta["count"]
+        self.last_id = meta["last_id"]
+        if self.count > self._capacity or self._vectors is None:
+            self._map(max(self.count, MIN_CAPACITY))
+
+    def _reset_files(self):
+        for name in ("vectors.f32", "ids.i64", "meta.json"):
+            try:
+                os.remove(self._file(name))
+            except FileNotFoundError:
+                pass
+        self.dimensions = None
+        self.count = self.last_id = self._capacity = 0
+        self._vectors = self._ids = None
+
+    def _map(self, capacity: int):
+        """Agrandar los archivos a capacity filas (dispersos: no escribe ceros) y volver a mapearlos"""
+        for name, row_bytes in (("vectors.f32", 4 * self.dimensions), ("ids.i64", 8)):
+            with open(self._file(name), "ab") as file:
+                if file.tell() < capacity * row_bytes:
+                    file.truncate(capacity * row_bytes)
+        self._vectors = np.memmap(self._file("vectors.f32"), dtype="<f4", mode="r+", shape=(capacity, self.dimensions))
+        self._ids = np.memmap(self._file("ids.i64"), dtype="<i8", mode="r+", shape=(capacity,))
+        self._capacity = capacity
+
+    def _save_meta(self):
+        meta = {"model": self.model, "dimensions": self.dimensions, "count": self.count, "last_id": self.last_id}
+        temporary = self._file("meta.json.tmp")
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(meta, file)
+        # reemplazo atómico: un lector ve el meta anterior o el nuevo, nunca uno a medias
+        os.replace(temporary, self._file("meta.json"))
+
+    @contextmanager
+    def _writer(self):
+        """Exclusión entre hilos y, si se puede, entre procesos; relee lo que escribieron los demás"""
+        with self._lock, open(self._file("lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._load()
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _append(self, ids: "np.ndarray", vectors: "np.ndarray"):
+        if self.dimensions is None:
+            self.dimensions = vectors.shape[1]
+        elif vectors.shape[1] != self.dimensions:
+            raise ValueError(f"Expected {self.dimensions}-dimensional vectors, got {vectors.shape[1]}")
+        end = self.count + len(ids)
+        if end > self._capacity:
+            self._map(max(end, 2 * self._capacity, MIN_CAPACITY))
+        self._vectors[self.count:end] = vectors
+        self._ids[self.count:end] = ids
+        # datos antes que meta.json: si el proceso cae en medio, las filas sin meta se ignoran
+        self._vectors.flush()
+        self._ids.flush()
+        self.count = end
+        self.last_id = int(ids[-1])
+        self._save_meta()
+
+    def sync(self, fetch: Callable[[int, int], Sequence[Tuple[int, bytes]]], batch_size: int = SYNC_BATCH_SIZE) -> int:
+        """
+        Agregar las filas posteriores a last_id. fetch(after_id, limit) devuelve
+        (id, vector en bytes) en orden de id. Devuelve cuántas filas se agregaron.
+        """
+        added = 0
+        with self._writer():
+            while True:
+                rows = fetch(self.last_id, batch_size)
+                if not rows:
+                    break
+                ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+                vectors = np.frombuffer(b"".join(row[1] for row in rows), dtype="<f4").reshape(len(rows), -1)
+                self._append(ids, vectors)
+                added += len(rows)
+                if len(rows) < batch_size:
+                    break
+        return added
+
+    def reset(self):
+        """Vaciar el índice (reconstruirlo desde cero con sync)"""
+        with self._writer():
+            self._reset_files()
+
+    def search(self, query: "np.ndarray", k: int, min_score: float = -1.0) -> List[Tuple[int, float]]:
+        """Los k ids más parecidos a query (norma 1) con su similitud, de mayor a menor"""
+        with self._lock:
+            vectors, ids, count = self._vectors, self._ids, self.count
+        if count == 0 or query.shape[0] != vectors.shape[1]:
+            return []
+        query = query.astype(np.float32, copy=False)
+        best_scores, best_ids = [], []
+        for start in range(0, count, SEARCH_BLOCK_ROWS):
+            stop = min(count, start + SEARCH_BLOCK_ROWS)
+            scores = vectors[start:stop] @ query
+            top = np.argpartition(scores, -k)[-k:] if len(scores) > k else np.arange(len(scores))
+            best_scores.append(scores[top])
+            best_ids.append(ids[start:stop][top])
+        scores = np.concatenate(best_scores)
+        found = np.concatenate(best_ids)
+        order = np.argsort(-scores)[:k]
+        return [(int(found[i]), float(scores[i])) for i in order if scores[i] >= min_score]
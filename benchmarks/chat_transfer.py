@@ -0,0 +1,110 @@
+"""
+Benchmark de la exportación/importación masiva de chats (NDJSON) sobre SQLite.
+
+Genera un archivo sintético de --chats x --messages-per-chat mensajes, lo importa
+con cada tamaño de lote (filas/s; un lote = una transacción con executemany) y
+exporta la base resultante en plano y gzip (filas/s y pico de memoria de Python,
+que no debe crecer con el número de filas).
+
+Uso:
+    python -m benchmarks.chat_transfer --chats 1000 --messages-per-chat 1000 --batch-sizes 100 1000 5000
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+
+def setup_database(path: str):
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    from app.conf.db import Base, engine
+    from app.entities import chats, messages, search  # noqa: F401 (registra las tablas y los índices FTS5)
+
+    engine.echo = False
+    Base.metadata.create_all(bind=engine)
+
+
+def write_dataset(path: str, chats: int, messages_per_chat: int, content_chars: int) -> int:
+    """Archivo NDJSON gzip con el formato de la exportación"""
+    content = ("lorem ipsum " * (content_chars // 12 + 1))[:content_chars]
+    with gzip.open(path, "wt", compresslevel=1) as output:
+        output.write(json.dumps({"type": "header", "format": "chat-export", "version": 1}) + "\n")
+        for chat_id in range(1, chats + 1):
+            output.write(json.dumps({"type": "chat", "id": chat_id, "title": f"chat {chat_id}",
+                                     "created_at": "2024-01-01T00:00:00"}) + "\n")
+        for chat_id in range(1, chats + 1):
+            for i in range(messages_per_chat):
+                sender = "user" if i % 2 == 0 else "llm"
+                output.write(json.dumps({
+                    "type": "message", "chat_id": chat_id, "sender": sender, "content": content,
+                    "created_at": f"2024-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}",
+                    "completion_tokens": 20 if sender == "llm" else None
+                }) + "\n")
+    return chats * (messages_per_chat + 1)
+
+
+def run_import(path: str, batch_size: int) -> dict:
+    from app.conf.db import SessionLocal
+    from app.services.transfer import ChatImporter, NdjsonDecoder
+
+    decoder = NdjsonDecoder()
+    with SessionLocal() as db, open(path, "rb") as source:
+        importer = ChatImporter(db, batch_size)
+        while chunk := source.read(1 << 20):
+            importer.add_lines(decoder.feed(chunk))
+        importer.add_lines(decoder.finish())
+        stats = importer.finish()
+    return {"case": "import", "batch_size": batch_size, **stats}
+
+
+def run_export(compress: bool, batch_size: int, rows: int) -> dict:
+    from app.services.transfer import ChatExporter
+
+    exporter = ChatExporter(compress=compress, batch_size=batch_size)
+    started = time.perf_counter()
+    written = sum(len(chunk) for chunk in exporter.chunks())
+    elapsed = time.perf_counter() - started
+    # segunda pasada solo para el pico de memoria (tracemalloc ralentiza la primera)
+    tracemalloc.start()
+    for _ in exporter.chunks():
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "case": "export gzip" if compress else "export",
+        "batch_size": batch_size,
+        "bytes": written,
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(rows / elapsed, 1),
+        "peak_python_mb": round(peak / 1024 / 1024, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=200, help="chats del dataset")
+    parser.add_argument("--messages-per-chat", type=int, default=500, help="mensajes por chat")
+    parser.add_argument("--content-chars", type=int, default=200, help="largo de cada mensaje")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[100, 1000, 5000], help="registros por lote")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_database(os.path.join(tmp, "bench.db"))
+        dataset = os.path.join(tmp, "dataset.ndjson.gz")
+        rows = write_dataset(dataset, args.chats, args.messages_per_chat, args.content_chars)
+        print({"dataset_rows": rows, "dataset_bytes": os.path.getsize(dataset)})
+        for batch_size in args.batch_sizes:
+            print(run_import(dataset, batch_size))
+        for compress in (False, True):
+            # la base tiene el dataset importado una vez por tamaño de lote
+            print(run_export(compress, max(args.batch_sizes), rows * len(args.batch_sizes)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark de saturación del pool de conexiones a la BD.
+
+Lanza N hilos que repiten checkout -> consulta -> retener la conexión unos ms ->
+checkin contra una BD SQLite en disco, con el mismo InstrumentedQueuePool que usa
+la app. Al pasar de pool_size + max_overflow hilos la espera en el checkout crece
+y, con un pool_timeout corto, aparecen timeouts en lugar de encolarse sin límite.
+
+Uso:
+    python -m benchmarks.db_pool_saturation --pool-size 4 --max-overflow 4 --concurrency 4 8 16 32
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+
+def build_engine(path: str, pool_size: int, max_overflow: int, pool_timeout: float):
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{path}")
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    from sqlalchemy import create_engine
+    from app.conf.pool import InstrumentedQueuePool
+
+    return create_engine(
+        f"sqlite:///{path}",
+        poolclass=InstrumentedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+        pool_pre_ping=True,
+        connect_args={"check_same_thread": False}
+    )
+
+
+def worker(engine, checkouts: int, hold_seconds: float, errors: list):
+    from sqlalchemy import exc, text
+
+    for _ in range(checkouts):
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+                # simula una transacción que retiene la conexión (p. ej. una consulta lenta)
+                time.sleep(hold_seconds)
+        except exc.TimeoutError:
+            errors.append("timeout")
+
+
+def run_case(path: str, args, concurrency: int) -> dict:
+    engine = build_engine(path, args.pool_size, args.max_overflow, args.pool_timeout)
+    errors = []
+    threads = [
+        threading.Thread(target=worker, args=(engine, args.checkouts, args.hold_ms / 1000, errors))
+        for _ in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    stats = engine.pool.to_dict()
+    engine.dispose()
+    return {
+        "concurrency": concurrency,
+        "capacity": args.pool_size + args.max_overflow,
+        "checkouts": stats["checkouts"],
+        "timeouts": stats["timeouts"],
+        "checkouts_per_s": round(stats["checkouts"] / elapsed, 1),
+        "wait_ms": stats["checkout_wait_ms"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--max-overflow", type=int, default=4)
+    parser.add_argument("--pool-timeout", type=float, default=0.5, help="segundos antes de TimeoutError")
+    parser.add_argument("--hold-ms", type=float, default=20, help="tiempo que cada hilo retiene la conexión")
+    parser.add_argument("--checkouts", type=int, default=50, help="checkouts por hilo")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[4, 8, 16, 32, 64])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        for concurrency in args.concurrency:
+            print(run_case(path, args, concurrency))
+
+
+if __name__ == "__main__":
+    main()
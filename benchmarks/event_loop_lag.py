@@ -0,0 +1,117 @@
+"""
+Benchmark de latencia del event loop con acceso a BD bloqueante vs executor.
+
+Simula turnos concurrentes de completion (lecturas de contexto + inserción de
+mensajes) contra SQLite mientras una tarea "heartbeat" mide cuánto se retrasa
+el event loop. En modo "blocking" los repositorios se llaman directamente
+desde el loop (comportamiento anterior); en modo "executor" se usan vía run_db.
+
+Uso:
+    python -m benchmarks.event_loop_lag --messages 200000 --concurrency 16 --turns 5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+
+def setup_database(path: str, messages: int):
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    from app.conf.db import Base, engine
+    from app.entities.chats import Chat
+    from app.entities.messages import Message
+
+    engine.echo = False
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        chat_id = conn.execute(Chat.__table__.insert().values(title="bench")).inserted_primary_key[0]
+        rows = [
+            {"chat_id": chat_id, "sender": "user" if i % 2 == 0 else "llm", "content": f"mensaje {i}"}
+            for i in range(messages)
+        ]
+        conn.execute(Message.__table__.insert(), rows)
+    return chat_id
+
+
+def completion_turn(chat_id: int):
+    """Un turno de completion sin el LLM: lecturas de contexto + dos inserts"""
+    from app.conf.db import SessionLocal
+    from app.repositories.chats import ChatRepository
+    from app.repositories.messages import MessageRepository
+    from app.services.context_builder import ContextBuilder
+
+    with SessionLocal() as db:
+        ChatRepository(db).get_chat_by_id(chat_id)
+        repository = MessageRepository(db)
+        ContextBuilder(repository).build(chat_id, "hola")
+        repository.create_message(chat_id, "user", "hola")
+        repository.create_message(chat_id, "llm", "respuesta")
+
+
+def percentile(values: list, pct: float) -> float:
+    """Percentil por rango más cercano sobre una lista ordenada"""
+    index = max(0, min(len(values) - 1, round(pct / 100 * len(values)) - 1))
+    return values[index]
+
+
+async def heartbeat(interval: float, lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, time.perf_counter() - expected))
+
+
+async def run_mode(mode: str, chat_id: int, concurrency: int, turns: int, interval: float) -> dict:
+    from app.conf.db import run_db
+
+    async def worker():
+        for _ in range(turns):
+            if mode == "blocking":
+                completion_turn(chat_id)
+            else:
+                await run_db(completion_turn, chat_id)
+            # cede el control como lo haría la espera al LLM
+            await asyncio.sleep(0)
+
+    lags = []
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(heartbeat(interval, lags, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await monitor
+
+    lags_ms = sorted(lag * 1000 for lag in lags) or [0.0]
+    return {
+        "mode": mode,
+        "turns": concurrency * turns,
+        "elapsed_s": round(elapsed, 3),
+        "lag_samples": len(lags),
+        "lag_p50_ms": round(percentile(lags_ms, 50), 2),
+        "lag_p95_ms": round(percentile(lags_ms, 95), 2),
+        "lag_max_ms": round(lags_ms[-1], 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=200000, help="mensajes precargados en el chat")
+    parser.add_argument("--concurrency", type=int, default=16, help="turnos concurrentes")
+    parser.add_argument("--turns", type=int, default=5, help="turnos por tarea")
+    parser.add_argument("--interval", type=float, default=0.005, help="intervalo del heartbeat en segundos")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        chat_id = setup_database(os.path.join(tmp, "bench.db"), args.messages)
+        for mode in ("blocking", "executor"):
+            result = asyncio.run(run_mode(mode, chat_id, args.concurrency, args.turns, args.interval))
+            print(result)
+
+
+if __name__ == "__main__":
+    main()
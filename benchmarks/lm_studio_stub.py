@@ -0,0 +1,240 @@
+"""
+Servidor stub compatible con la API de OpenAI que imita a LM Studio sin GPU.
+
+Responde /v1/models, /v1/chat/completions (normal y en streaming) con un texto
+determinista y /v1/embeddings (bolsa de palabras con hashing: textos con palabras
+en común son parecidos): la misma petición con la misma semilla produce siempre la misma
+respuesta. Simula el tiempo de procesar el prompt (--latency-ms), la velocidad de
+generación (--tokens-per-second), cuántos tokens viajan por chunk SSE
+(--chunk-tokens) e inyecta errores HTTP con una fracción fija de las peticiones
+(--error-rate, --error-status).
+
+Se usa como proceso aparte (benchmarks.load_test lo arranca solo) o en memoria
+con httpx.ASGITransport(app=create_app(StubConfig(...))) en los tests.
+
+Uso:
+    python -m benchmarks.lm_studio_stub --port 1235 --latency-ms 200 --tokens-per-second 40
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, List
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+WORDS = (
+    "el modelo responde con texto de prueba generado de forma determinista para medir "
+    "latencia tokens por segundo y rendimiento de la api sin depender de una gpu"
+).split()
+
+
+@dataclass
+class StubConfig:
+    latency_ms: float = 0
+    tokens_per_second: float = 0  # 0: sin espera entre tokens
+    completion_tokens: int = 32
+    chunk_tokens: int = 1
+    error_rate: float = 0
+    error_status: int = 503
+    seed: int = 0
+    model: str = "stub-model"
+    embedding_dimensions: int = 64
+
+
+class LMStudioStub:
+    """Estado del stub: configuración, generador de errores y contadores"""
+
+    def __init__(self, config: StubConfig):
+        self.config = config
+        self._errors = random.Random(config.seed)
+        self.requests = 0
+        self.errors = 0
+        self.embedding_requests = 0
+
+    def should_fail(self) -> bool:
+        return self.config.error_rate > 0 and self._errors.random() < self.config.error_rate
+
+    def reply_tokens(self, messages: List[Dict], max_tokens: int) -> List[str]:
+        """Tokens de la respuesta: dependen solo de los mensajes y la semilla"""
+        digest = hashlib.sha256(json.dumps([self.config.seed, messages], sort_keys=True).encode()).digest()
+        rng = random.Random(digest)
+        count = self.config.completion_tokens
+        if max_tokens and max_tokens > 0:
+            count = min(count, max_tokens)
+        return [(" " if i else "") + rng.choice(WORDS) for i in range(count)]
+
+    @staticmethod
+    def prompt_tokens(messages: List[Dict]) -> int:
+        # misma aproximación que la estimación local de la app (~4 caracteres por token)
+        return sum(max(1, len(message.get("content") or "") // 4) + 4 for message in messages)
+
+    def finish_reason(self, tokens: List[str]) -> str:
+        return "length" if len(tokens) < self.config.completion_tokens else "stop"
+
+    def embedding(self, text: str) -> List[float]:
+        """Vector determinista con norma 1: cada palabra suma ±1 en una posición según su hash"""
+        vector = [0.0] * self.config.embedding_dimensions
+        for word in text.lower().split():
+            digest = hashlib.md5(word.strip(".,;:¿?¡!").encode()).digest()
+            vector[int.from_bytes(digest[:4], "little") % len(vector)] += 1.0 if digest[4] & 1 else -1.0
+        norm = sum(value * value for value in vector) ** 0.5 or 1.0
+        return [value / norm for value in vector]
+
+    async def generation_delay(self, tokens: int):
+        if self.config.tokens_per_second > 0 and tokens > 0:
+            await asyncio.sleep(tokens / self.config.tokens_per_second)
+
+
+def create_app(config: StubConfig) -> Starlette:
+    stub = LMStudioStub(config)
+
+    async def models(request: Request):
+        return JSONResponse({"object": "list", "data": [{"id": config.model, "object": "model"}]})
+
+    async def chat_completions(request: Request):
+        stub.requests += 1
+        payload = await request.json()
+        if stub.should_fail():
+            stub.errors += 1
+            return JSONResponse(
+                {"error": {"message": "injected error", "type": "stub_error"}},
+                status_code=config.error_status,
+                headers={"Retry-After": "1"} if config.error_status in (429, 503) else None
+            )
+
+        messages = payload.get("messages", [])
+        tokens = stub.reply_tokens(messages, payload.get("max_tokens", -1))
+        usage = {
+            "prompt_tokens": stub.prompt_tokens(messages),
+            "completion_tokens": len(tokens),
+            "total_tokens": stub.prompt_tokens(messages) + len(tokens)
+        }
+        completion_id = f"chatcmpl-stub-{stub.requests}"
+        created = int(time.time())
+
+        # procesamiento del prompt (tiempo hasta el primer token)
+        await asyncio.sleep(config.latency_ms / 1000)
+
+        if not payload.get("stream"):
+            await stub.generation_delay(len(tokens))
+            return JSONResponse({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": config.model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(tokens)},
+                    "finish_reason": stub.finish_reason(tokens)
+                }],
+                "usage": usage
+            })
+
+        include_usage = bool((payload.get("stream_options") or {}).get("include_usage"))
+
+        def chunk(delta: Dict, finish_reason=None) -> str:
+            body = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": config.model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }
+            return f"data: {json.dumps(body)}\n\n"
+
+        async def events():
+            step = max(1, config.chunk_tokens)
+            for start in range(0, len(tokens), step):
+                part = tokens[start:start + step]
+                if start:
+                    await stub.generation_delay(len(part))
+                yield chunk({"content": "".join(part)})
+            yield chunk({}, stub.finish_reason(tokens))
+            if include_usage:
+                body = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                        "model": config.model, "choices": [], "usage": usage}
+                yield f"data: {json.dumps(body)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    async def embeddings(request: Request):
+        stub.embedding_requests += 1
+        payload = await request.json()
+        inputs = payload.get("input", [])
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        tokens = sum(max(1, len(text) // 4) for text in inputs)
+        return JSONResponse({
+            "object": "list",
+            "data": [
+                {"object": "embedding", "index": index, "embedding": stub.embedding(text)}
+                for index, text in enumerate(inputs)
+            ],
+            "model": payload.get("model", config.model),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+        })
+
+    async def stats(request: Request):
+        return JSONResponse({
+            "requests": stub.requests,
+            "errors": stub.errors,
+            "embedding_requests": stub.embedding_requests,
+            "config": asdict(config)
+        })
+
+    app = Starlette(routes=[
+        Route("/v1/models", models),
+        Route("/v1/chat/completions", chat_completions, methods=["POST"]),
+        Route("/v1/embeddings", embeddings, methods=["POST"]),
+        Route("/stub/stats", stats)
+    ])
+    app.state.stub = stub
+    return app
+
+
+def config_arguments(parser: argparse.ArgumentParser):
+    """Opciones del stub (compartidas con benchmarks.load_test)"""
+    defaults = StubConfig()
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms, help="espera antes del primer token")
+    parser.add_argument("--tokens-per-second", type=float, default=defaults.tokens_per_second, help="0: sin espera")
+    parser.add_argument("--completion-tokens", type=int, default=defaults.completion_tokens)
+    parser.add_argument("--chunk-tokens", type=int, default=defaults.chunk_tokens, help="tokens por chunk SSE")
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate, help="fracción de peticiones con error")
+    parser.add_argument("--error-status", type=int, default=defaults.error_status)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--embedding-dimensions", type=int, default=defaults.embedding_dimensions)
+
+
+def config_from_args(args: argparse.Namespace) -> StubConfig:
+    return StubConfig(
+        latency_ms=args.latency_ms,
+        tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens,
+        chunk_tokens=args.chunk_tokens,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed,
+        embedding_dimensions=args.embedding_dimensions
+    )
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1235)
+    config_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(create_app(config_from_args(args)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+Prueba de carga de extremo a extremo de /api/v1/messenger/completion sin GPU.
+
+Arranca el stub de LM Studio (benchmarks.lm_studio_stub) y la app con uvicorn
+contra una BD SQLite temporal (migrada con `python -m app.cli migrate`), y la
+ataca en lazo cerrado: N usuarios concurrentes, cada uno con su chat, envían
+mensajes uno tras otro hasta completar --requests por nivel de concurrencia.
+
+Por nivel reporta requests/s, latencia p50/p95/p99 y, con --stream, el tiempo
+hasta el primer token (TTFT) visto por el cliente. Los resultados se guardan en
+JSON junto con el commit actual; --compare contra un JSON anterior muestra la
+variación y con --max-regression termina con error si el p95 o los requests/s
+empeoran más de ese porcentaje.
+
+Uso:
+    python -m benchmarks.load_test --concurrency 1 4 16 --requests 200 --latency-ms 50 --tokens-per-second 200
+    python -m benchmarks.load_test --stream --compare benchmarks/results/load_test-abc1234.json --max-regression 10
+    python -m benchmarks.load_test --app-url http://localhost:3555   # app ya levantada (sin stub)
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.lm_studio_stub import config_arguments
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def wait_until_ready(url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} no respondió en {timeout}s")
+
+
+def percentiles(values: List[float]) -> Optional[Dict]:
+    if not values:
+        return None
+    ordered = sorted(values)
+
+    def pick(pct: float) -> float:
+        index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+        return round(ordered[index] * 1000, 2)
+
+    return {
+        "p50": pick(50),
+        "p95": pick(95),
+        "p99": pick(99),
+        "mean": round(statistics.fmean(ordered) * 1000, 2),
+        "max": round(ordered[-1] * 1000, 2)
+    }
+
+
+class LoadTest:
+    """Usuarios concurrentes en lazo cerrado contra la API de completions"""
+
+    def __init__(self, base_url: str, stream: bool, timeout: float):
+        self.base_url = base_url
+        self.stream = stream
+        self.timeout = timeout
+
+    async def create_chat(self, client: httpx.AsyncClient, name: str) -> int:
+        response = await client.post("/api/v1/chats/create", json={"name": name})
+        response.raise_for_status()
+        return response.json()["data"]["id"]
+
+    async def completion(self, client: httpx.AsyncClient, chat_id: int, message: str) -> Dict:
+        """Una petición: latencia total, TTFT (solo streaming) y resultado"""
+        started = time.perf_counter()
+        ttft = None
+        path = f"/api/v1/messenger/completion/{chat_id}"
+        try:
+            if not self.stream:
+                response = await client.post(path, json={"message": message})
+                status = response.status_code
+            else:
+                async with client.stream("POST", f"{path}/stream", json={"message": message}) as response:
+                    status = response.status_code
+                    async for line in response.aiter_lines():
+                        if line.startswith("event: error"):
+                            status = "stream_error"
+                        elif ttft is None and line.startswith('data: {"delta"'):
+                            ttft = time.perf_counter() - started
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        return {"status": status, "latency": time.perf_counter() - started, "ttft": ttft}
+
+    async def run_level(self, concurrency: int, requests: int, warmup: int) -> Dict:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=limits) as client:
+            chats = [await self.create_chat(client, f"carga c{concurrency} u{user}") for user in range(concurrency)]
+            for i in range(warmup):
+                await self.completion(client, chats[i % concurrency], f"calentamiento {i}")
+
+            pending = iter(range(requests))
+            samples: List[Dict] = []
+
+            async def user(chat_id: int):
+                for i in pending:
+                    samples.append(await self.completion(client, chat_id, f"pregunta {i} de la prueba de carga"))
+
+            started = time.perf_counter()
+            await asyncio.gather(*(user(chat_id) for chat_id in chats))
+            elapsed = time.perf_counter() - started
+
+        ok = [sample for sample in samples if sample["status"] == 200]
+        errors: Dict[str, int] = {}
+        for sample in samples:
+            if sample["status"] != 200:
+                errors[str(sample["status"])] = errors.get(str(sample["status"]), 0) + 1
+        return {
+            "concurrency": concurrency,
+            "requests": len(samples),
+            "ok": len(ok),
+            "errors": errors,
+            "elapsed_s": round(elapsed, 3),
+            "requests_per_second": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+            "latency_ms": percentiles([sample["latency"] for sample in ok]),
+            "ttft_ms": percentiles([sample["ttft"] for sample in ok if sample["ttft"] is not None])
+        }
+
+
+def start_stack(args, tmp: str) -> tuple:
+    """Stub de LM Studio + app con uvicorn sobre SQLite; devuelve (url de la app, procesos)"""
+    stub_port, app_port = free_port(), free_port()
+    stub_cmd = [
+        sys.executable, "-m", "benchmarks.lm_studio_stub", "--port", str(stub_port),
+        "--latency-ms", str(args.latency_ms), "--tokens-per-second", str(args.tokens_per_second),
+        "--completion-tokens", str(args.completion_tokens), "--chunk-tokens", str(args.chunk_tokens),
+        "--error-rate", str(args.error_rate), "--error-status", str(args.error_status), "--seed", str(args.seed)
+    ]
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'load_test.db')}",
+        LM_STUDIO_URL=f"http://127.0.0.1:{stub_port}",
+        LM_STUDIO_URLS="",
+        LM_STUDIO_MAX_CONCURRENCY=str(args.max_concurrency),
+        LM_STUDIO_MAX_QUEUE_DEPTH=str(max(args.concurrency) * 2),
+        LOG_LEVEL="WARNING",
+        JOBS_WORKERS="0"
+    )
+    subprocess.run([sys.executable, "-m", "app.cli", "migrate"], cwd=ROOT, env=env, capture_output=True, check=True)
+
+    processes = [subprocess.Popen(stub_cmd, cwd=ROOT, env=env)]
+    processes.append(subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(app_port), "--log-level", "warning"],
+        cwd=ROOT, env=env
+    ))
+    app_url = f"http://127.0.0.1:{app_port}"
+    wait_until_ready(f"http://127.0.0.1:{stub_port}/v1/models")
+    wait_until_ready(f"{app_url}/readyz")
+    return app_url, processes
+
+
+def compare(results: List[Dict], baseline_path: str, max_regression: Optional[float]) -> bool:
+    """Imprimir la variación contra un JSON anterior; False si hay una regresión mayor a la tolerada"""
+    with open(baseline_path) as f:
+        baseline = {row["concurrency"]: row for row in json.load(f)["results"]}
+    passed = True
+    for row in results:
+        previous = baseline.get(row["concurrency"])
+        if not previous or not row["latency_ms"] or not previous["latency_ms"]:
+            continue
+        delta = {
+            key: round((row["latency_ms"][key] / previous["latency_ms"][key] - 1) * 100, 1)
+            for key in ("p50", "p95", "p99") if previous["latency_ms"][key]
+        }
+        if previous["requests_per_second"]:
+            delta["requests_per_second"] = round(
+                (row["requests_per_second"] / previous["requests_per_second"] - 1) * 100, 1
+            )
+        print({"concurrency": row["concurrency"], "change_pct": delta})
+        if max_regression is not None and (
+            delta.get("p95", 0) > max_regression or delta.get("requests_per_second", 0) < -max_regression
+        ):
+            passed = False
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=200, help="peticiones por nivel de concurrencia")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--stream", action="store_true", help="usar /completion/{chat_id}/stream y medir TTFT")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--max-concurrency", type=int, default=4, help="LM_STUDIO_MAX_CONCURRENCY de la app")
+    parser.add_argument("--app-url", default=None, help="atacar una app ya levantada en lugar de arrancar una")
+    parser.add_argument("--output", default=None, help="JSON de resultados (por defecto benchmarks/results/)")
+    parser.add_argument("--compare", default=None, help="JSON de una corrida anterior")
+    parser.add_argument("--max-regression", type=float, default=None, help="%% tolerado de empeoramiento")
+    config_arguments(parser)
+    args = parser.parse_args()
+
+    commit = git_commit()
+    with tempfile.TemporaryDirectory() as tmp:
+        processes = []
+        try:
+            if args.app_url:
+                app_url = args.app_url
+            else:
+                app_url, processes = start_stack(args, tmp)
+            load_test = LoadTest(app_url, args.stream, args.timeout)
+            results = []
+            for concurrency in args.concurrency:
+                row = asyncio.run(load_test.run_level(concurrency, args.requests, args.warmup))
+                print(row)
+                results.append(row)
+        finally:
+            for process in processes:
+                process.terminate()
+                process.wait()
+
+    report = {
+        "benchmark": "load_test",
+        "git_commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "results": results
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"load_test-{commit or 'nogit'}{'-stream' if args.stream else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Resultados guardados en {output}")
+
+    if args.compare and not compare(results, args.compare, args.max_regression):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Microbenchmark de round trips a la BD por turno al guardar el par user-llm.
+
+Compara el camino anterior (dos create_message, cada uno con commit + refresh;
+y update_last_message_pair con commit + refresh por mensaje) contra
+create_message_pair / update_message_pair (un statement + un commit).
+
+Uso:
+    python -m benchmarks.message_pair_roundtrips --turns 500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+
+def setup_database(path: str):
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    from app.conf.db import Base, engine
+    from app.entities.chats import Chat
+    from app.entities.messages import Message  # noqa: F401 (registra la tabla)
+
+    engine.echo = False
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        return conn.execute(Chat.__table__.insert().values(title="bench")).inserted_primary_key[0]
+
+
+class RoundTripCounter:
+    """Cuenta statements y commits enviados al driver"""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.statements = 0
+        self.commits = 0
+        event.listen(engine, "before_cursor_execute", self._on_statement)
+        event.listen(engine, "commit", self._on_commit)
+
+    def _on_statement(self, *args):
+        self.statements += 1
+
+    def _on_commit(self, *args):
+        self.commits += 1
+
+    def reset(self):
+        self.statements = 0
+        self.commits = 0
+
+
+def legacy_insert(repository, chat_id: int):
+    repository.create_message(chat_id, "user", "hola")
+    return repository.create_message(chat_id, "llm", "respuesta")
+
+
+def pair_insert(repository, chat_id: int):
+    return repository.create_message_pair(chat_id, "hola", "respuesta")
+
+
+def legacy_update(repository, chat_id: int):
+    user_message, llm_message = repository.get_last_two_messages(chat_id)
+    user_message.content = "hola editado"
+    llm_message.content = "respuesta editada"
+    repository.db.commit()
+    repository.db.refresh(user_message)
+    repository.db.refresh(llm_message)
+
+
+def pair_update(repository, chat_id: int):
+    user_message, llm_message = repository.get_last_two_messages(chat_id)
+    repository.update_message_pair(user_message, llm_message, "hola editado", "respuesta editada")
+
+
+def run_case(name: str, operation, chat_id: int, turns: int, counter: RoundTripCounter) -> dict:
+    from app.conf.db import SessionLocal
+    from app.repositories.messages import MessageRepository
+
+    with SessionLocal() as db:
+        repository = MessageRepository(db)
+        counter.reset()
+        started = time.perf_counter()
+        for _ in range(turns):
+            operation(repository, chat_id)
+        elapsed = time.perf_counter() - started
+
+    return {
+        "case": name,
+        "turns": turns,
+        "statements_per_turn": round(counter.statements / turns, 2),
+        "commits_per_turn": round(counter.commits / turns, 2),
+        "ms_per_turn": round(elapsed / turns * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=500, help="turnos por caso")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        chat_id = setup_database(os.path.join(tmp, "bench.db"))
+        from app.conf.db import engine
+
+        counter = RoundTripCounter(engine)
+        cases = [
+            ("insert: 2x create_message", legacy_insert),
+            ("insert: create_message_pair", pair_insert),
+            ("update: commit + refresh", legacy_update),
+            ("update: update_message_pair", pair_update),
+        ]
+        for name, operation in cases:
+            print(run_case(name, operation, chat_id, args.turns, counter))
+
+
+if __name__ == "__main__":
+    main()
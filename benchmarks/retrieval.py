@@ -0,0 +1,156 @@
+"""
+Benchmark de la memoria de largo plazo (embeddings y búsqueda por similitud).
+
+Carga --messages mensajes sintéticos (Zipf, como benchmarks.search) repartidos en
+--chats chats y mide, con el embedder local de --dimensions dimensiones:
+
+- throughput del embedder (mensajes/s, sin BD);
+- indexación completa: embeber y guardar en message_embeddings (index_pending);
+- construcción del índice global numpy.memmap desde la tabla (sync_index);
+- alta incremental: un par nuevo embebido, guardado y agregado al índice;
+- consultas p50/p95: búsqueda en el índice global (solo numpy), recuperación
+  global completa (con la lectura de los mensajes) y recuperación dentro de un chat.
+
+Uso:
+    python -m benchmarks.retrieval --messages 1000000 --chats 10000 --dimensions 256 --runs 50
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.search import load_corpus, percentile, vocabulary
+
+
+def setup_database(path: str):
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ.setdefault("DB_SLOW_QUERY_MS", "0")
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    from app.conf.db import Base, engine
+    from app.entities import chats, embeddings, messages  # noqa: F401 (registra las tablas)
+
+    engine.echo = False
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def latency(name: str, timings) -> dict:
+    return {
+        "case": name,
+        "p50_ms": round(statistics.median(timings), 2),
+        "p95_ms": round(percentile(timings, 0.95), 2),
+    }
+
+
+def measure_embedder(embedder, texts) -> dict:
+    started = time.perf_counter()
+    embedder.embed_sync(texts)
+    elapsed = time.perf_counter() - started
+    return {"embedder": embedder.model, "texts": len(texts), "texts_per_second": round(len(texts) / elapsed)}
+
+
+async def index_all(retriever) -> dict:
+    started = time.perf_counter()
+    total, after_id = 0, 0
+    while True:
+        indexed, after_id = await retriever.index_pending(after_id=after_id)
+        total += indexed
+        if indexed < retriever.batch_size:
+            break
+    elapsed = time.perf_counter() - started
+    return {"embedded": total, "index_seconds": round(elapsed, 1), "rows_per_second": round(total / elapsed)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=100_000, help="mensajes del corpus")
+    parser.add_argument("--chats", type=int, default=1_000, help="chats del corpus")
+    parser.add_argument("--vocabulary", type=int, default=20_000, help="palabras distintas")
+    parser.add_argument("--dimensions", type=int, default=256, help="EMBEDDING_DIMENSIONS")
+    parser.add_argument("--batch-size", type=int, default=1000, help="EMBEDDING_BATCH_SIZE")
+    parser.add_argument("--top-k", type=int, default=4, help="CONTEXT_RETRIEVAL_TOP_K")
+    parser.add_argument("--runs", type=int, default=50, help="repeticiones por consulta")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "retrieval.db")
+        engine = setup_database(path)
+        words = vocabulary(args.vocabulary, rng)
+        print(load_corpus(engine, args.messages, args.chats, words, rng))
+
+        from app.conf.db import SessionLocal
+        from app.providers.embeddings import LocalEmbedder
+        from app.repositories.embeddings import EmbeddingRepository
+        from app.repositories.messages import MessageRepository
+        from app.services.retrieval import ConversationRetriever
+
+        embedder = LocalEmbedder(args.dimensions)
+        retriever = ConversationRetriever(
+            enabled=True,
+            embedder=embedder,
+            scope="global",
+            top_k=args.top_k,
+            min_score=-1.0,
+            index_path=os.path.join(tmp, "vector_index"),
+            batch_size=args.batch_size
+        )
+        queries = [" ".join(rng.choices(words[:2000], k=rng.randint(4, 12))) for _ in range(args.runs)]
+        vectors = embedder.embed_sync(queries)
+
+        print(measure_embedder(embedder, [" ".join(rng.choices(words, k=24)) for _ in range(10_000)]))
+        print(asyncio.run(index_all(retriever)))
+
+        with SessionLocal() as db:
+            repository = EmbeddingRepository(db)
+            started = time.perf_counter()
+            added = retriever.sync_index(repository)
+            elapsed = time.perf_counter() - started
+            size = sum(
+                os.path.getsize(os.path.join(retriever.index_path, name)) for name in ("vectors.f32", "ids.i64")
+            )
+            print({
+                "index_vectors": added,
+                "build_seconds": round(elapsed, 1),
+                "vectors_per_second": round(added / elapsed),
+                "index_mb": round(size / 1024 / 1024, 1),
+            })
+
+            chat_id = args.chats // 2
+            message_repository = MessageRepository(db)
+            incremental = []
+            for query in queries:
+                message_repository.create_message_pair(chat_id, query, query[::-1])
+                started = time.perf_counter()
+                asyncio.run(retriever.index_pending(chat_id))
+                retriever.sync_index(repository)
+                incremental.append((time.perf_counter() - started) * 1000)
+
+            search, global_scope, chat_scope = [], [], []
+            for vector in vectors:
+                started = time.perf_counter()
+                retriever.index.search(vector, 2 * args.top_k)
+                search.append((time.perf_counter() - started) * 1000)
+                started = time.perf_counter()
+                retriever.retrieve(repository, chat_id, vector)
+                global_scope.append((time.perf_counter() - started) * 1000)
+            retriever.scope = "chat"
+            for vector in vectors:
+                started = time.perf_counter()
+                retriever.retrieve(repository, chat_id, vector)
+                chat_scope.append((time.perf_counter() - started) * 1000)
+
+        print(latency("alta incremental (par nuevo)", incremental))
+        print(latency(f"búsqueda en el índice ({retriever.index.count} vectores)", search))
+        print(latency("recuperación global", global_scope))
+        print(latency(f"recuperación en un chat (~{args.messages // args.chats + 2 * args.runs} vectores)", chat_scope))
+
+
+if __name__ == "__main__":
+    main()
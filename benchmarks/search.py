@@ -0,0 +1,159 @@
+"""
+Benchmark de la búsqueda de texto completo sobre un corpus sintético (SQLite FTS5).
+
+Carga --messages mensajes (palabras con distribución de Zipf, como el lenguaje
+natural) repartidos en --chats chats con los triggers del índice activos, y mide
+la latencia p50/p95 de la primera página y de una página profunda (siguiendo
+cursores) para términos frecuentes, intermedios, raros, dos términos, prefijo y
+búsqueda dentro de un chat. Los términos caros se repiten rankeando todas las
+coincidencias (--max-ranked 0) para comparar con el tope. Con --like repite las
+consultas sin índice (LIKE).
+
+Uso:
+    python -m benchmarks.search --messages 1000000 --chats 10000 --runs 20 [--max-ranked 10000] [--like]
+"""
+import argparse
+import itertools
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+SYLLABLES = ["ba", "ca", "da", "fe", "ge", "la", "ma", "no", "pi", "qu", "ra", "so", "ta", "ve", "zo", "tri", "mon", "sal"]
+
+
+def setup_database(path: str):
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    # las consultas de términos muy frecuentes superan el umbral del log de consultas lentas
+    os.environ.setdefault("DB_SLOW_QUERY_MS", "0")
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    from app.conf.db import Base, engine
+    from app.entities import chats, messages, search  # noqa: F401 (registra las tablas y los índices FTS5)
+
+    engine.echo = False
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def vocabulary(size: int, rng: random.Random):
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words, key=lambda word: rng.random())
+
+
+def load_corpus(engine, messages: int, chats: int, words, rng: random.Random, batch_size: int = 20000) -> dict:
+    from sqlalchemy import insert
+    from app.entities.chats import Chat
+    from app.entities.messages import Message
+
+    # Zipf: el término de rango r aparece con frecuencia proporcional a 1/r
+    # (cum_weights precalculado: choices() no recalcula los acumulados en cada llamada)
+    weights = list(itertools.accumulate(1 / rank for rank in range(1, len(words) + 1)))
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(insert(Chat.__table__), [{"title": " ".join(rng.choices(words, cum_weights=weights, k=4))} for _ in range(chats)])
+    for offset in range(0, messages, batch_size):
+        rows = [
+            {
+                # como una conversación real, los mensajes de un chat quedan en un tramo de ids
+                "chat_id": i * chats // messages + 1,
+                "sender": "user" if i % 2 == 0 else "llm",
+                "content": " ".join(rng.choices(words, cum_weights=weights, k=rng.randint(8, 40)))
+            }
+            for i in range(offset, min(messages, offset + batch_size))
+        ]
+        with engine.begin() as conn:
+            conn.execute(insert(Message.__table__), rows)
+    elapsed = time.perf_counter() - started
+    return {"messages": messages, "chats": chats, "load_seconds": round(elapsed, 1), "rows_per_second": round(messages / elapsed)}
+
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_query(name: str, query: str, runs: int, pages: int, max_ranked: int, chat_id=None) -> dict:
+    from app.conf.db import SessionLocal
+    from app.services.search import SearchService
+
+    first, deep, hits = [], [], 0
+    with SessionLocal() as db:
+        service = SearchService(db)
+        service.max_ranked = max_ranked
+        for _ in range(runs):
+            cursor = None
+            for page in range(pages):
+                started = time.perf_counter()
+                result, cursor = service._search_messages(query, chat_id, cursor, 20)
+                elapsed = (time.perf_counter() - started) * 1000
+                (first if page == 0 else deep).append(elapsed)
+                hits = len(result["results"]) if page == 0 else hits
+                if cursor is None:
+                    break
+    summary = {
+        "case": name,
+        "query": query,
+        "backend": result["backend"],
+        "max_ranked": max_ranked,
+        "first_page_hits": hits,
+        "p50_ms": round(statistics.median(first), 2),
+        "p95_ms": round(percentile(first, 0.95), 2),
+    }
+    if deep:
+        summary[f"page_{pages}_p50_ms"] = round(statistics.median(deep), 2)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1_000_000, help="mensajes del corpus")
+    parser.add_argument("--chats", type=int, default=10_000, help="chats del corpus")
+    parser.add_argument("--vocabulary", type=int, default=20_000, help="palabras distintas")
+    parser.add_argument("--runs", type=int, default=20, help="repeticiones por consulta")
+    parser.add_argument("--pages", type=int, default=5, help="páginas recorridas con el cursor")
+    parser.add_argument("--max-ranked", type=int, default=10000, help="SEARCH_MAX_RANKED_MATCHES")
+    parser.add_argument("--like", action="store_true", help="repetir las consultas sin índice (LIKE)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "search.db")
+        engine = setup_database(path)
+        words = vocabulary(args.vocabulary, rng)
+        print(load_corpus(engine, args.messages, args.chats, words, rng))
+        print({"database_mb": round(os.path.getsize(path) / 1024 / 1024, 1)})
+
+        cases = [
+            ("frecuente", words[0]),
+            ("intermedio", words[100]),
+            ("raro", words[5000]),
+            ("dos términos", f"{words[1]} {words[50]}"),
+            ("prefijo", f"{words[10][:3]}*"),
+        ]
+        results = [run_query(name, query, args.runs, args.pages, args.max_ranked) for name, query in cases]
+        results.append(run_query("en un chat", words[0], args.runs, args.pages, args.max_ranked, chat_id=args.chats // 2))
+        if args.max_ranked:
+            results += [
+                run_query(f"{name} (sin tope)", query, max(1, args.runs // 4), args.pages, 0)
+                for name, query in (cases[0], cases[4])
+            ]
+        if args.like:
+            from app.repositories import search as search_repository
+
+            search_repository._backends[str(engine.url)] = ("like", float("inf"))
+            results += [
+                run_query(f"{name} (LIKE)", query, max(1, args.runs // 10), 1, 0)
+                for name, query in cases[:3]
+            ]
+        for result in results:
+            print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark del arranque en frío de un worker.
+
+Cada corrida es un intérprete nuevo que mide:
+  - import_ms: importar app.main (módulos, settings, engine, rutas)
+  - startup_ms: ejecutar el lifespan (arranque del proveedor; sin DDL ni consultas)
+  - first_readyz_ms: primera llamada a /readyz (primera conexión a la BD)
+
+Con --importtime lista los módulos que más tardan en importarse (python -X importtime).
+
+Uso:
+    python -m benchmarks.startup_time --runs 5 [--importtime 15]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# se ejecuta en un proceso nuevo por corrida para medir imports en frío
+BOOT_SCRIPT = """
+import asyncio, json, time
+started = time.perf_counter()
+from app.main import app, lifespan
+imported = time.perf_counter()
+
+async def boot():
+    from app.controllers.health import HealthController
+    async with lifespan(app):
+        booted = time.perf_counter()
+        await HealthController.readiness()
+        return booted, time.perf_counter()
+
+booted, ready = asyncio.run(boot())
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "startup_ms": (booted - imported) * 1000,
+    "first_readyz_ms": (ready - booted) * 1000
+}))
+"""
+
+
+def run_boot(env: dict) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", BOOT_SCRIPT], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def slowest_imports(env: dict, top: int) -> list:
+    """Módulos con mayor tiempo de import acumulado según -X importtime"""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = [part.strip() for part in line[len("import time:"):].split("|")]
+        rows.append((int(cumulative) / 1000, module.strip()))
+    return [{"module": module, "cumulative_ms": ms} for ms, module in sorted(rows, reverse=True)[:top]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--importtime", type=int, default=0, help="mostrar los N imports más lentos")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}", LOG_LEVEL="WARNING")
+        # el esquema se aplica una vez, fuera del arranque medido
+        subprocess.run([sys.executable, "-m", "app.cli", "migrate"], cwd=ROOT, env=env, capture_output=True, check=True)
+
+        runs = [run_boot(env) for _ in range(args.runs)]
+        for key in ("import_ms", "startup_ms", "first_readyz_ms"):
+            values = [run[key] for run in runs]
+            print({
+                "phase": key,
+                "median": round(statistics.median(values), 1),
+                "min": round(min(values), 1),
+                "max": round(max(values), 1)
+            })
+
+        if args.importtime:
+            for row in slowest_imports(env, args.importtime):
+                print(row)
+
+
+if __name__ == "__main__":
+    main()
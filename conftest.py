@@ -0,0 +1,72 @@
+"""
+Fixtures compartidas: BD SQLite en memoria con el esquema de los modelos y el
+stub de LM Studio (benchmarks.lm_studio_stub) servido en memoria, para probar
+la API de extremo a extremo sin SQL Server ni GPU.
+"""
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.conf.db import Base, SessionLocal, engine
+from app.entities import chats, embeddings, jobs, messages, search, summaries  # noqa: F401 (registra los modelos)
+from app.providers.router import BackendRouter
+from app.utils.conversation_cache import conversation_cache
+from benchmarks.lm_studio_stub import StubConfig, create_app
+
+STUB_URL = "http://lm-stub"
+
+
+@pytest.fixture
+def sqlite_engine():
+    # StaticPool: una sola conexión, compartida con los hilos del executor de BD
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    conversation_cache.clear()
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session(sqlite_engine):
+    db = sessionmaker(bind=sqlite_engine)()
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def stub_config() -> StubConfig:
+    """Configuración del stub; un test la reemplaza redefiniendo esta fixture o con parametrize indirecto"""
+    return StubConfig()
+
+
+@pytest.fixture
+def lm_studio_stub(stub_config):
+    """App ASGI del stub (su estado, con contadores, queda en app.state.stub)"""
+    return create_app(stub_config)
+
+
+@pytest.fixture
+def stub_router(lm_studio_stub) -> BackendRouter:
+    def client_factory(base_url: str) -> httpx.AsyncClient:
+        return httpx.AsyncClient(base_url=base_url, transport=httpx.ASGITransport(app=lm_studio_stub))
+
+    return BackendRouter([STUB_URL], client_factory, health_interval=0)
+
+
+@pytest.fixture
+def api_client(sqlite_engine, stub_router, monkeypatch):
+    """
+    Cliente de la API con la BD SQLite y el proveedor global apuntando al stub.
+    Sin el lifespan: no arranca los workers de jobs ni los health checks.
+    """
+    from app.main import app
+    from app.providers.llm_studio_api import lm_studio_provider
+
+    # get_db y las sesiones propias de los servicios (p. ej. el guardado del streaming) usan SessionLocal
+    SessionLocal.configure(bind=sqlite_engine)
+    monkeypatch.setattr(lm_studio_provider, "router", stub_router)
+    yield TestClient(app)
+    SessionLocal.configure(bind=engine)
@@ -0,0 +1,61 @@
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine, pool
+
+from app.conf.db import Base, DATABASE_URL, connect_args_for
+from app.entities import chats, embeddings, jobs, messages, summaries  # noqa: F401 (registra los modelos)
+
+config = context.config
+
+if config.config_file_name is not None:
+    # sin desactivar los loggers de la app (python -m app.cli migrate)
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+# tablas FTS5 de SQLite y sus tablas internas (migración 0008): fuera del modelo, no las toca autogenerate
+FTS_TABLE_PREFIXES = ("messages_fts", "chats_fts")
+
+def include_name(name, type_, parent_names) -> bool:
+    return not (type_ == "table" and name.startswith(FTS_TABLE_PREFIXES))
+
+def get_url() -> str:
+    # permite sobreescribir la URL (p. ej. en pruebas) con -x url=... o set_main_option
+    return context.get_x_argument(as_dictionary=True).get("url") or config.get_main_option("sqlalchemy.url") or DATABASE_URL
+
+def run_migrations_offline():
+    """Generar el SQL de las migraciones sin conectarse (alembic upgrade head --sql)"""
+    context.configure(
+        url=get_url(),
+        target_metadata=target_metadata,
+        include_name=include_name,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"}
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    """Aplicar las migraciones contra la base de datos"""
+    url = get_url()
+    connectable = create_engine(
+        url,
+        poolclass=pool.NullPool,
+        connect_args=connect_args_for(url)
+    )
+    with connectable.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_name=include_name,
+            # SQLite no soporta ALTER TABLE completo: usar batch mode
+            render_as_batch=connection.dialect.name == "sqlite"
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
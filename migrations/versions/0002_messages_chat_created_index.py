@@ -0,0 +1,40 @@
+"""Índice compuesto (chat_id, created_at, id) en messages
+
+Sirve a todas las consultas calientes de MessageRepository (filtro por chat_id
+y orden/cursor por created_at, id) sin scan ni sort, y también indexa la FK
+messages.chat_id (es su columna inicial). En SQL Server incluye sender para que
+la búsqueda del último par se resuelva desde el índice. Las bases creadas con
+create_all (la app lo hacía al arrancar) ya lo tienen: en ese caso no se crea.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def _has_index(table: str, name: str) -> bool:
+    # en modo offline (--sql) no hay conexión para inspeccionar
+    if op.get_context().as_sql:
+        return False
+    return any(index["name"] == name for index in sa.inspect(op.get_bind()).get_indexes(table))
+
+
+def upgrade():
+    if not _has_index("messages", "ix_messages_chat_id_created_at"):
+        op.create_index(
+            "ix_messages_chat_id_created_at",
+            "messages",
+            ["chat_id", "created_at", "id"],
+            mssql_include=["sender"]
+        )
+
+
+def downgrade():
+    op.drop_index("ix_messages_chat_id_created_at", table_name="messages")
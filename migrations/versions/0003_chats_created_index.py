@@ -0,0 +1,31 @@
+"""Índice (created_at, id) en chats para la paginación por cursor del listado
+
+Las bases creadas con create_all ya lo tienen: en ese caso no se crea.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def _has_index(table: str, name: str) -> bool:
+    # en modo offline (--sql) no hay conexión para inspeccionar
+    if op.get_context().as_sql:
+        return False
+    return any(index["name"] == name for index in sa.inspect(op.get_bind()).get_indexes(table))
+
+
+def upgrade():
+    if not _has_index("chats", "ix_chats_created_at"):
+        op.create_index("ix_chats_created_at", "chats", ["created_at", "id"])
+
+
+def downgrade():
+    op.drop_index("ix_chats_created_at", table_name="chats")
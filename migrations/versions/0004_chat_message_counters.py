@@ -0,0 +1,48 @@
+"""Contadores denormalizados en chats: message_count y last_message_at
+
+El listado de chats deja de agrupar la tabla messages. Los valores se
+rellenan aquí para los chats existentes; si quedaran desalineados se
+pueden recalcular con: python -m app.cli repair-chat-counters
+
+Las bases creadas con create_all ya tienen las columnas: solo se recalculan.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def _has_column(table: str, name: str) -> bool:
+    # en modo offline (--sql) no hay conexión para inspeccionar
+    if op.get_context().as_sql:
+        return False
+    return any(column["name"] == name for column in sa.inspect(op.get_bind()).get_columns(table))
+
+
+def upgrade():
+    if not _has_column("chats", "message_count"):
+        with op.batch_alter_table("chats") as batch_op:
+            batch_op.add_column(sa.Column("message_count", sa.Integer(), nullable=False, server_default="0"))
+            batch_op.add_column(sa.Column("last_message_at", sa.DateTime(timezone=True), nullable=True))
+
+    op.execute(
+        """
+        UPDATE chats SET
+            message_count = (SELECT COUNT(*) FROM messages WHERE messages.chat_id = chats.id),
+            last_message_at = (SELECT MAX(messages.created_at) FROM messages WHERE messages.chat_id = chats.id)
+        """
+    )
+
+
+def downgrade():
+    with op.batch_alter_table("chats") as batch_op:
+        batch_op.drop_column("last_message_at")
+        # SQL Server: server_default creó un DEFAULT constraint con nombre generado que hay que borrar antes
+        batch_op.drop_column("message_count", mssql_drop_default=True)
@@ -0,0 +1,44 @@
+"""Uso de tokens por mensaje y acumulado por chat
+
+Los mensajes "llm" guardan prompt/completion tokens, modelo, latencia y
+finish_reason de la respuesta de LM Studio. Los mensajes anteriores quedan
+con NULL (su uso no se conoce) y los acumulados de los chats empiezan en 0.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("messages") as batch_op:
+        batch_op.add_column(sa.Column("prompt_tokens", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("completion_tokens", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("model", sa.String(128), nullable=True))
+        batch_op.add_column(sa.Column("latency_ms", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("finish_reason", sa.String(32), nullable=True))
+
+    with op.batch_alter_table("chats") as batch_op:
+        batch_op.add_column(sa.Column("prompt_tokens_total", sa.Integer(), nullable=False, server_default="0"))
+        batch_op.add_column(sa.Column("completion_tokens_total", sa.Integer(), nullable=False, server_default="0"))
+
+
+def downgrade():
+    with op.batch_alter_table("chats") as batch_op:
+        # SQL Server: server_default creó DEFAULT constraints con nombre generado que hay que borrar antes
+        batch_op.drop_column("completion_tokens_total", mssql_drop_default=True)
+        batch_op.drop_column("prompt_tokens_total", mssql_drop_default=True)
+
+    with op.batch_alter_table("messages") as batch_op:
+        batch_op.drop_column("finish_reason")
+        batch_op.drop_column("latency_ms")
+        batch_op.drop_column("model")
+        batch_op.drop_column("completion_tokens")
+        batch_op.drop_column("prompt_tokens")
@@ -0,0 +1,38 @@
+"""Cola durable de completions en segundo plano (completion_jobs)
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "completion_jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("chat_id", sa.Integer(), sa.ForeignKey("chats.id"), nullable=False),
+        sa.Column("message", sa.String(), nullable=False),
+        sa.Column("cache", sa.Boolean(), nullable=True),
+        sa.Column("status", sa.String(16), nullable=False, server_default="queued"),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("error", sa.String(), nullable=True),
+        sa.Column("result_message_id", sa.Integer(), sa.ForeignKey("messages.id"), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_completion_jobs_id", "completion_jobs", ["id"])
+    op.create_index("ix_completion_jobs_status_id", "completion_jobs", ["status", "id"])
+
+
+def downgrade():
+    op.drop_index("ix_completion_jobs_status_id", table_name="completion_jobs")
+    op.drop_index("ix_completion_jobs_id", table_name="completion_jobs")
+    op.drop_table("completion_jobs")
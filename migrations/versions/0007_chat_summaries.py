@@ -0,0 +1,39 @@
+"""Resúmenes versionados de los mensajes antiguos de cada chat (chat_summaries)
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "chat_summaries",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("chat_id", sa.Integer(), sa.ForeignKey("chats.id"), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("content", sa.String(), nullable=False),
+        sa.Column("through_message_id", sa.Integer(), sa.ForeignKey("messages.id"), nullable=False),
+        sa.Column("through_created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("message_count", sa.Integer(), nullable=False),
+        sa.Column("prompt_tokens", sa.Integer(), nullable=True),
+        sa.Column("completion_tokens", sa.Integer(), nullable=True),
+        sa.Column("model", sa.String(128), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("invalidated_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_chat_summaries_id", "chat_summaries", ["id"])
+    op.create_index("ux_chat_summaries_chat_id_version", "chat_summaries", ["chat_id", "version"], unique=True)
+
+
+def downgrade():
+    op.drop_index("ux_chat_summaries_chat_id_version", table_name="chat_summaries")
+    op.drop_index("ix_chat_summaries_id", table_name="chat_summaries")
+    op.drop_table("chat_summaries")
@@ -0,0 +1,113 @@
+"""Índices de texto completo sobre messages.content y chats.title
+
+SQLite: tablas FTS5 de contenido externo (messages_fts, chats_fts) con triggers
+que las sincronizan; se rellenan aquí con los datos existentes.
+SQL Server: catálogo e índices FULLTEXT (con CHANGE_TRACKING AUTO) si el
+servicio de texto completo está instalado; si no, la búsqueda usa LIKE.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+# (tabla, columna, tabla FTS5 / índice único para KEY INDEX en SQL Server)
+TARGETS = (
+    ("messages", "content", "messages_fts", "ux_messages_id"),
+    ("chats", "title", "chats_fts", "ux_chats_id"),
+)
+TOKENIZER = "unicode61 remove_diacritics 2"
+FULLTEXT_CATALOG = "chat_search_catalog"
+# 3082 = español (alfabetización moderna): separación de palabras y stemming
+FULLTEXT_LANGUAGE = 3082
+
+# logger que ya configura alembic.ini (no escribe en stdout, que puede ser el SQL de --sql)
+logger = logging.getLogger("alembic.runtime.migration")
+
+
+def sqlite_upgrade():
+    for source, text_column, fts, _ in TARGETS:
+        op.execute(
+            f"CREATE VIRTUAL TABLE {fts} USING fts5({text_column}, content='{source}', content_rowid='id', "
+            f"tokenize='{TOKENIZER}')"
+        )
+        op.execute(
+            f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {source} BEGIN "
+            f"INSERT INTO {fts}(rowid, {text_column}) VALUES (new.id, new.{text_column}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {source} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {text_column}) VALUES ('delete', old.id, old.{text_column}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {text_column} ON {source} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {text_column}) VALUES ('delete', old.id, old.{text_column}); "
+            f"INSERT INTO {fts}(rowid, {text_column}) VALUES (new.id, new.{text_column}); END"
+        )
+        # indexar las filas existentes
+        op.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def mssql_fulltext_installed() -> bool:
+    if op.get_context().as_sql:
+        # generando SQL sin conexión: se asume instalado
+        return True
+    return bool(op.get_bind().execute(sa.text("SELECT FULLTEXTSERVICEPROPERTY('IsFullTextInstalled')")).scalar())
+
+
+def mssql_upgrade():
+    if not mssql_fulltext_installed():
+        logger.warning("Full-text search no está instalado en SQL Server: la búsqueda usará LIKE")
+        return
+    # KEY INDEX exige un índice único de una sola columna no nula
+    for source, _, _, key_index in TARGETS:
+        op.create_index(key_index, source, ["id"], unique=True)
+    # CREATE FULLTEXT CATALOG/INDEX no se pueden ejecutar dentro de una transacción
+    with op.get_context().autocommit_block():
+        op.execute(f"CREATE FULLTEXT CATALOG {FULLTEXT_CATALOG}")
+        for source, text_column, _, key_index in TARGETS:
+            op.execute(
+                f"CREATE FULLTEXT INDEX ON {source} ({text_column} LANGUAGE {FULLTEXT_LANGUAGE}) "
+                f"KEY INDEX {key_index} ON {FULLTEXT_CATALOG} WITH CHANGE_TRACKING AUTO"
+            )
+
+
+def upgrade():
+    dialect = op.get_context().dialect.name
+    if dialect == "sqlite":
+        sqlite_upgrade()
+    elif dialect == "mssql":
+        mssql_upgrade()
+
+
+def downgrade():
+    dialect = op.get_context().dialect.name
+    if dialect == "sqlite":
+        for source, _, fts, _ in TARGETS:
+            for suffix in ("ai", "ad", "au"):
+                op.execute(f"DROP TRIGGER IF EXISTS {fts}_{suffix}")
+            op.execute(f"DROP TABLE IF EXISTS {fts}")
+    elif dialect == "mssql":
+        with op.get_context().autocommit_block():
+            for source, _, _, _ in TARGETS:
+                op.execute(
+                    f"IF EXISTS (SELECT 1 FROM sys.fulltext_indexes WHERE object_id = OBJECT_ID('{source}')) "
+                    f"DROP FULLTEXT INDEX ON {source}"
+                )
+            op.execute(
+                f"IF EXISTS (SELECT 1 FROM sys.fulltext_catalogs WHERE name = '{FULLTEXT_CATALOG}') "
+                f"DROP FULLTEXT CATALOG {FULLTEXT_CATALOG}"
+            )
+        for source, _, _, key_index in TARGETS:
+            op.execute(
+                f"IF EXISTS (SELECT 1 FROM sys.indexes WHERE name = '{key_index}') "
+                f"DROP INDEX {key_index} ON {source}"
+            )
@@ -0,0 +1,35 @@
+"""Embeddings de los mensajes para la recuperación de turnos antiguos (message_embeddings)
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "message_embeddings",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("message_id", sa.Integer(), sa.ForeignKey("messages.id"), nullable=False),
+        sa.Column("chat_id", sa.Integer(), sa.ForeignKey("chats.id"), nullable=False),
+        sa.Column("model", sa.String(128), nullable=False),
+        sa.Column("dimensions", sa.Integer(), nullable=False),
+        sa.Column("vector", sa.LargeBinary(), nullable=False),
+    )
+    op.create_index("ix_message_embeddings_id", "message_embeddings", ["id"])
+    op.create_index("ux_message_embeddings_message_id", "message_embeddings", ["message_id"], unique=True)
+    op.create_index("ix_message_embeddings_chat_id_model", "message_embeddings", ["chat_id", "model"])
+
+
+def downgrade():
+    op.drop_index("ix_message_embeddings_chat_id_model", table_name="message_embeddings")
+    op.drop_index("ux_message_embeddings_message_id", table_name="message_embeddings")
+    op.drop_index("ix_message_embeddings_id", table_name="message_embeddings")
+    op.drop_table("message_embeddings")
@@ -0,0 +1,135 @@
+"""
+Control de admisión delante de LM Studio: orden FIFO, rechazo rápido con la
+cola llena (429), timeout de espera (503) y coalescencia de peticiones idénticas
+(solo deterministas, y sin cancelar a los seguidores si se cancela el líder).
+"""
+import asyncio
+
+import httpx
+import pytest
+
+from app.providers.admission import AdmissionController
+from app.providers.errors import ProviderOverloadedError, ProviderQueueTimeoutError
+from app.providers.llm_studio_api import LMStudioAPIProvider
+
+
+async def hold(admission: AdmissionController, order: list, name: str, seconds: float):
+    async with admission.slot():
+        order.append(name)
+        await asyncio.sleep(seconds)
+
+
+def test_fifo_order_and_queue_full_rejection():
+    async def scenario():
+        admission = AdmissionController(max_concurrency=1, max_queue_depth=2, queue_timeout=1)
+        order = []
+        tasks = [asyncio.create_task(hold(admission, order, name, 0.01)) for name in "abc"]
+        await asyncio.sleep(0)
+        with pytest.raises(ProviderOverloadedError):
+            await admission.acquire()
+        await asyncio.gather(*tasks)
+        return admission, order
+
+    admission, order = asyncio.run(scenario())
+    assert order == ["a", "b", "c"]
+    stats = admission.stats()
+    assert stats["rejected_queue_full"] == 1
+    assert stats["in_flight"] == 0 and stats["queued"] == 0
+
+
+def test_queue_timeout_and_cancellation_release_slots():
+    async def scenario():
+        admission = AdmissionController(max_concurrency=1, max_queue_depth=4, queue_timeout=0.02)
+        holder = asyncio.create_task(hold(admission, [], "a", 0.1))
+        await asyncio.sleep(0)
+        with pytest.raises(ProviderQueueTimeoutError):
+            await admission.acquire()
+        waiter = asyncio.create_task(admission.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(holder, waiter, return_exceptions=True)
+        return admission
+
+    admission = asyncio.run(scenario())
+    stats = admission.stats()
+    assert stats["rejected_timeout"] == 1
+    assert stats["in_flight"] == 0 and stats["queued"] == 0
+
+
+def mock_provider(handler) -> LMStudioAPIProvider:
+    provider = LMStudioAPIProvider()
+    provider.router.backends[0].client = httpx.AsyncClient(base_url="http://lm", transport=httpx.MockTransport(handler))
+    return provider
+
+
+def test_identical_completions_are_coalesced():
+    calls = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"choices": [{"message": {"content": "hola"}}]})
+
+    async def scenario():
+        provider = mock_provider(handler)
+        messages = [{"role": "user", "content": "hola"}]
+        results = await asyncio.gather(*[provider.chat_completion(messages, temperature=0) for _ in range(3)])
+        await provider.shutdown()
+        return provider, results
+
+    provider, results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert all(result["choices"][0]["message"]["content"] == "hola" for result in results)
+    assert provider.get_admission_stats()["coalescing"]["coalesced_requests"] == 2
+    # los seguidores reciben una copia marcada: su uso de tokens ya lo contó el líder
+    assert results[1] is not results[0] and results[1] == dict(results[0], cached=True)
+
+
+def test_sampled_completions_are_not_coalesced():
+    calls = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"choices": [{"message": {"content": f"respuesta {len(calls)}"}}]})
+
+    async def scenario():
+        provider = mock_provider(handler)
+        messages = [{"role": "user", "content": "hola"}]
+        await asyncio.gather(*[provider.chat_completion(messages, temperature=0.7) for _ in range(3)])
+        # con cache=True quien llama acepta compartir la respuesta
+        await asyncio.gather(*[provider.chat_completion(messages, temperature=0.7, cache=True) for _ in range(2)])
+        await provider.shutdown()
+        return provider
+
+    provider = asyncio.run(scenario())
+    assert len(calls) == 4
+    assert provider.get_admission_stats()["coalescing"]["coalesced_requests"] == 1
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    calls = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"choices": [{"message": {"content": "hola"}}]})
+
+    async def scenario():
+        provider = mock_provider(handler)
+        messages = [{"role": "user", "content": "hola"}]
+        leader = asyncio.create_task(provider.chat_completion(messages, temperature=0))
+        await asyncio.sleep(0.01)
+        followers = [asyncio.create_task(provider.chat_completion(messages, temperature=0)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        results = await asyncio.gather(*followers)
+        await provider.shutdown()
+        return provider, leader, results
+
+    provider, leader, results = asyncio.run(scenario())
+    assert leader.cancelled()
+    # el primer seguidor repitió la petición y el otro lo esperó a él
+    assert len(calls) == 2
+    assert all(result["choices"][0]["message"]["content"] == "hola" for result in results)
+    assert provider.get_admission_stats()["coalescing"]["coalesced_requests"] == 1
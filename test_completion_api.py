@@ -0,0 +1,87 @@
+"""
+API de completions de extremo a extremo contra el stub de LM Studio y SQLite:
+respuesta determinista, uso de tokens guardado, streaming por chunks y errores
+inyectados convertidos en el código HTTP del proveedor.
+"""
+import json
+
+import pytest
+from sqlalchemy import text
+
+from app.providers.response_cache import MemoryResponseBackend, ResponseCache
+from benchmarks.lm_studio_stub import StubConfig
+
+
+def create_chat(api_client, name="e2e") -> int:
+    return api_client.post("/api/v1/chats/create", json={"name": name}).json()["data"]["id"]
+
+
+def test_completion_is_deterministic_and_stores_usage(api_client, lm_studio_stub):
+    first, second = create_chat(api_client), create_chat(api_client)
+    replies = [
+        api_client.post(f"/api/v1/messenger/completion/{chat_id}", json={"message": "hola"}).json()["data"]
+        for chat_id in (first, second)
+    ]
+    assert replies[0]["llm_response"] == replies[1]["llm_response"]
+    assert len(replies[0]["llm_response"].split()) == StubConfig().completion_tokens
+
+    usage = api_client.get(f"/api/v1/usage/chats/{first}").json()["data"]
+    assert usage["completion_tokens_total"] == StubConfig().completion_tokens
+    assert usage["prompt_tokens_total"] > 0
+    assert lm_studio_stub.state.stub.requests == 2
+
+
+@pytest.mark.parametrize("stub_config", [StubConfig(completion_tokens=10, chunk_tokens=3)])
+def test_stream_forwards_stub_chunks(api_client):
+    chat_id = create_chat(api_client)
+    response = api_client.post(f"/api/v1/messenger/completion/{chat_id}/stream", json={"message": "hola"})
+    events = [block for block in response.text.split("\n\n") if block]
+    deltas = [json.loads(block[len("data: "):])["delta"] for block in events if block.startswith("data: ")]
+    done = json.loads(events[-1].split("data: ", 1)[1])
+    assert len(deltas) == 4
+    assert "".join(deltas) == done["llm_response"]
+
+
+@pytest.mark.parametrize("stub_config", [StubConfig(error_rate=1, error_status=500)])
+def test_injected_errors_surface_as_bad_gateway(api_client, lm_studio_stub):
+    chat_id = create_chat(api_client)
+    response = api_client.post(f"/api/v1/messenger/completion/{chat_id}", json={"message": "hola"})
+    assert response.status_code == 502
+    assert lm_studio_stub.state.stub.errors >= 1
+    assert api_client.get(f"/api/v1/messenger/registers/{chat_id}").json()["data"]["messages"] == []
+
+
+def test_chat_deleted_by_another_worker_returns_not_found(api_client, sqlite_engine, lm_studio_stub):
+    chat_id = create_chat(api_client)
+    assert api_client.post(f"/api/v1/messenger/completion/{chat_id}", json={"message": "hola"}).status_code == 200
+    # otro worker borra el chat: la cache de conversaciones de este proceso todavía lo tiene
+    with sqlite_engine.begin() as conn:
+        conn.execute(text("DELETE FROM messages WHERE chat_id = :chat_id"), {"chat_id": chat_id})
+        conn.execute(text("DELETE FROM chats WHERE id = :chat_id"), {"chat_id": chat_id})
+
+    response = api_client.post(f"/api/v1/messenger/completion/{chat_id}", json={"message": "¿sigues ahí?"})
+    assert response.status_code == 404
+    with sqlite_engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM messages")).scalar() == 0
+    # la cache se invalidó: la siguiente petición ya no llega al LLM
+    assert api_client.post(f"/api/v1/messenger/completion/{chat_id}", json={"message": "hola"}).status_code == 404
+    assert lm_studio_stub.state.stub.requests == 2
+
+
+def test_cached_reply_does_not_count_usage_twice(api_client, lm_studio_stub, monkeypatch):
+    from app.providers.llm_studio_api import lm_studio_provider
+    from app.utils.tokens import token_calibration
+
+    monkeypatch.setattr(lm_studio_provider, "response_cache", ResponseCache(MemoryResponseBackend(10, 60)))
+    first, second = create_chat(api_client), create_chat(api_client)
+    samples = token_calibration.samples
+    for chat_id in (first, second):
+        response = api_client.post(f"/api/v1/messenger/completion/{chat_id}", json={"message": "hola", "cache": True})
+        assert response.status_code == 200
+    assert lm_studio_stub.state.stub.requests == 1
+    assert token_calibration.samples == samples + 1
+
+    original = api_client.get(f"/api/v1/usage/chats/{first}").json()["data"]
+    reused = api_client.get(f"/api/v1/usage/chats/{second}").json()["data"]
+    assert original["completion_tokens_total"] == StubConfig().completion_tokens
+    assert reused["prompt_tokens_total"] == reused["completion_tokens_total"] == 0
@@ -0,0 +1,77 @@
+"""
+Ventana deslizante del contexto: presupuesto de tokens (contigua, cortando en el
+primer turno que no cabe), tope de mensajes, cursor `before` y lectura por
+lotes igual con la cache de conversaciones fría o caliente.
+"""
+from app.conf.settings import Settings
+from app.entities.chats import Chat
+from app.repositories.messages import MessageRepository
+from app.services.context_builder import ContextBuilder
+from app.utils.conversation_cache import conversation_cache
+from app.utils.tokens import estimate_message_tokens, estimate_tokens, MESSAGE_OVERHEAD_TOKENS
+
+SETTINGS = Settings(database_url="sqlite://", context_token_calibration=False)
+
+
+def add_pairs(session, turns: int):
+    chat = Chat(title="ventana")
+    session.add(chat)
+    session.commit()
+    repository = MessageRepository(session)
+    pairs = [repository.create_message_pair(chat.id, f"pregunta {i}", f"respuesta {i}") for i in range(turns)]
+    return chat.id, pairs
+
+
+def cost(role: str, content: str) -> int:
+    return estimate_message_tokens({"role": role, "content": content})
+
+
+def test_budget_keeps_newest_turns_that_fit(session):
+    chat_id, _ = add_pairs(session, 5)
+    system_message = "Eres un asistente"
+    fixed = cost("user", "nueva") + estimate_tokens(system_message) + MESSAGE_OVERHEAD_TOKENS
+    # caben justo los tres mensajes más recientes
+    window = cost("assistant", "respuesta 4") + cost("user", "pregunta 4") + cost("assistant", "respuesta 3")
+    builder = ContextBuilder(
+        MessageRepository(session), max_tokens=fixed + window + 1, response_reserve_tokens=1, settings=SETTINGS
+    )
+
+    context = builder.build(chat_id, "nueva", system_message=system_message)
+    assert [turn["content"] for turn in context] == ["respuesta 3", "pregunta 4", "respuesta 4", "nueva"]
+    assert [turn["role"] for turn in context] == ["assistant", "user", "assistant", "user"]
+
+    # un turno menos de presupuesto deja fuera el más antiguo de la ventana
+    builder.max_tokens -= 1
+    assert [turn["content"] for turn in builder.build(chat_id, "nueva", system_message=system_message)] == [
+        "pregunta 4", "respuesta 4", "nueva"
+    ]
+
+    # sin presupuesto para el historial el mensaje nuevo se envía igual
+    builder.max_tokens = 1
+    assert builder.build(chat_id, "nueva", system_message=system_message) == [{"role": "user", "content": "nueva"}]
+
+
+def test_max_messages_caps_the_window(session):
+    chat_id, _ = add_pairs(session, 5)
+    builder = ContextBuilder(MessageRepository(session), max_messages=3, settings=SETTINGS)
+    assert [turn["content"] for turn in builder.build(chat_id, "nueva")] == [
+        "respuesta 3", "pregunta 4", "respuesta 4", "nueva"
+    ]
+
+
+def test_before_cursor_skips_newer_messages_with_cold_and_warm_cache(session):
+    chat_id, pairs = add_pairs(session, 5)
+    cursor = (pairs[3][0].created_at, pairs[3][0].id)
+    expected = ["pregunta 1", "respuesta 1", "pregunta 2", "respuesta 2", "otra"]
+    builder = ContextBuilder(MessageRepository(session), max_messages=4, fetch_batch_size=3, settings=SETTINGS)
+
+    conversation_cache.clear()
+    assert [turn["content"] for turn in builder.build(chat_id, "otra", before=cursor)] == expected
+    # con cursor no se carga la cache: la carga parcial no sería el final del chat
+    assert conversation_cache.get(chat_id) is None
+
+    # sin cursor, lectura por lotes desde la BD que queda en la cache
+    full = [turn["content"] for turn in builder.build(chat_id, "otra")]
+    assert full == ["pregunta 3", "respuesta 3", "pregunta 4", "respuesta 4", "otra"]
+    assert conversation_cache.get(chat_id) is not None
+    assert [turn["content"] for turn in builder.build(chat_id, "otra", before=cursor)] == expected
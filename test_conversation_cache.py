@@ -0,0 +1,58 @@
+"""
+Cache de conversaciones por chat: una carga desde BD que se cruza con una
+escritura (invalidate/append) se descarta, y el LRU, el TTL y el tope de
+mensajes acotan lo que queda en memoria.
+"""
+from datetime import datetime
+
+from app.utils.conversation_cache import CachedMessage, ConversationCache
+
+
+def messages(*ids: int):
+    return [CachedMessage(i, datetime(2024, 1, 1, 0, 0, i), "user", f"mensaje {i}") for i in ids]
+
+
+def test_load_is_rejected_after_invalidate():
+    cache = ConversationCache(max_chats=10, ttl_seconds=60, max_messages=10)
+    stale = cache.begin_load(1)
+    # otra petición guarda un mensaje e invalida mientras la primera lee de la BD
+    cache.invalidate(1)
+    fresh = cache.begin_load(1)
+    cache.put(stale, messages(2, 1), complete=True)
+    assert cache.get(1) is None
+
+    cache.put(fresh, messages(3, 2, 1), complete=True)
+    entry = cache.get(1)
+    assert [message.id for message in entry.messages] == [3, 2, 1]
+    assert entry.complete
+    assert cache._loading == {}
+
+
+def test_load_is_rejected_after_append_or_edit_and_other_chats_are_unaffected():
+    cache = ConversationCache(max_chats=10, ttl_seconds=60, max_messages=10)
+    appended, edited, other = cache.begin_load(1), cache.begin_load(2), cache.begin_load(3)
+    cache.append(1, messages(5))
+    cache.update_content(2, 1, "editado")
+    for token in (appended, edited, other):
+        cache.put(token, messages(1), complete=True)
+    assert cache.get(1) is None and cache.get(2) is None
+    assert cache.get(3) is not None
+
+
+def test_append_lru_ttl_and_message_cap(monkeypatch):
+    cache = ConversationCache(max_chats=2, ttl_seconds=60, max_messages=3)
+    for chat_id in (1, 2):
+        cache.put(cache.begin_load(chat_id), messages(2, 1), complete=True)
+    cache.append(1, messages(3, 4))
+    entry = cache.get(1)
+    assert [message.id for message in entry.messages] == [4, 3, 2]
+    assert not entry.complete
+
+    # el chat 1 es el más reciente: al agregar un tercero se descarta el 2
+    cache.put(cache.begin_load(3), messages(1), complete=True)
+    assert cache.contains(1) and cache.contains(3) and not cache.contains(2)
+
+    clock = [entry.loaded_at + 61]
+    monkeypatch.setattr("app.utils.conversation_cache.time.monotonic", lambda: clock[0])
+    assert cache.get(1) is None
+    assert cache.stats()["evictions"] == 2
@@ -0,0 +1,46 @@
+"""
+run_db: las operaciones síncronas de BD corren en el executor dedicado, fuera
+del event loop, con sus argumentos y propagando las excepciones.
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.conf.db import run_db
+
+
+def blocking_query(seconds: float, prefix: str = "") -> str:
+    time.sleep(seconds)
+    return prefix + threading.current_thread().name
+
+
+def failing_query():
+    raise ValueError("Chat not found")
+
+
+def test_run_db_uses_executor_without_blocking_the_loop():
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        task = asyncio.create_task(ticker())
+        thread_name = await run_db(blocking_query, 0.1, prefix="thread:")
+        task.cancel()
+        return thread_name, ticks
+
+    thread_name, ticks = asyncio.run(scenario())
+    assert thread_name.startswith("thread:db")
+    # el loop siguió atendiendo otras tareas mientras la consulta bloqueaba
+    assert ticks >= 5
+
+
+def test_run_db_propagates_exceptions():
+    with pytest.raises(ValueError, match="Chat not found"):
+        asyncio.run(run_db(failing_query))
@@ -0,0 +1,135 @@
+"""
+Jobs de completions en segundo plano: carril batch de la admisión (el tráfico
+interactivo pasa primero y el lote no ocupa todos los cupos) y ciclo de vida de
+un job en la cola durable (claim, completar, cancelar, recuperar abandonados,
+fallo al guardar el resultado).
+"""
+import asyncio
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import update
+
+from app.conf.db import SessionLocal, engine
+from app.entities.chats import Chat
+from app.entities.jobs import CompletionJob
+from app.entities.messages import Message
+from app.providers.admission import AdmissionController
+from app.repositories.jobs import JobRepository, _utcnow
+from app.repositories.messages import MessageRepository
+from app.services.job_worker import JobWorker
+
+
+def test_interactive_requests_go_before_batch_and_batch_is_capped():
+    async def run(admission, order, name, batch):
+        async with admission.slot(batch=batch):
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    async def scenario():
+        # el lote solo puede ocupar max_concurrency - 1 cupos
+        admission = AdmissionController(max_concurrency=2, max_queue_depth=8, queue_timeout=1)
+        batch_tasks = [asyncio.create_task(run(admission, [], f"b{i}", True)) for i in range(3)]
+        await asyncio.sleep(0)
+        capped = (admission.in_flight, admission.stats()["batch_queued"])
+        await asyncio.gather(*batch_tasks)
+
+        # un job que llegó antes espera a la petición interactiva que llegó después
+        admission = AdmissionController(max_concurrency=1, max_queue_depth=8, queue_timeout=1)
+        order = []
+        first = asyncio.create_task(run(admission, order, "batch-1", True))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(run(admission, order, "batch-2", True))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(run(admission, order, "interactive", False))
+        await asyncio.gather(first, second, interactive)
+        return capped, order
+
+    capped, order = asyncio.run(scenario())
+    assert capped == (1, 2)
+    assert order == ["batch-1", "interactive", "batch-2"]
+
+
+def test_job_lifecycle(session):
+    chat = Chat(title="jobs")
+    session.add(chat)
+    session.commit()
+    repository = JobRepository(session)
+
+    first = repository.create_job(chat.id, "hola")
+    second = repository.create_job(chat.id, "otra")
+    claimed = repository.claim_next_job()
+    assert (claimed.id, claimed.status, claimed.attempts) == (first.id, CompletionJob.RUNNING, 1)
+
+    message = repository.complete_job(claimed, "respuesta", {"prompt_tokens": 10, "completion_tokens": 3})
+    session.expire_all()
+    job = repository.get_job(first.id)
+    assert job.status == CompletionJob.SUCCEEDED and job.result_message_id == message.id
+    assert session.get(Chat, chat.id).message_count == 2
+    assert repository.get_result_message(job).content == "respuesta"
+
+    # cancelado mientras corre: el resultado que llega después se descarta
+    running = repository.claim_next_job()
+    assert running.id == second.id
+    assert repository.cancel_job(second.id)
+    assert not repository.cancel_job(second.id)
+    assert repository.complete_job(running, "tarde", {}) is None
+    assert session.query(Message).count() == 2
+    assert repository.claim_next_job() is None
+
+
+def test_stale_jobs_are_requeued_or_failed(session):
+    chat = Chat(title="lease")
+    session.add(chat)
+    session.commit()
+    repository = JobRepository(session)
+    retryable = repository.create_job(chat.id, "a")
+    exhausted = repository.create_job(chat.id, "b")
+    repository.claim_next_job()
+    repository.claim_next_job()
+    session.execute(
+        update(CompletionJob)
+        .where(CompletionJob.id == exhausted.id)
+        .values(attempts=3)
+    )
+    session.execute(update(CompletionJob).values(started_at=_utcnow() - timedelta(hours=1)))
+    session.commit()
+
+    assert repository.requeue_stale_jobs(lease_seconds=60, max_attempts=3) == 1
+    assert repository.count_by_status() == {CompletionJob.QUEUED: 1, CompletionJob.FAILED: 1}
+    assert repository.claim_next_job().id == retryable.id
+
+
+@pytest.mark.parametrize("attempts, expected", [(1, CompletionJob.QUEUED), (3, CompletionJob.FAILED)])
+def test_failed_save_does_not_leave_the_job_running(session, sqlite_engine, monkeypatch, attempts, expected):
+    chat = Chat(title="guardado")
+    session.add(chat)
+    session.commit()
+    repository = JobRepository(session)
+    repository.create_job(chat.id, "hola")
+    job = repository.claim_next_job()
+    session.execute(update(CompletionJob).where(CompletionJob.id == job.id).values(attempts=attempts))
+    session.commit()
+    job.attempts = attempts
+
+    def failing_pair(self, *args, **kwargs):
+        raise RuntimeError("database is locked")
+
+    async def generate(job):
+        return "respuesta", {"completion_tokens": 3}
+
+    worker = JobWorker(workers=1, poll_interval=0.5, lease_seconds=900, max_attempts=3)
+    monkeypatch.setattr(worker, "_generate", generate)
+    monkeypatch.setattr(MessageRepository, "create_message_pair", failing_pair)
+    # los workers abren sus propias sesiones con SessionLocal
+    SessionLocal.configure(bind=sqlite_engine)
+    try:
+        backoff = asyncio.run(worker._process(job))
+    finally:
+        SessionLocal.configure(bind=engine)
+
+    session.expire_all()
+    failed = repository.get_job(job.id)
+    assert failed.status == expected and failed.error == "database is locked"
+    assert backoff == (0.5 if expected == CompletionJob.QUEUED else 0)
+    assert session.query(Message).count() == 0
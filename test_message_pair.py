@@ -0,0 +1,84 @@
+"""
+Guardado del par user-llm: un solo INSERT de dos filas más la actualización de
+los contadores del chat en la misma transacción, que se descarta entera si el
+INSERT falla.
+"""
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+
+from app.entities.chats import Chat
+from app.entities.messages import Message
+from app.repositories.messages import MessageRepository
+from app.utils.conversation_cache import conversation_cache
+
+
+def create_chat(session) -> int:
+    chat = Chat(title="par")
+    session.add(chat)
+    session.commit()
+    return chat.id
+
+
+def test_pair_is_saved_with_one_insert_and_updates_counters(session, sqlite_engine):
+    chat_id = create_chat(session)
+    conversation_cache.put(conversation_cache.begin_load(chat_id), [], complete=True)
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.split()[0].upper())
+
+    event.listen(sqlite_engine, "before_cursor_execute", record)
+    try:
+        usage = {"prompt_tokens": 12, "completion_tokens": 5, "model": "stub"}
+        user_message, llm_message = MessageRepository(session).create_message_pair(chat_id, "hola", "buenas", usage)
+    finally:
+        event.remove(sqlite_engine, "before_cursor_execute", record)
+
+    assert statements == ["UPDATE", "INSERT"]
+    assert (user_message.sender, llm_message.sender) == ("user", "llm")
+    assert user_message.id < llm_message.id and llm_message.created_at is not None
+    assert user_message.prompt_tokens is None and llm_message.completion_tokens == 5
+
+    chat = session.get(Chat, chat_id)
+    session.refresh(chat)
+    assert chat.message_count == 2
+    assert (chat.prompt_tokens_total, chat.completion_tokens_total) == (12, 5)
+    cached = conversation_cache.get(chat_id).messages
+    assert [message.id for message in cached] == [llm_message.id, user_message.id]
+
+
+def test_failed_insert_rolls_back_the_counters(session):
+    chat_id = create_chat(session)
+    repository = MessageRepository(session)
+    with pytest.raises(IntegrityError):
+        # content es NOT NULL: falla el INSERT después de actualizar los contadores
+        repository.create_message_pair(chat_id, "hola", None, {"completion_tokens": 5})
+
+    assert session.query(Message).count() == 0
+    chat = session.get(Chat, chat_id)
+    assert (chat.message_count, chat.completion_tokens_total) == (0, 0)
+
+    # la sesión queda usable para el siguiente guardado
+    repository.create_message_pair(chat_id, "hola", "buenas")
+    session.refresh(chat)
+    assert chat.message_count == 2
+
+
+
+def test_failed_single_insert_rolls_back_the_counters(session):
+    chat_id = create_chat(session)
+    repository = MessageRepository(session)
+    with pytest.raises(IntegrityError):
+        repository.create_message(chat_id, "user", None)
+
+    chat = session.get(Chat, chat_id)
+    assert chat.message_count == 0 and session.query(Message).count() == 0
+    repository.create_message(chat_id, "user", "hola")
+    session.refresh(chat)
+    assert chat.message_count == 1
+
+def test_missing_chat_raises_value_error(session):
+    with pytest.raises(ValueError, match="Chat not found"):
+        MessageRepository(session).create_message_pair(999, "hola", "buenas")
+    assert session.query(Message).count() == 0
@@ -0,0 +1,48 @@
+"""
+Métricas en formato de texto de Prometheus: buckets acumulados de los
+histogramas, medición de los métodos de los repositorios y tipos de métrica
+incompletos rechazados al crearlos.
+"""
+import pytest
+
+from app.utils.metrics import MetricsRegistry, _Metric, db_query_duration, instrument_repository
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency_seconds", "Latencia", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3):
+        histogram.observe(value, route='/api/"x"')
+
+    lines = registry.render().splitlines()
+    assert "# TYPE latency_seconds histogram" in lines
+    assert 'latency_seconds_bucket{route="/api/\\"x\\"",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/api/\\"x\\"",le="1"} 3' in lines
+    assert 'latency_seconds_bucket{route="/api/\\"x\\"",le="+Inf"} 4' in lines
+    assert 'latency_seconds_sum{route="/api/\\"x\\""} 4.05' in lines
+    assert 'latency_seconds_count{route="/api/\\"x\\""} 4' in lines
+
+
+def test_repository_methods_are_timed():
+    @instrument_repository("fake")
+    class FakeRepository:
+        def get_item(self, item_id):
+            return item_id
+
+        def _helper(self):
+            return "privado"
+
+    repository = FakeRepository()
+    assert repository.get_item(7) == 7
+    repository._helper()
+
+    assert db_query_duration.count(repository="fake", method="get_item") == 1
+    assert db_query_duration.count(repository="fake", method="_helper") == 0
+
+
+def test_metric_without_samples_cannot_be_created():
+    class Summary(_Metric):
+        kind = "summary"
+
+    with pytest.raises(TypeError):
+        Summary("latency_summary", "Sin muestras")
@@ -0,0 +1,106 @@
+"""
+Cliente HTTP compartido con LM Studio: un solo cliente con pool keep-alive por
+instancia, reutilizado entre peticiones, cerrado en el shutdown y recreado si
+se vuelve a usar. Las estadísticas del pool se prueban con conexiones reales
+(falla si cambia cómo httpx guarda sus conexiones).
+"""
+import asyncio
+
+import httpx
+
+from app.providers.llm_studio_api import LMStudioAPIProvider
+from app.providers.router import BackendRouter
+
+
+def test_client_is_configured_with_pool_limits_and_shared_tls_context():
+    async def scenario():
+        provider = LMStudioAPIProvider()
+        first = provider._create_client("http://lm-a")
+        context = provider._ssl_context
+        second = provider._create_client("http://lm-b")
+        pool = first._transport._pool
+        limits = (pool._max_connections, pool._max_keepalive_connections, pool._keepalive_expiry)
+        await first.aclose()
+        await second.aclose()
+        return provider, first, context, limits
+
+    provider, client, context, limits = asyncio.run(scenario())
+    assert context is not None and provider._ssl_context is context
+    assert client.timeout == provider.timeout
+    assert limits == (
+        provider.limits.max_connections,
+        provider.limits.max_keepalive_connections,
+        provider.limits.keepalive_expiry
+    )
+
+
+def test_client_is_reused_closed_on_shutdown_and_recreated():
+    created = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"data": [{"id": "model"}]})
+
+    def client_factory(base_url: str) -> httpx.AsyncClient:
+        client = httpx.AsyncClient(base_url=base_url, transport=httpx.MockTransport(handler))
+        created.append(client)
+        return client
+
+    async def scenario():
+        provider = LMStudioAPIProvider()
+        provider.router.client_factory = client_factory
+        provider.router.health_interval = 0
+        await provider.startup()
+        for _ in range(3):
+            await provider.get_available_models()
+        stats = provider.get_pool_stats()["backends"][0]
+        await provider.shutdown()
+        closed = (created[0].is_closed, provider.router.backends[0].client)
+        await provider.get_available_models()
+        await provider.shutdown()
+        return stats, closed
+
+    stats, (closed, client_after_shutdown) = asyncio.run(scenario())
+    assert stats["requests_total"] == 3 and stats["in_flight"] == 0
+    assert closed and client_after_shutdown is None
+    assert len(created) == 2
+
+
+async def keep_alive_server():
+    """Servidor HTTP/1.1 mínimo que mantiene la conexión abierta entre respuestas"""
+    body = b'{"data": []}'
+    response = (
+        b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+        b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body
+    )
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while await reader.readuntil(b"\r\n\r\n"):
+                writer.write(response)
+                await writer.drain()
+        except asyncio.IncompleteReadError:
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+
+def test_pool_stats_report_reused_keep_alive_connections():
+    async def scenario():
+        server = await keep_alive_server()
+        port = server.sockets[0].getsockname()[1]
+        provider = LMStudioAPIProvider()
+        provider.router = BackendRouter([f"http://127.0.0.1:{port}"], provider._create_client, health_interval=0)
+        await provider.startup()
+        for _ in range(3):
+            await provider.get_available_models()
+        stats = provider.get_pool_stats()["backends"][0]
+        await provider.shutdown()
+        server.close()
+        await server.wait_closed()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert (stats["new_connections"], stats["reused_connections"]) == (1, 2)
+    assert stats["connections"] == {"open": 1, "in_use": 0, "idle": 1}
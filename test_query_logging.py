@@ -0,0 +1,50 @@
+"""
+Log de consultas lentas: registra sentencia, duración y método del repositorio
+que la lanzó, sin los parámetros (contienen el contenido de los mensajes).
+"""
+import json
+import logging
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.conf.db import Base, install_query_logging
+from app.conf.logging import JsonFormatter
+from app.entities.chats import Chat
+from app.entities.messages import Message  # noqa: F401 (registra el modelo)
+from app.repositories.chats import ChatRepository
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def test_slow_queries_are_logged_with_repository_method():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    install_query_logging(engine, threshold_ms=0)
+    db = sessionmaker(bind=engine)()
+    db.add(Chat(title="secreto"))
+    db.commit()
+
+    handler = ListHandler()
+    logger = logging.getLogger("app.db.slow_query")
+    logger.addHandler(handler)
+    try:
+        ChatRepository(db).get_chats_page(16)
+    finally:
+        logger.removeHandler(handler)
+        db.close()
+        engine.dispose()
+
+    assert handler.records
+    entry = json.loads(JsonFormatter().format(handler.records[-1]))
+    assert entry["message"] == "slow query"
+    assert entry["repository_method"] == "chats.get_chats_page"
+    assert entry["statement"].lstrip().upper().startswith("SELECT")
+    assert "secreto" not in json.dumps(entry)
@@ -0,0 +1,186 @@
+"""
+Regresión de planes de consulta: las consultas calientes de MessageRepository
+deben usar el índice compuesto (chat_id, created_at, id) sin scan ni sort.
+Se ejecutan contra SQLite en memoria y se revisa EXPLAIN QUERY PLAN.
+"""
+import pytest
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, MetaData, String, Table, create_engine, event, func, text
+from sqlalchemy.orm import sessionmaker
+
+from app.conf.db import Base
+from app.entities.chats import Chat
+from app.entities.messages import Message
+from app.repositories.chats import ChatRepository
+from app.repositories.messages import MessageRepository
+from app.utils.conversation_cache import conversation_cache
+
+INDEX_NAME = "ix_messages_chat_id_created_at"
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    chat = Chat(title="plan")
+    db.add(chat)
+    db.commit()
+    db.add_all([
+        Message(chat_id=chat.id, sender="user" if i % 2 == 0 else "llm", content=f"mensaje {i}")
+        for i in range(50)
+    ])
+    db.commit()
+    conversation_cache.clear()
+    yield db
+    db.close()
+    engine.dispose()
+
+
+def capture_selects(db, operation, table: str = "messages"):
+    """Ejecutar una operación del repositorio y devolver los SELECT emitidos sobre una tabla"""
+    statements = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and f"FROM {table}" in statement:
+            statements.append((statement, parameters))
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", on_execute)
+    try:
+        operation()
+    finally:
+        event.remove(engine, "before_cursor_execute", on_execute)
+    return statements
+
+
+def query_plan(db, statement, parameters) -> str:
+    rows = db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    return "\n".join(row[-1] for row in rows)
+
+
+def assert_uses_index(db, statements, index_name: str = INDEX_NAME):
+    assert statements, "la operación no emitió consultas sobre la tabla"
+    for statement, parameters in statements:
+        plan = query_plan(db, statement, parameters)
+        assert index_name in plan, plan
+        assert "USE TEMP B-TREE" not in plan, plan
+
+
+def test_recent_messages_uses_composite_index(session):
+    repository = MessageRepository(session)
+    chat_id = session.query(Chat.id).scalar()
+    last = repository.get_recent_messages(chat_id, 1)[0]
+
+    statements = capture_selects(session, lambda: (
+        repository.get_recent_messages(chat_id, 20),
+        repository.get_recent_messages(chat_id, 20, before=(last.created_at, last.id)),
+    ))
+    assert_uses_index(session, statements)
+
+
+def test_all_messages_by_chat_uses_composite_index(session):
+    repository = MessageRepository(session)
+    chat_id = session.query(Chat.id).scalar()
+
+    statements = capture_selects(session, lambda: repository.get_all_messages_by_chat_id(chat_id))
+    assert_uses_index(session, statements)
+
+
+def test_messages_page_uses_composite_index(session):
+    repository = MessageRepository(session)
+    chat_id = session.query(Chat.id).scalar()
+    messages, _ = repository.get_messages_page(chat_id, 10)
+    cursor = (messages[0].created_at, messages[0].id)
+
+    statements = capture_selects(session, lambda: (
+        repository.get_messages_page(chat_id, 10, cursor, "prev"),
+        repository.get_messages_page(chat_id, 10, cursor, "next"),
+    ))
+    assert_uses_index(session, statements)
+
+
+def test_last_two_messages_uses_composite_index(session):
+    repository = MessageRepository(session)
+    chat_id = session.query(Chat.id).scalar()
+
+    statements = capture_selects(session, lambda: repository.get_last_two_messages(chat_id))
+    assert_uses_index(session, statements)
+
+
+def test_chats_page_uses_created_at_index(session):
+    repository = ChatRepository(session)
+    chats, _ = repository.get_chats_page(1)
+    cursor = (chats[0].created_at, chats[0].id)
+
+    statements = capture_selects(session, lambda: (
+        repository.get_chats_page(16, cursor, "next"),
+        repository.get_chats_page(16, cursor, "prev"),
+    ), table="chats")
+    assert_uses_index(session, statements, "ix_chats_created_at")
+
+
+def test_migrations_create_composite_index(tmp_path):
+    from alembic import command
+    from alembic.config import Config
+
+    url = f"sqlite:///{tmp_path / 'migrations.db'}"
+    config = Config("alembic.ini")
+    config.set_main_option("sqlalchemy.url", url)
+    command.upgrade(config, "head")
+
+    engine = create_engine(url)
+    with engine.connect() as conn:
+        columns = [row[2] for row in conn.execute(text(f"PRAGMA index_info('{INDEX_NAME}')"))]
+    engine.dispose()
+    assert columns == ["chat_id", "created_at", "id"]
+
+
+def create_all_schema(metadata: MetaData, counters: bool):
+    """Tablas como las creaba create_all al arrancar la app (con o sin los contadores de 0004)"""
+    columns = [
+        Column("message_count", Integer, nullable=False, server_default="0"),
+        Column("last_message_at", DateTime(timezone=True)),
+    ] if counters else []
+    Table(
+        "chats", metadata,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("title", String),
+        Column("created_at", DateTime(timezone=True), server_default=func.now()),
+        *columns,
+        Index("ix_chats_created_at", "created_at", "id"),
+    )
+    Table(
+        "messages", metadata,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("chat_id", Integer, ForeignKey("chats.id")),
+        Column("sender", String, nullable=False),
+        Column("content", String, nullable=False),
+        Column("created_at", DateTime(timezone=True), server_default=func.now()),
+        Index(INDEX_NAME, "chat_id", "created_at", "id"),
+    )
+
+
+@pytest.mark.parametrize("counters", [False, True])
+def test_migrations_upgrade_database_created_by_create_all(tmp_path, counters):
+    from alembic import command
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+
+    url = f"sqlite:///{tmp_path / 'create_all.db'}"
+    engine = create_engine(url)
+    metadata = MetaData()
+    create_all_schema(metadata, counters)
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO chats (id, title) VALUES (1, 'viejo')"))
+        conn.execute(text("INSERT INTO messages (chat_id, sender, content) VALUES (1, 'user', 'hola'), (1, 'llm', '¡hola!')"))
+
+    config = Config("alembic.ini")
+    config.set_main_option("sqlalchemy.url", url)
+    command.upgrade(config, "head")
+
+    with engine.connect() as conn:
+        version = conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+        assert conn.execute(text("SELECT message_count FROM chats WHERE id = 1")).scalar() == 2
+    assert version == ScriptDirectory.from_config(config).get_current_head()
+    engine.dispose()
@@ -0,0 +1,53 @@
+"""
+/readyz: la comprobación de BD se cachea, se comparte entre peticiones
+concurrentes y tiene timeout; sin migraciones, o con el esquema en una
+revisión distinta de la última, la app no está lista.
+"""
+import asyncio
+
+from app.utils.readiness import ReadinessProbe
+
+
+def test_readiness_is_cached_and_shared():
+    calls = []
+
+    async def check():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"schema_revision": "0004", "expected_schema_revision": "0004"}
+
+    async def scenario():
+        probe = ReadinessProbe(check, cache_seconds=60, timeout=1)
+        results = await asyncio.gather(*[probe.status() for _ in range(5)])
+        results.append(await probe.status())
+        return results
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert all(result["ready"] for result in results)
+
+
+def test_readiness_reports_timeout_and_missing_schema():
+    async def stalled():
+        await asyncio.sleep(1)
+        return {"schema_revision": "0004"}
+
+    async def not_migrated():
+        return {"schema_revision": None, "expected_schema_revision": "0009"}
+
+    async def outdated():
+        return {"schema_revision": "0003", "expected_schema_revision": "0009"}
+
+    async def scenario():
+        timed_out = await ReadinessProbe(stalled, cache_seconds=0, timeout=0.01).status()
+        unmigrated = await ReadinessProbe(not_migrated, cache_seconds=0, timeout=1).status()
+        behind = await ReadinessProbe(outdated, cache_seconds=0, timeout=1).status()
+        return timed_out, unmigrated, behind
+
+    timed_out, unmigrated, behind = asyncio.run(scenario())
+    assert not timed_out["ready"] and timed_out["database"] == "unavailable"
+    assert not unmigrated["ready"] and unmigrated["database"] == "ok"
+    assert "migrate" in unmigrated["error"]
+    # una BD a medio migrar no está lista aunque tenga alembic_version
+    assert not behind["ready"] and behind["database"] == "ok"
+    assert "0003" in behind["error"] and "0009" in behind["error"]
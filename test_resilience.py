@@ -0,0 +1,158 @@
+"""
+Resiliencia del proveedor: circuit breaker, reintentos con backoff antes de
+generar, hedging y conversión de errores de httpx en ProviderError.
+"""
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.providers.errors import ProviderConnectionError, ProviderUnavailableError
+from app.providers.llm_studio_api import LMStudioAPIProvider
+from app.providers.resilience import CircuitBreaker, RetryPolicy
+from app.providers.router import BackendRouter
+
+URLS = ["http://lm-a", "http://lm-b"]
+
+
+def make_provider(handlers, **router_kwargs):
+    provider = LMStudioAPIProvider()
+    provider.response_cache.backend = None
+    provider.coalesce = False
+    provider.retry_policy = RetryPolicy(max_attempts=3, base_delay=0, max_delay=0)
+
+    def client_factory(base_url: str) -> httpx.AsyncClient:
+        return httpx.AsyncClient(base_url=base_url, transport=httpx.MockTransport(handlers[base_url]))
+
+    provider.router = BackendRouter(URLS, client_factory, health_interval=0, **router_kwargs)
+    return provider
+
+
+def completion(content: str) -> httpx.Response:
+    return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+
+
+def test_breaker_opens_half_opens_and_closes():
+    breaker = CircuitBreaker(failure_threshold=2, recovery_seconds=0.01)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allows()
+
+    time.sleep(0.02)
+    assert breaker.state == CircuitBreaker.HALF_OPEN and breaker.allows()
+    breaker.on_attempt()
+    assert not breaker.allows()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_connect_error_is_retried_on_another_backend():
+    async def refused(request):
+        raise httpx.ConnectError("connection refused", request=request)
+
+    async def ok(request):
+        return completion("ok")
+
+    provider = make_provider({"http://lm-a": refused, "http://lm-b": ok})
+    messages = [{"role": "user", "content": "hola"}]
+
+    async def scenario():
+        return [await provider.chat_completion(messages, chat_id=chat_id) for chat_id in range(4)]
+
+    results = asyncio.run(scenario())
+    assert all(result["choices"][0]["message"]["content"] == "ok" for result in results)
+    assert provider.retry_policy.retries >= 1
+    assert provider.get_resilience_stats()["breakers"][0]["state"] == CircuitBreaker.OPEN
+
+
+def test_read_timeout_is_not_retried_and_is_wrapped():
+    calls = []
+
+    async def slow(request):
+        calls.append(request)
+        raise httpx.ReadTimeout("timed out", request=request)
+
+    provider = make_provider({url: slow for url in URLS})
+
+    with pytest.raises(Exception) as info:
+        asyncio.run(provider.chat_completion([{"role": "user", "content": "hola"}]))
+    assert info.value.status_code == 504
+    assert isinstance(info.value, ProviderConnectionError)
+    assert len(calls) == 1
+
+
+def test_all_breakers_open_rejects_with_503():
+    async def refused(request):
+        raise httpx.ConnectError("connection refused", request=request)
+
+    provider = make_provider({url: refused for url in URLS}, failure_threshold=1, recovery_seconds=60)
+
+    # el primer intento abre lm-a, el reintento abre lm-b y el tercero ya no tiene instancia
+    with pytest.raises(ProviderUnavailableError) as info:
+        asyncio.run(provider.get_available_models())
+    assert info.value.status_code == 503 and info.value.retry_after >= 1
+    states = [breaker["state"] for breaker in provider.get_resilience_stats()["breakers"]]
+    assert states == [CircuitBreaker.OPEN, CircuitBreaker.OPEN]
+
+
+def test_hedged_request_uses_fastest_backend():
+    async def stalled(request):
+        await asyncio.sleep(1)
+        return completion("lento")
+
+    async def fast(request):
+        return completion("rápido")
+
+    provider = make_provider({"http://lm-a": stalled, "http://lm-b": fast})
+    provider.hedger.delay = 0.01
+
+    async def scenario():
+        # ocupar lm-b para que la primera petición vaya a lm-a
+        provider.router.backends[1].outstanding += 1
+        task = asyncio.create_task(provider.get_available_models())
+        await asyncio.sleep(0)
+        provider.router.backends[1].outstanding -= 1
+        return await task
+
+    result = asyncio.run(scenario())
+    assert result["choices"][0]["message"]["content"] == "rápido"
+    assert provider.hedger.won == 1
+
+
+
+def test_completions_are_not_hedged():
+    calls = []
+
+    async def slow(request):
+        calls.append(request.url.host)
+        await asyncio.sleep(0.05)
+        return completion("única")
+
+    provider = make_provider({"http://lm-a": slow, "http://lm-b": slow})
+    provider.hedger.delay = 0.01
+
+    result = asyncio.run(provider.chat_completion([{"role": "user", "content": "hola"}]))
+    assert result["choices"][0]["message"]["content"] == "única"
+    # una segunda generación ocuparía otra GPU sin cupo de admisión
+    assert len(calls) == 1 and provider.hedger.started == 0
+
+def test_stream_retries_only_before_first_chunk():
+    attempts = []
+
+    async def flaky(request):
+        attempts.append(request)
+        if len(attempts) == 1:
+            return httpx.Response(503, json={"error": "loading model"})
+        body = 'data: {"choices": [{"delta": {"content": "hola"}}]}\n\ndata: [DONE]\n\n'
+        return httpx.Response(200, content=body.encode("utf-8"))
+
+    provider = make_provider({url: flaky for url in URLS})
+
+    async def scenario():
+        return [chunk async for chunk in provider.chat_completion_stream([{"role": "user", "content": "hola"}])]
+
+    chunks = asyncio.run(scenario())
+    assert [chunk["choices"][0]["delta"]["content"] for chunk in chunks] == ["hola"]
+    assert len(attempts) == 2
@@ -0,0 +1,73 @@
+"""
+Cache de respuestas del LLM: clave normalizada, política de uso (temperature 0
+o permiso explícito) y expulsión por TTL y tamaño en ambos backends.
+"""
+import asyncio
+import time
+
+import pytest
+
+from app.providers.response_cache import MemoryResponseBackend, ResponseCache, SQLiteResponseBackend
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        backend = MemoryResponseBackend(max_entries=2, ttl_seconds=60)
+    else:
+        backend = SQLiteResponseBackend(str(tmp_path / "cache.db"), max_entries=2, ttl_seconds=60)
+    yield backend
+    backend.close()
+
+
+def test_key_normalizes_whitespace_and_covers_sampling_params():
+    messages = [{"role": "user", "content": "¿Qué es  Python?\n"}]
+    key = ResponseCache.make_key("qwen", "sistema", {"temperature": 0}, messages)
+
+    assert key == ResponseCache.make_key("qwen", " sistema", {"temperature": 0}, [
+        {"role": "user", "content": "¿Qué es Python?"}
+    ])
+    assert key != ResponseCache.make_key("qwen", "sistema", {"temperature": 0.7}, messages)
+    assert key != ResponseCache.make_key("otro", "sistema", {"temperature": 0}, messages)
+
+
+def test_cache_only_used_when_deterministic_or_allowed():
+    cache = ResponseCache(MemoryResponseBackend(10, 60))
+
+    assert cache.allows(0, None)
+    assert not cache.allows(0.7, None)
+    assert cache.allows(0.7, True)
+    assert not cache.allows(0, False)
+    assert not ResponseCache().allows(0, True)
+
+
+def test_backend_evicts_least_recently_used(backend):
+    cache = ResponseCache(backend)
+
+    async def scenario():
+        await cache.set("a", {"v": 1})
+        await cache.set("b", {"v": 2})
+        assert await cache.get("a") == {"v": 1}
+        await cache.set("c", {"v": 3})
+        return await cache.get("b"), await cache.get("a")
+
+    evicted, kept = asyncio.run(scenario())
+    assert evicted is None
+    assert kept == {"v": 1}
+    assert cache.stats()["entries"] == 2
+
+
+def test_backend_expires_entries(backend):
+    backend.ttl_seconds = 0.01
+    backend.set("a", {"v": 1})
+    time.sleep(0.02)
+    assert backend.get("a") is None
+
+
+def test_backend_reopens_after_close(backend):
+    # la instancia es global: un segundo lifespan en el mismo proceso la sigue usando
+    backend.set("a", {"v": 1})
+    backend.close()
+    assert backend.get("a") == {"v": 1}
+    backend.set("b", {"v": 2})
+    assert backend.get("b") == {"v": 2}
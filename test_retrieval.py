@@ -0,0 +1,148 @@
+"""
+Recuperación de turnos antiguos por similitud: embeddings en message_embeddings,
+contexto con los mensajes recuperados fuera de la ventana reciente, índice global
+numpy.memmap y embeddings calculados por el proveedor (stub de LM Studio).
+"""
+import asyncio
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from app.conf.settings import Settings
+from app.entities.chats import Chat
+from app.entities.embeddings import MessageEmbedding
+from app.providers.embeddings import LocalEmbedder, ProviderEmbedder
+from app.providers.llm_studio_api import lm_studio_provider
+from app.repositories.chats import ChatRepository
+from app.repositories.embeddings import EmbeddingRepository
+from app.repositories.messages import MessageRepository
+from app.services.context_builder import ContextBuilder, RECALL_HEADER
+from app.services.retrieval import ConversationRetriever
+from app.utils.vector_index import MIN_CAPACITY, VectorIndex, normalize
+
+TOPICS = [
+    ("Dame la receta de paella valenciana con azafrán", "Sofríe pollo y conejo, agrega el arroz y el azafrán"),
+    ("El servidor SQL no responde desde anoche", "Revisa el servicio y el registro de errores"),
+    ("¿Quién ganó el partido de fútbol?", "Ganó el equipo local por dos goles"),
+    ("Recomiéndame una novela policiaca", "Prueba con una de Agatha Christie"),
+    ("¿Qué tiempo hará mañana en Bilbao?", "Lluvia por la mañana y sol por la tarde"),
+]
+
+
+def make_retriever(tmp_path, embedder=None, scope="chat") -> ConversationRetriever:
+    return ConversationRetriever(
+        enabled=True,
+        embedder=embedder or LocalEmbedder(256),
+        scope=scope,
+        top_k=2,
+        min_score=0.2,
+        index_path=str(tmp_path / "vector_index"),
+        batch_size=64
+    )
+
+
+def add_chat(session, title: str, turns):
+    chat = Chat(title=title)
+    session.add(chat)
+    session.commit()
+    repository = MessageRepository(session)
+    return chat.id, [repository.create_message_pair(chat.id, user, llm) for user, llm in turns]
+
+
+def test_context_recalls_old_turns_outside_the_window(api_client, session, tmp_path):
+    chat_id, pairs = add_chat(session, "temas", TOPICS)
+    retriever = make_retriever(tmp_path)
+    assert asyncio.run(retriever.index_pending(chat_id)) == (10, pairs[-1][1].id)
+    assert asyncio.run(retriever.index_pending(chat_id, pairs[-1][1].id)) == (0, pairs[-1][1].id)
+
+    builder = ContextBuilder(
+        MessageRepository(session),
+        max_messages=4,
+        embedding_repository=EmbeddingRepository(session),
+        retriever=retriever,
+        settings=Settings(database_url="sqlite://", context_retrieval_enabled=True)
+    )
+
+    def build(query: str, **kwargs):
+        return builder.build(chat_id, query, query_vector=asyncio.run(retriever.embed_query(query)), **kwargs)
+
+    # la receta quedó fuera de la ventana de 4 mensajes: vuelve como mensaje del sistema
+    context = build("¿Cuánto azafrán lleva la paella valenciana?")
+    assert context[0]["role"] == "system"
+    assert context[0]["content"] == (
+        RECALL_HEADER
+        + "Usuario: Dame la receta de paella valenciana con azafrán\n"
+        + "Asistente: Sofríe pollo y conejo, agrega el arroz y el azafrán"
+    )
+    assert [turn["content"] for turn in context[1:-1]] == [
+        "Recomiéndame una novela policiaca", "Prueba con una de Agatha Christie",
+        "¿Qué tiempo hará mañana en Bilbao?", "Lluvia por la mañana y sol por la tarde"
+    ]
+
+    # lo que ya está en la ventana no se repite; sin nada parecido no hay bloque
+    assert build("¿Lloverá mañana en Bilbao?")[0]["content"] == "Recomiéndame una novela policiaca"
+    assert build("Háblame de astronomía")[0]["content"] == "Recomiéndame una novela policiaca"
+    # al regenerar la receta no se puede recuperar a sí misma
+    before = (pairs[0][0].created_at, pairs[0][0].id)
+    assert build("paella valenciana con azafrán", before=before)[-1]["content"] == "paella valenciana con azafrán"
+    assert all(turn["role"] != "system" for turn in build("paella valenciana con azafrán", before=before))
+
+    # reescribir el par borra sus embeddings; al reindexar se recupera el texto nuevo
+    MessageRepository(session).update_message_pair(
+        pairs[0][0], pairs[0][1], "¿Cómo hago tortilla de patatas?", "Patatas, huevo y cebolla pochada"
+    )
+    assert build("paella valenciana con azafrán")[0]["role"] == "user"
+    assert asyncio.run(retriever.index_pending(chat_id))[0] == 2
+    assert "tortilla de patatas" in build("Receta de tortilla de patatas")[0]["content"]
+
+    ChatRepository(session).delete_chat(chat_id)
+    assert session.query(MessageEmbedding).count() == 0
+
+
+def test_vector_index_grows_persists_and_resets_on_model_change(tmp_path):
+    rows = 2 * MIN_CAPACITY + 10
+    vectors = normalize(np.random.default_rng(0).standard_normal((rows, 32)).astype(np.float32))
+    stored = [(i + 1, vectors[i].tobytes()) for i in range(rows)]
+
+    def fetch(after_id, limit):
+        return stored[after_id:after_id + limit]
+
+    index = VectorIndex(str(tmp_path), "modelo-a")
+    assert index.sync(fetch, batch_size=1000) == rows
+    assert index.sync(fetch) == 0
+    assert index.search(vectors[5000], k=3)[0] == (5001, pytest.approx(1.0))
+
+    # otro proceso (u otro arranque) ve las mismas filas
+    reopened = VectorIndex(str(tmp_path), "modelo-a")
+    assert (reopened.count, reopened.last_id, reopened.dimensions) == (rows, rows, 32)
+    assert [hit[0] for hit in reopened.search(vectors[42], k=1)] == [43]
+
+    stored.append((rows + 1, vectors[0].tobytes()))
+    assert reopened.sync(fetch) == 1
+    assert {hit[0] for hit in reopened.search(vectors[0], k=2)} == {1, rows + 1}
+
+    # los vectores de otro modelo no son comparables: el índice empieza de cero
+    assert VectorIndex(str(tmp_path), "modelo-b").count == 0
+
+
+def test_global_scope_recalls_other_chats_with_provider_embeddings(api_client, session, lm_studio_stub, tmp_path):
+    first_chat, _ = add_chat(session, "mascotas", [("Mi perro se llama Toby y es un labrador", "¡Qué buen nombre!")])
+    second_chat, _ = add_chat(session, "otro", TOPICS[1:3])
+    retriever = make_retriever(tmp_path, ProviderEmbedder(lm_studio_provider, "stub-embeddings"), scope="global")
+
+    assert asyncio.run(retriever.index_pending()) == (6, 6)
+    assert lm_studio_stub.state.stub.embedding_requests == 1
+
+    vector = asyncio.run(retriever.embed_query("¿Cómo se llama mi perro labrador?"))
+    recalled = retriever.retrieve(EmbeddingRepository(session), second_chat, vector)
+    # el turno completo: la pregunta encontrada y su respuesta
+    assert [(message.chat_id, message.content) for message in recalled[0]] == [
+        (first_chat, "Mi perro se llama Toby y es un labrador"), (first_chat, "¡Qué buen nombre!")
+    ]
+    assert retriever.index.count == 6
+
+    # un chat borrado deja filas en el índice, pero ya no se recuperan
+    ChatRepository(session).delete_chat(first_chat)
+    recalled = retriever.retrieve(EmbeddingRepository(session), second_chat, vector)
+    assert all(message.chat_id == second_chat for turn in recalled for message in turn)
@@ -0,0 +1,119 @@
+"""
+Router entre varias instancias de LM Studio: reparto por carga, afinidad por
+chat, expulsión de instancias que fallan y readmisión por health check.
+Cada instancia es un servidor stub en memoria (httpx.MockTransport).
+"""
+import asyncio
+
+import httpx
+
+from app.providers.router import BackendRouter
+
+URLS = ["http://lm-a", "http://lm-b", "http://lm-c"]
+
+
+class StubServer:
+    """Servidor compatible con OpenAI mínimo que cuenta las peticiones recibidas"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.requests = 0
+        self.down = False
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        if self.down:
+            raise httpx.ConnectError("connection refused", request=request)
+        self.requests += 1
+        if request.url.path == "/v1/models":
+            return httpx.Response(200, json={"data": [{"id": "stub"}]})
+        return httpx.Response(200, json={"choices": [{"message": {"content": self.url}}]})
+
+
+def make_router(**kwargs):
+    servers = {url: StubServer(url) for url in URLS}
+
+    def client_factory(base_url: str) -> httpx.AsyncClient:
+        return httpx.AsyncClient(base_url=base_url, transport=httpx.MockTransport(servers[base_url].handle))
+
+    return BackendRouter(URLS, client_factory, health_interval=0, **kwargs), servers
+
+
+async def call(router: BackendRouter, affinity_key=None) -> str:
+    async with router.lease(affinity_key) as backend:
+        response = await backend.client.post("/v1/chat/completions", json={})
+        return response.json()["choices"][0]["message"]["content"]
+
+
+def test_least_outstanding_spreads_concurrent_requests():
+    router, servers = make_router()
+    leases = [router.lease() for _ in URLS]
+
+    async def scenario():
+        backends = [await lease.__aenter__() for lease in leases]
+        for lease in leases:
+            await lease.__aexit__(None, None, None)
+        return backends
+
+    backends = asyncio.run(scenario())
+    assert sorted(backend.url for backend in backends) == URLS
+    assert all(backend.outstanding == 0 for backend in router.backends)
+
+
+def test_chat_affinity_prefers_same_backend():
+    router, servers = make_router()
+
+    async def scenario():
+        return [await call(router, "chat:42") for _ in range(5)]
+
+    assert len(set(asyncio.run(scenario()))) == 1
+    assert router.affinity_hits == 5
+
+
+def test_failing_backend_is_ejected_and_readmitted_by_health_check():
+    router, servers = make_router(failure_threshold=2, recovery_seconds=60)
+
+    async def scenario():
+        preferred = await call(router, "chat:7")
+        servers[preferred].down = True
+        for _ in range(2):
+            try:
+                await call(router, "chat:7")
+            except httpx.ConnectError:
+                pass
+        rerouted = await call(router, "chat:7")
+
+        servers[preferred].down = False
+        await router.check_all()
+        readmitted = await call(router, "chat:7")
+        return preferred, rerouted, readmitted
+
+    preferred, rerouted, readmitted = asyncio.run(scenario())
+    assert rerouted != preferred
+    assert readmitted == preferred
+
+
+def test_health_loop_survives_unexpected_errors():
+    calls = []
+
+    async def handle(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        if len(calls) == 1:
+            raise RuntimeError("respuesta inesperada")
+        return httpx.Response(200, json={"data": [{"id": "stub"}]})
+
+    def client_factory(base_url: str) -> httpx.AsyncClient:
+        return httpx.AsyncClient(base_url=base_url, transport=httpx.MockTransport(handle))
+
+    async def scenario():
+        router = BackendRouter(URLS[:1], client_factory, health_interval=0.01)
+        router.backends[0].healthy = False
+        await router.start()
+        await asyncio.sleep(0.05)
+        running = not router._health_task.done()
+        await router.stop()
+        return router, running
+
+    router, running = asyncio.run(scenario())
+    assert running
+    assert len(calls) > 1
+    assert router.backends[0].healthy
@@ -0,0 +1,136 @@
+"""
+Búsqueda de texto completo sobre SQLite FTS5: ranking bm25, fragmentos
+resaltados, paginación por cursor y sincronización del índice con los
+inserts/updates/deletes de mensajes; sin índice se recurre a LIKE hasta que aparece
+(y los cursores de LIKE dejan de valer).
+"""
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.conf.settings import Settings
+from app.entities.search import sqlite_fts_statements
+from app.entities.chats import Chat
+from app.repositories.chats import ChatRepository
+from app.repositories import search as search_repository
+from app.repositories.messages import MessageRepository
+from app.repositories.search import SearchRepository
+from app.services.search import SearchService, highlight, parse_terms
+from app.utils.pagination import InvalidCursorError, decode_rank_cursor
+
+
+def add_chat(session, title: str, pairs):
+    chat = Chat(title=title)
+    session.add(chat)
+    session.commit()
+    repository = MessageRepository(session)
+    for user_content, llm_content in pairs:
+        repository.create_message_pair(chat.id, user_content, llm_content)
+    return chat.id
+
+
+def search(api_client, path: str, **params):
+    response = api_client.get(f"/api/v1/search/{path}", params=params)
+    return response.json()
+
+
+def test_search_ranks_highlights_and_pages(api_client, session):
+    recipes = add_chat(session, "Recetas de cocina", [
+        ("¿Cómo hago una paella?", "Paella, paella y más paella: arroz, azafrán y caldo."),
+        ("¿Y el gazpacho?", "El gazpacho es una sopa fría de tomate."),
+    ])
+    add_chat(session, "Viajes", [("Quiero ir a Valencia", "En Valencia puedes comer paella junto al mar.")])
+
+    body = search(api_client, "messages", q="paella")
+    assert body["data"]["backend"] == "fts5"
+    results = body["data"]["results"]
+    assert len(results) == 3
+    # el mensaje que repite el término rankea primero
+    assert results[0]["snippet"].lower().count("<mark>paella</mark>") == 3
+    assert [r["score"] for r in results] == sorted((r["score"] for r in results), reverse=True)
+
+    # sin tildes, por prefijo y acotado a un chat
+    assert len(search(api_client, "messages", q="azafran")["data"]["results"]) == 1
+    assert len(search(api_client, "messages", q="gazp*")["data"]["results"]) == 2
+    assert {r["chat_id"] for r in search(api_client, "messages", q="paella", chat_id=recipes)["data"]["results"]} == {recipes}
+
+    # páginas de a uno sin repetir ni saltar resultados
+    seen, cursor = [], None
+    while True:
+        page = search(api_client, "messages", q="paella", limit=1, **({"cursor": cursor} if cursor else {}))
+        seen += [r["message_id"] for r in page["data"]["results"]]
+        cursor = page["pagination"]["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [r["message_id"] for r in results]
+
+    chats = search(api_client, "chats", q="cocina")["data"]["results"]
+    assert [(c["chat_id"], c["snippet"]) for c in chats] == [(recipes, "Recetas de <mark>cocina</mark>")]
+    assert api_client.get("/api/v1/search/messages", params={"q": "¿?"}).status_code == 400
+    assert api_client.get("/api/v1/search/messages", params={"q": "paella", "cursor": "x"}).status_code == 400
+
+
+def test_index_follows_updates_and_deletes(api_client, session):
+    chat_id = add_chat(session, "temporal", [("pregunta vieja", "respuesta original")])
+    messages = MessageRepository(session)
+    user_message, llm_message = messages.get_last_two_messages(chat_id)
+    messages.update_message_pair(user_message, llm_message, "pregunta nueva", "respuesta corregida")
+
+    assert search(api_client, "messages", q="original")["data"]["results"] == []
+    assert len(search(api_client, "messages", q="corregida")["data"]["results"]) == 1
+
+    ChatRepository(session).delete_chat(chat_id)
+    assert search(api_client, "messages", q="corregida")["data"]["results"] == []
+    assert search(api_client, "chats", q="temporal")["data"]["results"] == []
+
+
+def test_ranking_window_keeps_newest_matches(session):
+    add_chat(session, "ventana", [(f"tema {i}", "otra cosa") for i in range(5)])
+    service = SearchService(session, Settings(database_url="sqlite://", search_max_ranked_matches=2))
+    result, next_cursor = service._search_messages("tema", None, None, 10)
+    # solo se rankean las 2 coincidencias más recientes (ids 7 y 9: mensajes del usuario)
+    assert sorted(r.message_id for r in result["results"]) == [7, 9]
+    assert next_cursor is None
+    # dentro de un chat el tope no aplica
+    result, _ = service._search_messages("tema", 1, None, 10)
+    assert len(result["results"]) == 5
+
+
+def test_query_terms_and_python_highlight():
+    assert parse_terms('paella "valenciana" OR va* paella') == ["paella", "valenciana", "OR", "va"]
+    assert highlight("Una paella valenciana", ["paella", "valen*"]) == "Una <mark>paella</mark> <mark>valenciana</mark>"
+    long_text = "x " * 100 + "aguja" + " y" * 100
+    snippet = highlight(long_text, ["aguja"], width=40)
+    assert snippet.startswith("…") and snippet.endswith("…") and "<mark>aguja</mark>" in snippet
+
+
+def test_like_fallback_is_detected_again_after_migration(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'search.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE messages (id INTEGER PRIMARY KEY, content TEXT)"))
+        conn.execute(text(
+            "CREATE TABLE chats (id INTEGER PRIMARY KEY, title TEXT, created_at DATETIME, "
+            "message_count INTEGER, last_message_at DATETIME)"
+        ))
+    db = sessionmaker(bind=engine)()
+    monkeypatch.setattr(search_repository, "LIKE_BACKEND_TTL_SECONDS", 0)
+    assert SearchRepository(db).get_backend() == "like"
+    db.execute(text(
+        "INSERT INTO chats (id, title, created_at, message_count) "
+        "VALUES (1, 'paella', '2024-01-01', 0), (2, 'paella valenciana', '2024-01-02', 0)"
+    ))
+    db.commit()
+    _, like_cursor = SearchService(db, Settings(database_url="sqlite://"))._search_chats("paella", None, 1)
+    assert decode_rank_cursor(like_cursor) == ("like", None, 2)
+
+    # la migración 0008 se aplica con el proceso en marcha: la siguiente búsqueda ya usa FTS5
+    with engine.begin() as conn:
+        for source, fts, column in (("messages", "messages_fts", "content"), ("chats", "chats_fts", "title")):
+            for statement in sqlite_fts_statements(source, fts, column):
+                conn.execute(text(statement))
+    assert SearchRepository(db).get_backend() == "fts5"
+    # un cursor de LIKE no sirve con FTS5 (rank > NULL daría una página vacía): 400
+    with pytest.raises(InvalidCursorError):
+        SearchService(db, Settings(database_url="sqlite://"))._search_chats("paella", like_cursor, 1)
+    db.close()
+    engine.dispose()
@@ -0,0 +1,30 @@
+"""
+Configuración centralizada: se lee del entorno una vez, con tipos validados.
+"""
+import pytest
+from pydantic import ValidationError
+
+from app.conf.settings import Settings
+
+
+def test_settings_read_and_coerce_environment(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", "sqlite://")
+    monkeypatch.setenv("LM_STUDIO_URLS", "http://a:1234, http://b:1234,")
+    monkeypatch.setenv("LM_STUDIO_COALESCE", "false")
+    monkeypatch.setenv("LLM_TEMPERATURE", "0.2")
+    monkeypatch.setenv("RESPONSE_CACHE_BACKEND", "OFF")
+    monkeypatch.setenv("DB_ISOLATION_LEVEL", "")
+
+    settings = Settings.from_env()
+    assert settings.lm_studio_base_urls == ["http://a:1234", "http://b:1234"]
+    assert settings.lm_studio_coalesce is False
+    assert settings.llm_temperature == 0.2
+    assert settings.response_cache_backend == "none"
+    assert settings.db_isolation_level is None
+
+
+def test_settings_reject_invalid_values(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", "sqlite://")
+    monkeypatch.setenv("LM_STUDIO_ROUTING_POLICY", "random")
+    with pytest.raises(ValidationError):
+        Settings.from_env()
@@ -0,0 +1,62 @@
+"""
+Endpoint SSE de completions: 404 antes de abrir el stream, eventos delta/done
+con el par de mensajes guardado al final y evento de error sin guardar nada.
+"""
+import json
+
+import pytest
+
+from benchmarks.lm_studio_stub import StubConfig
+
+
+def create_chat(api_client, name="sse") -> int:
+    return api_client.post("/api/v1/chats/create", json={"name": name}).json()["data"]["id"]
+
+
+def parse_events(body: str):
+    events = []
+    for block in body.split("\n\n"):
+        if not block:
+            continue
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields.get("event", "message"), json.loads(fields["data"])))
+    return events
+
+
+def test_unknown_chat_is_rejected_before_opening_the_stream(api_client):
+    response = api_client.post("/api/v1/messenger/completion/999/stream", json={"message": "hola"})
+    assert response.status_code == 404
+    assert response.headers["content-type"].startswith("application/json")
+
+
+def test_stream_sends_deltas_then_done_and_saves_the_pair(api_client):
+    chat_id = create_chat(api_client)
+    response = api_client.post(f"/api/v1/messenger/completion/{chat_id}/stream", json={"message": "hola"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["cache-control"] == "no-cache"
+
+    events = parse_events(response.text)
+    assert [name for name, _ in events[:-1]] == ["message"] * (len(events) - 1)
+    name, done = events[-1]
+    assert name == "done"
+    assert "".join(data["delta"] for _, data in events[:-1]) == done["llm_response"]
+
+    messages = api_client.get(f"/api/v1/messenger/registers/{chat_id}").json()["data"]["messages"]
+    assert [(message["role"], message["content"]) for message in messages] == [
+        ("user", "hola"),
+        ("assistant", done["llm_response"])
+    ]
+    assert done["message_id"] > 0
+
+
+@pytest.mark.parametrize("stub_config", [StubConfig(error_rate=1, error_status=500)])
+def test_provider_error_is_sent_as_error_event_and_nothing_is_saved(api_client):
+    chat_id = create_chat(api_client)
+    response = api_client.post(f"/api/v1/messenger/completion/{chat_id}/stream", json={"message": "hola"})
+    assert response.status_code == 200
+
+    events = parse_events(response.text)
+    assert [name for name, _ in events] == ["error"]
+    assert events[0][1]["message"].startswith("Error communicating with LLM")
+    assert api_client.get(f"/api/v1/messenger/registers/{chat_id}").json()["data"]["messages"] == []
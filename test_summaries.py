@@ -0,0 +1,74 @@
+"""
+Resumen incremental de chats largos: el contexto envía resumen + ventana reciente,
+las versiones se invalidan al reescribir un turno resumido y el plegado se
+genera a través del proveedor (stub de LM Studio).
+"""
+import asyncio
+
+from app.conf.settings import Settings
+from app.entities.chats import Chat
+from app.repositories.messages import MessageRepository
+from app.repositories.summaries import SummaryRepository
+from app.services.context_builder import ContextBuilder, SUMMARY_HEADER
+from app.services.summarizer import ConversationSummarizer
+
+
+def add_pairs(session, turns: int):
+    chat = Chat(title="largo")
+    session.add(chat)
+    session.commit()
+    repository = MessageRepository(session)
+    pairs = [repository.create_message_pair(chat.id, f"pregunta {i}", f"respuesta {i}") for i in range(turns)]
+    return chat.id, pairs
+
+
+def test_context_starts_with_summary_and_skips_summarized_turns(session):
+    chat_id, pairs = add_pairs(session, 6)
+    summaries = SummaryRepository(session)
+    summaries.create_summary(chat_id, "resumen v1", pairs[1][1], message_count=4)
+    summaries.create_summary(chat_id, "resumen v2", pairs[3][1], message_count=8)
+    settings = Settings(database_url="sqlite://", context_summary_enabled=True)
+    builder = ContextBuilder(MessageRepository(session), summary_repository=summaries, settings=settings)
+
+    context = builder.build(chat_id, "nueva")
+    assert context[0] == {"role": "system", "content": SUMMARY_HEADER + "resumen v2"}
+    assert [turn["content"] for turn in context[1:]] == [
+        "pregunta 4", "respuesta 4", "pregunta 5", "respuesta 5", "nueva"
+    ]
+
+    # reescribir un turno ya resumido invalida las versiones que lo cubren
+    user_message = pairs[2][0]
+    assert summaries.invalidate_from(chat_id, (user_message.created_at, user_message.id)) == 1
+    context = builder.build(chat_id, "nueva")
+    assert context[0]["content"] == SUMMARY_HEADER + "resumen v1"
+    assert context[1]["content"] == "pregunta 2"
+    assert [summary.version for summary in summaries.list_summaries(chat_id)] == [2, 1]
+
+    # sin CONTEXT_SUMMARY_ENABLED el resumen se ignora
+    disabled = ContextBuilder(
+        MessageRepository(session), summary_repository=summaries, settings=Settings(database_url="sqlite://")
+    )
+    assert disabled.build(chat_id, "nueva")[0]["content"] == "pregunta 0"
+
+
+def test_summarizer_folds_old_turns_through_provider(api_client, lm_studio_stub):
+    chat_id = api_client.post("/api/v1/chats/create", json={"name": "largo"}).json()["data"]["id"]
+    for i in range(6):
+        api_client.post(f"/api/v1/messenger/completion/{chat_id}", json={"message": f"pregunta {i}"})
+    summarizer = ConversationSummarizer(
+        enabled=True, trigger_messages=8, keep_messages=4, max_tokens=64, chunk_tokens=10_000
+    )
+
+    assert asyncio.run(summarizer.fold(chat_id)) is True
+    # quedan 4 mensajes sin resumir: por debajo del umbral
+    assert asyncio.run(summarizer.fold(chat_id)) is False
+    assert lm_studio_stub.state.stub.requests == 7
+
+    summaries = api_client.get(f"/api/v1/messenger/summaries/{chat_id}").json()["data"]
+    assert [(s["version"], s["message_count"]) for s in summaries] == [(1, 8)]
+    assert summaries[0]["content"] and summaries[0]["completion_tokens"] > 0
+
+    # regenerar el último par (fuera del resumen) no lo invalida
+    api_client.put(f"/api/v1/messenger/update/{chat_id}", json={})
+    summaries = api_client.get(f"/api/v1/messenger/summaries/{chat_id}").json()["data"]
+    assert summaries[0]["invalidated_at"] is None
@@ -0,0 +1,56 @@
+"""
+Exportación/importación masiva de chats: el NDJSON (plano o gzip) exportado por la
+API se vuelve a importar con ids nuevos, mensajes y contadores intactos.
+"""
+import gzip
+import json
+
+import pytest
+
+from app.services.transfer import ChatImporter, NdjsonDecoder, TransferFormatError
+
+
+def create_chat(api_client, name: str, turns: int) -> int:
+    chat_id = api_client.post("/api/v1/chats/create", json={"name": name}).json()["data"]["id"]
+    for i in range(turns):
+        api_client.post(f"/api/v1/messenger/completion/{chat_id}", json={"message": f"{name} {i}"})
+    return chat_id
+
+
+def registers(api_client, chat_id: int):
+    messages = api_client.get(f"/api/v1/messenger/registers/{chat_id}").json()["data"]["messages"]
+    return [(message["role"], message["content"]) for message in messages]
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_export_import_roundtrip(api_client, compress):
+    first, second = create_chat(api_client, "uno", 3), create_chat(api_client, "dos", 1)
+    response = api_client.get("/api/v1/transfer/export", params={"gzip": compress})
+    assert response.status_code == 200
+    body = gzip.decompress(response.content) if compress else response.content
+    records = [json.loads(line) for line in body.splitlines()]
+    assert [record["type"] for record in records] == ["header", "chat", "chat"] + ["message"] * 8
+
+    # lotes de 3 registros: los mensajes de un chat quedan repartidos en varias transacciones
+    result = api_client.post(
+        "/api/v1/transfer/import", params={"batch_size": 3}, content=response.content
+    ).json()["data"]
+    assert (result["chats"], result["messages"]) == (2, 8)
+    assert result["rows_per_second"] > 0
+
+    for original in (first, second):
+        imported = original + 2
+        assert registers(api_client, imported) == registers(api_client, original)
+        assert api_client.get(f"/api/v1/usage/chats/{imported}").json()["data"] == {
+            **api_client.get(f"/api/v1/usage/chats/{original}").json()["data"], "chat_id": imported
+        }
+
+
+def test_import_rejects_messages_before_their_chat(session):
+    decoder = NdjsonDecoder()
+    importer = ChatImporter(session, batch_size=10)
+    lines = decoder.feed(b'{"type":"message","chat_id":7,"sender":"user","content":"hola"}\n{"type":"ch')
+    assert len(lines) == 1 and decoder.finish() == [b'{"type":"ch']
+    importer.add_lines(lines)
+    with pytest.raises(TransferFormatError, match="Record 1: chat 7"):
+        importer.finish()
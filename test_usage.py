@@ -0,0 +1,62 @@
+"""
+Uso de tokens: se guarda en el mensaje del LLM, se acumula por chat (ajustándose
+al regenerar) y alimenta la calibración de la estimación local.
+"""
+from datetime import datetime, timedelta, timezone
+
+from app.entities.chats import Chat
+from app.entities.messages import Message  # noqa: F401 (registra el modelo)
+from app.repositories.messages import MessageRepository
+from app.repositories.usage import UsageRepository
+from app.utils.tokens import TokenCalibration
+
+
+def usage(prompt_tokens, completion_tokens, finish_reason="stop"):
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "model": "qwen/qwen3-8b",
+        "latency_ms": 120,
+        "finish_reason": finish_reason
+    }
+
+
+def test_usage_is_stored_and_rolled_up_per_chat(session):
+    chat = Chat(title="uso")
+    session.add(chat)
+    session.commit()
+    repository = MessageRepository(session)
+
+    repository.create_message_pair(chat.id, "hola", "r1", usage(100, 10))
+    user_message, llm_message = repository.create_message_pair(chat.id, "otra", "r2", usage(150, 20, "length"))
+    # regenerar reemplaza el uso del mensaje y ajusta los acumulados
+    stored_user, stored_llm = repository.get_last_two_messages(chat.id)
+    repository.update_message_pair(stored_user, stored_llm, None, "r2 bis", usage(150, 40))
+
+    session.expire_all()
+    chat = session.get(Chat, chat.id)
+    assert (chat.prompt_tokens_total, chat.completion_tokens_total) == (250, 50)
+    assert session.get(Message, llm_message.id).completion_tokens == 40
+    assert session.get(Message, user_message.id).prompt_tokens is None
+
+    since = datetime.now(timezone.utc) - timedelta(days=1)
+    usage_repository = UsageRepository(session)
+    totals = usage_repository.get_totals(since)
+    assert (totals["responses"], totals["prompt_tokens"], totals["completion_tokens"]) == (2, 250, 50)
+    assert usage_repository.get_finish_reasons(since) == {"stop": 2}
+    assert usage_repository.get_largest_prompts(since, limit=1)[0]["message_id"] == llm_message.id
+    assert sum(day["prompt_tokens"] for day in usage_repository.get_usage_by_day(since)) == 250
+    assert usage_repository.get_chat_usage(chat.id)["responses"] == 2
+
+
+def test_token_calibration_tracks_real_prompt_tokens():
+    calibration = TokenCalibration(alpha=0.5)
+    calibration.observe(100, 150)
+    assert calibration.ratio == 1.5
+    calibration.observe(100, 100)
+    assert calibration.ratio == 1.25
+    # las muestras anómalas se acotan
+    calibration.observe(100, 10_000)
+    assert calibration.ratio <= calibration.max_ratio
+    calibration.observe(0, 50)
+    assert calibration.samples == 3